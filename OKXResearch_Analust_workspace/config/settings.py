@@ -1,4 +1,5 @@
 import os
+import json
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -13,6 +14,12 @@ OKX_API_KEY = os.getenv("OKX_API_KEY")
 OKX_SECRET_KEY = os.getenv("OKX_SECRET_KEY")
 OKX_PASSPHRASE = os.getenv("OKX_PASSPHRASE")
 OKX_BASE_URL = os.getenv("OKX_BASE_URL", "https://www.okx.com")
+# 备用主机 (逗号分隔)：主主机过慢时发出对冲请求，主主机熔断时自动切换
+OKX_BACKUP_URLS = [u.strip() for u in os.getenv("OKX_BACKUP_URLS", "https://aws.okx.com").split(",") if u.strip()]
+# 主主机响应超过该延迟分位数仍未返回时触发对冲请求
+OKX_HEDGE_PERCENTILE = float(os.getenv("OKX_HEDGE_PERCENTILE", "0.95"))
+# 限频安全系数：按 OKX 官方限频的该比例发送请求 (1.0 = 用满)
+OKX_RATE_LIMIT_FACTOR = float(os.getenv("OKX_RATE_LIMIT_FACTOR", "0.9"))
 
 # LLM (大模型) 配置
 # 优先读取 LLM_ 前缀的配置，如果未设置则尝试读取 DEEPSEEK_ 前缀以保持兼容性
@@ -20,6 +27,21 @@ LLM_API_KEY = os.getenv("LLM_API_KEY") or os.getenv("DEEPSEEK_API_KEY")
 LLM_BASE_URL = os.getenv("LLM_BASE_URL") or os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com")
 LLM_MODEL = os.getenv("LLM_MODEL", "deepseek-chat")
 
+# 额外的 OpenAI 兼容模型端点 (JSON 列表)，用于多模型集成分析，例如：
+# [{"name": "gpt", "base_url": "https://api.openai.com/v1", "model": "gpt-4o-mini", "api_key": "sk-...", "deadline": 60}]
+# api_key 缺省时使用 LLM_API_KEY
+try:
+    LLM_ENDPOINTS = json.loads(os.getenv("LLM_ENDPOINTS") or "[]")
+except ValueError as e:
+    raise ValueError(f"LLM_ENDPOINTS must be a JSON list: {e}")
+# 多模型集成：市场分析并发发送给默认模型与 LLM_ENDPOINTS 中的全部模型，超过期限的模型被丢弃
+ENABLE_LLM_ENSEMBLE = os.getenv("ENABLE_LLM_ENSEMBLE", "false").lower() == "true"
+LLM_ENSEMBLE_DEADLINE = float(os.getenv("LLM_ENSEMBLE_DEADLINE", "90")) # 单个模型的默认期限 (秒)
+# 多端点路由：每次调用选择 EWMA 延迟/错误率最优的健康端点，超过软期限对冲、失败时切换
+ENABLE_LLM_ROUTING = os.getenv("ENABLE_LLM_ROUTING", "false").lower() == "true"
+LLM_ROUTE_DEADLINE = float(os.getenv("LLM_ROUTE_DEADLINE", "30")) # 软期限 (秒)，超过后向下一个端点发出对冲请求
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60")) # 单次 LLM 调用的总超时 (秒)
+
 # 调度与通知配置
 ENABLE_SCHEDULER = os.getenv("ENABLE_SCHEDULER", "false").lower() == "true"
 SCHEDULE_TIME = os.getenv("SCHEDULE_TIME", "08:00") # 默认每天早上8点
@@ -27,9 +49,92 @@ SCHEDULE_INTERVAL = int(os.getenv("SCHEDULE_INTERVAL", "0")) # 默认0，表示
 FEISHU_WEBHOOK_URL = os.getenv("FEISHU_WEBHOOK_URL")
 DINGTALK_WEBHOOK_URL = os.getenv("DINGTALK_WEBHOOK_URL")
 
+# 变化检测闸门 (仅间隔调度模式生效)：行情/新闻无显著变化时跳过 LLM 分析
+ENABLE_CHANGE_GATE = os.getenv("ENABLE_CHANGE_GATE", "true").lower() == "true"
+GATE_PRICE_CHANGE_PCT = float(os.getenv("GATE_PRICE_CHANGE_PCT", "1.0")) # Top30 最大价格变动 (%)
+GATE_RANK_CHURN = float(os.getenv("GATE_RANK_CHURN", "0.2")) # 成交额 Top30 名单换手比例
+GATE_FUNDING_DELTA = float(os.getenv("GATE_FUNDING_DELTA", "0.005")) # 资金费率变动 (百分点)
+GATE_MIN_NEW_HEADLINES = int(os.getenv("GATE_MIN_NEW_HEADLINES", "1")) # 新增新闻条数
+GATE_MAX_SKIPS = int(os.getenv("GATE_MAX_SKIPS", "6")) # 连续跳过次数上限，达到后强制分析
+
+# Prompt 中逐币列出的币种数 (按成交额)；启用赛道汇总后可适当调小以节省 token
+PROMPT_TOP_N = int(os.getenv("PROMPT_TOP_N", "30"))
+# 全市场赛道汇总：按赛道聚合全部 USDT 交易对的加权涨跌、上涨占比、成交额占比与分化度
+ENABLE_SECTOR_SUMMARY = os.getenv("ENABLE_SECTOR_SUMMARY", "true").lower() == "true"
+SECTOR_TABLE_TOP_N = int(os.getenv("SECTOR_TABLE_TOP_N", "12")) # 汇总表保留的赛道数
+# 订单簿流动性采样：对成交额 Top N 与异动币种并发拉取订单簿，计算价差、±0.5%/±2% 深度与买卖失衡
+ENABLE_LIQUIDITY_METRICS = os.getenv("ENABLE_LIQUIDITY_METRICS", "true").lower() == "true"
+ORDER_BOOK_DEPTH = int(os.getenv("ORDER_BOOK_DEPTH", "200")) # 每侧档位数 (OKX 上限 400)
+# 全市场异动筛选：从成交额 Top N 之外挑出涨跌/振幅/放量/资金费率异常的币种一并交给 LLM
+ENABLE_ANOMALY_SCREENER = os.getenv("ENABLE_ANOMALY_SCREENER", "true").lower() == "true"
+ANOMALY_TOP_N = int(os.getenv("ANOMALY_TOP_N", "8")) # 每轮加入 prompt 的异动币种数
+ANOMALY_MIN_VOLUME = float(os.getenv("ANOMALY_MIN_VOLUME", "100000")) # 参与筛选的最小 24h 成交额 (USDT)
+ANOMALY_Z_THRESHOLD = float(os.getenv("ANOMALY_Z_THRESHOLD", "2.5")) # 单项稳健 z 分数阈值
+
 # 新闻源配置
 CRYPTOPANIC_API_KEY = os.getenv("CRYPTOPANIC_API_KEY")
+NEWS_MAX_PAGES = int(os.getenv("NEWS_MAX_PAGES", "3")) # 增量拉取新闻时最多翻页数
+NEWS_STORE_RETENTION = int(os.getenv("NEWS_STORE_RETENTION", "500")) # 本地新闻存储保留条数
+
+# 数据目录 (新闻存储、运行存档等)
+DATA_DIR = BASE_DIR / "data"
+
+# 运行存档：每次分析的输入、prompt、报告、耗时与 token 用量写入 SQLite，可按时间/币种/关键词检索
+ENABLE_RUN_ARCHIVE = os.getenv("ENABLE_RUN_ARCHIVE", "true").lower() == "true"
+RUN_ARCHIVE_PATH = BASE_DIR / os.getenv("RUN_ARCHIVE_PATH", "data/runs.sqlite3") # 相对路径基于项目根目录
+
+# 共享行情环形缓冲区：由 src/collector.py 单进程采集 SPOT tickers，其他进程通过内存映射零拷贝读取
+USE_PRICE_RING = os.getenv("USE_PRICE_RING", "false").lower() == "true" # 分析任务优先从环形缓冲区读取现货行情
+PRICE_RING_PATH = BASE_DIR / os.getenv("PRICE_RING_PATH", "data/price_ring.bin")
+PRICE_RING_SLOTS = int(os.getenv("PRICE_RING_SLOTS", "120")) # 保留的快照数
+PRICE_RING_MAX_INSTRUMENTS = int(os.getenv("PRICE_RING_MAX_INSTRUMENTS", "1024")) # 固定索引的交易对容量
+PRICE_RING_INTERVAL = float(os.getenv("PRICE_RING_INTERVAL", "5")) # 采集间隔 (秒)
 
 # 日志配置
 LOG_DIR = BASE_DIR / "logs"
 LOG_DIR.mkdir(exist_ok=True)
+# 队列模式：日志写入由后台线程完成，不阻塞分析流程
+LOG_QUEUE = os.getenv("LOG_QUEUE", "false").lower() == "true"
+# 文件日志格式: text (默认) 或 json (JSON Lines 结构化日志)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+
+# 性能分析：对每轮分析任务进行 CPU 采样与按阶段的内存快照，报告写入 logs/ (单次运行可用 --profile 开启)
+PROFILE_RUNS = os.getenv("PROFILE_RUNS", "false").lower() == "true"
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005")) # CPU 采样间隔 (秒)
+
+# 状态服务：定时模式下在后台线程提供 /healthz、/status、/report，供容器编排探活与查看最近一轮结果
+ENABLE_STATUS_SERVER = os.getenv("ENABLE_STATUS_SERVER", "false").lower() == "true"
+STATUS_SERVER_HOST = os.getenv("STATUS_SERVER_HOST", "0.0.0.0")
+STATUS_SERVER_PORT = int(os.getenv("STATUS_SERVER_PORT", "8080"))
+STATUS_STALE_AFTER = int(os.getenv("STATUS_STALE_AFTER", "900")) # 调度循环超过该秒数无心跳视为不健康
+
+# HTTP 录制 / 回放：python src/main.py --record 录制一次运行的全部请求，--replay 离线重放 (调试 prompt、回归基准)
+CASSETTE_PATH = BASE_DIR / os.getenv("CASSETTE_PATH", "data/cassettes/run.json.gz")
+CASSETTE_LATENCY = float(os.getenv("CASSETTE_LATENCY", "0")) # 回放延迟倍数，0 为立即返回，1 为按录制耗时
+
+# 多交易所：逗号分隔的交易所列表 (目前支持 okx, binance)，配置 OKX 之外的交易所时为 prompt 补充跨交易所成交额与价差
+EXCHANGE_VENUES = [v.strip().lower() for v in os.getenv("EXCHANGE_VENUES", "okx").split(",") if v.strip()]
+VENUE_TIMEOUT = float(os.getenv("VENUE_TIMEOUT", "10")) # 等待其他交易所返回的最长时间 (秒)
+
+# 规则告警：python src/alerter.py 读取共享环形缓冲区 (需先启动 collector)，每个新快照到达即按规则求值并推送，不经过 LLM
+ALERT_RULES_PATH = BASE_DIR / os.getenv("ALERT_RULES_PATH", "config/alert_rules.json")
+ALERT_DEFAULT_COOLDOWN = int(os.getenv("ALERT_DEFAULT_COOLDOWN", "900")) # 规则未指定 cooldown 时的冷却时间 (秒)
+ALERT_FUNDING_INTERVAL = float(os.getenv("ALERT_FUNDING_INTERVAL", "60")) # 资金费率规则的刷新间隔 (秒)
+ALERT_LLM_REPORT = os.getenv("ALERT_LLM_REPORT", "false").lower() == "true" # 带 report 标记的规则触发时是否生成 LLM 报告
+
+# 合并预分析：新闻验证与未知币种赛道识别合并为一次 LLM 请求，响应未通过校验时自动退回分开调用
+ENABLE_COMBINED_PRE_ANALYSIS = os.getenv("ENABLE_COMBINED_PRE_ANALYSIS", "true").lower() == "true"
+
+# 分析服务：python src/service.py 提供 HTTP 接口，后台定时刷新共享行情快照，相同查询与快照的请求合并为一次 LLM 分析
+SERVICE_HOST = os.getenv("SERVICE_HOST", "0.0.0.0")
+SERVICE_PORT = int(os.getenv("SERVICE_PORT", "8081"))
+SERVICE_WORKERS = int(os.getenv("SERVICE_WORKERS", "2")) # 同时进行的 LLM 分析数
+SERVICE_REFRESH_INTERVAL = float(os.getenv("SERVICE_REFRESH_INTERVAL", "60")) # 共享快照刷新间隔 (秒)
+SERVICE_MAX_QUEUE = int(os.getenv("SERVICE_MAX_QUEUE", "50")) # 排队任务上限，超出返回 429
+SERVICE_JOB_TTL = int(os.getenv("SERVICE_JOB_TTL", "3600")) # 已完成任务的保留时间 (秒)
+
+# BTC 联动：对进入 prompt 的币种按 K 线收益率滚动计算 BTC Beta、相关系数与联动分组，常驻内存，每轮只拉取新收盘的 K 线
+ENABLE_CORRELATION = os.getenv("ENABLE_CORRELATION", "true").lower() == "true"
+CORRELATION_BAR = os.getenv("CORRELATION_BAR", "1H") # K 线周期 (1m/5m/15m/30m/1H/2H/4H/1D)
+CORRELATION_WINDOW = int(os.getenv("CORRELATION_WINDOW", "168")) # 滚动窗口 (K 线根数，OKX 单次最多返回 300 根)
+CORRELATION_CLUSTER_THRESHOLD = float(os.getenv("CORRELATION_CLUSTER_THRESHOLD", "0.7")) # 相关系数达到该值归为同一联动组
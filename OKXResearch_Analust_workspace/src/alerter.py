@@ -0,0 +1,125 @@
+import sys
+import os
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# 将 src 目录和项目根目录添加到 Python 路径
+src_path = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(src_path)
+sys.path.append(src_path)
+sys.path.append(project_root)
+
+from api.okx_client import OKXClient
+from analysis.alert_engine import AlertEngine, AlertDispatcher, load_rules, ring_metrics, ring_coverage, required_ring_slots
+from utils.notifier import Notifier
+from utils.price_ring import PriceRingReader
+from utils.logger import setup_logger, shutdown_logging
+from config.settings import LOG_DIR, LOG_QUEUE, LOG_FORMAT, PRICE_RING_PATH, PRICE_RING_INTERVAL, FEISHU_WEBHOOK_URL, DINGTALK_WEBHOOK_URL
+from config.settings import ALERT_RULES_PATH, ALERT_DEFAULT_COOLDOWN, ALERT_FUNDING_INTERVAL, ALERT_LLM_REPORT
+import logging
+
+setup_logger(name=None, log_file=LOG_DIR / "alerter.log", queued=LOG_QUEUE, json_format=(LOG_FORMAT == "json"))
+logger = logging.getLogger("alerter")
+
+
+def funding_targets(rules):
+    """
+    资金费率规则需要拉取的永续合约
+    :return: instId 列表 (如 ["BTC-USDT-SWAP"])；存在不限交易对的规则时附带 OKX 默认的主流币；无资金费率规则返回 []
+    """
+    rules = [r for r in rules if r.metric == 'funding_rate']
+    targets = {f"{s}-SWAP" for r in rules for s in (r.symbols or [])}
+    if any(not r.symbols for r in rules):
+        targets.update(["BTC-USDT-SWAP", "ETH-USDT-SWAP", "SOL-USDT-SWAP", "DOGE-USDT-SWAP"])
+    return sorted(targets)
+
+
+def run_analysis_report(query):
+    """告警触发的 LLM 报告：复用完整的分析流程 (含通知推送)"""
+    from main import run_analysis_task
+    run_analysis_task(user_query=query)
+
+
+def run_alerter(rules_path=ALERT_RULES_PATH, ring_path=PRICE_RING_PATH, funding_interval=ALERT_FUNDING_INTERVAL,
+                llm_report=ALERT_LLM_REPORT, iterations=None, poll_timeout=0.5, ring_interval=PRICE_RING_INTERVAL):
+    """
+    告警进程：等待采集进程写入新快照，到达后立即对全部规则求值并推送
+    资金费率在后台线程按 funding_interval 刷新，结果返回后同样立即求值
+    :param iterations: 求值次数，None 表示一直运行
+    :param ring_interval: 采集进程的写入间隔 (秒)，用于检查缓冲区能否覆盖规则窗口
+    :return: 没有规则或缓冲区覆盖不到规则窗口时返回 False (不启动)
+    """
+    engine = AlertEngine(load_rules(rules_path), default_cooldown=ALERT_DEFAULT_COOLDOWN)
+    if not engine.rules:
+        logger.error("No alert rules configured, alerter exits.")
+        return False
+    notifier = Notifier(feishu_webhook=FEISHU_WEBHOOK_URL, dingtalk_webhook=DINGTALK_WEBHOOK_URL) \
+        if FEISHU_WEBHOOK_URL or DINGTALK_WEBHOOK_URL else None
+    dispatcher = AlertDispatcher(notifier, run_analysis_report if llm_report else None)
+
+    reader = PriceRingReader(ring_path)
+    # 规则窗口超出缓冲区覆盖范围时，该规则永远不会触发：直接报错退出
+    coverage = ring_coverage(reader.layout.slots, ring_interval)
+    too_long = [w for w in engine.windows if w > coverage]
+    if too_long:
+        logger.error(f"Price ring covers {coverage:.0f}s ({reader.layout.slots} slots x {ring_interval:g}s), "
+                     f"rule windows {too_long} can never fire; set PRICE_RING_SLOTS >= "
+                     f"{required_ring_slots(max(too_long), ring_interval)} and restart the collector.")
+        return False
+
+    okx = OKXClient()
+    targets = funding_targets(engine.rules)
+    funding_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="alert-funding")
+    funding_future, funding_due = None, 0.0
+    funding_rates = {}
+    logger.info(f"Alerter started: {len(engine.rules)} rules, windows {engine.windows}, funding {targets}")
+
+    seq = 0
+    count = 0
+    try:
+        while iterations is None or count < iterations:
+            if targets and funding_future is None and time.monotonic() >= funding_due:
+                funding_future = funding_executor.submit(okx.get_funding_rates, targets)
+                funding_due = time.monotonic() + funding_interval
+
+            updated = reader.wait_for_update(seq, timeout=poll_timeout)
+            funding_updated = funding_future is not None and funding_future.done()
+            if funding_updated:
+                try:
+                    funding_rates = funding_future.result() or funding_rates
+                except Exception as e:
+                    logger.warning(f"Failed to refresh funding rates: {e}")
+                funding_future = None
+            if updated is None and not funding_updated:
+                continue
+            seq = updated or seq
+
+            metrics, data_ts = ring_metrics(reader, engine.windows, funding_rates)
+            alerts = engine.evaluate(metrics, data_ts=data_ts if updated else None)
+            dispatcher.dispatch(alerts)
+            count += 1
+    finally:
+        funding_executor.shutdown(wait=False)
+        dispatcher.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="规则告警进程：读取共享行情缓冲区，按规则实时推送告警")
+    parser.add_argument("--rules", default=str(ALERT_RULES_PATH), help="规则文件 (JSON)")
+    parser.add_argument("--ring", default=str(PRICE_RING_PATH), help="采集进程写入的环形缓冲区")
+    parser.add_argument("--interval", type=float, default=PRICE_RING_INTERVAL, help="采集进程的写入间隔 (秒)")
+    parser.add_argument("--report", action="store_true", default=ALERT_LLM_REPORT,
+                        help="带 report 标记的规则触发时生成 LLM 报告")
+    args = parser.parse_args(argv)
+    try:
+        if run_alerter(args.rules, args.ring, llm_report=args.report, ring_interval=args.interval) is False:
+            sys.exit(1)
+    except KeyboardInterrupt:
+        logger.info("Alerter stopped.")
+    finally:
+        shutdown_logging()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+import json
+import logging
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from utils.price_ring import RING_FIELDS, snapshot_frame
+
+logger = logging.getLogger("alert_engine")
+
+# 规则可用的指标 (资金费率与涨跌幅均以百分比计)
+# - price: 最新价
+# - change_24h: 相对 24h 开盘价的涨跌幅
+# - change: 相对 window 秒前的涨跌幅 (需要行情历史，如共享环形缓冲区)
+# - volume_24h: 24h 成交额 (USDT)
+# - spread_bps: 买一卖一价差 (基点)
+# - funding_rate: 永续合约资金费率
+METRICS = ('price', 'change_24h', 'change', 'volume_24h', 'spread_bps', 'funding_rate')
+
+# 比较运算符，顺序即向量化比较时的编码
+OPS = ('>', '>=', '<', '<=', 'abs>')
+
+
+class AlertRule:
+    """
+    一条声明式告警规则，通常从 JSON 读取:
+        {"name": "pump_5m", "metric": "change", "window": 300, "op": ">=", "value": 8,
+         "min_volume": 1000000, "cooldown": 1800, "report": true}
+    - symbols: 只对这些交易对生效 (如 ["BTC-USDT"])，省略表示全市场
+    - min_volume: 24h 成交额下限，过滤流动性过差的交易对
+    - cooldown: 同一规则、同一交易对两次告警的最小间隔 (秒)
+    - repeat: 条件持续成立时是否每隔 cooldown 重复提醒，默认只在条件由不成立变为成立时告警
+    - report: 触发时是否请求一份 LLM 分析报告
+    """
+
+    def __init__(self, name, metric, op, value, window=None, symbols=None, min_volume=0.0, cooldown=None,
+                 repeat=False, report=False):
+        if metric not in METRICS:
+            raise ValueError(f"Alert rule {name}: unknown metric {metric}")
+        if op not in OPS:
+            raise ValueError(f"Alert rule {name}: unknown operator {op}")
+        if metric == 'change' and not window:
+            raise ValueError(f"Alert rule {name}: metric 'change' requires a window (seconds)")
+        self.name = name
+        self.metric = metric
+        self.op = op
+        self.value = float(value)
+        self.window = int(window) if window else None
+        self.symbols = list(symbols) if symbols else None
+        self.min_volume = float(min_volume or 0.0)
+        self.cooldown = cooldown
+        self.repeat = bool(repeat)
+        self.report = bool(report)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    @property
+    def column(self):
+        """规则读取的指标列名 (change 按窗口区分，如 change_3600s)"""
+        return f"change_{self.window}s" if self.metric == 'change' else self.metric
+
+
+def load_rules(path):
+    """
+    从 JSON 文件读取规则列表，文件不存在时返回空列表
+    :return: [AlertRule, ...]
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        logger.warning(f"Alert rules file not found: {path}")
+        return []
+    return [AlertRule.from_dict(item) for item in data]
+
+
+def ticker_metrics(df, funding_rates=None):
+    """
+    把 OKXClient.get_tickers (或 PriceRingReader.to_frame) 的结果转换为规则指标表
+    :param funding_rates: {"BTC-USDT": 0.01, ...}
+    :return: DataFrame (index=instId)
+    """
+    last = pd.to_numeric(df['last'], errors='coerce').to_numpy(dtype='float64')
+    columns = {'price': last, 'change_24h': np.nan, 'volume_24h': np.nan, 'spread_bps': np.nan}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if 'open24h' in df.columns:
+            columns['change_24h'] = (last / pd.to_numeric(df['open24h'], errors='coerce').to_numpy(dtype='float64') - 1) * 100
+        if 'volCcy24h' in df.columns:
+            columns['volume_24h'] = pd.to_numeric(df['volCcy24h'], errors='coerce').to_numpy(dtype='float64')
+        if 'bidPx' in df.columns and 'askPx' in df.columns:
+            bid = pd.to_numeric(df['bidPx'], errors='coerce').to_numpy(dtype='float64')
+            ask = pd.to_numeric(df['askPx'], errors='coerce').to_numpy(dtype='float64')
+            columns['spread_bps'] = (ask - bid) / ((ask + bid) / 2) * 1e4
+    metrics = pd.DataFrame(columns, index=pd.Index(df['instId'].astype(str), name='instId'))
+    metrics['funding_rate'] = metrics.index.map(funding_rates or {}).to_numpy(dtype='float64', na_value=np.nan)
+    return metrics
+
+
+def ring_coverage(slots, interval):
+    """
+    环形缓冲区能计算涨跌幅的最长窗口 (秒)
+    读取方最多拿到 slots - 1 个快照，首尾相隔 slots - 2 个采集间隔
+    """
+    return (slots - 2) * interval
+
+
+def required_ring_slots(window, interval):
+    """覆盖 window 秒的涨跌幅所需的 PRICE_RING_SLOTS"""
+    return math.ceil(window / interval) + 2
+
+
+def ring_metrics(reader, windows=(), funding_rates=None):
+    """
+    从共享环形缓冲区构造指标表：最新快照的基础指标，加上各窗口的涨跌幅 (change_<window>s)
+    缓冲区覆盖不到的窗口 (见 ring_coverage) 为 NaN，不会触发告警
+    基础指标与历史价格取自同一份一致拷贝，不会混入两次读取之间写入的快照
+    :return: (DataFrame, 最新快照时间)，尚无数据时返回 (None, None)
+    """
+    ts, data, instruments = reader.copy_latest(reader.layout.slots - 1)
+    if not len(ts):
+        return None, None
+    metrics = ticker_metrics(snapshot_frame(data[-1], instruments), funding_rates)
+    if windows:
+        # 历史价格矩阵 [快照, 交易对]，按最新快照中仍在交易的交易对对齐
+        positions = instruments.get_indexer(metrics.index)
+        history = data[:, RING_FIELDS.index('last'), positions]
+        for window in windows:
+            k = int(np.searchsorted(ts, ts[-1] - window, side='right')) - 1
+            with np.errstate(divide='ignore', invalid='ignore'):
+                metrics[f"change_{window}s"] = (history[-1] / history[k] - 1) * 100 if k >= 0 else np.nan
+    return metrics, float(ts[-1])
+
+
+class AlertEngine:
+    """
+    规则引擎：每个新的行情 / 资金费率快照到达时，对全部规则 x 全部交易对做一次矩阵比较
+    - 去重：条件持续成立时只在首次成立时告警 (repeat 规则除外)，条件解除后才会再次告警
+    - 冷却：同一规则、同一交易对在 cooldown 秒内最多告警一次
+    实例需要常驻内存以保存告警状态
+    """
+
+    def __init__(self, rules, default_cooldown=900, clock=time.time):
+        """
+        :param rules: AlertRule 或 dict 列表
+        :param default_cooldown: 规则未指定 cooldown 时的冷却时间 (秒)
+        """
+        self.rules = [r if isinstance(r, AlertRule) else AlertRule.from_dict(r) for r in rules]
+        self.clock = clock
+        self._columns = [r.column for r in self.rules]
+        self._thresholds = np.array([[r.value for r in self.rules]], dtype='float64')
+        self._ops = np.array([[OPS.index(r.op) for r in self.rules]])
+        self._min_volume = np.array([[r.min_volume for r in self.rules]], dtype='float64')
+        self._cooldowns = [default_cooldown if r.cooldown is None else r.cooldown for r in self.rules]
+        self._index = None
+        self._allowed = None
+        self._active = set()
+        self._last_fired = {}
+
+    @property
+    def windows(self):
+        """规则用到的涨跌幅窗口 (秒)"""
+        return sorted({r.window for r in self.rules if r.metric == 'change'})
+
+    def _symbol_mask(self, index):
+        """[交易对, 规则] 的适用范围矩阵，交易对索引不变时复用"""
+        if self._index is None or not self._index.equals(index):
+            allowed = np.ones((len(index), len(self.rules)), dtype=bool)
+            for j, rule in enumerate(self.rules):
+                if rule.symbols:
+                    allowed[:, j] = index.isin(rule.symbols)
+            self._index, self._allowed = index, allowed
+        return self._allowed
+
+    def match(self, metrics):
+        """
+        向量化求值
+        :return: (hits, known) 两个 [交易对, 规则] 布尔矩阵；known 表示指标有值 (NaN 视为未知，不改变告警状态)
+        """
+        values = metrics.reindex(columns=self._columns).to_numpy(dtype='float64')
+        volume = metrics['volume_24h'].to_numpy(dtype='float64') if 'volume_24h' in metrics else np.zeros(len(metrics))
+        with np.errstate(invalid='ignore'):
+            hits = np.select(
+                [self._ops == i for i in range(len(OPS))],
+                [values > self._thresholds, values >= self._thresholds, values < self._thresholds,
+                 values <= self._thresholds, np.abs(values) > self._thresholds],
+                False
+            )
+            hits &= np.nan_to_num(volume)[:, None] >= self._min_volume
+        hits &= self._symbol_mask(metrics.index)
+        return hits, ~np.isnan(values)
+
+    def evaluate(self, metrics, data_ts=None):
+        """
+        :param metrics: ticker_metrics / ring_metrics 构造的指标表 (index=instId)
+        :param data_ts: 快照时间 (epoch 秒)，用于统计告警延迟，默认当前时间
+        :return: 本次新触发的告警列表 [{rule, symbol, metric, op, threshold, value, ts, data_ts, report}, ...]
+        """
+        if not self.rules or metrics is None or metrics.empty:
+            return []
+        now = self.clock()
+        hits, known = self.match(metrics)
+        symbols = metrics.index
+
+        # 条件已解除 (且指标有值) 的告警恢复为未激活
+        for key in list(self._active):
+            j, symbol = key
+            pos = symbols.get_indexer([symbol])[0]
+            if pos >= 0 and known[pos, j] and not hits[pos, j]:
+                self._active.discard(key)
+
+        alerts = []
+        for i, j in zip(*np.nonzero(hits)):
+            rule, symbol = self.rules[j], symbols[i]
+            key = (j, symbol)
+            if key in self._active and not rule.repeat:
+                continue
+            self._active.add(key)
+            last = self._last_fired.get(key)
+            if last is not None and now - last < self._cooldowns[j]:
+                continue
+            self._last_fired[key] = now
+            alerts.append({
+                "rule": rule.name,
+                "symbol": symbol,
+                "metric": rule.column,
+                "op": rule.op,
+                "threshold": rule.value,
+                "value": float(metrics.iat[i, metrics.columns.get_loc(rule.column)]),
+                "ts": now,
+                "data_ts": data_ts if data_ts is not None else now,
+                "report": rule.report,
+            })
+        return alerts
+
+
+def format_alerts(alerts):
+    """
+    :return: (标题, Markdown 正文)
+    """
+    if len(alerts) == 1:
+        a = alerts[0]
+        title = f"OKX Alert: {a['symbol']} {a['metric']} {a['op']} {a['threshold']:g}"
+    else:
+        title = f"OKX Alerts ({len(alerts)})"
+    lines = [
+        f"- **{a['symbol']}** `{a['rule']}`: {a['metric']} = {a['value']:.4g} ({a['op']} {a['threshold']:g})"
+        for a in alerts
+    ]
+    stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(alerts[0]['data_ts']))
+    return title, "\n".join(lines + ["", f"数据时间: {stamp}"])
+
+
+class AlertDispatcher:
+    """
+    告警发送：通知在后台线程中发送，不阻塞下一次求值
+    带 report 标记的规则触发时，再异步请求一份 LLM 报告 (同一时间最多一份，进行中时新的请求被合并忽略)
+    """
+
+    def __init__(self, notifier=None, report_fn=None):
+        """
+        :param notifier: Notifier 实例，None 时只写日志
+        :param report_fn: report_fn(query) 生成并发送 LLM 报告，None 表示不生成
+        """
+        self.notifier = notifier
+        self.report_fn = report_fn
+        self._notify_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="alert-notify")
+        self._report_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="alert-report")
+        self._report_running = threading.Event()
+        self.sent = 0
+        self.last_latency = None
+
+    def dispatch(self, alerts):
+        """
+        :return: 通知任务的 Future，无告警时返回 None
+        """
+        if not alerts:
+            return None
+        title, content = format_alerts(alerts)
+        logger.warning(f"{title}\n{content}")
+        future = self._notify_executor.submit(self._send, title, content, alerts)
+        if self.report_fn and any(a['report'] for a in alerts):
+            self._request_report(alerts)
+        return future
+
+    def _send(self, title, content, alerts):
+        if self.notifier is not None:
+            try:
+                self.notifier.send(title, content)
+            except Exception as e:
+                logger.error(f"Failed to send alert notification: {e}")
+                return
+        self.sent += len(alerts)
+        # 从数据到达到通知发出的耗时
+        self.last_latency = round(time.time() - min(a['data_ts'] for a in alerts), 3)
+        logger.info(f"Alert notification sent ({len(alerts)} alerts, {self.last_latency}s after data)")
+
+    def _request_report(self, alerts):
+        if self._report_running.is_set():
+            logger.info("LLM report already in progress, alert report request merged.")
+            return
+        self._report_running.set()
+        symbols = sorted({a['symbol'] for a in alerts if a['report']})
+        lines = "\n".join(f"- {a['symbol']}: {a['metric']} = {a['value']:.4g} ({a['op']} {a['threshold']:g})"
+                          for a in alerts if a['report'])
+        query = f"以下告警刚刚触发，请重点分析 {', '.join(symbols)} 的异动原因与风险：\n{lines}"
+        self._report_executor.submit(self._run_report, query)
+
+    def _run_report(self, query):
+        try:
+            self.report_fn(query)
+        except Exception as e:
+            logger.error(f"Alert-triggered report failed: {e}", exc_info=True)
+        finally:
+            self._report_running.clear()
+
+    def close(self, wait=True):
+        self._notify_executor.shutdown(wait=wait)
+        self._report_executor.shutdown(wait=wait)
@@ -0,0 +1,143 @@
+import logging
+import numpy as np
+import pandas as pd
+from analysis.technical import calculate_volatility
+
+logger = logging.getLogger("anomaly_screener")
+
+# MAD 换算为标准差的系数 (正态分布下)
+_MAD_SCALE = 1.4826
+
+
+def robust_zscore(values):
+    """
+    横截面稳健 z 分数：(x - 中位数) / (1.4826 * MAD)
+    MAD 为 0 时退回标准差，仍为 0 时全部为 0；NaN 保持 NaN
+    """
+    values = pd.Series(values, dtype='float64')
+    median = values.median()
+    scale = (values - median).abs().median() * _MAD_SCALE
+    if not scale or np.isnan(scale):
+        scale = values.std(ddof=0)
+    if not scale or np.isnan(scale):
+        return values * 0.0
+    return (values - median) / scale
+
+
+class AnomalyScreener:
+    """
+    全市场异动筛选：对全部 USDT 交易对一次性向量化打分
+    - 涨跌幅、振幅 (calculate_volatility) 的横截面稳健 z 分数
+    - 成交额相对历史基线 (跨轮 EWMA) 的放大倍数
+    - 资金费率的横截面极端值
+    实例在定时任务的多轮之间常驻内存，以累积成交额基线
+    """
+
+    def __init__(self, top_n=8, min_volume=100_000, z_threshold=2.5, volume_alpha=0.2):
+        """
+        :param top_n: 每轮返回的异动币种数
+        :param min_volume: 参与筛选的最小 24h 成交额 (USDT)，过滤流动性过差的交易对
+        :param z_threshold: 单项 z 分数达到该值才算异动
+        :param volume_alpha: 成交额基线的 EWMA 系数
+        """
+        self.top_n = top_n
+        self.min_volume = min_volume
+        self.z_threshold = z_threshold
+        self.volume_alpha = volume_alpha
+        self.volume_baseline = pd.Series(dtype='float64')
+
+    def _update_baseline(self, vol):
+        """用本轮成交额更新 EWMA 基线，并返回更新前的基线 (与 vol 对齐)"""
+        previous = self.volume_baseline.reindex(vol.index)
+        updated = (self.volume_alpha * vol + (1 - self.volume_alpha) * previous).fillna(vol)
+        # 本轮未出现的交易对 (如暂停交易) 保留原基线
+        self.volume_baseline = updated.combine_first(self.volume_baseline)
+        return previous
+
+    def screen(self, df, funding_rates=None, exclude=None):
+        """
+        :param df: 全市场 tickers (ExchangeAdapter 的 TICKER_COLUMNS 格式)
+        :param funding_rates: {symbol: 资金费率(%)}
+        :param exclude: 不参与排名的 symbol 集合 (如已在成交额 Top N 中的币种)
+        :return: DataFrame，列为 symbol / change_pct / range_pct / vol_ratio / funding_rate / score / flags，按 score 降序
+        """
+        columns = ['symbol', 'change_pct', 'range_pct', 'vol_ratio', 'funding_rate', 'score', 'flags']
+        if df is None or df.empty:
+            return pd.DataFrame(columns=columns)
+
+        inst = df['symbol'].astype(str).to_numpy()
+        last = pd.to_numeric(df['last'], errors='coerce').to_numpy()
+        open_price = pd.to_numeric(df['open_24h'], errors='coerce').to_numpy()
+        vol = pd.Series(pd.to_numeric(df['quote_volume'], errors='coerce').to_numpy(), index=inst)
+        vol = vol[~vol.index.duplicated()]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            change = np.where(open_price > 0, (last - open_price) / open_price * 100, np.nan)
+            vol_ratio = (vol / self._update_baseline(vol)).reindex(inst).to_numpy()
+
+        range_pct = calculate_volatility(df)
+        frame = pd.DataFrame({
+            'symbol': inst,
+            'change_pct': change,
+            'range_pct': range_pct.to_numpy() if range_pct is not None else np.nan,
+            # 首次出现的交易对没有基线，视为 1 倍
+            'vol_ratio': np.nan_to_num(vol_ratio, nan=1.0, posinf=1.0),
+            'funding_rate': pd.Series(inst).map(funding_rates or {}).to_numpy(dtype='float64'),
+            'vol': vol.reindex(inst).to_numpy(),
+        })
+        frame = frame[frame['vol'] >= self.min_volume]
+        if frame.empty:
+            return pd.DataFrame(columns=columns)
+
+        z_change = robust_zscore(frame['change_pct'].to_numpy()).fillna(0).to_numpy()
+        z_range = robust_zscore(frame['range_pct'].to_numpy()).fillna(0).to_numpy()
+        z_volume = robust_zscore(np.log(frame['vol_ratio'].clip(lower=1e-9)).to_numpy()).fillna(0).to_numpy()
+        z_funding = robust_zscore(frame['funding_rate'].to_numpy()).fillna(0).to_numpy()
+
+        # 振幅、成交额只关注放大方向；涨跌幅与资金费率两个方向都算异动
+        frame['score'] = np.abs(z_change) + np.clip(z_range, 0, None) + np.clip(z_volume, 0, None) + np.abs(z_funding)
+
+        t = self.z_threshold
+        flag_change = np.abs(z_change) >= t
+        flag_range = z_range >= t
+        flag_volume = z_volume >= t
+        flag_funding = np.abs(z_funding) >= t
+        flagged = flag_change | flag_range | flag_volume | flag_funding
+        if exclude:
+            flagged &= ~frame['symbol'].isin(set(exclude)).to_numpy()
+
+        frame = frame[flagged].assign(
+            flag_change=flag_change[flagged], flag_range=flag_range[flagged],
+            flag_volume=flag_volume[flagged], flag_funding=flag_funding[flagged],
+        ).nlargest(self.top_n, 'score')
+
+        # 只对入选的少量行生成说明文字
+        frame['flags'] = [self._describe(row) for row in frame.itertuples(index=False)]
+        logger.debug(f"Screened {int(flagged.size)} pairs, {int(flagged.sum())} flagged.")
+        return frame[columns].reset_index(drop=True)
+
+    @staticmethod
+    def _describe(row):
+        flags = []
+        if row.flag_change:
+            flags.append("暴涨" if row.change_pct > 0 else "暴跌")
+        if row.flag_range:
+            flags.append("振幅放大")
+        if row.flag_volume:
+            flags.append(f"放量 {row.vol_ratio:.1f}x")
+        if row.flag_funding:
+            flags.append("资金费率极端")
+        return "/".join(flags)
+
+
+def format_anomaly_fields(anomalies):
+    """
+    :return: {symbol: 附加描述}，供 format_data_for_llm 的 extra_fields 使用
+    """
+    if anomalies is None or anomalies.empty:
+        return {}
+    fields = {}
+    for row in anomalies.itertuples(index=False):
+        text = f"Range: {row.range_pct:.1f}%, Vol vs Avg: {row.vol_ratio:.1f}x, Anomaly: {row.flags} (score {row.score:.1f})"
+        fields[row.symbol] = text
+    return fields
@@ -0,0 +1,141 @@
+import datetime
+import logging
+import numpy as np
+
+logger = logging.getLogger("change_detector")
+
+
+class MaterialityGate:
+    """
+    变化检测闸门：比较本轮行情/新闻与上一次【实际分析】时的快照，
+    变化不显著时跳过 LLM 分析，只输出一段低成本的增量摘要。
+
+    注意基线只在真正完成分析后才更新 (mark_analyzed)，
+    避免行情缓慢漂移时每轮都和上一轮比较而永远达不到阈值。
+    """
+
+    def __init__(self, price_change_pct=1.0, rank_churn=0.2, funding_delta=0.005,
+                 min_new_headlines=1, max_skips=6, top_n=30):
+        """
+        :param price_change_pct: Top N 币种中最大价格变动 (%) 阈值
+        :param rank_churn: 成交额 Top N 名单的换手比例阈值 (0~1)
+        :param funding_delta: 资金费率最大变动阈值 (百分点)
+        :param min_new_headlines: 新增新闻条数阈值
+        :param max_skips: 连续跳过次数上限，达到后强制重新分析
+        :param top_n: 参与比较的成交额前 N 名
+        """
+        self.price_change_pct = price_change_pct
+        self.rank_churn = rank_churn
+        self.funding_delta = funding_delta
+        self.min_new_headlines = min_new_headlines
+        self.max_skips = max_skips
+        self.top_n = top_n
+
+        self.baseline = None        # 上一次实际分析时的快照
+        self.consecutive_skips = 0
+        self.evaluations = 0
+        self.skips = 0
+
+    @property
+    def skip_rate(self):
+        return self.skips / self.evaluations if self.evaluations else 0.0
+
+    def _take_snapshot(self, df, funding_rates, news_items):
+        top = df.sort_values(by='quote_volume', ascending=False).head(self.top_n)
+        return {
+            "time": datetime.datetime.now(),
+            "prices": top.set_index(top['symbol'].astype(str))['last'].astype(float),
+            "top_ids": list(top['symbol'].astype(str)),
+            "news_ids": {item.get("id") for item in (news_items or [])},
+            "funding": dict(funding_rates or {}),
+        }
+
+    def _compare(self, current, baseline):
+        """计算各项变化指标 (向量化比较价格)"""
+        metrics = {}
+
+        # 1. 价格最大变动：两次快照中 Top N 的交集
+        prev_prices = baseline["prices"]
+        cur_prices = current["prices"]
+        common = cur_prices.index.intersection(prev_prices.index)
+        if len(common):
+            prev = prev_prices.loc[common].to_numpy()
+            cur = cur_prices.loc[common].to_numpy()
+            with np.errstate(divide='ignore', invalid='ignore'):
+                changes = np.abs((cur - prev) / prev * 100)
+            changes = np.nan_to_num(changes, nan=0.0, posinf=0.0)
+            idx = int(np.argmax(changes))
+            metrics["max_price_change_pct"] = float(changes[idx])
+            metrics["max_price_mover"] = str(common[idx])
+        else:
+            metrics["max_price_change_pct"] = float("inf")
+            metrics["max_price_mover"] = None
+
+        # 2. 成交额排名换手率
+        prev_top = set(baseline["top_ids"])
+        cur_top = set(current["top_ids"])
+        n = max(len(cur_top), 1)
+        metrics["rank_churn"] = 1 - len(prev_top & cur_top) / n
+
+        # 3. 新增新闻
+        metrics["new_headlines"] = len(current["news_ids"] - baseline["news_ids"] - {None})
+
+        # 4. 资金费率变动
+        common_funding = set(current["funding"]) & set(baseline["funding"])
+        metrics["max_funding_delta"] = max(
+            (abs(current["funding"][k] - baseline["funding"][k]) for k in common_funding),
+            default=0.0
+        )
+        return metrics
+
+    def evaluate(self, df, funding_rates=None, news_items=None):
+        """
+        判断本轮数据相对基线是否发生显著变化
+        :return: 字典 {material, reasons, metrics, summary, snapshot}
+        """
+        self.evaluations += 1
+        current = self._take_snapshot(df, funding_rates, news_items)
+
+        if self.baseline is None:
+            return {"material": True, "reasons": ["首次运行"], "metrics": {}, "summary": "", "snapshot": current}
+
+        metrics = self._compare(current, self.baseline)
+        reasons = []
+        if metrics["max_price_change_pct"] >= self.price_change_pct:
+            reasons.append(f"价格变动 {metrics['max_price_mover']} {metrics['max_price_change_pct']:.2f}%")
+        if metrics["rank_churn"] >= self.rank_churn:
+            reasons.append(f"成交额排名换手 {metrics['rank_churn'] * 100:.0f}%")
+        if metrics["new_headlines"] >= self.min_new_headlines:
+            reasons.append(f"新增新闻 {metrics['new_headlines']} 条")
+        if metrics["max_funding_delta"] >= self.funding_delta:
+            reasons.append(f"资金费率变动 {metrics['max_funding_delta']:.4f}%")
+        if not reasons and self.consecutive_skips >= self.max_skips:
+            reasons.append(f"已连续跳过 {self.consecutive_skips} 次，强制刷新")
+
+        material = bool(reasons)
+        if not material:
+            self.skips += 1
+            self.consecutive_skips += 1
+
+        return {
+            "material": material,
+            "reasons": reasons,
+            "metrics": metrics,
+            "summary": "" if material else self._delta_summary(metrics),
+            "snapshot": current,
+        }
+
+    def mark_analyzed(self, decision):
+        """分析成功完成后，将本轮快照设为新的比较基线"""
+        self.baseline = decision["snapshot"]
+        self.consecutive_skips = 0
+
+    def _delta_summary(self, metrics):
+        since = self.baseline["time"].strftime('%H:%M')
+        mover = metrics["max_price_mover"] or "N/A"
+        return (f"自 {since} 的上一次分析以来市场无显著变化："
+                f"最大价格变动 {mover} {metrics['max_price_change_pct']:.2f}%，"
+                f"成交额排名换手 {metrics['rank_churn'] * 100:.0f}%，"
+                f"新增新闻 {metrics['new_headlines']} 条，"
+                f"资金费率最大变动 {metrics['max_funding_delta']:.4f}%。"
+                f"沿用上一份报告结论。")
@@ -0,0 +1,327 @@
+import logging
+import time
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger("correlation")
+
+# K 线周期 -> 毫秒
+BAR_MS = {"1m": 60_000, "5m": 300_000, "15m": 900_000, "30m": 1_800_000,
+          "1H": 3_600_000, "2H": 7_200_000, "4H": 14_400_000, "1D": 86_400_000}
+
+def candle_closes(candles, bar_ms, now_ms=None):
+    """
+    K 线 (ExchangeAdapter 的 CANDLE_COLUMNS 格式) 转为已收盘 K 线的收盘价序列
+    :param now_ms: 当前时间 (毫秒)，默认取系统时间；结束时间晚于它的 K 线 (未收盘) 被丢弃
+    :return: Series，索引为 K 线开始时间 (毫秒)，升序
+    """
+    if candles is None or candles.empty:
+        return pd.Series(dtype='float64')
+    if now_ms is None:
+        now_ms = int(time.time() * 1000)
+    closed = candles[candles['ts'] + bar_ms <= now_ms]
+    closes = pd.Series(closed['close'].to_numpy(dtype='float64'), index=closed['ts'].to_numpy(dtype='int64'))
+    return closes[~closes.index.duplicated()].sort_index()
+
+
+class CorrelationEngine:
+    """
+    币种收益率的滚动相关性 / BTC Beta
+    - 以 K 线收益率为样本，保存最近 window 根的收益率环形缓冲区
+    - 维护成对的样本数、和、平方和与交叉乘积和 (N x N 矩阵)，新 K 线到达时加上新样本的外积、减去被挤出样本的外积，
+      每根 K 线 O(N^2)，不重新遍历整个窗口
+    - 统计量按"两者都有数据的 K 线"成对计算，币种中途进入 / 退出观察范围不影响其他币种
+    - 新进入的币种用历史 K 线回填窗口，只计算该币种所在的行 / 列，O(window x N)
+    实例在定时任务的多轮之间常驻内存，之后每轮只需拉取新收盘的 K 线
+    """
+
+    def __init__(self, window=168, bar="1H", benchmark="BTC-USDT", cluster_threshold=0.7, min_obs=24,
+                 max_symbols=128):
+        """
+        :param window: 滚动窗口 (K 线根数)
+        :param bar: K 线周期，见 BAR_MS
+        :param benchmark: 计算 Beta 的基准交易对
+        :param cluster_threshold: 相关系数达到该值的币种归为同一联动组
+        :param min_obs: 成对样本数少于该值时不输出统计量
+        :param max_symbols: 保留统计状态的币种上限，超出时丢弃不在本轮观察范围内的币种
+        """
+        if bar not in BAR_MS:
+            raise ValueError(f"Unsupported bar: {bar}")
+        self.window = window
+        self.bar = bar
+        self.bar_ms = BAR_MS[bar]
+        self.benchmark = benchmark
+        self.cluster_threshold = cluster_threshold
+        self.min_obs = min_obs
+        self.max_symbols = max_symbols
+        self.symbols = []
+        self._col = {}
+        self._returns = np.full((window, 0), np.nan)
+        self._bar_ts = np.full(window, -1, dtype='int64')
+        self._head = 0
+        self.bars = 0
+        self.last_ts = None
+        self._last_close = {}
+        self._n = np.zeros((0, 0))
+        self._sx = np.zeros((0, 0))
+        self._sxx = np.zeros((0, 0))
+        self._sxy = np.zeros((0, 0))
+
+    def plan(self, symbols, now_ms):
+        """
+        本轮需要拉取的 K 线数量
+        :param symbols: 本轮观察的交易对 (基准交易对自动加入)
+        :param now_ms: 当前时间 (毫秒)
+        :return: {symbol: limit}；已跟踪的币种只拉取上次之后新收盘的 K 线，尚无新 K 线时不拉取
+        """
+        plan = {}
+        # 最新一根已收盘 K 线的开始时间
+        closed = (now_ms // self.bar_ms - 1) * self.bar_ms
+        for symbol in dict.fromkeys([self.benchmark, *symbols]):
+            if symbol not in self._col or self.last_ts is None:
+                # 回填整个窗口：多一根用于计算首个收益率，多一根为未收盘的当前 K 线
+                plan[symbol] = self.window + 2
+            elif closed > self.last_ts:
+                plan[symbol] = min(self.window, (closed - self.last_ts) // self.bar_ms) + 1
+        return plan
+
+    def ingest(self, candles, universe=None):
+        """
+        加入新拉取的 K 线并增量更新统计量
+        :param candles: {symbol: ExchangeAdapter.get_candles_multi 返回的 K 线 DataFrame}
+        :param universe: 本轮观察的交易对，超出 max_symbols 时优先保留
+        :return: 本次加入的 K 线根数
+        """
+        closes = {symbol: candle_closes(frame, self.bar_ms) for symbol, frame in candles.items()}
+        closes = {symbol: s for symbol, s in closes.items() if not s.empty}
+        self._evict(set(universe or []) | set(closes) | {self.benchmark})
+
+        new_symbols = [s for s in closes if s not in self._col]
+        self._add_columns(new_symbols)
+        if self.last_ts is not None:
+            for symbol in new_symbols:
+                self._backfill(symbol, closes[symbol][closes[symbol].index <= self.last_ts])
+
+        stamps = sorted({ts for s in closes.values() for ts in s.index
+                         if self.last_ts is None or ts > self.last_ts})
+        # 首次运行只保留窗口内的 K 线 (额外一根作为首个收益率的基准)
+        stamps = stamps[-(self.window + 1):]
+        for ts in stamps:
+            self.add_bar(ts, {s: c[ts] for s, c in closes.items() if ts in c.index})
+        if stamps:
+            logger.debug(f"Ingested {len(stamps)} bars for {len(closes)} symbols ({len(new_symbols)} new).")
+        return len(stamps)
+
+    def _add_columns(self, symbols):
+        if not symbols:
+            return
+        old = len(self.symbols)
+        size = old + len(symbols)
+        for symbol in symbols:
+            self._col[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        returns = np.full((self.window, size), np.nan)
+        returns[:, :old] = self._returns
+        self._returns = returns
+        for name in ('_n', '_sx', '_sxx', '_sxy'):
+            grown = np.zeros((size, size))
+            grown[:old, :old] = getattr(self, name)
+            setattr(self, name, grown)
+
+    def _evict(self, keep):
+        """币种数将超过上限时，丢弃不在 keep 中的币种 (统计量成对计算，删除行列即可，不影响其他币种)"""
+        incoming = len(keep - set(self._col))
+        if len(self.symbols) + incoming <= self.max_symbols:
+            return
+        kept = [i for i, s in enumerate(self.symbols) if s in keep]
+        dropped = [s for s in self.symbols if s not in keep]
+        self.symbols = [self.symbols[i] for i in kept]
+        self._col = {s: i for i, s in enumerate(self.symbols)}
+        self._returns = self._returns[:, kept]
+        for name in ('_n', '_sx', '_sxx', '_sxy'):
+            setattr(self, name, getattr(self, name)[np.ix_(kept, kept)])
+        for symbol in dropped:
+            self._last_close.pop(symbol, None)
+        logger.debug(f"Evicted {len(dropped)} symbols from correlation state.")
+
+    def _bar_return(self, symbol, ts, close):
+        """与上一根 K 线收盘价相邻时返回收益率，否则返回 NaN；同时记录本根收盘价"""
+        prev = self._last_close.get(symbol)
+        self._last_close[symbol] = (ts, close)
+        if prev is None or prev[0] != ts - self.bar_ms or prev[1] <= 0:
+            return np.nan
+        return close / prev[1] - 1
+
+    def add_bar(self, ts, closes):
+        """
+        加入一根新 K 线：挤出最旧的样本并加入新样本，两次外积更新
+        :param ts: K 线开始时间 (毫秒)
+        :param closes: {symbol: 收盘价}，未跟踪的币种被忽略
+        """
+        row = np.full(len(self.symbols), np.nan)
+        for symbol, close in closes.items():
+            col = self._col.get(symbol)
+            if col is not None:
+                row[col] = self._bar_return(symbol, ts, close)
+
+        if self.bars == self.window:
+            self._accumulate(self._returns[self._head], -1.0)
+        self._returns[self._head] = row
+        self._bar_ts[self._head] = ts
+        self._accumulate(row, 1.0)
+        self._head = (self._head + 1) % self.window
+        self.bars = min(self.bars + 1, self.window)
+        self.last_ts = ts
+
+    def _accumulate(self, row, sign):
+        mask = (~np.isnan(row)).astype('float64')
+        x = np.nan_to_num(row)
+        self._n += sign * np.outer(mask, mask)
+        self._sx += sign * np.outer(x, mask)
+        self._sxx += sign * np.outer(x * x, mask)
+        self._sxy += sign * np.outer(x, x)
+
+    def _backfill(self, symbol, closes):
+        """用历史收盘价回填新币种在窗口内的收益率，只更新该币种所在的行 / 列"""
+        col = self._col[symbol]
+        for ts, close in closes.items():
+            ret = self._bar_return(symbol, ts, close)
+            slot = np.flatnonzero(self._bar_ts == ts)
+            if slot.size and self.bars:
+                self._returns[slot[0], col] = ret
+
+        data = self._returns
+        mask = (~np.isnan(data)).astype('float64')
+        x = np.nan_to_num(data)
+        m, xc = mask[:, col], x[:, col]
+        self._n[col, :] = self._n[:, col] = m @ mask
+        self._sx[col, :] = xc @ mask
+        self._sx[:, col] = x.T @ m
+        self._sxx[col, :] = (xc * xc) @ mask
+        self._sxx[:, col] = (x * x).T @ m
+        self._sxy[col, :] = self._sxy[:, col] = xc @ x
+
+    def recompute(self):
+        """从收益率缓冲区完整重算统计量 (用于校验增量结果，或长时间运行后消除浮点累积误差)"""
+        mask = (~np.isnan(self._returns)).astype('float64')
+        x = np.nan_to_num(self._returns)
+        self._n = mask.T @ mask
+        self._sx = x.T @ mask
+        self._sxx = (x * x).T @ mask
+        self._sxy = x.T @ x
+
+    def matrices(self, symbols=None):
+        """
+        成对的协方差与相关系数矩阵
+        :return: (cov, corr, n) 三个 DataFrame；样本不足 min_obs 的位置为 NaN
+        """
+        symbols = [s for s in (symbols if symbols is not None else self.symbols) if s in self._col]
+        idx = [self._col[s] for s in symbols]
+        sub = np.ix_(idx, idx)
+        n = self._n[sub]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean_i = self._sx[sub] / n
+            mean_j = mean_i.T
+            cov = self._sxy[sub] / n - mean_i * mean_j
+            var_i = np.clip(self._sxx[sub] / n - mean_i ** 2, 0, None)
+            corr = np.clip(cov / np.sqrt(var_i * var_i.T), -1, 1)
+        # 成对方差所需的自由度修正 (与 pandas 的 ddof=1 一致)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cov = cov * n / (n - 1)
+        insufficient = n < max(self.min_obs, 2)
+        cov[insufficient] = np.nan
+        corr[insufficient] = np.nan
+        frame = lambda values: pd.DataFrame(values, index=symbols, columns=symbols)
+        return frame(cov), frame(corr), frame(n)
+
+    def stats(self, symbols):
+        """
+        各币种相对基准的 Beta、相关系数与联动分组
+        :param symbols: 交易对列表，按重要性排序 (联动组以组内第一个币种命名)
+        :return: DataFrame，索引为 symbol，列为 beta_btc / corr_btc / cluster / obs
+        """
+        symbols = list(dict.fromkeys(symbols))
+        columns = ['beta_btc', 'corr_btc', 'cluster', 'obs']
+        tracked = [s for s in symbols if s in self._col]
+        if not tracked:
+            return pd.DataFrame(columns=columns, index=pd.Index(symbols, name='symbol'))
+
+        _, corr, _ = self.matrices(list(dict.fromkeys(tracked + [self.benchmark])))
+        corr_values = corr.loc[tracked, tracked].to_numpy()
+        result = pd.DataFrame(index=pd.Index(tracked, name='symbol'))
+        if self.benchmark in self._col:
+            b = self._col[self.benchmark]
+            idx = [self._col[s] for s in tracked]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                nb = self._n[idx, b]
+                mean_i, mean_b = self._sx[idx, b] / nb, self._sx[b, idx] / nb
+                cov = self._sxy[idx, b] / nb - mean_i * mean_b
+                var_b = self._sxx[b, idx] / nb - mean_b ** 2
+                beta = np.where(nb >= max(self.min_obs, 2), cov / var_b, np.nan)
+            result['beta_btc'] = beta
+            result['corr_btc'] = corr.loc[tracked, self.benchmark].to_numpy()
+            result['obs'] = nb
+            # 基准自身的 Beta / 相关系数恒为 1，不输出
+            result.loc[result.index == self.benchmark, ['beta_btc', 'corr_btc']] = np.nan
+        else:
+            result['beta_btc'] = result['corr_btc'] = result['obs'] = np.nan
+        result['cluster'] = self._clusters(tracked, corr_values)
+        result = result.reindex(pd.Index(symbols, name='symbol'))[columns]
+        result['cluster'] = result['cluster'].astype(object).where(result['cluster'].notna(), None)
+        return result
+
+    def _clusters(self, symbols, corr):
+        """
+        相关系数 >= cluster_threshold 的币种连成一组 (连通分量，向量化标签传播)
+        :return: 组名列表 (组内第一个币种的基础币)，独立的币种为 None
+        """
+        adjacent = np.nan_to_num(corr, nan=-1.0) >= self.cluster_threshold
+        np.fill_diagonal(adjacent, True)
+        labels = np.arange(len(symbols))
+        while True:
+            # 每个币种取相邻币种中最小的标签，直至收敛
+            updated = np.where(adjacent, labels[None, :], len(symbols)).min(axis=1)
+            if np.array_equal(updated, labels):
+                break
+            labels = updated
+        sizes = np.bincount(labels, minlength=len(symbols))
+        return [symbols[label].split('-')[0] if sizes[label] > 1 else None for label in labels]
+
+
+def attach_correlation(df, stats, benchmark="BTC-USDT"):
+    """
+    把 Beta / 相关系数 / 联动组作为列加到 tickers DataFrame 上，并计算 24h 特异涨跌 (扣除 Beta x 基准涨跌)
+    :return: 新的 DataFrame；未统计的币种为 NaN
+    """
+    if stats is None or stats.empty:
+        return df
+    keys = df['symbol'].astype(str)
+    last = pd.to_numeric(df['last'], errors='coerce')
+    open_price = pd.to_numeric(df['open_24h'], errors='coerce')
+    change = ((last - open_price) / open_price * 100).where(open_price > 0)
+    bench = change[keys == benchmark]
+    bench_change = bench.iloc[0] if not bench.empty else np.nan
+    beta = keys.map(stats['beta_btc']).to_numpy(dtype='float64')
+    return df.assign(
+        beta_btc=beta,
+        corr_btc=keys.map(stats['corr_btc']).to_numpy(dtype='float64'),
+        idio_24h=change.to_numpy() - beta * bench_change,
+        cluster=keys.map(stats['cluster']).to_numpy(dtype=object),
+    )
+
+
+def format_correlation_fields(row):
+    """
+    返回某一行的 BTC 联动描述 (供 LLM 摘要行使用)，无数据时返回空字符串
+    :param row: 带有相关性列的 tickers 行
+    """
+    parts = []
+    beta = row.get('beta_btc')
+    if beta is not None and not pd.isna(beta):
+        parts.append(f"BTC Beta: {beta:.2f} (Corr {row['corr_btc']:.2f})")
+        if not pd.isna(row.get('idio_24h')):
+            parts.append(f"Idio 24h: {row['idio_24h']:+.2f}%")
+    cluster = row.get('cluster')
+    if isinstance(cluster, str):
+        parts.append(f"Cluster: {cluster}")
+    return ", ".join(parts)
@@ -5,6 +5,9 @@ import logging
 
 logger = logging.getLogger("fundamental")
 
+# 单次请求识别赛道的最大币种数
+SECTOR_BATCH_SIZE = 20
+
 class FundamentalAnalyzer:
     def __init__(self, config_path=None):
         if config_path:
@@ -16,6 +19,9 @@ class FundamentalAnalyzer:
         self.local_sector_map = self._load_local_sector_data()
         self.llm_client = LLMClient()
         self.memory_cache = {} # 内存缓存，避免重复请求 LLM
+        # 最近一次 update_sectors_with_ai 的缓存命中情况 (已知赛道 / 需 AI 识别)
+        self.sector_hits = 0
+        self.sector_misses = 0
 
     def _load_local_sector_data(self):
         """加载本地币种赛道数据作为兜底"""
@@ -59,30 +65,43 @@ class FundamentalAnalyzer:
         # 而是提供一个 batch_update_sectors 方法供外部调用。
         return "Unknown"
 
-    def update_sectors_with_ai(self, coin_list):
+    def unknown_coins(self, coin_list):
         """
-        批量使用 AI 更新赛道信息
+        找出赛道未知的币种，并更新缓存命中统计
+        :return: 去掉 -USDT 后缀的币种列表
         """
-        # 找出所有未知的币种
         unknown_coins = []
         for coin in coin_list:
             base = coin.split('-')[0]
             if self.get_coin_sector(coin) == "Unknown":
                 unknown_coins.append(base)
-        
+        self.sector_hits = len(coin_list) - len(unknown_coins)
+        self.sector_misses = len(unknown_coins)
+        return unknown_coins
+
+    def apply_sectors(self, sectors):
+        """写入 AI 识别的赛道 {coin: sector}"""
+        if sectors:
+            self.memory_cache.update(sectors)
+            logger.info(f"AI identified {len(sectors)} sectors.")
+
+    def classify_with_ai(self, unknown_coins):
+        """分批调用 LLM 识别赛道"""
         if not unknown_coins:
             return
 
         logger.info(f"Identifying sectors for {len(unknown_coins)} new coins using AI...")
         
-        # 每次最多处理 20 个，避免 token 溢出
-        chunk_size = 20
-        for i in range(0, len(unknown_coins), chunk_size):
-            batch = unknown_coins[i:i+chunk_size]
+        # 每次最多处理 SECTOR_BATCH_SIZE 个，避免 token 溢出
+        for i in range(0, len(unknown_coins), SECTOR_BATCH_SIZE):
+            batch = unknown_coins[i:i+SECTOR_BATCH_SIZE]
             try:
-                ai_result = self.llm_client.classify_sectors(batch)
-                if ai_result:
-                    self.memory_cache.update(ai_result)
-                    logger.info(f"AI identified {len(ai_result)} sectors.")
+                self.apply_sectors(self.llm_client.classify_sectors(batch))
             except Exception as e:
                 logger.error(f"Failed to identify sectors with AI: {e}")
+
+    def update_sectors_with_ai(self, coin_list):
+        """
+        批量使用 AI 更新赛道信息
+        """
+        self.classify_with_ai(self.unknown_coins(coin_list))
@@ -0,0 +1,112 @@
+import logging
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger("liquidity")
+
+# 流动性指标列 (深度以 USDT 计)
+LIQUIDITY_COLUMNS = [
+    'spread_bps',
+    'bid_depth_05', 'ask_depth_05', 'depth_05_usdt',
+    'bid_depth_2', 'ask_depth_2', 'depth_2_usdt',
+    'imbalance',
+]
+
+
+def books_to_arrays(books, depth=None):
+    """
+    将多个订单簿对齐为定长二维数组，档位不足的部分填 NaN
+    :param books: {symbol: {"bids": [[px, sz, ...], ...], "asks": [...]}}
+    :param depth: 每侧保留的档位数，默认取最深的订单簿
+    :return: (inst_ids, bid_px, bid_sz, ask_px, ask_sz)，后四个均为 [n, depth] float64
+    """
+    inst_ids = list(books)
+    if depth is None:
+        depth = max([max(len(b.get("bids", [])), len(b.get("asks", []))) for b in books.values()] or [0])
+    shape = (len(inst_ids), depth)
+    arrays = {k: np.full(shape, np.nan) for k in ("bid_px", "bid_sz", "ask_px", "ask_sz")}
+
+    for i, inst_id in enumerate(inst_ids):
+        for side in ("bid", "ask"):
+            levels = books[inst_id].get(side + "s") or []
+            if not levels:
+                continue
+            # 只取价格与数量两列 (OKX 每档还返回已废弃字段与订单数)
+            level_arr = np.asarray([lv[:2] for lv in levels[:depth]], dtype='float64')
+            arrays[side + "_px"][i, :len(level_arr)] = level_arr[:, 0]
+            arrays[side + "_sz"][i, :len(level_arr)] = level_arr[:, 1]
+
+    return inst_ids, arrays["bid_px"], arrays["bid_sz"], arrays["ask_px"], arrays["ask_sz"]
+
+
+def compute_liquidity_metrics(books, bands=(0.005, 0.02)):
+    """
+    对所有订单簿一次性计算流动性指标 (整矩阵运算，无逐币循环)
+    - spread_bps: 买一卖一价差 (基点)
+    - bid/ask_depth_05, bid/ask_depth_2: 中间价 ±0.5% / ±2% 以内的挂单金额 (USDT)
+    - imbalance: ±2% 内 (买 - 卖) / (买 + 卖)，>0 表示买盘更厚
+    :param books: ExchangeAdapter.get_order_books 返回的字典
+    :return: DataFrame (index=symbol, columns=LIQUIDITY_COLUMNS)
+    """
+    if not books:
+        return pd.DataFrame(columns=LIQUIDITY_COLUMNS)
+
+    inst_ids, bid_px, bid_sz, ask_px, ask_sz = books_to_arrays(books)
+    best_bid = bid_px[:, 0]
+    best_ask = ask_px[:, 0]
+    mid = (best_bid + best_ask) / 2
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        spread_bps = (best_ask - best_bid) / mid * 1e4
+        bid_notional = np.nan_to_num(bid_px * bid_sz)
+        ask_notional = np.nan_to_num(ask_px * ask_sz)
+
+        depth = {}
+        for band in bands:
+            # 广播：每行与自己的中间价比较；NaN 档位比较结果为 False
+            bid_mask = bid_px >= (mid * (1 - band))[:, None]
+            ask_mask = ask_px <= (mid * (1 + band))[:, None]
+            depth[band] = ((bid_notional * bid_mask).sum(axis=1), (ask_notional * ask_mask).sum(axis=1))
+
+        near, far = bands
+        bid_2, ask_2 = depth[far]
+        imbalance = (bid_2 - ask_2) / (bid_2 + ask_2)
+
+    result = pd.DataFrame({
+        'spread_bps': spread_bps,
+        'bid_depth_05': depth[near][0],
+        'ask_depth_05': depth[near][1],
+        'depth_05_usdt': depth[near][0] + depth[near][1],
+        'bid_depth_2': bid_2,
+        'ask_depth_2': ask_2,
+        'depth_2_usdt': bid_2 + ask_2,
+        'imbalance': imbalance,
+    }, index=pd.Index(inst_ids, name='symbol'))
+    # 单边为空的订单簿无法计算中间价，相关指标为 NaN
+    invalid = np.isnan(mid)
+    result.loc[invalid, :] = np.nan
+    return result[LIQUIDITY_COLUMNS]
+
+
+def attach_liquidity(df, metrics):
+    """
+    把流动性指标作为列加到 tickers DataFrame 上 (未采样的币种为 NaN)
+    :return: 新的 DataFrame
+    """
+    if metrics is None or metrics.empty:
+        return df
+    keys = df['symbol'].astype(str)
+    return df.assign(**{col: keys.map(metrics[col]).to_numpy(dtype='float64') for col in LIQUIDITY_COLUMNS})
+
+
+def format_liquidity_fields(row):
+    """
+    返回某一行的流动性描述 (供 LLM 摘要行使用)，无数据时返回空字符串
+    :param row: 带有流动性列的 tickers 行
+    """
+    spread = row.get('spread_bps')
+    if spread is None or pd.isna(spread):
+        return ""
+    return (f"Spread: {spread:.1f}bps, "
+            f"Depth±0.5%: {row['depth_05_usdt']:.0f}, Depth±2%: {row['depth_2_usdt']:.0f}, "
+            f"Book Imbalance: {row['imbalance']:+.2f}")
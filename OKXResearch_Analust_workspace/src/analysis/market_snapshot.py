@@ -0,0 +1,117 @@
+import logging
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger("market_snapshot")
+
+# 快照中各市场保留的列
+SNAPSHOT_COLUMNS = [
+    'spot_last', 'spot_vol_usdt',
+    'perp_last', 'perp_vol_usdt',
+    'futures_vol_usdt', 'futures_basis_pct',
+    'basis_pct', 'perp_vol_share', 'deriv_vol_usdt', 'deriv_spot_ratio',
+]
+
+
+def _usdt_rows(df):
+    """只保留 USDT 计价的行 (TICKER_COLUMNS 格式，成交额 quote_volume 已统一以 USDT 计)"""
+    mask = (df['quote'] == 'USDT').to_numpy()
+    return df['base'].to_numpy()[mask], df['last'].to_numpy()[mask], df['quote_volume'].to_numpy()[mask]
+
+
+def _prepare_spot(df):
+    if df is None or df.empty:
+        return pd.DataFrame(columns=['spot_last', 'spot_vol_usdt'])
+
+    base, last, vol_usdt = _usdt_rows(df)
+    spot = pd.DataFrame({'base': base, 'spot_last': last, 'spot_vol_usdt': vol_usdt})
+    return spot.drop_duplicates('base').set_index('base')
+
+
+def _prepare_perp(df):
+    if df is None or df.empty:
+        return pd.DataFrame(columns=['perp_last', 'perp_vol_usdt'])
+
+    base, last, vol_usdt = _usdt_rows(df)
+    perp = pd.DataFrame({'base': base, 'perp_last': last, 'perp_vol_usdt': vol_usdt})
+    return perp.drop_duplicates('base').set_index('base')
+
+
+def _prepare_futures(df):
+    if df is None or df.empty:
+        return pd.DataFrame(columns=['futures_vol_usdt', 'futures_vwap'])
+
+    # 同一币种的多个交割日期各占一行
+    base, last, vol_usdt = _usdt_rows(df)
+    futures = pd.DataFrame({
+        'base': base,
+        'vol_usdt': vol_usdt,
+        'px_x_vol': last * vol_usdt,
+    })
+    grouped = futures.groupby('base', sort=False)[['vol_usdt', 'px_x_vol']].sum()
+    # 多个交割日期按成交额加权得到一个代表价格
+    with np.errstate(divide='ignore', invalid='ignore'):
+        vwap = grouped['px_x_vol'] / grouped['vol_usdt'].replace(0, np.nan)
+    return pd.DataFrame({
+        'futures_vol_usdt': grouped['vol_usdt'],
+        'futures_vwap': vwap,
+    })
+
+
+def build_market_snapshot(spot_df, swap_df=None, futures_df=None):
+    """
+    将 SPOT / SWAP / FUTURES 三个市场的 tickers (ExchangeAdapter 的 TICKER_COLUMNS 格式) 合并为以 base 币种为索引的快照
+    所有衍生指标均为整列向量化计算:
+    - basis_pct: 永续相对现货的基差 (%)
+    - futures_basis_pct: 交割合约 (成交额加权) 相对现货的基差 (%)
+    - perp_vol_share: 永续成交额占 (现货 + 永续) 的比例
+    - deriv_spot_ratio: 衍生品总成交额 / 现货成交额，作为持仓/杠杆拥挤度的近似指标
+    :return: DataFrame (index=base)
+    """
+    spot = _prepare_spot(spot_df)
+    perp = _prepare_perp(swap_df)
+    futures = _prepare_futures(futures_df)
+
+    snapshot = spot.join(perp, how='outer').join(futures, how='outer')
+    snapshot.index.name = 'base'
+
+    spot_last = snapshot['spot_last']
+    spot_vol = snapshot['spot_vol_usdt']
+    perp_vol = snapshot['perp_vol_usdt']
+    fut_vol = snapshot['futures_vol_usdt']
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        snapshot['basis_pct'] = (snapshot['perp_last'] - spot_last) / spot_last * 100
+        snapshot['futures_basis_pct'] = (snapshot['futures_vwap'] - spot_last) / spot_last * 100
+        snapshot['perp_vol_share'] = perp_vol / (perp_vol + spot_vol.fillna(0))
+        # 两个衍生品市场都没有时保持 NaN
+        snapshot['deriv_vol_usdt'] = perp_vol.add(fut_vol, fill_value=0)
+        snapshot['deriv_spot_ratio'] = snapshot['deriv_vol_usdt'] / spot_vol.replace(0, np.nan)
+
+    snapshot = snapshot[SNAPSHOT_COLUMNS].replace([np.inf, -np.inf], np.nan)
+    logger.debug(f"Market snapshot built: {len(snapshot)} coins, {int(snapshot['perp_last'].notna().sum())} with perpetuals.")
+    return snapshot
+
+
+def format_snapshot_fields(snapshot, symbol):
+    """
+    返回某个现货交易对的衍生品上下文描述 (供 LLM 摘要行使用)
+    :param symbol: 现货交易对，如 BTC-USDT
+    :return: 字符串，无衍生品数据时返回空字符串
+    """
+    if snapshot is None or snapshot.empty:
+        return ""
+
+    base = symbol.split('-')[0]
+    if base not in snapshot.index:
+        return ""
+
+    row = snapshot.loc[base]
+    parts = []
+    if pd.notna(row['basis_pct']):
+        parts.append(f"Perp Basis: {row['basis_pct']:+.3f}%")
+    if pd.notna(row['perp_vol_share']):
+        parts.append(f"Perp Vol Share: {row['perp_vol_share'] * 100:.1f}%")
+    if pd.notna(row['deriv_spot_ratio']):
+        parts.append(f"Deriv/Spot Vol: {row['deriv_spot_ratio']:.2f}x")
+    return ", ".join(parts)
@@ -0,0 +1,143 @@
+import datetime
+import logging
+import math
+
+logger = logging.getLogger("news_index")
+
+
+def _parse_time(value):
+    """解析 CryptoPanic 的 published_at (ISO 8601)，失败返回 None"""
+    if not value:
+        return None
+    try:
+        dt = datetime.datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=datetime.timezone.utc)
+    return dt.timestamp()
+
+
+def _vote_stats(votes):
+    """根据投票数据计算 (热度权重, 情绪分)"""
+    votes = votes or {}
+    positive = votes.get("positive", 0) or 0
+    negative = votes.get("negative", 0) or 0
+    engagement = sum(v for v in votes.values() if isinstance(v, (int, float)))
+    weight = 1.0 + math.log1p(max(engagement, 0))
+    sentiment = (positive - negative) / (positive + negative) if (positive + negative) else 0.0
+    return weight, sentiment
+
+
+class NewsIndex:
+    """
+    币种 -> 新闻 的倒排索引，随新闻到达增量更新
+    每个币种维护按时间衰减、按投票加权的聚合值：
+    - score: Σ 衰减权重 × 热度权重
+    - sentiment: 以上述权重加权的平均情绪分 (-1 ~ 1)
+
+    衰减采用相对固定参考时间的指数形式存储，读取时只需乘一个系数，
+    因此 get() 为 O(1)，不需要随时间重算所有条目。
+    """
+
+    # 参考时间距今超过多少个半衰期后重新归一化，防止数值溢出
+    _REBASE_HALF_LIVES = 30
+
+    def __init__(self, half_life_hours=6.0, max_age_hours=48.0):
+        """
+        :param half_life_hours: 新闻热度的半衰期 (小时)
+        :param max_age_hours: 超过该时长的新闻从索引中移除
+        """
+        self.half_life = half_life_hours * 3600
+        self.max_age = max_age_hours * 3600
+        self.ref_time = datetime.datetime.now(datetime.timezone.utc).timestamp()
+
+        self.postings = {}  # {币种: {帖子 id: (时间戳, 权重, 情绪分)}}
+        self.stats = {}     # {币种: {"count", "weight_sum", "sentiment_sum"}}
+
+    def _decay(self, ts):
+        return 2 ** ((ts - self.ref_time) / self.half_life)
+
+    def _apply(self, code, entry, sign):
+        ts, weight, sentiment = entry
+        w = self._decay(ts) * weight
+        stat = self.stats.setdefault(code, {"count": 0, "weight_sum": 0.0, "sentiment_sum": 0.0})
+        stat["count"] += sign
+        stat["weight_sum"] += sign * w
+        stat["sentiment_sum"] += sign * w * sentiment
+        if stat["count"] <= 0:
+            del self.stats[code]
+
+    def add(self, items, verdicts=None):
+        """
+        增量加入新闻 (重复加入同一帖子会覆盖旧值)
+        :param items: 新闻列表，需包含 id / currencies / votes / published_at
+        :param verdicts: 可选 {帖子 id: AI 验证结论}，有 sentiment_score 时优先于投票情绪
+        """
+        verdicts = verdicts or {}
+        now = datetime.datetime.now(datetime.timezone.utc).timestamp()
+        self._maybe_rebase(now)
+
+        for item in items or []:
+            post_id = item.get("id")
+            if post_id is None:
+                continue
+            ts = _parse_time(item.get("published_at")) or now
+            if now - ts > self.max_age:
+                continue
+
+            weight, sentiment = _vote_stats(item.get("votes"))
+            verdict = verdicts.get(str(post_id)) or verdicts.get(post_id)
+            if verdict and isinstance(verdict.get("sentiment_score"), (int, float)):
+                sentiment = max(-1.0, min(1.0, float(verdict["sentiment_score"])))
+
+            entry = (ts, weight, sentiment)
+            for code in item.get("currencies", []):
+                postings = self.postings.setdefault(code, {})
+                if post_id in postings:
+                    self._apply(code, postings[post_id], -1)
+                postings[post_id] = entry
+                self._apply(code, entry, +1)
+
+        self.prune(now)
+
+    def prune(self, now=None):
+        """移除超过 max_age 的新闻"""
+        now = now or datetime.datetime.now(datetime.timezone.utc).timestamp()
+        for code in list(self.postings):
+            postings = self.postings[code]
+            expired = [pid for pid, entry in postings.items() if now - entry[0] > self.max_age]
+            for pid in expired:
+                self._apply(code, postings.pop(pid), -1)
+            if not postings:
+                del self.postings[code]
+
+    def _maybe_rebase(self, now):
+        """参考时间过旧时整体归一化，保持数值稳定"""
+        if (now - self.ref_time) / self.half_life < self._REBASE_HALF_LIVES:
+            return
+        factor = 2 ** (-(now - self.ref_time) / self.half_life)
+        for stat in self.stats.values():
+            stat["weight_sum"] *= factor
+            stat["sentiment_sum"] *= factor
+        self.ref_time = now
+
+    def get(self, code):
+        """
+        O(1) 查询某币种的新闻聚合
+        :param code: 币种代码 (如 BTC) 或交易对 (如 BTC-USDT)
+        :return: {"count", "score", "sentiment"}，没有相关新闻时返回 None
+        """
+        stat = self.stats.get(code.split('-')[0])
+        if not stat:
+            return None
+        now = datetime.datetime.now(datetime.timezone.utc).timestamp()
+        weight_sum = stat["weight_sum"]
+        return {
+            "count": stat["count"],
+            "score": weight_sum * 2 ** (-(now - self.ref_time) / self.half_life),
+            "sentiment": stat["sentiment_sum"] / weight_sum if weight_sum > 0 else 0.0,
+        }
+
+    def __len__(self):
+        return len(self.stats)
@@ -0,0 +1,229 @@
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from api.llm_client import is_valid_verdict
+
+logger = logging.getLogger("news_ingestor")
+
+# 同时拉取的新闻过滤器，按优先级排列
+NEWS_FILTERS = ("important", "hot")
+
+
+class NewsIngestor:
+    """
+    增量、去重的新闻摄取器
+    - 本地存储已见过的帖子及其 AI 验证结论 (data/news_store.json)
+    - 每个 (filter, currencies) 组合记录一个游标 (已完整拉取到的最大帖子 id)，只翻页拉取更新的帖子
+    - 新帖子超过 max_pages 页 (或中途出错) 时游标不前移，记录续拉位置，下一轮从该页继续，
+      直到与游标衔接后才把游标推进到这一批的最大 id，中间的帖子不会被跳过
+    - important / hot 两个查询并发发出
+    - 只有从未验证过的新闻才会发送给 LLM，其余直接复用缓存的结论
+    """
+
+    def __init__(self, news_client, store_path=None, max_pages=3, retention=500):
+        """
+        :param news_client: NewsClient 实例
+        :param store_path: 本地存储路径，默认 data/news_store.json
+        :param max_pages: 每次增量拉取最多翻页数
+        :param retention: 本地最多保留的帖子数量
+        """
+        self.client = news_client
+        if store_path:
+            self.store_path = Path(store_path)
+        else:
+            self.store_path = Path(__file__).resolve().parent.parent.parent / "data" / "news_store.json"
+        self.max_pages = max_pages
+        self.retention = retention
+        self.store = self._load_store()
+
+        # 本轮统计：新帖子数、验证缓存命中数
+        self.last_new_count = 0
+        self.verdict_hits = 0
+        self.verdict_misses = 0
+
+    def _load_store(self):
+        """加载本地新闻存储"""
+        if self.store_path.exists():
+            try:
+                with open(self.store_path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except Exception as e:
+                logger.error(f"Failed to load news store: {e}")
+
+        return {
+            "cursors": {},          # {"important|BTC,ETH": 已完整拉取到的最大帖子 id}
+            "resume": {},           # {"important|BTC,ETH": {"page": 续拉页码, "top": 本批最大帖子 id}}
+            "posts": {},            # {帖子 id: 新闻条目}
+            "verdicts": {},         # {帖子 id: AI 验证结论}
+            "market_summary": None  # 最近一次 AI 给出的市场叙事
+        }
+
+    def _save_store(self):
+        """保存本地新闻存储 (只保留最近 retention 条)"""
+        posts = self.store["posts"]
+        if len(posts) > self.retention:
+            keep = sorted(posts, key=int, reverse=True)[:self.retention]
+            self.store["posts"] = {k: posts[k] for k in keep}
+            self.store["verdicts"] = {k: v for k, v in self.store["verdicts"].items() if k in self.store["posts"]}
+
+        try:
+            self.store_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.store_path, 'w', encoding='utf-8') as f:
+                json.dump(self.store, f, ensure_ascii=False)
+        except Exception as e:
+            logger.error(f"Failed to save news store: {e}")
+
+    @staticmethod
+    def _cursor_key(news_filter, currencies):
+        return f"{news_filter}|{','.join(sorted(currencies or []))}"
+
+    def fetch(self, currencies=None, limit=10):
+        """
+        增量拉取新闻并合并到本地存储
+        :param currencies: 币种代码列表
+        :param limit: 返回的最近新闻条数
+        :return: (recent_items, new_items) 最近的新闻 (important 优先，为空时用 hot) 与本轮新增的新闻
+        """
+        if not self.client.api_key:
+            return [], []
+
+        cursors = self.store["cursors"]
+        resume = self.store.setdefault("resume", {})
+        with ThreadPoolExecutor(max_workers=len(NEWS_FILTERS)) as executor:
+            futures = {}
+            for f in NEWS_FILTERS:
+                key = self._cursor_key(f, currencies)
+                page = resume.get(key, {}).get("page", 1)
+                futures[f] = executor.submit(self.client.fetch_pages, f, currencies, cursors.get(key),
+                                             self.max_pages, page)
+            fetched = {}
+            for news_filter, future in futures.items():
+                items, next_page = future.result()
+                fetched[news_filter] = items
+                self._advance_cursor(self._cursor_key(news_filter, currencies), items, next_page)
+
+        new_items = []
+        posts = self.store["posts"]
+        for news_filter, items in fetched.items():
+            for item in items:
+                if item.get("id") is None:
+                    continue
+                key = str(item["id"])
+                if key not in posts:
+                    posts[key] = dict(item, filters=[])
+                    new_items.append(posts[key])
+                if news_filter not in posts[key]["filters"]:
+                    posts[key]["filters"].append(news_filter)
+
+        self.last_new_count = len(new_items)
+        logger.info(f"News ingestion: {len(new_items)} new posts, {len(posts)} in local store.")
+        self._save_store()
+
+        return self.recent(currencies, limit), new_items
+
+    def _advance_cursor(self, key, items, next_page):
+        """
+        更新游标与续拉位置
+        :param next_page: fetch_pages 返回的下次页码，None 表示已与上次的游标衔接
+        """
+        cursors, resume = self.store["cursors"], self.store["resume"]
+        ids = [i["id"] for i in items if i.get("id") is not None]
+        # 本批 (可能跨越多轮) 见过的最大 id
+        top = max([resume.get(key, {}).get("top") or 0] + ids)
+        if next_page is None:
+            if top:
+                cursors[key] = max(cursors.get(key) or 0, top)
+            resume.pop(key, None)
+        else:
+            resume[key] = {"page": next_page, "top": top}
+            logger.info(f"News backlog for {key} not fully fetched, resuming from page {next_page} next run.")
+
+    def recent(self, currencies=None, limit=10):
+        """返回本地存储中最近的新闻 (important 优先，为空时降级为 hot)"""
+        wanted = set(currencies or [])
+        candidates = [
+            p for p in self.store["posts"].values()
+            if not wanted or wanted & set(p.get("currencies", []))
+        ]
+        candidates.sort(key=lambda p: p["id"], reverse=True)
+
+        for news_filter in NEWS_FILTERS:
+            selected = [p for p in candidates if news_filter in p.get("filters", [])]
+            if selected:
+                return selected[:limit]
+        return []
+
+    def pending(self, items, batch_size=5):
+        """
+        找出尚无缓存结论的新闻，并更新缓存命中统计
+        :return: 需要发送给 LLM 的一批新闻 (最多 batch_size 条)
+        """
+        verdicts = self.store["verdicts"]
+        pending = [i for i in items if not is_valid_verdict(verdicts.get(str(i["id"])))]
+        self.verdict_hits = len(items) - len(pending)
+        self.verdict_misses = len(pending)
+        return pending[:batch_size]
+
+    def apply_verdicts(self, batch, result):
+        """保存 LLM 对一批新闻的验证结果 (verify_and_analyze_news 的返回结构)"""
+        self._store_verdicts(batch, result)
+        self._save_store()
+
+    def summary(self, items):
+        """
+        由缓存结论组装验证结果
+        :return: 与 LLMClient.verify_and_analyze_news 相同结构的字典，没有任何结论时返回 None
+        """
+        verdicts = self.store["verdicts"]
+        # 旧版本可能缓存过不完整的结论，不再返回
+        cached = [verdicts[str(i["id"])] for i in items if is_valid_verdict(verdicts.get(str(i["id"])))]
+        if not cached:
+            return None
+        return {
+            "market_summary": self.store.get("market_summary") or "无",
+            "verified_news": cached
+        }
+
+    def verify(self, llm, items, batch_size=5):
+        """
+        验证新闻：已验证过的直接复用缓存结论，只把新帖子发送给 LLM
+        :param llm: LLMClient 实例
+        :param items: 待验证的新闻列表
+        :return: 与 LLMClient.verify_and_analyze_news 相同结构的字典，或 None
+        """
+        if not items:
+            return None
+
+        batch = self.pending(items, batch_size)
+        if batch and llm.api_key:
+            logger.info(f"Verifying {len(batch)} new headlines with AI ({self.verdict_hits} cached verdicts reused)...")
+            result = llm.verify_and_analyze_news(batch)
+            if result:
+                self.apply_verdicts(batch, result)
+        elif not batch:
+            logger.info(f"All {len(items)} headlines already verified, reusing cached verdicts.")
+
+        return self.summary(items)
+
+    def _store_verdicts(self, batch, result):
+        """
+        LLM 返回的 id 是批内序号 (从 1 开始)，映射回帖子 id 后写入缓存
+        结构不完整的结论 (与合并预分析的校验规则相同) 不写入缓存，对应新闻下一轮重新验证
+        """
+        if not isinstance(result, dict):
+            return
+        if result.get("market_summary"):
+            self.store["market_summary"] = result["market_summary"]
+
+        verified = result.get("verified_news")
+        for verdict in verified if isinstance(verified, list) else []:
+            if not is_valid_verdict(verdict):
+                logger.warning(f"Discarding malformed news verdict: {verdict}")
+                continue
+            try:
+                idx = int(verdict.get("id")) - 1
+            except (TypeError, ValueError):
+                continue
+            if 0 <= idx < len(batch):
+                self.store["verdicts"][str(batch[idx]["id"])] = verdict
@@ -2,7 +2,9 @@ import json
 import os
 import datetime
 import logging
+import math
 from pathlib import Path
+from utils.equity_series import EquitySeries
 
 logger = logging.getLogger("paper_trader")
 
@@ -11,6 +13,8 @@ class PaperTrader:
         self.data_file = Path(data_dir) / "paper_trading.json"
         self.initial_balance = initial_balance
         self.portfolio = self._load_portfolio()
+        # 逐次估值的权益曲线 (紧凑二进制，只追加)
+        self.equity = EquitySeries(Path(data_dir) / "paper_equity")
 
     def _load_portfolio(self):
         """加载或初始化投资组合数据"""
@@ -109,19 +113,24 @@ class PaperTrader:
         self._save_portfolio()
         return True
 
-    def update_valuations(self, current_prices):
+    def update_valuations(self, current_prices, ts=None):
         """
-        更新账户总市值
+        更新账户总市值，并把本次估值追加到权益曲线
         :param current_prices: 字典 {symbol: price}
+        :param ts: 估值时间 (epoch 秒)，默认当前时间
         """
-        position_value = 0.0
+        values = {}
         for symbol, qty in self.portfolio["positions"].items():
             price = current_prices.get(symbol, 0.0)
             if price > 0:
-                position_value += qty * price
+                values[symbol] = qty * price
         
-        self.portfolio["total_value"] = self.portfolio["balance"] + position_value
+        self.portfolio["total_value"] = self.portfolio["balance"] + sum(values.values())
         self._save_portfolio()
+        try:
+            self.equity.append(self.portfolio["total_value"], self.portfolio["balance"], values, ts=ts)
+        except Exception as e:
+            logger.error(f"Failed to append equity mark: {e}")
         
         return self.portfolio["total_value"]
 
@@ -132,6 +141,18 @@ class PaperTrader:
         report = f"💰 **模拟盘周报**\n"
         report += f"总资产: {self.portfolio['total_value']:.2f} USDT (收益率: {pnl_pct:+.2f}%)\n"
         report += f"可用余额: {self.portfolio['balance']:.2f} USDT\n"
+
+        # 绩效指标来自权益曲线：回撤按逐次估值，波动率 / Sharpe 按日 (或小时) 汇总，无需回放交易历史
+        stats = self.equity.stats()
+        if stats:
+            start = datetime.datetime.fromtimestamp(stats["start"]).strftime("%Y-%m-%d %H:%M")
+            report += f"区间收益: {stats['total_return']:+.2f}% (自 {start}，{stats['marks']} 次估值)\n"
+            report += f"最大回撤: {stats['max_drawdown']:.2f}% (当前 {stats['current_drawdown']:.2f}%)\n"
+            if not math.isnan(stats["volatility"]):
+                sharpe = "N/A" if math.isnan(stats["sharpe"]) else f"{stats['sharpe']:.2f}"
+                unit = "日" if stats["resolution"] == "day" else "小时"
+                report += f"年化波动率: {stats['volatility']:.2f}% (按{unit}汇总)，Sharpe: {sharpe}\n"
+            report += f"平均仓位: {stats['exposure']:.1f}%\n"
         
         if self.portfolio["positions"]:
             report += "当前持仓:\n"
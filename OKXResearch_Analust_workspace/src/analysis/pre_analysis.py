@@ -0,0 +1,33 @@
+import logging
+from analysis.fundamental import SECTOR_BATCH_SIZE
+
+logger = logging.getLogger("pre_analysis")
+
+
+def run_pre_analysis(llm, news_ingestor, fundamental, news_items, coins, batch_size=5):
+    """
+    主报告之前的 LLM 预分析：新闻验证 + 未知币种赛道识别
+    两者都有待处理项时合并为一次请求 (LLMClient.pre_analyze)；
+    只有一项、或合并响应未通过校验时，退回 NewsIngestor.verify 与 FundamentalAnalyzer.classify_with_ai 各自调用
+    已有缓存结论的新闻与已知赛道的币种都不会发送给 LLM
+    :param news_items: 待验证的新闻列表
+    :param coins: 本轮进入 prompt 的交易对 (如 BTC-USDT)
+    :return: 新闻验证结果 (与 NewsIngestor.verify 相同)
+    """
+    batch = news_ingestor.pending(news_items, batch_size) if news_items else []
+    unknown = fundamental.unknown_coins(coins)
+
+    if batch and unknown:
+        head = unknown[:SECTOR_BATCH_SIZE]
+        logger.info(f"Combined pre-analysis: {len(batch)} headlines + {len(head)} sectors in one request...")
+        news, sectors = llm.pre_analyze(batch, head)
+        if news is not None:
+            news_ingestor.apply_verdicts(batch, news)
+            fundamental.apply_sectors(sectors)
+            # 超出单次请求上限的币种仍按原方式分批识别
+            fundamental.classify_with_ai(unknown[SECTOR_BATCH_SIZE:])
+            return news_ingestor.summary(news_items)
+
+    verified_news = news_ingestor.verify(llm, news_items, batch_size) if news_items else None
+    fundamental.classify_with_ai(unknown)
+    return verified_news
@@ -0,0 +1,98 @@
+import logging
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger("sector_aggregator")
+
+# 赛道汇总表的列
+SECTOR_COLUMNS = ['coins', 'vol_usdt', 'vol_share', 'vw_change_pct', 'breadth', 'dispersion', 'leader', 'top_gainer']
+
+# FundamentalAnalyzer 无法识别赛道时返回的名称
+UNCLASSIFIED = "Unknown"
+
+
+def aggregate_sectors(df, analyzer):
+    """
+    按赛道对全部 USDT 交易对做一次向量化聚合
+    - vw_change_pct: 成交额加权的 24h 涨跌幅 (%)
+    - breadth: 上涨币种占比 (0~1)
+    - vol_share: 赛道成交额占全市场比例 (0~1)
+    - dispersion: 赛道内涨跌幅的标准差 (百分点)，衡量分化程度
+    - leader / top_gainer: 成交额最大 / 涨幅最大的币种
+    :param df: 全市场 tickers (ExchangeAdapter 的 TICKER_COLUMNS 格式)
+    :param analyzer: FundamentalAnalyzer 实例，提供币种 -> 赛道映射
+    :return: DataFrame (index=sector)，按成交额降序
+    """
+    if df is None or df.empty:
+        return pd.DataFrame(columns=SECTOR_COLUMNS)
+
+    last = pd.to_numeric(df['last'], errors='coerce')
+    open_price = pd.to_numeric(df['open_24h'], errors='coerce')
+    vol = pd.to_numeric(df['quote_volume'], errors='coerce').fillna(0)
+
+    # 转为分类类型后 map 只对每个类别调用一次
+    sector = df['symbol'].astype('category').map(analyzer.get_coin_sector).astype(str)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        change = (last - open_price) / open_price.replace(0, np.nan) * 100
+
+    frame = pd.DataFrame({
+        'sector': sector.to_numpy(),
+        'symbol': df['symbol'].astype(str).to_numpy(),
+        'change': change.to_numpy(),
+        'vol': vol.to_numpy(),
+    }).dropna(subset=['change'])
+    frame['up'] = frame['change'] > 0
+    frame['change_x_vol'] = frame['change'] * frame['vol']
+
+    grouped = frame.groupby('sector', sort=False)
+    sums = grouped[['vol', 'change_x_vol']].sum()
+    total_vol = frame['vol'].sum()
+    leader_idx = grouped['vol'].idxmax()
+    gainer_idx = grouped['change'].idxmax()
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = pd.DataFrame({
+            'coins': grouped.size(),
+            'vol_usdt': sums['vol'],
+            'vol_share': sums['vol'] / total_vol if total_vol else np.nan,
+            # 成交额全为 0 的赛道退回简单平均
+            'vw_change_pct': (sums['change_x_vol'] / sums['vol'].replace(0, np.nan)).fillna(grouped['change'].mean()),
+            'breadth': grouped['up'].mean(),
+            'dispersion': grouped['change'].std(ddof=0),
+            'leader': pd.Series(frame.loc[leader_idx, 'symbol'].to_numpy(), index=leader_idx.index),
+            'top_gainer': pd.Series(frame.loc[gainer_idx, 'symbol'].to_numpy(), index=gainer_idx.index),
+        })
+
+    result.index.name = 'sector'
+    logger.debug(f"Aggregated {len(frame)} pairs into {len(result)} sectors.")
+    return result[SECTOR_COLUMNS].sort_values('vol_usdt', ascending=False)
+
+
+def format_sector_table(sectors, top_n=12):
+    """
+    将赛道汇总格式化为紧凑的 Markdown 表格，供 LLM prompt 使用
+    未识别赛道的币种 (全市场中通常占多数) 不参与排名，只在表格下方单独注明其币种数与成交额占比
+    :param top_n: 按成交额保留的赛道数
+    :return: 字符串，无数据时返回空字符串
+    """
+    if sectors is None or sectors.empty:
+        return ""
+
+    ranked = sectors.drop(index=UNCLASSIFIED, errors='ignore')
+    lines = []
+    if not ranked.empty:
+        lines = [
+            "| 赛道 | 币种数 | 成交额占比 | 加权涨跌 | 上涨占比 | 分化度 | 龙头 | 涨幅第一 |",
+            "| :--- | ---: | ---: | ---: | ---: | ---: | :--- | :--- |",
+        ]
+    for name, row in ranked.head(top_n).iterrows():
+        lines.append(
+            f"| {name} | {int(row['coins'])} | {row['vol_share'] * 100:.1f}% | {row['vw_change_pct']:+.2f}% | "
+            f"{row['breadth'] * 100:.0f}% | {row['dispersion']:.2f} | "
+            f"{row['leader'].split('-')[0]} | {row['top_gainer'].split('-')[0]} |"
+        )
+    if UNCLASSIFIED in sectors.index:
+        unknown = sectors.loc[UNCLASSIFIED]
+        lines.append(f"未识别赛道: {int(unknown['coins'])} 个币种，成交额占比 {unknown['vol_share'] * 100:.1f}% (未计入上表)")
+    return "\n".join(lines)
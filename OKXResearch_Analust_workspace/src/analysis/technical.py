@@ -11,8 +11,8 @@ def calculate_volatility(df, window=24):
     计算波动率 (简单示例：使用高低价差)
     实际应用中可能需要更复杂的历史数据
     """
-    if 'high24h' in df.columns and 'low24h' in df.columns:
-        high = pd.to_numeric(df['high24h'], errors='coerce')
-        low = pd.to_numeric(df['low24h'], errors='coerce')
+    if 'high_24h' in df.columns and 'low_24h' in df.columns:
+        high = pd.to_numeric(df['high_24h'], errors='coerce')
+        low = pd.to_numeric(df['low_24h'], errors='coerce')
         return ((high - low) / low) * 100
     return None
@@ -0,0 +1,319 @@
+import abc
+import logging
+import numpy as np
+import pandas as pd
+import requests
+from api.okx_client import OKXClient
+
+logger = logging.getLogger("exchange_adapter")
+
+# 交易所无关的内部 schema：各适配器统一输出以下列名与类型
+# symbol 为 "BASE-QUOTE" (如 BTC-USDT，永续合约同样去掉 -SWAP 后缀)，成交额 quote_volume 一律以计价货币计
+TICKER_COLUMNS = {
+    'symbol': 'object',
+    'base': 'object',
+    'quote': 'object',
+    'last': 'float64',
+    'open_24h': 'float64',
+    'high_24h': 'float64',
+    'low_24h': 'float64',
+    'bid': 'float64',
+    'ask': 'float64',
+    'base_volume': 'float64',
+    'quote_volume': 'float64',
+    'ts': 'int64',  # 毫秒时间戳
+}
+
+# 资金费率以百分比计 (与 OKXClient.get_funding_rates 一致)
+FUNDING_COLUMNS = {
+    'symbol': 'object',
+    'funding_rate': 'float64',
+    'next_funding_ts': 'int64',
+}
+
+# K 线按时间升序
+CANDLE_COLUMNS = {
+    'ts': 'int64',
+    'open': 'float64',
+    'high': 'float64',
+    'low': 'float64',
+    'close': 'float64',
+    'base_volume': 'float64',
+    'quote_volume': 'float64',
+}
+
+
+def normalize_frame(columns, schema):
+    """
+    按 schema 构造 DataFrame：缺失的列补 NaN / 0，数值列统一转换类型，列顺序与 schema 一致
+    :param columns: {列名: 序列}
+    """
+    length = max((len(v) for v in columns.values() if v is not None), default=0)
+    data = {}
+    for col, dtype in schema.items():
+        values = columns.get(col)
+        if values is None:
+            values = np.zeros(length, dtype='int64') if dtype == 'int64' else np.full(length, np.nan if dtype == 'float64' else None)
+        if dtype == 'object':
+            data[col] = np.asarray(values, dtype='object')
+        elif dtype == 'int64':
+            data[col] = np.nan_to_num(pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype='float64'), nan=0).astype('int64')
+        else:
+            data[col] = pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype='float64')
+    return pd.DataFrame(data, columns=list(schema))
+
+
+def split_symbol(symbols):
+    """把 "BASE-QUOTE" 拆为 base / quote 两个数组"""
+    parts = pd.Series(symbols, dtype='object').str.split('-', n=1, expand=True).reindex(columns=[0, 1])
+    return parts[0].to_numpy(dtype='object'), parts[1].to_numpy(dtype='object')
+
+
+def funding_map(frame):
+    """FUNDING_COLUMNS 格式的 DataFrame 转为 {symbol: 资金费率(%)}，None 返回空字典"""
+    if frame is None or frame.empty:
+        return {}
+    frame = frame.dropna(subset=['funding_rate'])
+    return dict(zip(frame['symbol'], frame['funding_rate'].astype(float)))
+
+
+class ExchangeAdapter(abc.ABC):
+    """
+    交易所适配器接口：把各交易所的原始行情统一为 TICKER_COLUMNS / FUNDING_COLUMNS / CANDLE_COLUMNS
+    新增交易所只需继承本类并实现三个抽象方法，失败时返回 None (与 OKXClient 的约定一致)；
+    批量方法默认逐个调用抽象方法，交易所有批量接口时可以覆盖
+    """
+
+    name = "base"
+    markets = ("spot", "swap")
+
+    @abc.abstractmethod
+    def get_tickers(self, market="spot"):
+        """
+        :param market: "spot" 现货、"swap" 永续 或 "futures" 交割合约 (合约只保留 USDT 计价)
+        :return: TICKER_COLUMNS 格式的 DataFrame 或 None
+        """
+
+    @abc.abstractmethod
+    def get_funding_rates(self, symbols=None):
+        """
+        :param symbols: 如 ["BTC-USDT"]，None 表示交易所默认范围
+        :return: FUNDING_COLUMNS 格式的 DataFrame 或 None
+        """
+
+    @abc.abstractmethod
+    def get_candles(self, symbol, bar="1H", limit=100, market="spot"):
+        """
+        :param bar: 周期，沿用 OKX 写法 (1m / 15m / 1H / 4H / 1D)
+        :return: CANDLE_COLUMNS 格式的 DataFrame (时间升序，可能包含未收盘的最新一根) 或 None
+        """
+
+    def get_tickers_multi(self, markets=("spot", "swap")):
+        """
+        :return: {market: DataFrame 或 None}，交易所不支持的市场为 None
+        """
+        return {market: self.get_tickers(market) if market in self.markets else None for market in markets}
+
+    def get_all_funding_rates(self):
+        """全部 USDT 永续的资金费率，默认范围已是全市场的交易所无需覆盖"""
+        return self.get_funding_rates()
+
+    def get_candles_multi(self, limits, bar="1H", market="spot"):
+        """
+        :param limits: {symbol: limit}
+        :return: {symbol: CANDLE_COLUMNS 格式的 DataFrame}，失败或为空的交易对不包含在内
+        """
+        candles = {}
+        for symbol, limit in limits.items():
+            frame = self.get_candles(symbol, bar=bar, limit=limit, market=market)
+            if frame is not None and not frame.empty:
+                candles[symbol] = frame
+        return candles
+
+    def get_order_books(self, symbols, depth=200):
+        """
+        :return: {symbol: {"bids": [[px, sz, ...], ...], "asks": [...]}}；交易所未实现时返回空字典 (不计算流动性指标)
+        """
+        return {}
+
+
+class OKXAdapter(ExchangeAdapter):
+    name = "okx"
+    markets = ("spot", "swap", "futures")
+    INST_TYPES = {"spot": "SPOT", "swap": "SWAP", "futures": "FUTURES"}
+
+    def __init__(self, client=None):
+        self.client = client or OKXClient()
+
+    @staticmethod
+    def normalize_tickers(df, market="spot"):
+        """
+        把 OKXClient.get_tickers 的结果转换为内部 schema
+        OKX 合约的 volCcy24h 以交易币种计，需乘以价格折算为 USDT；现货的 volCcy24h 已是 USDT
+        交割合约 (如 BTC-USDT-250328) 去掉交割日期，同一 symbol 可能有多行
+        """
+        if df is None:
+            return None
+        inst_ids = df['instId'].astype(str)
+        if market == "swap":
+            keep = inst_ids.str.endswith('-USDT-SWAP').to_numpy()
+            df, inst_ids = df[keep], inst_ids[keep].str[:-len('-SWAP')]
+        elif market == "futures":
+            keep = inst_ids.str.fullmatch(r'[^-]+-USDT-\d+').to_numpy()
+            df, inst_ids = df[keep], inst_ids[keep].str.rsplit('-', n=1).str[0]
+        last = pd.to_numeric(df['last'], errors='coerce').to_numpy(dtype='float64')
+        if market != "spot":
+            base_volume = pd.to_numeric(df['volCcy24h'], errors='coerce').to_numpy(dtype='float64')
+            quote_volume = base_volume * last
+        else:
+            base_volume = df['vol24h'] if 'vol24h' in df.columns else None
+            quote_volume = df['volCcy24h']
+        base, quote = split_symbol(inst_ids.to_numpy())
+        return normalize_frame({
+            'symbol': inst_ids.to_numpy(), 'base': base, 'quote': quote,
+            'last': last, 'open_24h': df.get('open24h'), 'high_24h': df.get('high24h'), 'low_24h': df.get('low24h'),
+            'bid': df.get('bidPx'), 'ask': df.get('askPx'),
+            'base_volume': base_volume, 'quote_volume': quote_volume, 'ts': df.get('ts'),
+        }, TICKER_COLUMNS)
+
+    @staticmethod
+    def normalize_candles(rows):
+        """OKX K 线 (新 -> 旧，每根为 [ts, o, h, l, c, vol, volCcy, volCcyQuote, confirm]) 转为 CANDLE_COLUMNS"""
+        if rows is None:
+            return None
+        cols = list(zip(*reversed(rows))) if rows else [[]] * 9
+        return normalize_frame({
+            'ts': cols[0], 'open': cols[1], 'high': cols[2], 'low': cols[3], 'close': cols[4],
+            'base_volume': cols[5], 'quote_volume': cols[7] if len(cols) > 7 else None,
+        }, CANDLE_COLUMNS)
+
+    @staticmethod
+    def _funding_frame(rates):
+        return normalize_frame({'symbol': list(rates), 'funding_rate': list(rates.values())}, FUNDING_COLUMNS)
+
+    def get_tickers(self, market="spot"):
+        return self.normalize_tickers(self.client.get_tickers(self.INST_TYPES[market]), market)
+
+    def get_tickers_multi(self, markets=("spot", "swap", "futures")):
+        # 复用 OKXClient 的并发拉取
+        frames = self.client.get_tickers_multi(tuple(self.INST_TYPES[m] for m in markets))
+        return {m: self.normalize_tickers(frames.get(self.INST_TYPES[m]), m) for m in markets}
+
+    def get_funding_rates(self, symbols=None):
+        inst_ids = [f"{s}-SWAP" for s in symbols] if symbols else None
+        return self._funding_frame(self.client.get_funding_rates(inst_ids))
+
+    def get_all_funding_rates(self):
+        return self._funding_frame(self.client.get_all_funding_rates())
+
+    def get_candles(self, symbol, bar="1H", limit=100, market="spot"):
+        inst_id = f"{symbol}-SWAP" if market == "swap" else symbol
+        return self.normalize_candles(self.client.get_candles(inst_id, bar=bar, limit=limit))
+
+    def get_candles_multi(self, limits, bar="1H", market="spot"):
+        suffix = "-SWAP" if market == "swap" else ""
+        rows = self.client.get_candles_multi({f"{s}{suffix}": n for s, n in limits.items()}, bar=bar)
+        return {inst_id[:len(inst_id) - len(suffix)]: self.normalize_candles(r) for inst_id, r in rows.items()}
+
+    def get_order_books(self, symbols, depth=200):
+        # OKX 现货 instId 即 BASE-QUOTE
+        return self.client.get_order_books(list(symbols), depth=depth)
+
+
+class BinanceAdapter(ExchangeAdapter):
+    """Binance 公共行情 (无需 API Key)"""
+
+    name = "binance"
+    SPOT_URL = "https://api.binance.com"
+    FUTURES_URL = "https://fapi.binance.com"
+
+    def __init__(self, timeout=10):
+        self.timeout = timeout
+
+    def _get(self, url, params=None):
+        response = requests.get(url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    @staticmethod
+    def _usdt_symbols(symbols):
+        """BTCUSDT -> BTC-USDT，只保留 USDT 计价的交易对
+        :return: (mask, 转换后的 symbol 数组)
+        """
+        symbols = pd.Series(symbols, dtype='object')
+        mask = symbols.str.endswith('USDT') & (symbols.str.len() > 4)
+        return mask.to_numpy(), (symbols[mask].str[:-4] + '-USDT').to_numpy(dtype='object')
+
+    def get_tickers(self, market="spot"):
+        url = f"{self.FUTURES_URL}/fapi/v1/ticker/24hr" if market == "swap" else f"{self.SPOT_URL}/api/v3/ticker/24hr"
+        try:
+            records = self._get(url)
+        except Exception as e:
+            logger.error(f"Failed to fetch Binance {market} tickers: {e}")
+            return None
+        raw = pd.DataFrame.from_records(records)
+        if raw.empty:
+            return normalize_frame({}, TICKER_COLUMNS)
+        mask, symbols = self._usdt_symbols(raw['symbol'])
+        raw = raw[mask]
+        base, quote = split_symbol(symbols)
+        return normalize_frame({
+            'symbol': symbols, 'base': base, 'quote': quote,
+            'last': raw['lastPrice'], 'open_24h': raw['openPrice'], 'high_24h': raw['highPrice'], 'low_24h': raw['lowPrice'],
+            'bid': raw.get('bidPrice'), 'ask': raw.get('askPrice'),
+            'base_volume': raw['volume'], 'quote_volume': raw['quoteVolume'], 'ts': raw['closeTime'],
+        }, TICKER_COLUMNS)
+
+    def get_funding_rates(self, symbols=None):
+        try:
+            records = self._get(f"{self.FUTURES_URL}/fapi/v1/premiumIndex")
+        except Exception as e:
+            logger.error(f"Failed to fetch Binance funding rates: {e}")
+            return None
+        raw = pd.DataFrame.from_records(records)
+        if raw.empty:
+            return normalize_frame({}, FUNDING_COLUMNS)
+        mask, names = self._usdt_symbols(raw['symbol'])
+        frame = normalize_frame({
+            'symbol': names,
+            'funding_rate': pd.to_numeric(raw['lastFundingRate'][mask], errors='coerce') * 100,
+            'next_funding_ts': raw['nextFundingTime'][mask],
+        }, FUNDING_COLUMNS)
+        if symbols:
+            frame = frame[frame['symbol'].isin(symbols)].reset_index(drop=True)
+        return frame
+
+    def get_candles(self, symbol, bar="1H", limit=100, market="spot"):
+        # OKX 周期写法转为 Binance (1H -> 1h, 1D -> 1d；月线 1M 两者相同)
+        interval = bar if bar.endswith('M') else bar.lower()
+        base_url = f"{self.FUTURES_URL}/fapi/v1/klines" if market == "swap" else f"{self.SPOT_URL}/api/v3/klines"
+        try:
+            rows = self._get(base_url, params={'symbol': symbol.replace('-', ''), 'interval': interval, 'limit': limit})
+        except Exception as e:
+            logger.warning(f"Failed to fetch Binance candles for {symbol}: {e}")
+            return None
+        # 每根为 [openTime, o, h, l, c, volume, closeTime, quoteVolume, ...]，时间升序
+        cols = list(zip(*rows)) if rows else [[]] * 8
+        return normalize_frame({
+            'ts': cols[0], 'open': cols[1], 'high': cols[2], 'low': cols[3], 'close': cols[4],
+            'base_volume': cols[5], 'quote_volume': cols[7],
+        }, CANDLE_COLUMNS)
+
+
+# 可通过 EXCHANGE_VENUES 配置启用的适配器
+ADAPTERS = {
+    OKXAdapter.name: OKXAdapter,
+    BinanceAdapter.name: BinanceAdapter,
+}
+
+
+def create_adapters(names):
+    """按名称创建适配器，未知名称会被忽略并记录警告"""
+    adapters = []
+    for name in names:
+        cls = ADAPTERS.get(name.strip().lower())
+        if cls is None:
+            logger.warning(f"Unknown exchange venue: {name}")
+            continue
+        adapters.append(cls())
+    return adapters
@@ -2,27 +2,106 @@ import os
 import requests
 import json
 import logging
-from config.settings import LLM_API_KEY, LLM_BASE_URL, LLM_MODEL
+import threading
+import time
+from api.llm_router import LLMEndpoint, LLMRouter, normalize_chat_url
+from config.settings import LLM_API_KEY, LLM_BASE_URL, LLM_MODEL, LLM_ENDPOINTS
+from config.settings import ENABLE_LLM_ROUTING, LLM_ROUTE_DEADLINE, LLM_TIMEOUT
 
 logger = logging.getLogger("llm_client")
 
+# 进程内共享的路由器，使端点延迟与错误率统计在多个 LLMClient 实例之间累积
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_llm_router():
+    """
+    获取默认模型 + LLM_ENDPOINTS 组成的共享路由器
+    未启用路由或没有额外端点时返回 None
+    """
+    global _router
+    if not (ENABLE_LLM_ROUTING and LLM_ENDPOINTS):
+        return None
+    with _router_lock:
+        if _router is None:
+            endpoints = [LLMEndpoint(LLM_MODEL, LLM_BASE_URL, LLM_MODEL, LLM_API_KEY)]
+            for ep in LLM_ENDPOINTS:
+                endpoints.append(LLMEndpoint(ep.get("name") or ep.get("model"), ep.get("base_url"),
+                                             ep.get("model"), ep.get("api_key") or LLM_API_KEY))
+            _router = LLMRouter(endpoints, deadline=LLM_ROUTE_DEADLINE, timeout=LLM_TIMEOUT)
+        return _router
+
+
+def _format_news(news_items):
+    """新闻验证 prompt 中的新闻列表 (每次只分析前5条，避免token超限)"""
+    news_str = ""
+    for idx, item in enumerate(news_items[:5]):
+        news_str += f"{idx+1}. [{item.get('domain', 'Unknown')}] {item['title']} (发布时间: {item.get('published_at', 'Unknown')})\n"
+    return news_str
+
+
+def is_valid_verdict(verdict):
+    """新闻验证结论是否带有后续展示所需的 credibility (字符串) 与数值型 sentiment_score"""
+    return (isinstance(verdict, dict) and isinstance(verdict.get("credibility"), str)
+            and isinstance(verdict.get("sentiment_score"), (int, float))
+            and not isinstance(verdict.get("sentiment_score"), bool))
+
+
+def _validate_pre_analysis(data, news_count, coin_list):
+    """
+    校验合并预分析的响应
+    - news.verified_news 为列表，每项的 id 是 1..news_count 之间的序号，且带有后续展示所需的 credibility 与数值型 sentiment_score
+    - sectors 覆盖全部给定币种，且赛道为非空字符串 (多余的币种被丢弃)
+    :return: (新闻验证结果, {coin: sector})
+    :raises ValueError: 响应结构不符合要求
+    """
+    if not isinstance(data, dict):
+        raise ValueError("response is not a JSON object")
+    news, sectors = data.get("news"), data.get("sectors")
+    if not isinstance(news, dict) or not isinstance(news.get("verified_news"), list):
+        raise ValueError("missing news.verified_news")
+    for verdict in news["verified_news"]:
+        if not isinstance(verdict, dict):
+            raise ValueError("verified_news entries must be objects")
+        try:
+            idx = int(verdict.get("id"))
+        except (TypeError, ValueError):
+            raise ValueError(f"invalid news id: {verdict.get('id')}")
+        if not 1 <= idx <= news_count:
+            raise ValueError(f"news id out of range: {idx}")
+        if not is_valid_verdict(verdict):
+            raise ValueError(f"news {idx} lacks credibility or sentiment_score")
+    if not isinstance(sectors, dict):
+        raise ValueError("missing sectors")
+    missing = [c for c in coin_list if not isinstance(sectors.get(c), str) or not sectors[c].strip()]
+    if missing:
+        raise ValueError(f"sectors missing for {', '.join(missing)}")
+    return news, {c: sectors[c].strip() for c in coin_list}
+
+
 class LLMClient:
-    def __init__(self):
-        self.api_key = LLM_API_KEY
-        self.base_url = LLM_BASE_URL
-        self.model = LLM_MODEL
-        
-        # 兼容性处理：如果用户只配置了 base_url (如 https://api.deepseek.com) 
-        # 但没有包含具体的 chat 路径，我们尝试自动补充标准 OpenAI 格式路径
-        if self.base_url and not self.base_url.endswith("/chat/completions"):
-            # 如果结尾是 /v1，则补全 /chat/completions
-            if self.base_url.endswith("/v1"):
-                self.base_url = f"{self.base_url}/chat/completions"
-            # 否则假设这是一个根域名，尝试补充 /chat/completions 或 /v1/chat/completions
-            # 这里为了通用性，默认假设用户填写的是 base_url (e.g. https://api.openai.com/v1)
-            # 如果用户填写的已经是完整路径，则不改动
-            else:
-                self.base_url = f"{self.base_url.rstrip('/')}/chat/completions"
+    def __init__(self, api_key=None, base_url=None, model=None, timeout=LLM_TIMEOUT, name=None, routed=True):
+        """
+        :param api_key / base_url / model: 覆盖 .env 中的默认配置，用于同时连接多个模型端点
+        :param timeout: 单次请求超时 (秒)
+        :param name: 端点名称 (用于日志与统计)，默认为模型名
+        :param routed: 使用默认配置且启用了 ENABLE_LLM_ROUTING 时，经路由器在多个端点间选择与故障切换
+        """
+        self.api_key = api_key or LLM_API_KEY
+        # 如果用户只填写了根地址，自动补全 /chat/completions
+        self.base_url = normalize_chat_url(base_url or LLM_BASE_URL)
+        self.model = model or LLM_MODEL
+        self.timeout = timeout
+        self.name = name or self.model
+        # 显式指定端点的实例 (如集成分析中的各模型) 不走路由
+        self.router = get_llm_router() if routed and not (api_key or base_url or model) else None
+
+        # 本实例累计的 token 用量与调用次数，最近一次市场分析的 prompt，
+        # 以及最近一次调用实际应答的端点 (经路由器对冲或切换时可能不是默认模型)，用于运行存档
+        self.usage = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "latency": 0.0}
+        self.last_analysis_prompt = None
+        self.served_by = None
 
         if not self.api_key:
             logger.warning("Notice: LLM_API_KEY not found. AI analysis will not be available.")
@@ -38,9 +117,7 @@ class LLMClient:
             return None
 
         # 格式化新闻输入
-        news_str = ""
-        for idx, item in enumerate(news_items[:5]): # 每次只分析前5条，避免token超限
-            news_str += f"{idx+1}. [{item.get('domain', 'Unknown')}] {item['title']} (发布时间: {item.get('published_at', 'Unknown')})\n"
+        news_str = _format_news(news_items)
 
         system_prompt = """你是一个专业的加密货币情报分析师。请对以下新闻进行【简短而精准】的逻辑推演。
 不要复述新闻内容，而是直接指出：这条新闻背后的逻辑是什么？会导致什么结果？
@@ -76,12 +153,13 @@ class LLMClient:
             logger.error(f"News verification failed: {e}")
             return None
 
-    def analyze_market(self, market_data_summary, user_query="", news_analysis=None):
+    def analyze_market(self, market_data_summary, user_query="", news_analysis=None, sector_summary=None):
         """
         利用 LLM 分析市场数据 (结合新闻)
         :param market_data_summary: 市场数据的摘要字符串
         :param user_query: 用户特定的查询需求
         :param news_analysis: 验证过的新闻情报 (JSON dict)
+        :param sector_summary: 全市场赛道汇总表 (Markdown 字符串，可选)
         """
         if not self.api_key:
             return "Error: LLM API Key is missing. Please configure .env file."
@@ -99,8 +177,9 @@ class LLMClient:
             
             for news in news_analysis['verified_news']:
                 # 只展示高/中可信度且非噪音的新闻
-                if news['credibility'] != 'Low' and news.get('impact') != 'Low':
-                    sentiment_icon = "🟢" if news['sentiment_score'] > 0 else "🔴"
+                if news.get('credibility', 'Low') != 'Low' and news.get('impact') != 'Low':
+                    score = news.get('sentiment_score')
+                    sentiment_icon = "🟢" if isinstance(score, (int, float)) and score > 0 else "🔴"
                     
                     # 清理换行符，防止破坏表格
                     title = news.get('title', 'Unknown').replace('\n', ' ').replace('|', '/')
@@ -112,6 +191,12 @@ class LLMClient:
                     
                     news_context += f"| {sentiment_icon} | {title} | {logic} |\n"
 
+        # 预先聚合好的赛道数据，模型无需再从逐币数据中自行汇总
+        sector_context = ""
+        if sector_summary:
+            sector_context = ("\n\n📊 **全市场赛道汇总** (覆盖全部 USDT 交易对，按成交额排序；"
+                              "加权涨跌按成交额加权，分化度为赛道内涨跌幅标准差):\n" + sector_summary)
+
         system_prompt = """你是一个专业的加密货币市场分析师。你的分析风格需要兼备专业深度与通俗易懂性。
 
 核心任务：
@@ -125,7 +210,7 @@ class LLMClient:
    - 直接展示上方提供的【新闻情报与逻辑推演】表格内容。
    - **重要**：如果上方提供了表格，请原封不动地将其复制到这里，保持 Markdown 表格格式，不要将其转换为文本列表。
 3. **重点币种分析表格**：Markdown 表格，列头：币种、赛道、24h涨跌幅、分析与评价。
-4. **赛道机会与风险**：
+4. **赛道机会与风险**：如果提供了【全市场赛道汇总】，请以其为依据（成交额占比、加权涨跌、上涨占比、分化度）判断赛道强弱。
    - 🟢 **机会**：列出潜力赛道或币种。
    - 🔴 **风险**：列出需回避的板块或币种。
 5. **投资建议**：针对稳健型和激进型投资者的具体操作建议。
@@ -134,12 +219,26 @@ class LLMClient:
 - 正值 (>0)：代表多头支付空头费用，数值越高（如 >0.03%），表明做多情绪越拥挤。
 - 负值 (<0)：代表空头支付多头费用，数值越低，表明做空情绪越浓。
 
+关于订单簿流动性 (如有)：
+- Spread 为买一卖一价差 (基点)，Depth±0.5% / Depth±2% 为中间价附近的挂单金额 (USDT)，深度越薄越容易被大单推动。
+- Book Imbalance 在 -1 ~ 1 之间，>0 表示买盘更厚。推荐币种时请考虑流动性，避免推荐深度过薄的标的。
+
+关于 BTC 联动 (如有)：
+- BTC Beta 为该币种收益率对 BTC 收益率的回归系数，Corr 为相关系数 (滚动窗口内的 K 线收益率)。Beta 高且 Corr 高的币种基本是 BTC 的放大版。
+- Idio 24h 为扣除 Beta x BTC 涨跌后的特异涨跌，反映币种自身的逻辑；Cluster 为走势高度相关的联动组。
+- 推荐"机会"时请区分独立行情与单纯跟随 BTC 的高 Beta 标的，并说明理由。
+
+关于跨交易所数据 (如有)：
+- Venues 为有报价的交易所数量，XV Vol(USDT) 为各交易所现货成交额之和，Primary Vol Share 为 OKX 的成交额占比。
+- XV Dispersion 为各交易所最新价的极差 (基点)，明显偏大时说明价格尚未在各交易所间收敛，可能存在局部资金推动。
+
 保持客观、理性，数据驱动。语言风格需专业严谨但通俗易懂。
 """
         
         user_prompt = f"""
 以下是当前 OKX 市场的部分热门币种数据摘要（已按交易量排序）：
 {market_data_summary}
+{sector_context}
 
 {news_context}
 
@@ -148,6 +247,7 @@ class LLMClient:
 请给出详细的分析报告。
 """
 
+        self.last_analysis_prompt = f"[system]\n{system_prompt}\n[user]\n{user_prompt}"
         return self._call_llm(system_prompt, user_prompt)
 
     def get_trade_decision(self, market_analysis, current_portfolio):
@@ -223,6 +323,53 @@ JSON 格式要求：
             logger.error(f"Error classifying sectors: {e}")
             return {}
 
+    def pre_analyze(self, news_items, coin_list):
+        """
+        合并的预分析请求：一次调用同时完成新闻验证与未知币种的赛道识别
+        :param news_items: 待验证的新闻 (同 verify_and_analyze_news，最多取前 5 条)
+        :param coin_list: 待分类的币种 (同 classify_sectors)
+        :return: (新闻验证结果, {coin: sector})；请求失败或响应未通过校验时返回 (None, None)，
+                 调用方应退回 verify_and_analyze_news + classify_sectors 两次独立调用
+        """
+        if not self.api_key:
+            return None, None
+
+        system_prompt = """你是一个专业的加密货币情报分析师，同时也是加密货币领域的专家百科全书。本次请求包含两个任务：
+1. 新闻验证：对给出的新闻进行【简短而精准】的逻辑推演。不要复述新闻内容，而是直接指出：这条新闻背后的逻辑是什么？会导致什么结果？
+2. 赛道识别：识别给定币种所属的主流赛道（Sector），参考：Layer1, Layer2, DeFi, Meme, AI, GameFi, RWA, Storage, Oracle 等。如果不知道，标记为 "Unknown"。
+
+只返回一个纯 JSON 对象（不要 Markdown），格式如下：
+{
+    "news": {
+        "market_summary": "一句话总结当前最核心的市场叙事（50字以内）。",
+        "verified_news": [
+            {
+                "id": 1,
+                "title": "简化的新闻标题（不要超过20字）",
+                "credibility": "High" | "Medium" | "Low",
+                "impact": "High" | "Medium",
+                "logic": "简短的一句话逻辑推演（例如：MicroStrategy 再次买入 BTC -> 减少市场流通量 -> 长期利好）",
+                "sentiment_score": 0.8
+            }
+        ]
+    },
+    "sectors": {"BTC": "Layer1", "UNI": "DeFi"}
+}
+news.verified_news 中的 id 为新闻序号；sectors 必须包含每一个给定币种。
+"""
+        user_prompt = f"""
+【任务 1】以下是来自聚合器的最新加密新闻：
+{_format_news(news_items)}
+【任务 2】请对以下币种进行分类：{", ".join(coin_list)}
+"""
+        try:
+            response = self._call_llm(system_prompt, user_prompt)
+            clean_json = response.replace("```json", "").replace("```", "").strip()
+            return _validate_pre_analysis(json.loads(clean_json), min(len(news_items), 5), coin_list)
+        except Exception as e:
+            logger.warning(f"Combined pre-analysis failed, falling back to separate calls: {e}")
+            return None, None
+
     def _call_llm(self, system_prompt, user_prompt):
         """通用 LLM 调用方法"""
         headers = {
@@ -242,10 +389,18 @@ JSON 格式要求：
         try:
             # logger.info(f"Sending request to LLM ({self.model})...") 
             # 避免日志过于嘈杂，仅在 debug 级别或外部调用时记录
-            response = requests.post(self.base_url, headers=headers, json=payload, timeout=60)
-            response.raise_for_status()
-            
-            result = response.json()
+            start = time.perf_counter()
+            if self.router is not None:
+                # 路由器选择当前最健康的端点，超过软期限时对冲、失败时切换
+                result, endpoint = self.router.post(payload)
+                logger.debug(f"LLM request served by {endpoint.name}")
+                self.served_by = endpoint.name
+            else:
+                response = requests.post(self.base_url, headers=headers, json=payload, timeout=self.timeout)
+                response.raise_for_status()
+                result = response.json()
+                self.served_by = self.name
+            self._record_usage(result.get('usage'), time.perf_counter() - start)
             if 'choices' in result and len(result['choices']) > 0:
                 return result['choices'][0]['message']['content']
             else:
@@ -255,3 +410,10 @@ JSON 格式要求：
         except Exception as e:
             logger.error(f"Error calling LLM API: {e}")
             raise
+
+    def _record_usage(self, usage, latency):
+        """累计 OpenAI 兼容接口返回的 token 用量"""
+        self.usage["calls"] += 1
+        self.usage["latency"] = round(self.usage["latency"] + latency, 3)
+        for key in ("prompt_tokens", "completion_tokens", "total_tokens"):
+            self.usage[key] += (usage or {}).get(key) or 0
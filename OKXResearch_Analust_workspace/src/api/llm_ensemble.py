@@ -0,0 +1,283 @@
+import copy
+import logging
+import statistics
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from itertools import combinations
+from api.llm_client import LLMClient
+from utils.run_archive import extract_symbols
+from config.settings import LLM_ENDPOINTS, LLM_ENSEMBLE_DEADLINE
+
+logger = logging.getLogger("llm_ensemble")
+
+
+def vote_trade_decisions(decisions):
+    """
+    对多个模型的交易指令投票
+    以 (action, symbol) 为一票，多数胜出；票数并列时保守地选择 hold
+    :param decisions: {模型名: get_trade_decision 返回的字典}
+    :return: 合并后的交易指令 (附带 votes / agreement)，没有有效指令时返回 None
+    """
+    valid = {name: d for name, d in decisions.items()
+             if isinstance(d, dict) and d.get("action") in ("buy", "sell", "hold")}
+    if not valid:
+        return None
+
+    def key(d):
+        return (d["action"], None if d["action"] == "hold" else d.get("symbol"))
+
+    ranked = Counter(key(d) for d in valid.values()).most_common()
+    winner, votes = ranked[0]
+    if len(ranked) > 1 and ranked[1][1] == votes:
+        winner = ("hold", None)
+        votes = sum(1 for d in valid.values() if key(d) == winner)
+
+    backers = [d for d in valid.values() if key(d) == winner]
+    amounts = [float(d.get("amount_usdt", 0)) for d in backers if d.get("amount_usdt") is not None]
+    return {
+        "action": winner[0],
+        "symbol": winner[1] or (backers[0].get("symbol") if backers else None),
+        # 金额取支持者的中位数，避免单个模型给出极端仓位
+        "amount_usdt": statistics.median(amounts) if amounts else 0,
+        "reason": "; ".join(d.get("reason", "") for d in backers if d.get("reason")) or "模型意见分歧，保持观望",
+        "votes": {name: " ".join(filter(None, key(d))) for name, d in valid.items()},
+        "agreement": round(votes / len(valid), 3),
+    }
+
+
+def symbol_agreement(symbol_sets):
+    """多个报告提及币种集合的平均两两 Jaccard 相似度，少于两个报告时返回 None"""
+    pairs = list(combinations(symbol_sets, 2))
+    if not pairs:
+        return None
+    scores = [len(a & b) / len(a | b) if (a | b) else 1.0 for a, b in pairs]
+    return round(sum(scores) / len(scores), 3)
+
+
+class LLMEnsemble:
+    """
+    多模型集成分析：把同一个 prompt 并发发送给多个 OpenAI 兼容模型端点
+    - 每个模型有独立期限，超时的模型直接丢弃，不拖慢整轮分析
+    - 市场分析报告合并为一份 (主模型报告 + 共识摘要 + 其他模型观点)
+    - 交易指令按多数投票
+    - 记录每个模型的延迟、成功/超时次数与模型间的一致度
+    接口与 LLMClient 保持一致，可直接替换 analyze_market / get_trade_decision 的调用方
+    可被多个分析任务并发共享：每次调用使用各模型的独立副本，本轮 prompt / 状态 / 用量通过
+    analyze_market_round 的返回值获取，不保存在实例上
+    """
+
+    def __init__(self, clients, deadline=LLM_ENSEMBLE_DEADLINE, deadlines=None, concurrency=1):
+        """
+        :param clients: LLMClient 列表，第一个为主模型
+        :param deadline: 默认的单模型期限 (秒)
+        :param deadlines: {模型名: 期限}，覆盖默认期限
+        :param concurrency: 预计同时进行的调用数 (如分析服务的 worker 数)，用于确定线程池大小
+        """
+        self.clients = [c for c in clients if c.api_key]
+        self.deadline = deadline
+        self.deadlines = deadlines or {}
+        for client in self.clients:
+            # 请求超时与期限一致，被丢弃的请求不会在后台无限占用线程
+            client.timeout = self._deadline_for(client)
+        self.model = "+".join(c.name for c in self.clients)
+        # 仅供 stats() 展示，调用方应使用 analyze_market_round 返回的本轮状态
+        self.last_round = {}
+        self.rounds = 0
+        self.model_stats = {c.name: {"calls": 0, "ok": 0, "timeouts": 0, "errors": 0, "latency": 0.0}
+                            for c in self.clients}
+        self.agreements = []
+        self._usage = {}
+        self._lock = threading.Lock()
+        # 每个并发调用各占 len(clients) 个线程，另留一份给已丢弃但仍在收尾的请求
+        self._executor = ThreadPoolExecutor(max_workers=max(1, len(self.clients) * (max(1, concurrency) + 1)),
+                                            thread_name_prefix="llm-ensemble")
+
+    @classmethod
+    def from_settings(cls, primary=None, concurrency=1):
+        """
+        按 .env 配置构建：主模型 (LLM_API_KEY / LLM_BASE_URL / LLM_MODEL) + LLM_ENDPOINTS
+        :param primary: 已有的主模型 LLMClient，默认新建
+        :param concurrency: 预计同时进行的调用数
+        """
+        clients = [primary or LLMClient(routed=False)]
+        deadlines = {}
+        for ep in LLM_ENDPOINTS:
+            client = LLMClient(api_key=ep.get("api_key"), base_url=ep.get("base_url"),
+                               model=ep.get("model"), name=ep.get("name"), routed=False)
+            clients.append(client)
+            if ep.get("deadline"):
+                deadlines[client.name] = float(ep["deadline"])
+        return cls(clients, deadlines=deadlines, concurrency=concurrency)
+
+    @property
+    def api_key(self):
+        return bool(self.clients)
+
+    @property
+    def usage(self):
+        """各模型 token 用量之和 (与 LLMClient.usage 结构一致)"""
+        with self._lock:
+            return dict(self._usage)
+
+    def _add_usage(self, total, usage):
+        for key, value in usage.items():
+            total[key] = round(total.get(key, 0) + value, 3)
+
+    def _deadline_for(self, client):
+        return self.deadlines.get(client.name, self.deadline)
+
+    @staticmethod
+    def _fork(client):
+        """本次调用专用的模型副本：prompt 与用量记录在副本上，并发调用之间互不覆盖"""
+        fork = copy.copy(client)
+        fork.usage = dict.fromkeys(client.usage, 0)
+        return fork
+
+    def _run(self, fork, started, method, args, kwargs):
+        # 期限从真正开始执行时计算，线程池排队的时间不计入
+        started.append(time.monotonic())
+        try:
+            return getattr(fork, method)(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._add_usage(self._usage, fork.usage)
+
+    def _dispatch(self, method, *args, **kwargs):
+        """
+        并发调用所有模型的同名方法，各自到期未返回的丢弃
+        :return: ({模型名: 结果}, {模型名: {"status", "latency"[, "served_by"]}}, 本轮用量, {模型名: 本次调用的模型副本})，
+                 结果按模型配置顺序排列
+        """
+        start = time.monotonic()
+        pending, forks = {}, {}
+        for client in self.clients:
+            forks[client.name], started = self._fork(client), []
+            future = self._executor.submit(self._run, forks[client.name], started, method, args, kwargs)
+            pending[future] = (client, started)
+
+        results, round_stats = {}, {}
+        while pending:
+            now = time.monotonic()
+            # 丢弃已过期的模型
+            for future, (client, started) in list(pending.items()):
+                if started and now >= started[0] + self._deadline_for(client):
+                    del pending[future]
+                    round_stats[client.name] = {"status": "timeout", "latency": round(now - start, 3)}
+                    logger.warning(f"Model {client.name} exceeded its {self._deadline_for(client):.0f}s deadline, dropped.")
+            if not pending:
+                break
+            # 尚未开始执行的模型最早也要到 now + 期限 才会过期，届时重新检查
+            next_due = min((started[0] if started else now) + self._deadline_for(client)
+                           for client, started in pending.values())
+            done, _ = wait(list(pending), timeout=max(0.0, next_due - now), return_when=FIRST_COMPLETED)
+            for future in done:
+                client, _ = pending.pop(future)
+                latency = round(time.monotonic() - start, 3)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.error(f"Model {client.name} failed: {e}")
+                    round_stats[client.name] = {"status": "error", "latency": latency}
+                    continue
+                if result is None:
+                    round_stats[client.name] = {"status": "error", "latency": latency}
+                    continue
+                results[client.name] = result
+                # 成员经路由器调用时，实际应答的端点可能与成员名不同
+                round_stats[client.name] = {"status": "ok", "latency": latency,
+                                            "served_by": forks[client.name].served_by or client.name}
+
+        with self._lock:
+            self.rounds += 1
+            for name, stat in round_stats.items():
+                s = self.model_stats[name]
+                s["calls"] += 1
+                s["ok" if stat["status"] == "ok" else stat["status"] + "s"] += 1
+                s["latency"] = round(s["latency"] + stat["latency"], 3)
+            self.last_round = round_stats
+        # 本轮用量：已完成的调用 (被丢弃的调用完成后只计入总用量)
+        usage = {}
+        for name in results.keys() | {n for n, s in round_stats.items() if s["status"] == "error"}:
+            self._add_usage(usage, forks[name].usage)
+        ordered = {c.name: results[c.name] for c in self.clients if c.name in results}
+        return ordered, round_stats, usage, forks
+
+    def _record_agreement(self, value):
+        if value is None:
+            return
+        with self._lock:
+            self.agreements.append(value)
+
+    def analyze_market(self, market_data_summary, user_query="", **kwargs):
+        """并发生成多份市场分析并合并为一份报告，关键字参数原样传给各模型的 analyze_market"""
+        return self.analyze_market_round(market_data_summary, user_query, **kwargs)["report"]
+
+    def analyze_market_round(self, market_data_summary, user_query="", **kwargs):
+        """
+        同 analyze_market，另返回本轮的调用信息
+        :return: {"report": 合并后的报告, "prompt": 主模型的 prompt, "round": {模型名: {"status", "latency"}},
+                  "usage": 本轮 token 用量}
+        """
+        reports, round_stats, usage, forks = self._dispatch("analyze_market", market_data_summary, user_query,
+                                                            **kwargs)
+        prompt = forks[self.clients[0].name].last_analysis_prompt if self.clients else None
+        # 某些模型可能把错误信息当作报告返回 (如缺少 Key)，不参与合并
+        reports = {name: r for name, r in reports.items() if r and not r.startswith("Error:")}
+        if not reports:
+            raise RuntimeError("All ensemble models failed or exceeded their deadline.")
+
+        # 以本轮行情数据中的币种为全集，统计各报告提及的币种
+        universe = set(extract_symbols(market_data_summary))
+        mentions = {name: set(extract_symbols(r, universe)) for name, r in reports.items()}
+        agreement = symbol_agreement(list(mentions.values()))
+        self._record_agreement(agreement)
+        return {"report": self._merge_reports(reports, mentions, agreement, round_stats), "prompt": prompt,
+                "round": round_stats, "usage": usage}
+
+    def _merge_reports(self, reports, mentions, agreement, round_stats):
+        names = list(reports)
+        primary = names[0]
+        if len(names) == 1 and len(self.clients) == 1:
+            return reports[primary]
+
+        counts = Counter(sym for syms in mentions.values() for sym in syms)
+        consensus = sorted(sym for sym, c in counts.items() if c * 2 > len(names))
+        dropped = [f"{name} ({stat['status']})" for name, stat in round_stats.items() if stat["status"] != "ok"]
+
+        lines = [reports[primary], "", "---", "", "## 🤝 多模型共识", ""]
+        lines.append(f"- **参与模型**: {len(names)}/{len(self.clients)} 按时返回"
+                     + (f"，丢弃: {', '.join(dropped)}" if dropped else ""))
+        if agreement is not None:
+            lines.append(f"- **一致度** (提及币种的 Jaccard 相似度): {agreement:.2f}")
+        lines.append(f"- **共识币种** (过半模型提及): {', '.join(consensus) or '无'}")
+        lines += ["", "| 模型 | 耗时 | 提及币种 |", "| :--- | :---: | :--- |"]
+        for name in names:
+            lines.append(f"| {name} | {round_stats[name]['latency']:.1f}s | {', '.join(sorted(mentions[name])) or '-'} |")
+        for name in names[1:]:
+            lines += ["", f"### 💬 {name} 的观点", "", reports[name]]
+        return "\n".join(lines)
+
+    def get_trade_decision(self, market_analysis, current_portfolio):
+        """并发向各模型请求交易指令并投票"""
+        decisions, _, _, _ = self._dispatch("get_trade_decision", market_analysis, current_portfolio)
+        decision = vote_trade_decisions(decisions)
+        if decision is not None and len(decisions) > 1:
+            self._record_agreement(decision["agreement"])
+        return decision
+
+    def stats(self):
+        """返回每个模型的调用/超时统计与平均延迟，以及模型间一致度"""
+        with self._lock:
+            models = {}
+            for name, s in self.model_stats.items():
+                models[name] = dict(s, avg_latency=round(s["latency"] / s["calls"], 3) if s["calls"] else None)
+            agreements = list(self.agreements)
+            last_round = self.last_round
+        return {
+            "rounds": self.rounds,
+            "models": models,
+            "last_round": last_round,
+            "avg_agreement": round(sum(agreements) / len(agreements), 3) if agreements else None,
+        }
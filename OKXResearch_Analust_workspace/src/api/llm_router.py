@@ -0,0 +1,217 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import requests
+from utils.http_transport import CircuitBreaker
+
+logger = logging.getLogger("llm_router")
+
+
+def normalize_chat_url(base_url):
+    """
+    兼容性处理：如果用户只配置了 base_url (如 https://api.deepseek.com)
+    但没有包含具体的 chat 路径，自动补充标准 OpenAI 格式路径
+    """
+    if base_url and not base_url.endswith("/chat/completions"):
+        # 如果结尾是 /v1，则补全 /chat/completions；否则假设是根地址
+        if base_url.endswith("/v1"):
+            return f"{base_url}/chat/completions"
+        return f"{base_url.rstrip('/')}/chat/completions"
+    return base_url
+
+
+class LLMEndpoint:
+    """
+    单个模型端点的健康状况：EWMA 延迟、EWMA 错误率与熔断器
+    """
+
+    def __init__(self, name, url, model, api_key, alpha=0.3, failure_threshold=3, reset_timeout=60.0):
+        self.name = name
+        self.url = normalize_chat_url(url)
+        self.model = model
+        self.api_key = api_key
+        self.alpha = alpha
+        self.ewma_latency = None
+        self.error_rate = 0.0
+        self.calls = 0
+        self.errors = 0
+        self.wins = 0
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self._lock = threading.Lock()
+
+    def observe(self, latency, ok):
+        with self._lock:
+            self.calls += 1
+            if ok:
+                # 只用成功请求更新延迟，失败请求的耗时 (常为超时) 体现在错误率中
+                self.ewma_latency = latency if self.ewma_latency is None else \
+                    self.alpha * latency + (1 - self.alpha) * self.ewma_latency
+            else:
+                self.errors += 1
+            self.error_rate = self.alpha * (0.0 if ok else 1.0) + (1 - self.alpha) * self.error_rate
+        if ok:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+    def score(self, default_latency):
+        """路由得分 (越小越好)：期望延迟按错误率放大"""
+        latency = self.ewma_latency if self.ewma_latency is not None else default_latency
+        return latency * (1 + 4 * self.error_rate)
+
+    def snapshot(self):
+        return {
+            "model": self.model,
+            "ewma_latency": round(self.ewma_latency, 3) if self.ewma_latency is not None else None,
+            "error_rate": round(self.error_rate, 3),
+            "calls": self.calls,
+            "errors": self.errors,
+            "wins": self.wins,
+            "breaker": self.breaker.state,
+        }
+
+
+class LLMRouter:
+    """
+    多个 OpenAI 兼容端点之间的延迟感知路由
+    - 每次调用选择健康 (未熔断) 端点中得分最低的一个
+    - 端点报错时立即切换到下一个端点 (failover)
+    - 超过软期限仍未返回时，向下一个端点发出对冲请求，取先返回的结果
+    - 路由决策与每个端点的统计可通过 stats() 查看
+    """
+
+    def __init__(self, endpoints, deadline=30.0, timeout=60.0, history=50):
+        """
+        :param endpoints: LLMEndpoint 列表，按优先级排列 (未有延迟数据时按该顺序选择)
+        :param deadline: 软期限 (秒)，超过后发出对冲请求
+        :param timeout: 单次调用的总超时 (秒)
+        :param history: 保留最近多少条路由决策
+        """
+        self.endpoints = [ep for ep in endpoints if ep.api_key]
+        self.deadline = deadline
+        self.timeout = timeout
+        self.decisions = deque(maxlen=history)
+        self.hedges = 0
+        self.failovers = 0
+        # 多个分析任务共享同一路由器，计数器需要加锁
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max(2, len(self.endpoints) * 2),
+                                            thread_name_prefix="llm-router")
+
+    def rank(self):
+        """按得分排序的可用端点列表；全部熔断时仍返回全部端点"""
+        # 只读检查：半开试探名额只在真正向该端点发请求时占用 (见 _next_endpoint)
+        healthy = [ep for ep in self.endpoints if ep.breaker.available()] or list(self.endpoints)
+        # 未有数据的端点按软期限的一半估计，保证首选端点优先且新端点有机会被尝试
+        return sorted(healthy, key=lambda ep: (ep.score(self.deadline / 2), self.endpoints.index(ep)))
+
+    @staticmethod
+    def _next_endpoint(queue):
+        """从候选队列中取出下一个能发送请求的端点 (熔断中的端点在此占用试探名额)"""
+        while queue:
+            endpoint = queue.pop(0)
+            if endpoint.breaker.try_acquire_probe():
+                return endpoint
+        return None
+
+    def _post(self, endpoint, payload, timeout):
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {endpoint.api_key}"
+        }
+        start = time.monotonic()
+        try:
+            response = requests.post(endpoint.url, headers=headers, json=dict(payload, model=endpoint.model),
+                                     timeout=timeout)
+            response.raise_for_status()
+            result = response.json()
+        except Exception:
+            endpoint.observe(time.monotonic() - start, ok=False)
+            raise
+        endpoint.observe(time.monotonic() - start, ok=True)
+        return result
+
+    def post(self, payload):
+        """
+        发送一次 chat completion 请求
+        :param payload: 请求体 (model 字段会被替换为所选端点的模型)
+        :return: (响应 JSON, 应答的端点)
+        """
+        if not self.endpoints:
+            raise RuntimeError("No LLM endpoint configured.")
+
+        start = time.monotonic()
+        hard_deadline = start + self.timeout
+        queue = self.rank()
+        # 全部熔断时仍向得分最高的端点发送请求
+        endpoint = self._next_endpoint(list(queue)) or queue[0]
+        queue = queue[queue.index(endpoint) + 1:]
+        decision = {"time": time.time(), "primary": endpoint.name, "hedged": [], "failed": [], "winner": None}
+        pending = {self._executor.submit(self._post, endpoint, payload, self.timeout): endpoint}
+        hedge_at = start + self.deadline
+        last_error = None
+
+        try:
+            while pending:
+                now = time.monotonic()
+                if now >= hard_deadline:
+                    break
+                wait_until = min(hedge_at, hard_deadline) if queue else hard_deadline
+                done, _ = wait(list(pending), timeout=max(0.0, wait_until - now), return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    ep = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        last_error = e
+                        decision["failed"].append(ep.name)
+                        logger.warning(f"LLM endpoint {ep.name} failed: {e}")
+                        continue
+                    with ep._lock:
+                        ep.wins += 1
+                    decision["winner"] = ep.name
+                    decision["latency"] = round(time.monotonic() - start, 3)
+                    return result, ep
+
+                if not queue or (done and pending):
+                    continue
+                remaining = hard_deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                previous, endpoint = endpoint, self._next_endpoint(queue)
+                if endpoint is None:
+                    endpoint = previous
+                    continue
+                if done:
+                    # 当前端点失败，切换到下一个
+                    with self._lock:
+                        self.failovers += 1
+                else:
+                    # 超过软期限，对冲到下一个端点
+                    with self._lock:
+                        self.hedges += 1
+                    decision["hedged"].append(endpoint.name)
+                    logger.info(f"LLM endpoint {previous.name} exceeded {self.deadline:.0f}s, hedging to {endpoint.name}.")
+
+                pending[self._executor.submit(self._post, endpoint, payload, remaining)] = endpoint
+                hedge_at = time.monotonic() + self.deadline
+        finally:
+            self.decisions.append(decision)
+
+        if last_error is not None:
+            raise last_error
+        raise requests.Timeout(f"No LLM endpoint answered within {self.timeout:.0f}s")
+
+    def stats(self):
+        """返回每个端点的延迟/错误率/熔断状态，以及最近的路由决策"""
+        with self._lock:
+            hedges, failovers = self.hedges, self.failovers
+        return {
+            "endpoints": {ep.name: ep.snapshot() for ep in self.endpoints},
+            "hedges": hedges,
+            "failovers": failovers,
+            "recent_decisions": list(self.decisions)[-10:],
+        }
@@ -0,0 +1,146 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger("multi_venue")
+
+# 跨交易所汇总列
+CROSS_VENUE_COLUMNS = ['venues', 'xv_vol_usdt', 'xv_vwap', 'xv_dispersion_bps', 'primary_vol_share']
+
+
+def merge_venues(frames, primary=None):
+    """
+    把多个交易所的 tickers (内部 schema) 合并为一个跨交易所快照
+    - <venue>_last / <venue>_vol_usdt: 各交易所的最新价与成交额
+    - venues: 有报价的交易所数量
+    - xv_vol_usdt: 跨交易所总成交额
+    - xv_vwap: 按成交额加权的价格
+    - xv_dispersion_bps: (最高价 - 最低价) / 加权价 (基点)，衡量各交易所间的价差
+    - primary_vol_share: 主交易所成交额占比
+    :param frames: {venue: DataFrame 或 None}
+    :param primary: 主交易所名称
+    :return: DataFrame (index=symbol)
+    """
+    frames = {name: df for name, df in frames.items() if df is not None and not df.empty}
+    if not frames:
+        return pd.DataFrame(columns=CROSS_VENUE_COLUMNS)
+
+    long = pd.concat(
+        [df[['symbol', 'last', 'quote_volume']].assign(venue=name) for name, df in frames.items()],
+        ignore_index=True
+    )
+    long = long.dropna(subset=['last']).drop_duplicates(['symbol', 'venue'])
+    last = long.pivot(index='symbol', columns='venue', values='last')
+    vol = long.pivot(index='symbol', columns='venue', values='quote_volume')
+
+    price = last.to_numpy(dtype='float64')
+    volume = vol.to_numpy(dtype='float64')
+    quoted = ~np.isnan(price)
+    weights = np.where(quoted, np.nan_to_num(volume), 0.0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        total = weights.sum(axis=1)
+        vwap = (np.nan_to_num(price) * weights).sum(axis=1) / total
+        # 无成交额数据时退化为简单平均
+        vwap = np.where(total > 0, vwap, np.nanmean(np.where(quoted, price, np.nan), axis=1))
+        dispersion = (np.nanmax(price, axis=1) - np.nanmin(price, axis=1)) / vwap * 1e4
+
+    result = pd.DataFrame({
+        'venues': quoted.sum(axis=1),
+        'xv_vol_usdt': np.nansum(volume, axis=1),
+        'xv_vwap': vwap,
+        'xv_dispersion_bps': dispersion,
+    }, index=last.index)
+    if primary in vol.columns:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # 主交易所未上线的币种占比为 0
+            result['primary_vol_share'] = np.nan_to_num(vol[primary].to_numpy(dtype='float64')) / result['xv_vol_usdt'].to_numpy()
+    else:
+        result['primary_vol_share'] = np.nan
+
+    per_venue = pd.concat([last.add_suffix('_last'), vol.add_suffix('_vol_usdt')], axis=1)
+    return pd.concat([result, per_venue], axis=1)
+
+
+class MultiVenueAggregator:
+    """
+    并发拉取多个交易所的行情并合并为跨交易所快照
+    单个交易所失败或超时只会被跳过，不影响其他交易所
+    """
+
+    def __init__(self, adapters, primary=None, timeout=15):
+        """
+        :param adapters: ExchangeAdapter 实例列表
+        :param primary: 主交易所名称，默认第一个适配器
+        :param timeout: 等待全部交易所返回的最长时间 (秒)
+        """
+        self.adapters = list(adapters)
+        self.primary = primary or (self.adapters[0].name if self.adapters else None)
+        self.timeout = timeout
+        self.last_latency = {}
+
+    def _timed_fetch(self, adapter, method, *args):
+        start = time.perf_counter()
+        try:
+            return getattr(adapter, method)(*args)
+        except Exception as e:
+            logger.warning(f"{adapter.name} {method} failed: {e}")
+            return None
+        finally:
+            self.last_latency[adapter.name] = round(time.perf_counter() - start, 4)
+
+    def fetch(self, market="spot", method="get_tickers", exclude=()):
+        """
+        并发调用各适配器的同一方法
+        :param exclude: 跳过的交易所 (如调用方已自行拉取的主交易所)
+        :return: {venue: DataFrame 或 None}
+        """
+        adapters = [a for a in self.adapters if a.name not in exclude]
+        if not adapters:
+            return {}
+        executor = ThreadPoolExecutor(max_workers=len(adapters))
+        futures = {a.name: executor.submit(self._timed_fetch, a, method, market) for a in adapters}
+        results = {}
+        deadline = time.monotonic() + self.timeout
+        for name, future in futures.items():
+            try:
+                results[name] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except Exception:
+                logger.warning(f"{name} did not answer {method} within {self.timeout}s, skipped.")
+                results[name] = None
+        # 不等待超时的请求结束
+        executor.shutdown(wait=False)
+        return results
+
+    def snapshot(self, market="spot", frames=None):
+        """
+        :param frames: 已拉取的 {venue: DataFrame}，这些交易所不再重复请求
+        :return: merge_venues 的结果
+        """
+        frames = dict(frames or {})
+        frames.update(self.fetch(market, exclude=frames.keys()))
+        return merge_venues(frames, primary=self.primary)
+
+
+def attach_cross_venue(df, cross):
+    """
+    把跨交易所汇总列加到 tickers DataFrame (TICKER_COLUMNS 格式) 上，按 symbol 匹配
+    :return: 新的 DataFrame
+    """
+    if cross is None or cross.empty:
+        return df
+    keys = df['symbol'].astype(str)
+    return df.assign(**{col: keys.map(cross[col]).to_numpy(dtype='float64') for col in CROSS_VENUE_COLUMNS})
+
+
+def format_cross_venue_fields(row):
+    """返回某一行的跨交易所描述 (只在至少两个交易所有报价时输出)，否则返回空字符串"""
+    venues = row.get('venues')
+    if venues is None or pd.isna(venues) or venues < 2:
+        return ""
+    fields = f"Venues: {int(venues)}, XV Vol(USDT): {row['xv_vol_usdt']:.0f}, XV Dispersion: {row['xv_dispersion_bps']:.1f}bps"
+    if not pd.isna(row.get('primary_vol_share')):
+        fields += f", Primary Vol Share: {row['primary_vol_share']:.0%}"
+    return fields
@@ -1,6 +1,7 @@
 import requests
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 try:
     from config.settings import CRYPTOPANIC_API_KEY
 except ImportError:
@@ -36,52 +37,88 @@ class NewsClient:
         # 查阅 CryptoPanic 文档，filter 只有 rising, hot, bullish, bearish, important, saved, lol.
         # 所以我们可以改用 filter="important" 或者是 "hot"
         
+        # 同时并发请求 important 和 hot，important 为空时直接使用 hot 的结果，
+        # 避免原先"先请求 important、为空再串行请求 hot"的两次往返
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            important_future = executor.submit(self.fetch_posts, "important", currencies)
+            hot_future = executor.submit(self.fetch_posts, "hot", currencies)
+            results = important_future.result()
+            if not results:
+                logger.info("No important news found, falling back to hot news...")
+                results = hot_future.result()
+
+        return results[:limit]
+
+    def fetch_posts(self, filter="important", currencies=None, since_id=None, max_pages=1):
+        """
+        按分页拉取新闻，遇到 since_id (含) 之前的帖子即停止
+        :return: 预处理后的新闻列表 (新 -> 旧)，参数见 fetch_pages
+        """
+        return self.fetch_pages(filter, currencies, since_id, max_pages)[0]
+
+    def fetch_pages(self, filter="important", currencies=None, since_id=None, max_pages=1, page=1):
+        """
+        按分页拉取新闻，遇到 since_id (含) 之前的帖子即停止
+        CryptoPanic 的帖子按发布时间倒序排列，id 单调递增
+        :param filter: 新闻过滤器 (important / hot / rising ...)
+        :param currencies: 币种代码列表
+        :param since_id: 上次已见过的最大帖子 id，None 表示只取第一页
+        :param max_pages: 最多翻页数
+        :param page: 起始页码 (从 1 开始)，用于接着上次未拉完的位置继续
+        :return: (预处理后的新闻列表 (新 -> 旧), 下次应继续的页码)；
+                 已到达 since_id 或没有更多页时页码为 None，翻页数用完或请求出错时为未拉取的第一页
+        """
+        if not self.api_key:
+            return [], None
+
         params = {
             "auth_token": self.api_key,
-            "filter": "important", # 改为 important，只看重要新闻
+            "filter": filter,
             "public": "true",
             "kind": "news" # 只看新闻，过滤掉纯媒体内容
         }
-        
         if currencies:
             params["currencies"] = ",".join(currencies)
 
+        posts = []
+        resume = page
         try:
-            logger.info(f"Fetching news from CryptoPanic (filter={params['filter']})...")
-            response = requests.get(self.base_url, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
-            results = data.get('results', [])
-            
-            # 如果 important 没数据，降级为 hot
-            if not results and params['filter'] == 'important':
-                logger.info("No important news found, falling back to hot news...")
-                params['filter'] = 'hot'
-                response = requests.get(self.base_url, params=params, timeout=10)
+            for current in range(page, page + max_pages):
+                logger.info(f"Fetching news from CryptoPanic (filter={filter}, page={current})...")
+                page_params = dict(params, page=current) if current > 1 else params
+                response = requests.get(self.base_url, params=page_params, timeout=10)
+                response.raise_for_status()
                 data = response.json()
-                results = data.get('results', [])
 
-            # 简单的预处理
-            processed_news = []
-            for item in results[:limit]:
-                # 增加 source 信息，辅助 AI 判断价值
-                source_title = item.get("source", {}).get("title", "Unknown")
-                
-                news_item = {
-                    "id": item.get("id"),
-                    "title": item.get("title"),
-                    "domain": item.get("domain"),
-                    "source": source_title, # 新增来源
-                    "votes": item.get("votes", {}), # 新增投票数据 (bullish/bearish/important)
-                    "published_at": item.get("published_at"),
-                    "url": item.get("url"),
-                    "currencies": [c['code'] for c in item.get("currencies", []) if 'code' in c]
-                }
-                processed_news.append(news_item)
-                
-            return processed_news
-            
+                reached_seen = False
+                for item in data.get('results', []):
+                    if since_id is not None and item.get("id") is not None and item["id"] <= since_id:
+                        reached_seen = True
+                        break
+                    posts.append(self._process_item(item))
+
+                resume = current + 1
+                if reached_seen or not data.get('next') or since_id is None:
+                    resume = None
+                    break
         except Exception as e:
-            logger.error(f"Failed to fetch news: {e}")
-            return []
+            logger.error(f"Failed to fetch news ({filter}): {e}")
+
+        return posts, resume
+
+    @staticmethod
+    def _process_item(item):
+        """简单的预处理"""
+        # 增加 source 信息，辅助 AI 判断价值
+        source_title = item.get("source", {}).get("title", "Unknown")
+
+        return {
+            "id": item.get("id"),
+            "title": item.get("title"),
+            "domain": item.get("domain"),
+            "source": source_title, # 新增来源
+            "votes": item.get("votes", {}), # 新增投票数据 (bullish/bearish/important)
+            "published_at": item.get("published_at"),
+            "url": item.get("url"),
+            "currencies": [c['code'] for c in item.get("currencies", []) if 'code' in c]
+        }
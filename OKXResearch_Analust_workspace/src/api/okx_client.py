@@ -1,13 +1,83 @@
-import requests
+import numpy as np
 import pandas as pd
 import os
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from utils.rate_limiter import get_okx_rate_limiter
+from utils.http_transport import HedgedTransport
+from config.settings import OKX_BACKUP_URLS, OKX_HEDGE_PERCENTILE
 
 load_dotenv()
 
 logger = logging.getLogger("okx_client")
 
+# OKX 限频错误码: 50011 (请求过于频繁), 50061 (子账户限频)
+RATE_LIMIT_CODES = {"50011", "50061"}
+
+# tickers 接口的列 schema：只保留后续流程会用到的列，并直接解析为紧凑类型
+# 未列出的列 (instType, lastSz, sodUtc0, sodUtc8 等) 会被丢弃
+TICKER_SCHEMA = {
+    'instId': 'category',
+    'last': 'float64',
+    'open24h': 'float64',
+    'high24h': 'float64',
+    'low24h': 'float64',
+    'volCcy24h': 'float64',
+    'vol24h': 'float64',
+    'bidPx': 'float64',
+    'askPx': 'float64',
+    'bidSz': 'float32',
+    'askSz': 'float32',
+    'ts': 'int64',  # 毫秒时间戳
+}
+
+
+def parse_tickers(records, inst_type="SPOT"):
+    """
+    将 tickers 接口返回的 JSON 列表按 TICKER_SCHEMA 解析为类型化 DataFrame
+    每列只做一次转换，不经过全字符串 (object) 的中间 DataFrame
+    :param records: 接口返回的 data 列表
+    :param inst_type: 产品类型，SPOT 时只保留 USDT 交易对
+    :return: DataFrame
+    """
+    # 如果是 SPOT，只保留 USDT 交易对 (在建表前过滤，减少后续转换量)
+    if inst_type == "SPOT":
+        records = [r for r in records if r.get('instId', '').endswith('-USDT')]
+
+    columns = {}
+    for col, dtype in TICKER_SCHEMA.items():
+        values = [r.get(col) for r in records]
+        if dtype == 'category':
+            columns[col] = pd.Categorical(values)
+        elif dtype == 'int64':
+            # 空字符串等无效值记为 0
+            numeric = pd.to_numeric(values, errors='coerce')
+            columns[col] = np.nan_to_num(numeric, nan=0).astype('int64')
+        else:
+            columns[col] = pd.to_numeric(values, errors='coerce').astype(dtype)
+
+    return pd.DataFrame(columns)
+
+
+# 进程内共享的传输层 (按主机列表缓存)，使延迟直方图和熔断状态跨 OKXClient 实例累积
+_transports = {}
+_transports_lock = threading.Lock()
+
+
+def get_okx_transport(base_url):
+    """
+    获取以 base_url 为主主机、OKX_BACKUP_URLS 为备用主机的共享传输层
+    """
+    hosts = [base_url.rstrip('/')] + [u.rstrip('/') for u in OKX_BACKUP_URLS if u.rstrip('/') != base_url.rstrip('/')]
+    key = tuple(hosts)
+    with _transports_lock:
+        if key not in _transports:
+            _transports[key] = HedgedTransport(hosts, hedge_percentile=OKX_HEDGE_PERCENTILE)
+        return _transports[key]
+
+
 class OKXClient:
     def __init__(self):
         # 允许从环境变量覆盖 BASE_URL，默认使用官方地址
@@ -18,6 +88,49 @@ class OKXClient:
             # 模拟浏览器 User-Agent 以避免部分反爬
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
         }
+        # 进程内共享的按接口限频器，并发调用者自动按允许的最高速率排队
+        self.rate_limiter = get_okx_rate_limiter()
+        # 多主机传输层：主主机过慢时向备用主机 (如 https://aws.okx.com) 发出对冲请求，连续失败的主机会被熔断
+        self.transport = get_okx_transport(self.base_url)
+
+    def _get(self, endpoint, params=None, timeout=15, max_retries=2):
+        """
+        带限频的 GET 请求
+        遇到 429 或限频错误码时降低该接口速率并重试
+        :return: 解析后的 JSON (dict)
+        """
+        for attempt in range(max_retries + 1):
+            self.rate_limiter.acquire(endpoint)
+            response = self.transport.get(endpoint, params=params, headers=self.headers, timeout=timeout)
+
+            throttled = response.status_code == 429
+            data = None
+            if not throttled:
+                response.raise_for_status()
+                data = response.json()
+                throttled = data.get('code') in RATE_LIMIT_CODES
+
+            if not throttled:
+                self.rate_limiter.report_success(endpoint)
+                return data
+
+            retry_after = response.headers.get("Retry-After") if response.headers else None
+            try:
+                retry_after = float(retry_after) if retry_after else None
+            except ValueError:
+                retry_after = None
+            self.rate_limiter.report_throttled(endpoint, retry_after)
+            logger.warning(f"OKX rate limit hit on {endpoint} (attempt {attempt + 1}/{max_retries + 1}).")
+
+        raise RuntimeError(f"OKX rate limit exceeded on {endpoint} after {max_retries + 1} attempts")
+
+    def rate_limit_metrics(self):
+        """返回各接口的限频等待指标"""
+        return self.rate_limiter.metrics()
+
+    def transport_stats(self):
+        """返回各主机的延迟直方图、熔断状态及对冲次数"""
+        return self.transport.stats()
 
     def get_tickers(self, instType="SPOT"):
         """
@@ -26,28 +139,15 @@ class OKXClient:
         :return: DataFrame
         """
         endpoint = "/api/v5/market/tickers"
-        url = f"{self.base_url}{endpoint}"
         params = {'instType': instType}
         
         try:
-            logger.debug(f"Fetching data from {url}...")
-            response = requests.get(url, params=params, headers=self.headers, timeout=15)
-            response.raise_for_status()
-            data = response.json()
+            logger.debug(f"Fetching {instType} tickers from {self.base_url}{endpoint}...")
+            data = self._get(endpoint, params=params, timeout=15)
             
             if data['code'] == '0':
-                df = pd.DataFrame(data['data'])
-                # 简单的数据清洗
-                numeric_cols = ['last', 'open24h', 'high24h', 'low24h', 'volCcy24h', 'vol24h']
-                for col in numeric_cols:
-                    if col in df.columns:
-                        df[col] = pd.to_numeric(df[col], errors='coerce')
-                
-                # 如果是 SPOT，只保留 USDT 交易对
-                if instType == "SPOT":
-                    df = df[df['instId'].str.endswith('-USDT')]
-                
-                return df
+                # 按 schema 直接解析为紧凑的类型化 DataFrame
+                return parse_tickers(data['data'], instType)
             else:
                 logger.error(f"Error from OKX API: {data.get('msg')}")
                 return None
@@ -55,10 +155,22 @@ class OKXClient:
             logger.error(f"Exception during request: {e}")
             return None
 
-    def get_funding_rates(self):
+    def get_tickers_multi(self, inst_types=("SPOT", "SWAP", "FUTURES")):
+        """
+        并发获取多个市场的 tickers (每个市场一次批量请求)
+        :param inst_types: 产品类型列表，如 SPOT / SWAP / FUTURES
+        :return: 字典 {instType: DataFrame 或 None}
+        """
+        with ThreadPoolExecutor(max_workers=len(inst_types)) as executor:
+            futures = {t: executor.submit(self.get_tickers, t) for t in inst_types}
+        return {t: f.result() for t, f in futures.items()}
+
+    def get_funding_rates(self, inst_ids=None):
         """
         获取所有永续合约的资金费率
         使用 SWAP 市场的 tickers 接口，通常包含 fundingRate 信息
+        :param inst_ids: 永续合约列表，默认取几个主流币作为市场风向标
+        :return: 字典 {'BTC-USDT': 0.01, ...} (百分比)
         """
         endpoint = "/api/v5/public/funding-rate"
         # 注意：public/funding-rate 需要具体的 instId，不能批量获取所有
@@ -93,23 +205,115 @@ class OKXClient:
         # 实际上，我们可以尝试一次性获取 SWAP 的 tickers，虽然没有 fundingRate，
         # 但我们可以挑选出成交量最大的几个，然后专门去查它们的 fundingRate。
         
+        target_coins = inst_ids or ["BTC-USDT-SWAP", "ETH-USDT-SWAP", "SOL-USDT-SWAP", "DOGE-USDT-SWAP"]
+
+        # 并发请求，由限频器统一控制速率
         rates = {}
-        target_coins = ["BTC-USDT-SWAP", "ETH-USDT-SWAP", "SOL-USDT-SWAP", "DOGE-USDT-SWAP"]
-        
-        for inst_id in target_coins:
+        with ThreadPoolExecutor(max_workers=min(8, len(target_coins))) as executor:
+            results = executor.map(self._get_funding_rate, target_coins)
+            for inst_id, rate in zip(target_coins, results):
+                if rate is not None:
+                    # 存入字典: {'BTC-USDT': 0.01}
+                    rates[inst_id.replace("-SWAP", "")] = rate
+
+        return rates
+
+    def get_all_funding_rates(self):
+        """
+        一次请求获取全部 USDT 本位永续合约的资金费率 (instId=ANY)，供全市场异动筛选使用
+        :return: 字典 {'BTC-USDT': 0.01, ...} (百分比)，失败返回空字典
+        """
+        try:
+            d = self._get("/api/v5/public/funding-rate", params={'instId': 'ANY'}, timeout=10)
+            if d['code'] != '0':
+                logger.warning(f"Failed to fetch all funding rates: {d.get('msg')}")
+                return {}
+        except Exception as e:
+            logger.warning(f"Failed to fetch all funding rates: {e}")
+            return {}
+
+        rates = {}
+        for item in d['data']:
+            inst_id = item.get('instId', '')
+            if not inst_id.endswith("-USDT-SWAP"):
+                continue
             try:
-                url = f"{self.base_url}/api/v5/public/funding-rate"
-                params = {'instId': inst_id}
-                res = requests.get(url, params=params, headers=self.headers, timeout=5)
-                if res.status_code == 200:
-                    d = res.json()
-                    if d['code'] == '0' and d['data']:
-                        # fundingRate: "0.0001"
-                        rate = float(d['data'][0]['fundingRate']) * 100 # 转为百分比
-                        # 存入字典: {'BTC-USDT': 0.01}
-                        spot_id = inst_id.replace("-SWAP", "")
-                        rates[spot_id] = rate
-            except Exception:
+                rates[inst_id.replace("-SWAP", "")] = float(item['fundingRate']) * 100
+            except (KeyError, TypeError, ValueError):
                 continue
-        
         return rates
+
+    def get_order_books(self, inst_ids, depth=200, max_workers=8):
+        """
+        并发获取多个交易对的订单簿快照，由限频器统一控制速率
+        :param inst_ids: 交易对列表，如 ['BTC-USDT', 'ETH-USDT']
+        :param depth: 每侧档位数 (OKX 上限 400)
+        :return: 字典 {instId: {"bids": [[px, sz, ...], ...], "asks": [...]}}，失败的交易对不包含在内
+        """
+        inst_ids = list(inst_ids)
+        if not inst_ids:
+            return {}
+
+        books = {}
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(inst_ids))) as executor:
+            results = executor.map(lambda inst_id: self._get_order_book(inst_id, depth), inst_ids)
+            for inst_id, book in zip(inst_ids, results):
+                if book is not None:
+                    books[inst_id] = book
+        return books
+
+    def _get_order_book(self, inst_id, depth):
+        """获取单个交易对的订单簿，失败返回 None"""
+        try:
+            d = self._get("/api/v5/market/books", params={'instId': inst_id, 'sz': str(depth)}, timeout=5)
+            if d['code'] == '0' and d['data']:
+                return d['data'][0]
+            logger.warning(f"No order book for {inst_id}: {d.get('msg')}")
+        except Exception as e:
+            logger.warning(f"Failed to fetch order book for {inst_id}: {e}")
+        return None
+
+    def get_candles(self, inst_id, bar="1H", limit=100):
+        """
+        获取 K 线
+        :param bar: 周期，如 1m / 15m / 1H / 4H / 1D
+        :return: 接口返回的 data 列表 (新 -> 旧)，每根为 [ts, o, h, l, c, vol, volCcy, volCcyQuote, confirm]；失败返回 None
+        """
+        try:
+            d = self._get("/api/v5/market/candles", params={'instId': inst_id, 'bar': bar, 'limit': str(limit)}, timeout=10)
+            if d['code'] == '0':
+                return d['data']
+            logger.warning(f"No candles for {inst_id}: {d.get('msg')}")
+        except Exception as e:
+            logger.warning(f"Failed to fetch candles for {inst_id}: {e}")
+        return None
+
+    def get_candles_multi(self, limits, bar="1H", max_workers=8):
+        """
+        并发获取多个交易对的 K 线，由限频器统一控制速率
+        :param limits: {instId: limit}，每个交易对拉取的根数可以不同 (如增量更新时只拉取新收盘的 K 线)
+        :return: 字典 {instId: K 线列表 (新 -> 旧)}，失败的交易对不包含在内
+        """
+        inst_ids = list(limits)
+        if not inst_ids:
+            return {}
+
+        candles = {}
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(inst_ids))) as executor:
+            results = executor.map(lambda inst_id: self.get_candles(inst_id, bar=bar, limit=limits[inst_id]), inst_ids)
+            for inst_id, rows in zip(inst_ids, results):
+                if rows:
+                    candles[inst_id] = rows
+        return candles
+
+    def _get_funding_rate(self, inst_id):
+        """获取单个永续合约的资金费率 (百分比)，失败返回 None"""
+        try:
+            d = self._get("/api/v5/public/funding-rate", params={'instId': inst_id}, timeout=5)
+            if d['code'] == '0' and d['data']:
+                # fundingRate: "0.0001"
+                return float(d['data'][0]['fundingRate']) * 100 # 转为百分比
+            logger.warning(f"No funding rate for {inst_id}: {d.get('msg')}")
+        except Exception as e:
+            logger.warning(f"Failed to fetch funding rate for {inst_id}: {e}")
+        return None
@@ -0,0 +1,121 @@
+import sys
+import os
+import argparse
+import datetime
+import re
+
+# 将 src 目录和项目根目录添加到 Python 路径
+src_path = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(src_path)
+sys.path.append(src_path)
+sys.path.append(project_root)
+
+from utils.run_archive import RunArchive
+from config.settings import RUN_ARCHIVE_PATH
+from rich.console import Console
+from rich.markdown import Markdown
+from rich.panel import Panel
+from rich.table import Table
+
+console = Console()
+
+
+def parse_time(value):
+    """
+    解析时间参数，支持:
+    - 相对时间: 30m / 24h / 7d
+    - 绝对时间: 2025-12-23 或 "2025-12-23 08:00"
+    :return: epoch 秒
+    """
+    if value is None:
+        return None
+    match = re.fullmatch(r"(\d+)([mhd])", value.strip())
+    if match:
+        amount, unit = int(match.group(1)), match.group(2)
+        delta = {"m": datetime.timedelta(minutes=amount),
+                 "h": datetime.timedelta(hours=amount),
+                 "d": datetime.timedelta(days=amount)}[unit]
+        return (datetime.datetime.now() - delta).timestamp()
+    for fmt in ("%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return datetime.datetime.strptime(value, fmt).timestamp()
+        except ValueError:
+            continue
+    raise argparse.ArgumentTypeError(f"Invalid time: {value}")
+
+
+def format_ts(ts):
+    return datetime.datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S') if ts else "-"
+
+
+def cmd_list(archive, args):
+    runs = archive.query(since=args.since, until=args.until, symbol=args.symbol,
+                         keyword=args.keyword, status=args.status, limit=args.limit)
+    table = Table(title=f"Archived runs ({len(runs)})")
+    for col in ("ID", "Started", "Status", "Model", "Query", "Duration", "Tokens"):
+        table.add_column(col)
+    for run in runs:
+        duration = run["finished_at"] - run["started_at"] if run["finished_at"] else None
+        table.add_row(
+            str(run["id"]),
+            format_ts(run["started_at"]),
+            run["status"] or "-",
+            run["model"] or "-",
+            (run["user_query"] or "默认分析")[:30],
+            f"{duration:.1f}s" if duration is not None else "-",
+            str((run["usage"] or {}).get("total_tokens", "-")),
+        )
+    console.print(table)
+
+
+def cmd_show(archive, args):
+    run = archive.get(args.run_id)
+    if run is None:
+        console.print(f"[bold red]Run {args.run_id} not found.[/bold red]")
+        return 1
+
+    console.print(f"[bold]Run #{run['id']}[/bold]  {format_ts(run['started_at'])}  "
+                  f"status={run['status']}  model={run['model']}  snapshot={run['snapshot_ref']}")
+    console.print(f"Symbols: {', '.join(run['symbols']) or '-'}")
+    console.print(f"Timings: {run['timings']}")
+    console.print(f"Usage: {run['usage']}")
+    if args.prompt and run["prompt"]:
+        console.print(Panel(run["prompt"], title="Prompt", border_style="yellow"))
+    if run["report"]:
+        console.print(Panel(Markdown(run["report"]), title="📊 Report", border_style="blue"))
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="查询历史分析报告存档")
+    parser.add_argument("--db", default=str(RUN_ARCHIVE_PATH), help="存档数据库路径")
+    sub = parser.add_subparsers(dest="command")
+
+    list_parser = sub.add_parser("list", help="按时间 / 币种 / 关键词列出历史运行")
+    list_parser.add_argument("--since", type=parse_time, help="起始时间，如 7d、24h 或 2025-12-23")
+    list_parser.add_argument("--until", type=parse_time, help="结束时间")
+    list_parser.add_argument("--symbol", help="报告中提及的币种，如 BTC")
+    list_parser.add_argument("--keyword", help="报告 / prompt / 用户问题中的关键词")
+    list_parser.add_argument("--status", help="运行状态，如 ok / skipped / error")
+    list_parser.add_argument("--limit", type=int, default=20)
+
+    show_parser = sub.add_parser("show", help="显示某次运行的完整报告")
+    show_parser.add_argument("run_id", type=int)
+    show_parser.add_argument("--prompt", action="store_true", help="同时显示发送给 LLM 的 prompt")
+
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.print_help()
+        return 0
+
+    archive = RunArchive(args.db)
+    try:
+        if args.command == "list":
+            return cmd_list(archive, args) or 0
+        return cmd_show(archive, args)
+    finally:
+        archive.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
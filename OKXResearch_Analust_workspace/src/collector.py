@@ -0,0 +1,63 @@
+import sys
+import os
+import argparse
+import time
+
+# 将 src 目录和项目根目录添加到 Python 路径
+src_path = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(src_path)
+sys.path.append(src_path)
+sys.path.append(project_root)
+
+from api.okx_client import OKXClient
+from utils.price_ring import PriceRingWriter
+from utils.logger import setup_logger, shutdown_logging
+from config.settings import LOG_DIR, LOG_QUEUE, LOG_FORMAT, PRICE_RING_PATH, PRICE_RING_SLOTS, PRICE_RING_MAX_INSTRUMENTS, PRICE_RING_INTERVAL
+import logging
+
+setup_logger(name=None, log_file=LOG_DIR / "collector.log", queued=LOG_QUEUE, json_format=(LOG_FORMAT == "json"))
+logger = logging.getLogger("collector")
+
+
+def run_collector(path=PRICE_RING_PATH, interval=PRICE_RING_INTERVAL, slots=PRICE_RING_SLOTS,
+                  max_instruments=PRICE_RING_MAX_INSTRUMENTS, iterations=None):
+    """
+    单一采集进程：定时拉取 SPOT tickers 写入共享的环形缓冲区
+    其他进程 (分析、告警、看板) 通过 PriceRingReader 读取，无需各自请求 OKX
+    :param iterations: 采集轮数，None 表示一直运行
+    """
+    okx = OKXClient()
+    writer = PriceRingWriter(path, slots=slots, max_instruments=max_instruments)
+    logger.info(f"Price collector started: {path} ({slots} slots, every {interval}s)")
+
+    count = 0
+    while iterations is None or count < iterations:
+        start = time.monotonic()
+        df = okx.get_tickers()
+        if df is not None and not df.empty:
+            seq = writer.write(df)
+            logger.debug(f"Snapshot #{seq}: {len(df)} tickers")
+        else:
+            logger.warning("Empty tickers response, snapshot skipped.")
+        count += 1
+        if iterations is None or count < iterations:
+            time.sleep(max(0.0, interval - (time.monotonic() - start)))
+    writer.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="行情采集进程：写入共享内存环形缓冲区")
+    parser.add_argument("--path", default=str(PRICE_RING_PATH))
+    parser.add_argument("--interval", type=float, default=PRICE_RING_INTERVAL, help="采集间隔 (秒)")
+    parser.add_argument("--iterations", type=int, default=None, help="采集轮数，默认一直运行")
+    args = parser.parse_args(argv)
+    try:
+        run_collector(args.path, args.interval, iterations=args.iterations)
+    except KeyboardInterrupt:
+        logger.info("Price collector stopped.")
+    finally:
+        shutdown_logging()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,5 @@
 import sys
 import os
-import pandas as pd
 
 # 将 src 目录和项目根目录添加到 Python 路径
 src_path = os.path.dirname(os.path.abspath(__file__))
@@ -9,17 +8,54 @@ sys.path.append(src_path)
 sys.path.append(project_root)
 
 from api.okx_client import OKXClient
-from api.llm_client import LLMClient
+from api.llm_client import LLMClient, get_llm_router
+from api.llm_ensemble import LLMEnsemble
+from api.exchange_adapter import OKXAdapter, create_adapters, funding_map
+from api.multi_venue import MultiVenueAggregator, attach_cross_venue, format_cross_venue_fields
 from analysis.fundamental import FundamentalAnalyzer
 from analysis.technical import calculate_change
+from analysis.market_snapshot import build_market_snapshot, format_snapshot_fields
+from analysis.sector_aggregator import aggregate_sectors, format_sector_table
+from analysis.anomaly_screener import AnomalyScreener, format_anomaly_fields
+from analysis.liquidity import compute_liquidity_metrics, attach_liquidity, format_liquidity_fields
+from analysis.correlation import CorrelationEngine, attach_correlation, format_correlation_fields
+from analysis.change_detector import MaterialityGate
+from analysis.pre_analysis import run_pre_analysis
 from api.news_client import NewsClient
-from utils.logger import setup_logger
+from analysis.news_ingestor import NewsIngestor
+from analysis.news_index import NewsIndex
+from utils.logger import setup_logger, shutdown_logging
 from utils.notifier import Notifier
-from config.settings import LOG_DIR, ENABLE_SCHEDULER, SCHEDULE_TIME, SCHEDULE_INTERVAL, FEISHU_WEBHOOK_URL, DINGTALK_WEBHOOK_URL
+from utils.stage_timer import StageTimer
+from utils.run_archive import RunArchive
+from utils.price_ring import PriceRingReader
+from utils.profiler import RunProfiler
+from utils.status_server import RunStatus, StatusServer
+from utils.cassette import Cassette
+from config.settings import LOG_DIR, LOG_QUEUE, LOG_FORMAT, ENABLE_SCHEDULER, SCHEDULE_TIME, SCHEDULE_INTERVAL, FEISHU_WEBHOOK_URL, DINGTALK_WEBHOOK_URL
+from config.settings import NEWS_MAX_PAGES, NEWS_STORE_RETENTION, ENABLE_RUN_ARCHIVE, RUN_ARCHIVE_PATH
+from config.settings import ENABLE_LLM_ENSEMBLE, LLM_ENDPOINTS, PROMPT_TOP_N, ENABLE_SECTOR_SUMMARY, SECTOR_TABLE_TOP_N
+from config.settings import ENABLE_ANOMALY_SCREENER, ANOMALY_TOP_N, ANOMALY_MIN_VOLUME, ANOMALY_Z_THRESHOLD
+from config.settings import USE_PRICE_RING, PRICE_RING_PATH, PRICE_RING_INTERVAL
+from config.settings import ENABLE_LIQUIDITY_METRICS, ORDER_BOOK_DEPTH
+from config.settings import PROFILE_RUNS, PROFILE_INTERVAL
+from config.settings import ENABLE_STATUS_SERVER, STATUS_SERVER_HOST, STATUS_SERVER_PORT, STATUS_STALE_AFTER
+from config.settings import DATA_DIR, CASSETTE_PATH, CASSETTE_LATENCY
+from config.settings import EXCHANGE_VENUES, VENUE_TIMEOUT
+from config.settings import ENABLE_COMBINED_PRE_ANALYSIS, SERVICE_WORKERS
+from config.settings import ENABLE_CORRELATION, CORRELATION_BAR, CORRELATION_WINDOW, CORRELATION_CLUSTER_THRESHOLD
+from config.settings import (ENABLE_CHANGE_GATE, GATE_PRICE_CHANGE_PCT, GATE_RANK_CHURN, GATE_FUNDING_DELTA,
+                             GATE_MIN_NEW_HEADLINES, GATE_MAX_SKIPS)
 # 从根目录的 __init__.py 导入版本信息
 from src import __version__, __author__
+import argparse
+import concurrent.futures
 import datetime
+import hashlib
 import logging
+import shutil
+import tempfile
+import threading
 import schedule
 import time
 from rich.console import Console
@@ -31,7 +67,8 @@ log_file = LOG_DIR / "okx_research.log"
 
 # 配置 root logger，使其输出到文件和控制台
 # 注意：这里我们使用 name=None 来配置 root logger
-setup_logger(name=None, log_file=log_file)
+# LOG_QUEUE=true 时日志经队列交给后台线程写入，避免大段报告日志阻塞分析线程
+setup_logger(name=None, log_file=log_file, queued=LOG_QUEUE, json_format=(LOG_FORMAT == "json"))
 
 # 获取 main 模块的 logger
 logger = logging.getLogger("main")
@@ -39,6 +76,59 @@ logger = logging.getLogger("main")
 # 初始化 Rich Console
 console = Console()
 
+# 币种 -> 新闻 倒排索引，在定时任务的多轮之间常驻内存并增量更新
+coin_news_index = None
+
+# 全市场异动筛选器，常驻内存以累积各交易对的成交额基线
+anomaly_screener = None
+
+# BTC 联动 (Beta / 相关性) 引擎，常驻内存以增量更新滚动协方差
+correlation_engine = None
+
+# 多模型集成分析器，常驻内存以便跨轮累计各模型的延迟与一致度统计 (分析服务中被多个 worker 共享)
+llm_ensemble = None
+_ensemble_lock = threading.Lock()
+
+# 跨交易所行情聚合器 (EXCHANGE_VENUES 配置了 OKX 之外的交易所时创建)
+venue_aggregator = None
+
+def get_venue_aggregator():
+    """返回跨交易所聚合器；只配置了 OKX 时返回 None"""
+    global venue_aggregator
+    if venue_aggregator is None and [v for v in EXCHANGE_VENUES if v != OKXAdapter.name]:
+        # OKX 行情由主流程自行拉取，聚合器只请求其他交易所
+        adapters = create_adapters(v for v in EXCHANGE_VENUES if v != OKXAdapter.name)
+        if adapters:
+            venue_aggregator = MultiVenueAggregator(adapters, primary=OKXAdapter.name, timeout=VENUE_TIMEOUT)
+    return venue_aggregator
+
+# 本地新闻存储路径，None 为默认的 data/news_store.json (回放磁带时指向临时副本)
+news_store_path = None
+
+def get_analyst(llm):
+    """返回市场分析使用的模型：启用集成且配置了额外端点时为 LLMEnsemble，否则为单个 LLMClient"""
+    global llm_ensemble
+    if not (ENABLE_LLM_ENSEMBLE and LLM_ENDPOINTS and llm.api_key):
+        return llm
+    with _ensemble_lock:
+        if llm_ensemble is None:
+            llm_ensemble = LLMEnsemble.from_settings(concurrency=SERVICE_WORKERS)
+    return llm_ensemble
+
+def run_analyst(analyst, llm, *args, **kwargs):
+    """
+    执行市场分析
+    :return: (报告, prompt, 实际应答的端点, 集成分析各模型本轮状态, 集成分析本轮用量)；单个模型时后两项为 {} / None
+    (集成分析器被多个任务共享，本轮信息取自返回值而非实例属性)
+    """
+    if analyst is llm:
+        analysis = llm.analyze_market(*args, **kwargs)
+        return analysis, llm.last_analysis_prompt, llm.served_by, {}, None
+    result = analyst.analyze_market_round(*args, **kwargs)
+    # 集成分析记录本轮成功返回报告的各端点
+    served_by = "+".join(s["served_by"] for s in result["round"].values() if s["status"] == "ok")
+    return result["report"], result["prompt"], served_by, result["round"], result["usage"]
+
 def print_welcome():
     """打印启动欢迎信息"""
     # 记录到日志文件
@@ -54,31 +144,51 @@ def print_welcome():
         border_style="green"
     ))
 
-def format_data_for_llm(df, analyzer, funding_rates=None, top_n=20):
+def load_spot_from_ring():
     """
-    将 DataFrame 格式化为 LLM 易读的字符串，并补充赛道信息
+    从采集进程维护的共享环形缓冲区读取最新现货行情
+    :return: TICKER_COLUMNS 格式的 DataFrame；未启用、缓冲区不存在或数据过期 (超过 3 个采集间隔) 时返回 None
+    """
+    if not USE_PRICE_RING:
+        return None
+    try:
+        reader = PriceRingReader(PRICE_RING_PATH)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Price ring unavailable ({e}), falling back to OKX API.")
+        return None
+    age = reader.age()
+    if age is None or age > PRICE_RING_INTERVAL * 3:
+        logger.warning(f"Price ring is stale (age: {age}), falling back to OKX API.")
+        return None
+    logger.info(f"Using spot tickers from price ring (seq {reader.seq}, {age:.1f}s old).")
+    # 缓冲区按 OKX 原始字段存储 (采集进程与告警共用)，读出后转换为内部 schema
+    return OKXAdapter.normalize_tickers(reader.to_frame(), "spot")
+
+def format_data_for_llm(df, analyzer, funding_rates=None, top_n=20, snapshot=None, news_index=None, extra_fields=None):
+    """
+    将 tickers DataFrame (ExchangeAdapter 的 TICKER_COLUMNS 格式) 格式化为 LLM 易读的字符串，并补充赛道信息
+    :param snapshot: build_market_snapshot 生成的多市场快照 (可选)，用于补充基差等衍生品信息
+    :param news_index: NewsIndex 实例 (可选)，用于补充每个币种的新闻条数与情绪
+    :param extra_fields: {symbol: 附加描述} (可选)，追加到对应币种行末，如异动标记
     """
     if funding_rates is None:
         funding_rates = {}
 
-    # 确保 volCcy24h 是数值类型
-    df['volCcy24h'] = pd.to_numeric(df['volCcy24h'], errors='coerce')
-    
     # 按成交额排序
-    df_sorted = df.sort_values(by='volCcy24h', ascending=False).head(top_n)
+    df_sorted = df.sort_values(by='quote_volume', ascending=False).head(top_n)
     
     summary = []
     for _, row in df_sorted.iterrows():
         try:
             last_price = float(row['last'])
-            open_price = float(row['open24h'])
-            vol = float(row['volCcy24h'])
+            open_price = float(row['open_24h'])
+            vol = float(row['quote_volume'])
             
             # 使用 technical 模块计算涨跌幅
             change_pct = calculate_change(last_price, open_price)
             
             # 获取赛道信息
-            inst_id = row['instId']
+            inst_id = row['symbol']
             # 使用传入的 analyzer 实例，利用其缓存
             sector = analyzer.get_coin_sector(inst_id)
             
@@ -93,6 +203,34 @@ def format_data_for_llm(df, analyzer, funding_rates=None, top_n=20):
             if inst_id in funding_rates:
                 fr = funding_rates[inst_id]
                 line += f", Funding Rate: {fr:.4f}%"
+
+            # 补充衍生品上下文 (基差、永续成交占比等)
+            deriv_fields = format_snapshot_fields(snapshot, inst_id)
+            if deriv_fields:
+                line += f", {deriv_fields}"
+
+            # 补充该币种的新闻热度与情绪 (倒排索引 O(1) 查询)
+            coin_news = news_index.get(inst_id) if news_index is not None else None
+            if coin_news:
+                line += f", News: {coin_news['count']} (sentiment {coin_news['sentiment']:+.2f})"
+
+            # 补充订单簿流动性 (价差、深度、买卖失衡)
+            liquidity_fields = format_liquidity_fields(row)
+            if liquidity_fields:
+                line += f", {liquidity_fields}"
+
+            # 补充 BTC Beta、扣除 BTC 影响后的特异涨跌与联动分组
+            correlation_fields = format_correlation_fields(row)
+            if correlation_fields:
+                line += f", {correlation_fields}"
+
+            # 补充跨交易所成交额与价差
+            venue_fields = format_cross_venue_fields(row)
+            if venue_fields:
+                line += f", {venue_fields}"
+
+            if extra_fields and inst_id in extra_fields:
+                line += f", {extra_fields[inst_id]}"
             
             summary.append(line)
         except ValueError:
@@ -100,119 +238,466 @@ def format_data_for_llm(df, analyzer, funding_rates=None, top_n=20):
             
     return "\n".join(summary)
 
-def run_analysis_task(user_query=""):
+def prepare_analysis_inputs(llm, timer, record, gate=None):
     """
-    执行一次完整的分析任务：抓取 -> 预处理 -> 分析 -> 展示/通知
+    分析任务的阶段 1-2：拉取行情 / 资金费率 / 新闻，异动筛选、流动性采样、LLM 预分析与格式化
+    :param llm: LLMClient，用于新闻验证等预分析
+    :param timer: StageTimer，记录各阶段耗时
+    :param record: 运行记录，数据为空或被闸门跳过时写入 status，结束时写入缓存统计与预分析用量
+    :param gate: MaterialityGate 实例 (可选)
+    :return: 分析输入 {summary, sector_summary, news, universe, decision, text, snapshot_ref, created_at}；
+             数据为空或被闸门跳过时返回 None
     """
+    global coin_news_index, anomaly_screener, correlation_engine
+    fundamental = None
+    news_ingestor = None
     try:
-        logger.info("Starting analysis task...")
-        
         okx = OKXClient()
-        llm = LLMClient()
+        # 行情统一经适配器转换为交易所无关的内部 schema
+        market = OKXAdapter(okx)
         news = NewsClient()
-        
+        news_ingestor = NewsIngestor(news, store_path=news_store_path, max_pages=NEWS_MAX_PAGES,
+                                     retention=NEWS_STORE_RETENTION)
+
         # 1. 获取数据
-        logger.info("Fetching market data from OKX...")
-        df = okx.get_tickers()
+        # 并发拉取 SPOT / SWAP / FUTURES 三个市场，合并为多市场快照
+        with timer.stage("fetch_market"), concurrent.futures.ThreadPoolExecutor(max_workers=1) as venue_pool:
+            # 其他交易所的现货行情与 OKX 并发拉取
+            aggregator = get_venue_aggregator()
+            venue_future = venue_pool.submit(aggregator.fetch, "spot") if aggregator else None
+            # 启用共享环形缓冲区时，现货行情直接读本地内存，只向 OKX 请求衍生品市场
+            df = load_spot_from_ring()
+            if df is not None:
+                market_frames = market.get_tickers_multi(("swap", "futures"))
+            else:
+                logger.info("Fetching market data from OKX (SPOT/SWAP/FUTURES)...")
+                market_frames = market.get_tickers_multi()
+                df = market_frames.get("spot")
+            snapshot = build_market_snapshot(df, market_frames.get("swap"), market_frames.get("futures"))
+            if venue_future is not None and df is not None:
+                frames = venue_future.result()
+                frames[market.name] = df
+                df = attach_cross_venue(df, aggregator.snapshot("spot", frames=frames))
+                for name, seconds in aggregator.last_latency.items():
+                    timer.durations[f"fetch_market:{name}"] = seconds
         
         # 1.1 获取资金费率 (作为大盘情绪参考)
         # 虽然这里只获取了部分主流币的费率，但对 AI 判断市场情绪很有用
-        logger.info("Fetching funding rates...")
-        funding_rates = okx.get_funding_rates()
+        with timer.stage("fetch_funding"):
+            logger.info("Fetching funding rates...")
+            funding_rates = funding_map(market.get_funding_rates())
+            # 异动筛选的资金费率因子需要全市场数据 (主流币都在成交额龙头中，会被排除在排名之外)
+            screen_funding = funding_rates
+            if ENABLE_ANOMALY_SCREENER:
+                screen_funding = {**funding_map(market.get_all_funding_rates()), **funding_rates}
+
+        # 记录限频等待情况，便于观察是否接近 OKX 限额
+        throttled = {ep: m for ep, m in okx.rate_limit_metrics().items() if m['waited'] or m['throttled']}
+        if throttled:
+            logger.info(f"OKX rate limiter stats: {throttled}")
+        transport = okx.transport_stats()
+        if transport["hedges"] or transport["failovers"]:
+            logger.info(f"OKX transport: {transport['hedges']} hedged requests ({transport['hedge_wins']} won), "
+                        f"{transport['failovers']} failovers.")
         
         # 1.2 获取新闻 (新增)
-        logger.info("Fetching latest crypto news...")
-        # 获取热门新闻，涵盖主流币
-        raw_news = news.get_latest_news(filter="hot", currencies=["BTC", "ETH", "SOL"], limit=5)
-        
-        # 1.3 LLM 验证新闻
-        verified_news = None
-        if raw_news and llm.api_key:
-            logger.info("Verifying news authenticity with AI...")
-            verified_news = llm.verify_and_analyze_news(raw_news)
+        with timer.stage("fetch_news"):
+            logger.info("Fetching latest crypto news...")
+            # 增量拉取全市场新闻，只翻页获取上次之后的新帖子
+            _, new_news = news_ingestor.fetch()
+            # 新闻情报区仍聚焦主流币
+            raw_news = news_ingestor.recent(currencies=["BTC", "ETH", "SOL"], limit=5)
+
+            # 更新币种新闻倒排索引：首次运行用本地存储的全部新闻初始化，之后只加入新帖子
+            if coin_news_index is None:
+                coin_news_index = NewsIndex()
+                coin_news_index.add(list(news_ingestor.store["posts"].values()), news_ingestor.store["verdicts"])
+            else:
+                coin_news_index.add(new_news)
         
         if df is None or df.empty:
             logger.error("Failed to fetch data or data is empty.")
-            return
+            record["status"] = "no_data"
+            return None
+
+        # 1.3 全市场异动筛选：每轮都运行，以持续更新成交额基线
+        anomalies = None
+        if ENABLE_ANOMALY_SCREENER:
+            with timer.stage("screen_anomalies"):
+                if anomaly_screener is None:
+                    anomaly_screener = AnomalyScreener(top_n=ANOMALY_TOP_N, min_volume=ANOMALY_MIN_VOLUME,
+                                                       z_threshold=ANOMALY_Z_THRESHOLD)
+                # 已在成交额 Top N 中的币种本来就会出现在 prompt 中
+                leaders = set(df.nlargest(PROMPT_TOP_N, 'quote_volume')['symbol'].astype(str))
+                anomalies = anomaly_screener.screen(df, screen_funding, exclude=leaders)
+            if not anomalies.empty:
+                logger.info(f"Anomalies outside top {PROMPT_TOP_N}: {', '.join(anomalies['symbol'])}")
+
+        # 1.4 变化检测：与上一次分析相比无显著变化时，跳过全部 LLM 调用
+        decision = None
+        if gate is not None:
+            decision = gate.evaluate(df, funding_rates, raw_news)
+            if not decision["material"]:
+                logger.info(f"No material change, skipping LLM analysis (skip rate: {gate.skip_rate:.0%}, "
+                            f"{gate.skips}/{gate.evaluations}).")
+                logger.info(decision["summary"])
+                console.print(Panel(decision["summary"], title="⏸️ Market Delta Summary", border_style="yellow"))
+                record["status"] = "skipped"
+                record["report"] = decision["summary"]
+                return None
+            logger.info(f"Material change detected: {'; '.join(decision['reasons'])}")
+
+        # 1.5 订单簿流动性：只对会进入 prompt 的币种 (成交额龙头 + 异动币种) 采样，
+        # 放在变化检测之后，跳过分析的轮次不发请求
+        if ENABLE_LIQUIDITY_METRICS:
+            with timer.stage("sample_books"):
+                sampled = df.nlargest(PROMPT_TOP_N, 'quote_volume')['symbol'].astype(str).tolist()
+                if anomalies is not None and not anomalies.empty:
+                    sampled += anomalies['symbol'].tolist()
+                books = market.get_order_books(sampled, depth=ORDER_BOOK_DEPTH)
+                liquidity = compute_liquidity_metrics(books)
+                df = attach_liquidity(df, liquidity)
+                if anomalies is not None and not anomalies.empty:
+                    anomalies = anomalies.join(liquidity, on='symbol')
+            logger.info(f"Sampled {len(books)}/{len(sampled)} order books.")
 
         # 2. 预处理
-        logger.info(f"Fetched {len(df)} tickers. Preparing top 30 by volume for analysis...")
+        logger.info(f"Fetched {len(df)} tickers. Preparing top {PROMPT_TOP_N} by volume for analysis...")
         
-        # 提前使用 AI 批量识别这 Top 30 币种的赛道
+        # 提前使用 AI 批量识别这 Top N 币种的赛道
         # 这样在 format_data_for_llm 里就能直接从缓存拿数据，不用每次都调接口
         fundamental = FundamentalAnalyzer()
-        top_coins = df.sort_values(by='volCcy24h', ascending=False).head(30)['instId'].tolist()
-        
-        # 如果配置了 LLM，尝试自动识别未知赛道
+        top_coins = df.sort_values(by='quote_volume', ascending=False).head(PROMPT_TOP_N)['symbol'].tolist()
+        if anomalies is not None and not anomalies.empty:
+            top_coins += anomalies['symbol'].tolist()
+
+        # 2.0 BTC 联动：增量拉取新收盘的 K 线，更新滚动协方差后计算 Beta / 相关性 / 联动分组
+        if ENABLE_CORRELATION:
+            with timer.stage("correlation"):
+                if correlation_engine is None:
+                    correlation_engine = CorrelationEngine(window=CORRELATION_WINDOW, bar=CORRELATION_BAR,
+                                                           cluster_threshold=CORRELATION_CLUSTER_THRESHOLD)
+                plan = correlation_engine.plan(top_coins, int(time.time() * 1000))
+                candles = market.get_candles_multi(plan, bar=CORRELATION_BAR)
+                correlation_engine.ingest(candles, universe=top_coins)
+                df = attach_correlation(df, correlation_engine.stats(top_coins),
+                                        benchmark=correlation_engine.benchmark)
+            logger.info(f"Correlation: fetched candles for {len(candles)}/{len(plan)} symbols, "
+                        f"{correlation_engine.bars} bars in window.")
+
+        # 2.1 LLM 预分析：验证新闻 + 识别未知赛道
+        # 已验证过的新闻直接复用缓存结论，只有新帖子才发送给 LLM
+        verified_news = None
         if llm.api_key:
-            fundamental.update_sectors_with_ai(top_coins)
+            if ENABLE_COMBINED_PRE_ANALYSIS:
+                # 两项都有待处理内容时合并为一次请求，响应未通过校验时自动退回分开调用
+                with timer.stage("pre_analysis"):
+                    verified_news = run_pre_analysis(llm, news_ingestor, fundamental, raw_news, top_coins)
+            else:
+                if raw_news:
+                    with timer.stage("verify_news"):
+                        logger.info("Verifying news authenticity with AI...")
+                        verified_news = news_ingestor.verify(llm, raw_news)
+                with timer.stage("classify_sectors"):
+                    fundamental.update_sectors_with_ai(top_coins)
+            if raw_news:
+                # 用 AI 验证得到的情绪分刷新索引
+                coin_news_index.add(raw_news, news_ingestor.store["verdicts"])
             
-        data_summary = format_data_for_llm(df, fundamental, funding_rates=funding_rates, top_n=30)
+        with timer.stage("format"):
+            data_summary = format_data_for_llm(df, fundamental, funding_rates=funding_rates, top_n=PROMPT_TOP_N,
+                                               snapshot=snapshot, news_index=coin_news_index)
+            # 成交额龙头之外的异动币种，使用同样的行格式并附上异动原因
+            if anomalies is not None and not anomalies.empty:
+                anomaly_lines = format_data_for_llm(
+                    df[df['symbol'].isin(anomalies['symbol'])], fundamental, funding_rates=screen_funding,
+                    top_n=len(anomalies), snapshot=snapshot, news_index=coin_news_index,
+                    extra_fields=format_anomaly_fields(anomalies)
+                )
+                data_summary += f"\n\n🔍 全市场异动 (成交额 Top{PROMPT_TOP_N} 之外，按异动程度筛选):\n{anomaly_lines}"
+
+        # 全市场赛道汇总 (一次 groupby)，直接提供给 LLM，避免其从逐币数据中自行归纳
+        sector_summary = None
+        if ENABLE_SECTOR_SUMMARY:
+            with timer.stage("aggregate_sectors"):
+                sector_summary = format_sector_table(aggregate_sectors(df, fundamental), top_n=SECTOR_TABLE_TOP_N)
+
+        text = data_summary + (f"\n\n{sector_summary}" if sector_summary else "")
+        return {
+            "summary": data_summary,
+            "sector_summary": sector_summary,
+            "news": verified_news,
+            "universe": top_coins,
+            "decision": decision,
+            "text": text,
+            "snapshot_ref": hashlib.sha1(text.encode("utf-8")).hexdigest()[:12],
+            "created_at": time.time(),
+        }
+    finally:
+        record["cache"] = _cache_stats(news_ingestor, fundamental)
+        record["usage"] = _merge_usage(fundamental.llm_client.usage if fundamental else None)
+
+
+def run_analysis_task(user_query="", gate=None, stage_listener=None, inputs=None, publish=True):
+    """
+    执行一次完整的分析任务：抓取 -> 预处理 -> 分析 -> 展示/通知
+    :param gate: MaterialityGate 实例 (可选)。提供时，行情无显著变化则跳过 LLM 分析
+    :param stage_listener: 传给 StageTimer 的阶段监听器或监听器列表 (可选)，如 RunProfiler、RunStatus
+    :param inputs: 已准备好的分析输入 (prepare_analysis_inputs 的返回值，可选)。提供时跳过抓取与预处理，
+                   多个查询可共享同一份行情快照
+    :param publish: 是否在终端展示报告并推送 Webhook 通知 (分析服务中由调用方返回报告，不推送)
+    :return: 本次运行记录 (字典)，同时写入运行存档
+    """
+    timer = StageTimer(listener=stage_listener)
+    record = {"started_at": time.time(), "status": "running", "user_query": user_query}
+    llm = None
+    analyst_usage = None
+    try:
+        logger.info("Starting analysis task...")
+        
+        llm = LLMClient()
+        analyst = get_analyst(llm)
+        record["model"] = analyst.model
+
+        if inputs is None:
+            inputs = prepare_analysis_inputs(llm, timer, record, gate)
+            if inputs is None:
+                return record
+        else:
+            logger.info(f"Reusing market snapshot {inputs['snapshot_ref']}.")
+        data_summary = inputs["summary"]
+        sector_summary = inputs["sector_summary"]
+        verified_news = inputs["news"]
+        decision = inputs["decision"]
+        record.update(inputs=inputs["text"], news=verified_news, universe=inputs["universe"],
+                      snapshot_ref=inputs["snapshot_ref"])
         
         # 3. 分析
         if not llm.api_key:
              logger.warning("LLM API key not configured. Skipping analysis.")
-             return
+             record["status"] = "no_llm"
+             return record
         
         logger.info(f"User Query: {user_query if user_query else 'Default Analysis'}")
 
         # 交互模式下显示动画，非交互模式(定时任务)则静默
-        if sys.stdout.isatty():
-            with console.status(f"[bold green]AI ({llm.model}) is thinking...", spinner="dots"):
-                analysis = llm.analyze_market(data_summary, user_query, news_analysis=verified_news)
-        else:
-            logger.info(f"AI ({llm.model}) is analyzing...")
-            analysis = llm.analyze_market(data_summary, user_query, news_analysis=verified_news)
+        with timer.stage("analyze"):
+            if publish and sys.stdout.isatty():
+                with console.status(f"[bold green]AI ({analyst.model}) is thinking...", spinner="dots"):
+                    analysis, prompt, served_by, round_stats, analyst_usage = run_analyst(
+                        analyst, llm, data_summary, user_query, news_analysis=verified_news,
+                        sector_summary=sector_summary)
+            else:
+                logger.info(f"AI ({analyst.model}) is analyzing...")
+                analysis, prompt, served_by, round_stats, analyst_usage = run_analyst(
+                    analyst, llm, data_summary, user_query, news_analysis=verified_news,
+                    sector_summary=sector_summary)
+        record["prompt"] = prompt
+        record["report"] = analysis
+        # 存档实际应答的端点 (路由对冲 / 故障切换后可能不是 LLM_MODEL)
+        record["model"] = served_by or record["model"]
+        if analyst is not llm:
+            # 记录各模型本轮耗时与状态，写入运行存档
+            for name, stat in round_stats.items():
+                timer.durations[f"analyze:{name}"] = stat["latency"]
+            logger.info(f"Ensemble stats: {analyst.stats()}")
             
         logger.info("Analysis completed.")
+        router = get_llm_router()
+        if router is not None:
+            logger.info(f"LLM routing: {router.hedges} hedges, {router.failovers} failovers, "
+                        f"endpoints: {router.stats()['endpoints']}")
+        if gate is not None and decision is not None:
+            gate.mark_analyzed(decision)
 
-        # 4. 展示与通知
-        # 终端输出
-        console.print("\n")
-        console.print(Panel(Markdown(analysis), title="📊 OKX Market Analysis Report", border_style="blue"))
-        
         # 将完整的分析报告写入日志文件，作为存档
         logger.info(f"Analysis Report Content:\n{'-'*50}\n{analysis}\n{'-'*50}")
 
+        # 4. 展示与通知
+        if publish:
+            # 终端输出
+            console.print("\n")
+            console.print(Panel(Markdown(analysis), title="📊 OKX Market Analysis Report", border_style="blue"))
+
         # 推送通知
-        if FEISHU_WEBHOOK_URL or DINGTALK_WEBHOOK_URL:
-            notifier = Notifier(feishu_webhook=FEISHU_WEBHOOK_URL, dingtalk_webhook=DINGTALK_WEBHOOK_URL)
-            # 截取摘要或发送完整报告（注意消息长度限制，这里发送前500字符或完整内容）
-            # 实际生产中可能需要拆分发送
-            notifier.send("OKX Market Analysis Report", analysis)
+        if publish and (FEISHU_WEBHOOK_URL or DINGTALK_WEBHOOK_URL):
+            with timer.stage("notify"):
+                notifier = Notifier(feishu_webhook=FEISHU_WEBHOOK_URL, dingtalk_webhook=DINGTALK_WEBHOOK_URL)
+                # 截取摘要或发送完整报告（注意消息长度限制，这里发送前500字符或完整内容）
+                # 实际生产中可能需要拆分发送
+                notifier.send("OKX Market Analysis Report", analysis)
+
+        record["status"] = "ok"
+        return record
             
     except Exception as e:
         logger.error(f"Error occurring during analysis task: {e}", exc_info=True)
+        record["status"] = "error"
+        record["error"] = str(e)
         # 在控制台也打印一下，方便调试（如果是交互模式）
         if sys.stdout.isatty():
             console.print(f"[bold red]Task Error:[/bold red] {e}")
+        return record
+    finally:
+        record["finished_at"] = time.time()
+        record["timings"] = timer.durations
+        record["usage"] = _merge_usage(
+            llm.usage if llm else None,
+            # 赛道识别等预分析用量 (本轮自行准备输入时)
+            record.get("usage"),
+            # 集成分析器跨轮常驻，只计入本轮的用量
+            analyst_usage
+        )
+        archive_run(record)
+
+
+def _merge_usage(*usages):
+    """汇总本轮各 LLM 调用方的 token 用量"""
+    total = {}
+    for usage in usages:
+        for key, value in (usage or {}).items():
+            total[key] = round(total.get(key, 0) + value, 3)
+    return total
 
-def main():
+
+def _cache_stats(news_ingestor, fundamental):
+    """本轮各缓存的命中 / 未命中次数 (新闻验证结论、币种赛道)"""
+    stats = {}
+    if news_ingestor is not None and news_ingestor.verdict_hits + news_ingestor.verdict_misses:
+        stats["news_verdicts"] = {"hits": news_ingestor.verdict_hits, "misses": news_ingestor.verdict_misses}
+    if fundamental is not None and fundamental.sector_hits + fundamental.sector_misses:
+        stats["sectors"] = {"hits": fundamental.sector_hits, "misses": fundamental.sector_misses}
+    return stats
+
+
+def archive_run(record):
+    """将运行记录写入本地存档 (SQLite)，失败不影响主流程"""
+    if not ENABLE_RUN_ARCHIVE:
+        return
+    try:
+        archive = RunArchive(RUN_ARCHIVE_PATH)
+        try:
+            record["run_id"] = archive.save(record)
+        finally:
+            archive.close()
+    except Exception as e:
+        logger.error(f"Failed to archive run: {e}")
+
+def run_task(user_query="", gate=None, profiler=None, status=None):
+    """
+    执行一次分析任务
+    :param profiler: RunProfiler (可选)，提供时在 CPU 采样与内存跟踪下运行并写出报告
+    :param status: RunStatus (可选)，提供时更新状态服务展示的运行状态
+    """
+    if status is not None:
+        status.run_started()
+    # 状态对象按阶段刷新心跳，单轮分析耗时较长时 /healthz 仍保持健康
+    listeners = [listener for listener in (profiler, status) if listener is not None]
+    if profiler is None:
+        record = run_analysis_task(user_query, gate, stage_listener=listeners)
+    else:
+        with profiler.profile_run():
+            record = run_analysis_task(user_query, gate, stage_listener=listeners)
+    if status is not None:
+        status.run_finished(record)
+    return record
+
+def start_status_server():
+    """启动状态服务，端口被占用等失败不影响定时任务"""
+    status = RunStatus(next_run=schedule.next_run, stale_after=STATUS_STALE_AFTER)
+    if not ENABLE_STATUS_SERVER:
+        return status
+    try:
+        StatusServer(status, host=STATUS_SERVER_HOST, port=STATUS_SERVER_PORT).start()
+    except OSError as e:
+        logger.error(f"Failed to start status server: {e}")
+    return status
+
+def open_cassette(mode, path=CASSETTE_PATH, latency=CASSETTE_LATENCY):
+    """
+    创建录制 / 回放磁带
+    新闻的增量拉取与验证缓存依赖本地新闻存储，录制时把当时的存储随磁带保存，
+    回放时使用其临时副本，使请求序列与录制时一致，且不改动真实的本地存储
+    """
+    global news_store_path
+    cassette = Cassette(path, mode=mode, latency=latency)
+    store = DATA_DIR / "news_store.json"
+    if mode == "record":
+        if store.exists():
+            cassette.attach("news_store", store.read_text(encoding="utf-8"))
+    else:
+        news_store_path = os.path.join(tempfile.mkdtemp(prefix="okx_replay_"), "news_store.json")
+        saved = cassette.attachment("news_store")
+        if saved is not None:
+            with open(news_store_path, "w", encoding="utf-8") as f:
+                f.write(saved)
+    logger.info(f"Cassette {mode}: {path}")
+    return cassette
+
+def main(argv=None):
     # 打印欢迎信息
     print_welcome()
     
     # 获取命令行参数作为用户查询
-    user_query = " ".join(sys.argv[1:]) if len(sys.argv) > 1 else ""
+    parser = argparse.ArgumentParser(description="OKX 市场研究分析")
+    parser.add_argument("query", nargs="*", help="用户问题 (可选)")
+    parser.add_argument("--profile", action="store_true", help="对分析任务进行 CPU 采样与内存跟踪，报告写入 logs/")
+    cassette_mode = parser.add_mutually_exclusive_group()
+    cassette_mode.add_argument("--record", action="store_true", help="录制本次运行的全部 HTTP 请求与响应")
+    cassette_mode.add_argument("--replay", action="store_true", help="从磁带离线回放，不访问网络")
+    parser.add_argument("--cassette", default=str(CASSETTE_PATH), help="磁带文件路径")
+    parser.add_argument("--latency", type=float, default=CASSETTE_LATENCY, help="回放延迟倍数 (0 为立即返回)")
+    args = parser.parse_args(argv)
+    user_query = " ".join(args.query)
+
+    # 性能分析器跨轮常驻，以便比较相邻两轮的内存差异
+    profiler = RunProfiler(LOG_DIR, interval=PROFILE_INTERVAL) if (args.profile or PROFILE_RUNS) else None
+
+    if args.record or args.replay:
+        # 录制 / 回放只针对单次运行，忽略定时配置
+        with open_cassette("record" if args.record else "replay", args.cassette, args.latency):
+            run_task(user_query, profiler=profiler)
+        if news_store_path:
+            shutil.rmtree(os.path.dirname(news_store_path), ignore_errors=True)
+        shutdown_logging()
+        return
     
     if ENABLE_SCHEDULER:
+        status = start_status_server()
         if SCHEDULE_INTERVAL > 0:
             logger.info(f"Scheduler enabled. Task will run every {SCHEDULE_INTERVAL} minutes.")
             console.print(f"[bold green]Scheduler enabled. Running every {SCHEDULE_INTERVAL} minutes...[/bold green]")
+            # 间隔模式下启用变化检测闸门，行情无显著变化时跳过 LLM 分析
+            gate = None
+            if ENABLE_CHANGE_GATE:
+                gate = MaterialityGate(
+                    price_change_pct=GATE_PRICE_CHANGE_PCT,
+                    rank_churn=GATE_RANK_CHURN,
+                    funding_delta=GATE_FUNDING_DELTA,
+                    min_new_headlines=GATE_MIN_NEW_HEADLINES,
+                    max_skips=GATE_MAX_SKIPS
+                )
             # 立即运行一次
-            run_analysis_task(user_query)
-            schedule.every(SCHEDULE_INTERVAL).minutes.do(run_analysis_task, user_query)
+            run_task(user_query, gate, profiler, status)
+            schedule.every(SCHEDULE_INTERVAL).minutes.do(run_task, user_query, gate, profiler, status)
         else:
             logger.info(f"Scheduler enabled. Task will run daily at {SCHEDULE_TIME}.")
             console.print(f"[bold green]Scheduler enabled. Running daily at {SCHEDULE_TIME}...[/bold green]")
             # 设置定时任务
-            schedule.every().day.at(SCHEDULE_TIME).do(run_analysis_task, user_query)
+            schedule.every().day.at(SCHEDULE_TIME).do(run_task, user_query, None, profiler, status)
         
-        while True:
-            schedule.run_pending()
-            time.sleep(60)
+        try:
+            while True:
+                schedule.run_pending()
+                status.heartbeat()
+                time.sleep(60)
+        finally:
+            # 退出前确保队列中的日志全部写出
+            shutdown_logging()
     else:
         # 单次运行模式
-        run_analysis_task(user_query)
+        run_task(user_query, profiler=profiler)
+        shutdown_logging()
 
 if __name__ == "__main__":
     main()
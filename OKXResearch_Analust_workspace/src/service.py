@@ -0,0 +1,67 @@
+import sys
+import os
+import argparse
+
+# 将 src 目录和项目根目录添加到 Python 路径
+src_path = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(src_path)
+sys.path.append(src_path)
+sys.path.append(project_root)
+
+from api.llm_client import LLMClient
+from utils.analysis_service import AnalysisService, AnalysisServer
+from utils.logger import setup_logger, shutdown_logging
+from utils.stage_timer import StageTimer
+from config.settings import LOG_DIR, LOG_QUEUE, LOG_FORMAT, SERVICE_HOST, SERVICE_PORT, SERVICE_WORKERS, SERVICE_REFRESH_INTERVAL
+from config.settings import SERVICE_MAX_QUEUE, SERVICE_JOB_TTL
+import logging
+
+# root logger 在导入 main 之前配置，main 中的 setup_logger 会直接返回，因此日志设置需在此传入
+setup_logger(name=None, log_file=LOG_DIR / "service.log", queued=LOG_QUEUE, json_format=(LOG_FORMAT == "json"))
+logger = logging.getLogger("service")
+
+
+def prepare_snapshot():
+    """抓取行情 / 新闻并完成预分析，生成所有请求共享的分析输入"""
+    import main
+    timer = StageTimer()
+    record = {}
+    inputs = main.prepare_analysis_inputs(LLMClient(), timer, record)
+    if inputs is None:
+        logger.warning(f"Snapshot not refreshed: {record.get('status')}")
+        return None
+    logger.info(f"Snapshot timings: {timer.durations}, usage: {record.get('usage')}")
+    return inputs
+
+
+def analyze(query, inputs):
+    """基于共享快照执行一次 LLM 分析，报告由 HTTP 接口返回，不推送通知"""
+    import main
+    return main.run_analysis_task(user_query=query, inputs=inputs, publish=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="多用户分析服务：共享行情快照，通过 HTTP 提交查询")
+    parser.add_argument("--host", default=SERVICE_HOST, help="监听地址")
+    parser.add_argument("--port", type=int, default=SERVICE_PORT, help="监听端口")
+    parser.add_argument("--workers", type=int, default=SERVICE_WORKERS, help="同时进行的 LLM 分析数")
+    args = parser.parse_args(argv)
+
+    service = AnalysisService(prepare_snapshot, analyze, refresh_interval=SERVICE_REFRESH_INTERVAL,
+                              workers=args.workers, max_queue=SERVICE_MAX_QUEUE, job_ttl=SERVICE_JOB_TTL)
+    server = None
+    try:
+        service.start()
+        server = AnalysisServer(service, args.host, args.port)
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Analysis service stopped.")
+    finally:
+        if server is not None:
+            server.httpd.server_close()
+        service.stop()
+        shutdown_logging()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+import datetime
+import itertools
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+logger = logging.getLogger("analysis_service")
+
+
+def _iso(ts):
+    return datetime.datetime.fromtimestamp(ts).isoformat(timespec="seconds") if ts else None
+
+
+def normalize_query(query):
+    """合并空白字符，使仅空格不同的查询视为同一请求"""
+    return " ".join((query or "").split())
+
+
+class AnalysisJob:
+    """一次分析请求的状态：queued -> running -> done / error"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, query, snapshot_ref):
+        self.id = str(next(self._ids))
+        self.query = query
+        self.snapshot_ref = snapshot_ref
+        self.status = "queued"
+        self.requests = 1
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.report = None
+        self.run_id = None
+        self.error = None
+        self.finished = threading.Event()
+
+    def to_dict(self, include_report=True):
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "query": self.query,
+            "snapshot_ref": self.snapshot_ref,
+            "requests": self.requests,
+            "submitted_at": _iso(self.submitted_at),
+            "started_at": _iso(self.started_at),
+            "finished_at": _iso(self.finished_at),
+            "run_id": self.run_id,
+            "error": self.error,
+        }
+        if include_report:
+            data["report"] = self.report
+        return data
+
+
+class AnalysisService:
+    """
+    多用户分析服务
+    - 共享快照：后台线程每 refresh_interval 秒调用 prepare_fn 刷新一次行情 / 新闻等分析输入，所有请求共用
+    - 请求合并：查询相同且基于同一快照 (snapshot_ref) 的请求复用同一个任务 (排队中、运行中或已完成)，只调用一次 LLM
+    - 并发上限：LLM 分析在固定大小的工作池中执行，排队任务超过 max_queue 时拒绝新请求
+    """
+
+    def __init__(self, prepare_fn, analyze_fn, refresh_interval=60, workers=2, max_queue=50, job_ttl=3600):
+        """
+        :param prepare_fn: prepare_fn() -> 分析输入字典 (含 snapshot_ref)，失败返回 None
+        :param analyze_fn: analyze_fn(query, inputs) -> 运行记录 (含 status / report / run_id / error)
+        :param refresh_interval: 快照刷新间隔 (秒)
+        :param workers: 同时进行的 LLM 分析数
+        :param max_queue: 排队任务上限
+        :param job_ttl: 已结束任务的保留时间 (秒)
+        """
+        self.prepare_fn = prepare_fn
+        self.analyze_fn = analyze_fn
+        self.refresh_interval = refresh_interval
+        self.workers = workers
+        self.max_queue = max_queue
+        self.job_ttl = job_ttl
+        self.stats = {"submitted": 0, "coalesced": 0, "rejected": 0, "analyses": 0, "refreshes": 0,
+                      "refresh_failures": 0}
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._jobs = OrderedDict()
+        self._by_key = {}
+        self._queued = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="analysis-worker")
+        self._stop = threading.Event()
+        self._thread = None
+
+    def refresh(self):
+        """刷新共享快照，失败时保留旧快照"""
+        start = time.perf_counter()
+        try:
+            inputs = self.prepare_fn()
+        except Exception as e:
+            logger.error(f"Snapshot refresh failed: {e}", exc_info=True)
+            inputs = None
+        with self._lock:
+            if inputs is None:
+                self.stats["refresh_failures"] += 1
+                return False
+            self._snapshot = inputs
+            self.stats["refreshes"] += 1
+        logger.info(f"Market snapshot {inputs['snapshot_ref']} ready in {time.perf_counter() - start:.2f}s")
+        return True
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.refresh_interval):
+            self.refresh()
+
+    def start(self):
+        """同步准备第一份快照，之后在后台线程定时刷新"""
+        self.refresh()
+        self._thread = threading.Thread(target=self._refresh_loop, name="snapshot-refresh", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._executor.shutdown(wait=False)
+
+    def submit(self, query):
+        """
+        提交分析请求
+        :return: (AnalysisJob 或 None, 结果) 结果为 "new" / "coalesced" / "no_snapshot" / "queue_full"
+        """
+        query = normalize_query(query)
+        with self._lock:
+            self._prune()
+            if self._snapshot is None:
+                return None, "no_snapshot"
+            inputs = self._snapshot
+            key = (query, inputs["snapshot_ref"])
+            job = self._by_key.get(key)
+            if job is not None and job.status != "error":
+                job.requests += 1
+                self.stats["coalesced"] += 1
+                return job, "coalesced"
+            if self._queued >= self.max_queue:
+                self.stats["rejected"] += 1
+                return None, "queue_full"
+            job = AnalysisJob(query, inputs["snapshot_ref"])
+            self._jobs[job.id] = job
+            self._by_key[key] = job
+            self._queued += 1
+            self.stats["submitted"] += 1
+        self._executor.submit(self._run, job, inputs)
+        return job, "new"
+
+    def _run(self, job, inputs):
+        with self._lock:
+            self._queued -= 1
+            job.status = "running"
+            job.started_at = time.time()
+        try:
+            record = self.analyze_fn(job.query, inputs) or {}
+            status = "done" if record.get("status") == "ok" else "error"
+            report, run_id, error = record.get("report"), record.get("run_id"), record.get("error")
+            if status == "error" and not error:
+                error = f"analysis finished with status {record.get('status')}"
+        except Exception as e:
+            logger.error(f"Analysis job {job.id} failed: {e}", exc_info=True)
+            status, report, run_id, error = "error", None, None, str(e)
+        with self._lock:
+            job.status, job.report, job.run_id, job.error = status, report, run_id, error
+            job.finished_at = time.time()
+            self.stats["analyses"] += 1
+        job.finished.set()
+
+    def _prune(self):
+        """丢弃超过保留时间的已结束任务 (调用方持锁)"""
+        cutoff = time.time() - self.job_ttl
+        for job_id, job in list(self._jobs.items()):
+            if job.finished_at is not None and job.finished_at < cutoff:
+                del self._jobs[job_id]
+                key = (job.query, job.snapshot_ref)
+                if self._by_key.get(key) is job:
+                    del self._by_key[key]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def wait(self, job, timeout):
+        """等待任务结束，最多 timeout 秒"""
+        job.finished.wait(timeout)
+        return job
+
+    def job_snapshot(self, job, include_report=True):
+        with self._lock:
+            return job.to_dict(include_report)
+
+    def status(self):
+        """服务状态的 JSON 可序列化副本"""
+        with self._lock:
+            snapshot = self._snapshot
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            stats = dict(self.stats)
+        return {
+            "snapshot_ref": snapshot["snapshot_ref"] if snapshot else None,
+            "snapshot_time": _iso(snapshot["created_at"]) if snapshot else None,
+            "snapshot_age": round(time.time() - snapshot["created_at"], 1) if snapshot else None,
+            "workers": self.workers,
+            "jobs": counts,
+            "stats": stats,
+        }
+
+    def healthy(self):
+        """有快照，且快照未超过 3 个刷新间隔"""
+        with self._lock:
+            snapshot = self._snapshot
+        return snapshot is not None and time.time() - snapshot["created_at"] <= 3 * self.refresh_interval
+
+
+class _ServiceHandler(BaseHTTPRequestHandler):
+    server_version = "OKXResearchService/1.0"
+
+    # 单次请求最长阻塞等待时间 (秒)
+    MAX_WAIT = 300
+    # 请求体上限 (字节)，超过时不读取直接拒绝
+    MAX_BODY = 64 * 1024
+
+    def _wait_seconds(self, params, body=None):
+        value = (body or {}).get("wait", params.get("wait", [0])[0])
+        try:
+            return min(max(float(value), 0.0), self.MAX_WAIT)
+        except (TypeError, ValueError):
+            return 0.0
+
+    def do_GET(self):
+        service = self.server.service
+        parts = urlsplit(self.path)
+        path = parts.path.rstrip("/") or "/"
+        params = parse_qs(parts.query)
+        if path == "/healthz":
+            healthy = service.healthy()
+            self._send(200 if healthy else 503, {"status": "ok" if healthy else "stale"})
+        elif path in ("/", "/status"):
+            self._send(200, service.status())
+        elif path.startswith("/jobs/"):
+            job = service.get(path[len("/jobs/"):])
+            if job is None:
+                self._send(404, {"error": "job not found"})
+                return
+            wait = self._wait_seconds(params)
+            if wait:
+                service.wait(job, wait)
+            self._send(200, service.job_snapshot(job))
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        service = self.server.service
+        parts = urlsplit(self.path)
+        if parts.path.rstrip("/") != "/analyze":
+            self._send(404, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self._send(400, {"error": "invalid Content-Length"})
+            return
+        if length > self.MAX_BODY:
+            # 未读取的请求体留在连接中，响应后关闭连接
+            self.close_connection = True
+            self._send(413, {"error": f"request body exceeds {self.MAX_BODY} bytes"})
+            return
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(body, dict):
+                raise ValueError("body must be a JSON object")
+        except ValueError as e:
+            self._send(400, {"error": f"invalid JSON body: {e}"})
+            return
+        query = body.get("query")
+        if query is not None and not isinstance(query, str):
+            self._send(400, {"error": "query must be a string"})
+            return
+
+        job, outcome = service.submit(query or "")
+        if job is None:
+            if outcome == "queue_full":
+                self._send(429, {"error": "too many queued analyses, retry later"}, headers={"Retry-After": "30"})
+            else:
+                self._send(503, {"error": "market snapshot not ready"})
+            return
+        wait = self._wait_seconds(parse_qs(parts.query), body)
+        if wait:
+            service.wait(job, wait)
+        payload = service.job_snapshot(job)
+        payload["coalesced"] = outcome == "coalesced"
+        self._send(200 if job.finished.is_set() else 202, payload,
+                   headers={"Location": f"/jobs/{job.id}"})
+
+    def _send(self, code, body, headers=None):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+class AnalysisServer:
+    """
+    分析服务的 HTTP 接口
+    - POST /analyze {"query": "...", "wait": 秒}: 提交查询，返回任务状态 (202 排队 / 运行中，200 已完成)；
+      相同查询与快照的请求返回同一个任务 (coalesced=true)
+    - GET /jobs/<id>?wait=秒: 查询任务状态与报告，可阻塞等待完成
+    - GET /status: 当前快照、任务计数与合并 / 拒绝统计
+    - GET /healthz: 快照过旧或尚未就绪时返回 503
+    """
+
+    def __init__(self, service, host="0.0.0.0", port=8081):
+        self.service = service
+        self.httpd = ThreadingHTTPServer((host, port), _ServiceHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.service = service
+
+    @property
+    def port(self):
+        return self.httpd.server_address[1]
+
+    def serve_forever(self):
+        logger.info(f"Analysis service listening on port {self.port}")
+        self.httpd.serve_forever()
+
+    def start(self):
+        """在后台守护线程中运行 (测试与嵌入使用)"""
+        threading.Thread(target=self.serve_forever, name="analysis-server", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,224 @@
+import base64
+import gzip
+import hashlib
+import json
+import logging
+import threading
+import time
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import requests
+from requests.structures import CaseInsensitiveDict
+
+logger = logging.getLogger("cassette")
+
+CASSETTE_VERSION = 1
+
+# 不写入磁带、也不参与匹配的查询参数 (密钥与签名；DingTalk 的 timestamp/sign 每次都不同)
+SECRET_PARAMS = {"auth_token", "access_token", "api_key", "apikey", "key", "token", "sign", "timestamp"}
+
+# 密钥在 URL 路径中的 Webhook：主机 -> 路径前缀，前缀之后的部分 (机器人 token) 替换为 REDACTED
+SECRET_PATHS = {
+    "open.feishu.cn": "/open-apis/bot/v2/hook/",
+    "open.larksuite.com": "/open-apis/bot/v2/hook/",
+    "hooks.slack.com": "/services/",
+}
+REDACTED = "REDACTED"
+
+# 回放时需要还原的响应头
+_KEPT_HEADERS = ("Content-Type", "Retry-After")
+
+
+def _path_secret(parts):
+    """URL 路径中的 Webhook token，没有时返回 None"""
+    prefix = SECRET_PATHS.get((parts.hostname or "").lower())
+    if prefix and parts.path.startswith(prefix) and len(parts.path) > len(prefix):
+        return parts.path[len(prefix):]
+    return None
+
+
+def redact(text, url):
+    """把文本 (如异常信息) 中出现的 URL 密钥替换为 REDACTED"""
+    parts = urlsplit(url)
+    secrets = [v for k, v in parse_qsl(parts.query) if k.lower() in SECRET_PARAMS and v]
+    secrets.append(_path_secret(parts))
+    for secret in filter(None, secrets):
+        text = text.replace(secret, REDACTED)
+    return text
+
+
+def request_key(method, url, body=None):
+    """
+    生成请求的匹配键
+    :return: ("GET https://host/path?a=1&b=2", 请求体 sha1)，查询参数排序并去掉密钥类参数，
+             Webhook 路径中的 token 替换为 REDACTED
+    """
+    parts = urlsplit(url)
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k.lower() not in SECRET_PARAMS)
+    path = parts.path
+    if _path_secret(parts):
+        path = SECRET_PATHS[parts.hostname.lower()] + REDACTED
+    clean_url = urlunsplit((parts.scheme, parts.netloc, path, urlencode(query), ""))
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    digest = hashlib.sha1(body).hexdigest()[:16] if body else None
+    return f"{method.upper()} {clean_url}", digest
+
+
+def _encode_body(content):
+    try:
+        return content.decode("utf-8"), "utf-8"
+    except UnicodeDecodeError:
+        return base64.b64encode(content).decode("ascii"), "base64"
+
+
+def _decode_body(entry):
+    if entry.get("encoding") == "base64":
+        return base64.b64decode(entry["body"])
+    return (entry.get("body") or "").encode("utf-8")
+
+
+class Cassette:
+    """
+    HTTP 录制 / 回放磁带
+    在上下文中替换 requests.Session.send，所有经 requests 发出的请求 (OKX、CryptoPanic、LLM、通知 Webhook) 都会被拦截：
+    - record: 正常发送请求，并把请求键、状态码、响应体与耗时写入 gzip 压缩的 JSON 文件
+    - replay: 不访问网络，按请求键从磁带中返回响应；同一请求出现多次时按录制顺序依次返回
+    匹配规则：先按 方法+URL+请求体 精确匹配，找不到时退化为按 方法+URL 匹配 (如 prompt 中带有时间)，
+    仍找不到则抛出 requests.ConnectionError，与离线时的行为一致
+    用法:
+        with Cassette("data/cassettes/run.json.gz", mode="record"):
+            run_analysis_task()
+    """
+
+    def __init__(self, path, mode="replay", latency=0.0):
+        """
+        :param mode: "record" 或 "replay"
+        :param latency: 回放时的延迟倍数，0 表示立即返回，1 表示按录制时的耗时等待
+        """
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = Path(path)
+        self.mode = mode
+        self.latency = latency
+        self.interactions = []
+        self.attachments = {}
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._exact = {}
+        self._by_url = {}
+        self._cursors = {}
+        self._original_send = None
+        if mode == "replay":
+            self._load()
+
+    def _load(self):
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != CASSETTE_VERSION:
+            raise ValueError(f"Unsupported cassette version in {self.path}: {data.get('version')}")
+        self.interactions = data.get("interactions", [])
+        self.attachments = data.get("attachments", {})
+        for entry in self.interactions:
+            self._exact.setdefault((entry["request"], entry.get("body_sha1")), []).append(entry)
+            self._by_url.setdefault(entry["request"], []).append(entry)
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            "version": CASSETTE_VERSION,
+            "recorded_at": time.time(),
+            "interactions": self.interactions,
+            "attachments": self.attachments,
+        }
+        with gzip.open(self.path, "wt", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        logger.info(f"Cassette saved: {self.path} ({len(self.interactions)} interactions)")
+
+    def attach(self, name, text):
+        """随磁带保存额外的状态 (如录制开始时的本地新闻存储)，回放时用 attachment() 取回"""
+        self.attachments[name] = text
+
+    def attachment(self, name):
+        return self.attachments.get(name)
+
+    def __enter__(self):
+        self._original_send = requests.Session.send
+        cassette = self
+
+        def send(session, request, **kwargs):
+            if cassette.mode == "replay":
+                return cassette._replay(request)
+            return cassette._record(session, request, **kwargs)
+
+        requests.Session.send = send
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        requests.Session.send = self._original_send
+        if self.mode == "record":
+            self.save()
+        elif self.misses:
+            logger.warning(f"Cassette replay: {self.misses} requests had no recorded response.")
+        return False
+
+    def _record(self, session, request, **kwargs):
+        request_line, body_sha1 = request_key(request.method, request.url, request.body)
+        entry = {"request": request_line, "body_sha1": body_sha1}
+        start = time.perf_counter()
+        try:
+            response = self._original_send(session, request, **kwargs)
+        except requests.RequestException as e:
+            entry.update(error=type(e).__name__, message=redact(str(e), request.url),
+                         elapsed=round(time.perf_counter() - start, 4))
+            with self._lock:
+                self.interactions.append(entry)
+            raise
+        body, encoding = _encode_body(response.content)
+        entry.update(
+            status=response.status_code,
+            reason=response.reason,
+            headers={k: response.headers[k] for k in _KEPT_HEADERS if k in response.headers},
+            body=body,
+            encoding=encoding,
+            elapsed=round(time.perf_counter() - start, 4),
+        )
+        with self._lock:
+            self.interactions.append(entry)
+        return response
+
+    def _next(self, queues, key):
+        """取队列中的下一条记录 (self._cursors 保存各队列的位置)"""
+        entries = queues.get(key)
+        if not entries:
+            return None
+        index = self._cursors.get((id(queues), key), 0)
+        self._cursors[(id(queues), key)] = index + 1
+        # 用完后重复最后一条
+        return entries[min(index, len(entries) - 1)]
+
+    def _replay(self, request):
+        request_line, body_sha1 = request_key(request.method, request.url, request.body)
+        with self._lock:
+            entry = self._next(self._exact, (request_line, body_sha1)) or self._next(self._by_url, request_line)
+            if entry is None:
+                self.misses += 1
+        if entry is None:
+            raise requests.ConnectionError(f"No recorded response for {request_line}", request=request)
+
+        if self.latency and entry.get("elapsed"):
+            time.sleep(entry["elapsed"] * self.latency)
+
+        if "error" in entry:
+            error_cls = getattr(requests.exceptions, entry["error"], requests.ConnectionError)
+            raise error_cls(entry.get("message", ""), request=request)
+
+        response = requests.Response()
+        response.status_code = entry["status"]
+        response.reason = entry.get("reason")
+        response.headers = CaseInsensitiveDict(entry.get("headers") or {})
+        response._content = _decode_body(entry)
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        return response
@@ -0,0 +1,213 @@
+import json
+import logging
+import os
+import math
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger("equity_series")
+
+# 每次估值一条定长记录：时间 (epoch 秒)、总权益、现金、持仓总市值
+MARK_DTYPE = np.dtype([('ts', '<f8'), ('equity', '<f8'), ('cash', '<f8'), ('positions', '<f8')])
+# 各持仓市值：所属估值记录的行号、交易对编号 (见 symbols.json)、市值
+POSITION_DTYPE = np.dtype([('row', '<u4'), ('symbol', '<u2'), ('value', '<f8')])
+# 降采样汇总：桶开始时间、权益 OHLC、桶内最后一次的现金与持仓市值、估值次数
+ROLLUP_DTYPE = np.dtype([('ts', '<f8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8'),
+                         ('cash', '<f8'), ('positions', '<f8'), ('count', '<i8')])
+
+# 汇总粒度 -> 桶长度 (秒)
+ROLLUPS = {"hour": 3600, "day": 86400}
+# 汇总粒度 -> 每年的桶数 (加密市场全年无休)
+PERIODS_PER_YEAR = {"hour": 24 * 365, "day": 365}
+
+
+def performance_stats(equity, periods_per_year=365):
+    """
+    向量化计算权益曲线的绩效指标
+    :param equity: 等间隔的权益序列 (如日收盘权益)
+    :param periods_per_year: 每年的周期数，用于年化波动率与 Sharpe (无风险利率按 0)
+    :return: {total_return, max_drawdown, current_drawdown, volatility, sharpe}，百分比指标以 % 表示；样本不足时为 NaN
+    """
+    equity = np.asarray(equity, dtype='float64')
+    equity = equity[np.isfinite(equity) & (equity > 0)]
+    if equity.size == 0:
+        return {"total_return": math.nan, "max_drawdown": math.nan, "current_drawdown": math.nan,
+                "volatility": math.nan, "sharpe": math.nan}
+
+    peak = np.maximum.accumulate(equity)
+    drawdown = equity / peak - 1
+    returns = equity[1:] / equity[:-1] - 1
+    volatility = sharpe = math.nan
+    if returns.size >= 2:
+        std = returns.std(ddof=1)
+        volatility = std * math.sqrt(periods_per_year) * 100
+        if std > 0:
+            sharpe = returns.mean() / std * math.sqrt(periods_per_year)
+    return {
+        "total_return": (equity[-1] / equity[0] - 1) * 100,
+        "max_drawdown": drawdown.min() * 100,
+        "current_drawdown": drawdown[-1] * 100,
+        "volatility": volatility,
+        "sharpe": sharpe,
+    }
+
+
+class EquitySeries:
+    """
+    模拟盘逐次估值的紧凑二进制时间序列 (只追加)
+    - marks.bin: 每次估值一条 32 字节定长记录，直接按结构化数组读取 (np.memmap)，无需解析
+    - positions.bin: 各持仓市值 (长表，每条 14 字节)，交易对编号见 symbols.json
+    - rollup_<粒度>.bin: 按小时 / 天降采样的权益 OHLC，每次估值只改写最后一个桶，
+      长期运行后绩效统计也只需读取少量汇总记录
+    """
+
+    def __init__(self, directory):
+        self.dir = Path(directory)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.marks_path = self.dir / "marks.bin"
+        self.positions_path = self.dir / "positions.bin"
+        self.symbols_path = self.dir / "symbols.json"
+        self.symbols = self._load_symbols()
+        self._symbol_ids = {s: i for i, s in enumerate(self.symbols)}
+        self._rows = self._count(self.marks_path, MARK_DTYPE)
+        # 各粒度当前 (最后一个) 桶，追加时原地更新
+        self._buckets = {name: self._last_record(self._rollup_path(name)) for name in ROLLUPS}
+
+    def __len__(self):
+        return self._rows
+
+    def _rollup_path(self, name):
+        return self.dir / f"rollup_{name}.bin"
+
+    def _load_symbols(self):
+        if self.symbols_path.exists():
+            try:
+                with open(self.symbols_path, "r", encoding="utf-8") as f:
+                    return json.load(f)
+            except Exception as e:
+                logger.error(f"Failed to load equity series symbols: {e}")
+        return []
+
+    def _save_symbols(self):
+        # 先写临时文件再替换，避免中途退出留下半个文件
+        tmp = self.symbols_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.symbols, f)
+        os.replace(tmp, self.symbols_path)
+
+    @staticmethod
+    def _count(path, dtype):
+        return path.stat().st_size // dtype.itemsize if path.exists() else 0
+
+    @staticmethod
+    def _last_record(path):
+        count = EquitySeries._count(path, ROLLUP_DTYPE)
+        if not count:
+            return None
+        return np.fromfile(path, dtype=ROLLUP_DTYPE, count=1, offset=(count - 1) * ROLLUP_DTYPE.itemsize)[0].copy()
+
+    def _symbol_id(self, symbol):
+        sid = self._symbol_ids.get(symbol)
+        if sid is None:
+            sid = len(self.symbols)
+            self.symbols.append(symbol)
+            self._symbol_ids[symbol] = sid
+            self._save_symbols()
+        return sid
+
+    def append(self, equity, cash, positions=None, ts=None):
+        """
+        追加一次估值
+        :param equity: 总权益 (USDT)
+        :param cash: 现金余额 (USDT)
+        :param positions: {symbol: 市值 (USDT)}
+        :param ts: 估值时间 (epoch 秒)，默认当前时间
+        """
+        ts = time.time() if ts is None else float(ts)
+        positions = positions or {}
+        position_value = float(sum(positions.values()))
+
+        mark = np.array([(ts, equity, cash, position_value)], dtype=MARK_DTYPE)
+        with open(self.marks_path, "ab") as f:
+            f.write(mark.tobytes())
+        if positions:
+            rows = np.array([(self._rows, self._symbol_id(s), v) for s, v in positions.items()], dtype=POSITION_DTYPE)
+            with open(self.positions_path, "ab") as f:
+                f.write(rows.tobytes())
+        self._rows += 1
+
+        for name, seconds in ROLLUPS.items():
+            self._update_rollup(name, ts - ts % seconds, equity, cash, position_value)
+
+    def _update_rollup(self, name, start, equity, cash, position_value):
+        bucket = self._buckets[name]
+        path = self._rollup_path(name)
+        if bucket is not None and bucket['ts'] == start:
+            bucket['high'] = max(bucket['high'], equity)
+            bucket['low'] = min(bucket['low'], equity)
+            bucket['close'], bucket['cash'], bucket['positions'] = equity, cash, position_value
+            bucket['count'] += 1
+            # 同一个桶：只改写文件末尾的最后一条记录
+            with open(path, "r+b") as f:
+                f.seek(-ROLLUP_DTYPE.itemsize, os.SEEK_END)
+                f.write(bucket.tobytes())
+        else:
+            bucket = np.array((start, equity, equity, equity, equity, cash, position_value, 1), dtype=ROLLUP_DTYPE)
+            with open(path, "ab") as f:
+                f.write(bucket.tobytes())
+            self._buckets[name] = bucket
+
+    def marks(self):
+        """全部估值记录 (结构化数组，内存映射只读视图)"""
+        if not self._rows:
+            return np.zeros(0, dtype=MARK_DTYPE)
+        return np.memmap(self.marks_path, dtype=MARK_DTYPE, mode='r', shape=(self._rows,))
+
+    def rollup(self, name="day"):
+        """
+        降采样汇总
+        :return: DataFrame，索引为桶开始时间，列为 open / high / low / close / cash / positions / count
+        """
+        data = np.fromfile(self._rollup_path(name), dtype=ROLLUP_DTYPE) if self._rollup_path(name).exists() \
+            else np.zeros(0, dtype=ROLLUP_DTYPE)
+        frame = pd.DataFrame(data)
+        frame.index = pd.to_datetime(frame.pop('ts'), unit='s')
+        return frame
+
+    def positions(self):
+        """
+        各持仓市值的宽表
+        :return: DataFrame，索引为估值时间，列为交易对；该次估值未持有的为 NaN
+        """
+        if not self.positions_path.exists():
+            return pd.DataFrame()
+        data = np.fromfile(self.positions_path, dtype=POSITION_DTYPE)
+        data = data[data['row'] < self._rows]
+        values = np.full((self._rows, len(self.symbols)), np.nan)
+        values[data['row'], data['symbol']] = data['value']
+        return pd.DataFrame(values, index=pd.to_datetime(self.marks()['ts'], unit='s'), columns=self.symbols)
+
+    def stats(self):
+        """
+        绩效统计：最大回撤按逐次估值计算 (精确)，波动率与 Sharpe 按日汇总的收盘权益计算 (不足 3 天时用小时汇总)
+        :return: 字典，另含 marks / start / end / exposure (持仓市值占权益的平均比例 %)；尚无估值时返回 None
+        """
+        if not self._rows:
+            return None
+        marks = self.marks()
+        equity = np.asarray(marks['equity'])
+        result = performance_stats(equity)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            exposure = np.nanmean(np.asarray(marks['positions']) / equity) * 100
+
+        name = "day"
+        closes = self.rollup(name)['close'].to_numpy()
+        if closes.size < 3:
+            name = "hour"
+            closes = self.rollup(name)['close'].to_numpy()
+        periodic = performance_stats(closes, PERIODS_PER_YEAR[name])
+        result.update(volatility=periodic["volatility"], sharpe=periodic["sharpe"], resolution=name,
+                      marks=self._rows, start=float(marks['ts'][0]), end=float(marks['ts'][-1]), exposure=exposure)
+        return result
@@ -0,0 +1,270 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import requests
+
+logger = logging.getLogger("http_transport")
+
+# 延迟直方图的桶边界 (秒)
+LATENCY_BUCKETS = (0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0, 10.0, 15.0, float("inf"))
+
+
+class LatencyHistogram:
+    """
+    单个主机的延迟直方图
+    固定桶计数用于监控展示，最近 window 次的样本用于计算分位数 (对冲阈值)
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS, window=200):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.samples = deque(maxlen=window)
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    self.counts[i] += 1
+                    break
+            self.samples.append(seconds)
+            self.total += 1
+
+    def percentile(self, q, min_samples=5):
+        """
+        最近样本的分位数
+        :param q: 0~1
+        :return: 秒，样本不足时返回 None
+        """
+        with self._lock:
+            if len(self.samples) < min_samples:
+                return None
+            ordered = sorted(self.samples)
+        idx = min(len(ordered) - 1, int(q * len(ordered)))
+        return ordered[idx]
+
+    def snapshot(self):
+        with self._lock:
+            buckets = {("inf" if b == float("inf") else str(b)): c for b, c in zip(self.buckets, self.counts)}
+            count = self.total
+        return {
+            "count": count,
+            "buckets": buckets,
+            "p50": self.percentile(0.5, min_samples=1),
+            "p95": self.percentile(0.95, min_samples=1),
+            "p99": self.percentile(0.99, min_samples=1),
+        }
+
+
+class CircuitBreaker:
+    """
+    熔断器：连续失败达到阈值后打开，冷却期内不再向该主机发送请求，
+    冷却结束后进入半开状态，放行一次试探请求，成功则关闭。
+    available() 只读，用于筛选候选；真正发出请求前调用 try_acquire_probe() 才会占用试探名额，
+    试探请求超过 reset_timeout 仍无结果时允许发出新的试探，避免停留在半开状态。
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=3, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_at = 0.0
+        self.trips = 0
+        self._lock = threading.Lock()
+
+    def _probe_due(self, now):
+        if self.state == self.OPEN:
+            return now - self.opened_at >= self.reset_timeout
+        # 半开：上一次试探超过冷却时间仍无结果 (如请求未被真正发出)，允许重新试探
+        return self.state == self.HALF_OPEN and now - self.probe_at >= self.reset_timeout
+
+    def available(self):
+        """当前是否可以向该主机发送请求 (只读，不改变状态)"""
+        with self._lock:
+            return self.state == self.CLOSED or self._probe_due(time.monotonic())
+
+    def try_acquire_probe(self):
+        """
+        即将向该主机发送请求时调用：关闭状态直接放行；冷却结束时转为半开并占用唯一的试探名额
+        :return: 是否允许发送
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            now = time.monotonic()
+            if self._probe_due(now):
+                self.state = self.HALF_OPEN
+                self.probe_at = now
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.trips += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class HedgedTransport:
+    """
+    多主机 HTTP 传输层
+    - 主主机响应超过其延迟分位数 (默认 p95) 仍未返回时，向备用主机发出对冲请求，取先返回的结果
+    - 主机失败 (网络错误 / 5xx) 时立即切换到下一个可用主机
+    - 每个主机维护熔断器和延迟直方图
+    """
+
+    def __init__(self, hosts, hedge_percentile=0.95, min_hedge_delay=0.3, max_hedge_delay=3.0,
+                 failure_threshold=3, reset_timeout=30.0, max_workers=16):
+        """
+        :param hosts: 主机列表，第一个为主主机，如 ["https://www.okx.com", "https://aws.okx.com"]
+        :param hedge_percentile: 触发对冲的延迟分位数
+        :param min_hedge_delay: 对冲等待时间下限 (秒)
+        :param max_hedge_delay: 对冲等待时间上限 (秒)，样本不足时也使用该值
+        :param failure_threshold: 熔断器连续失败阈值
+        :param reset_timeout: 熔断器冷却时间 (秒)
+        """
+        self.hosts = [h.rstrip('/') for h in hosts if h]
+        self.hedge_percentile = hedge_percentile
+        self.min_hedge_delay = min_hedge_delay
+        self.max_hedge_delay = max_hedge_delay
+        self.histograms = {h: LatencyHistogram() for h in self.hosts}
+        self.breakers = {h: CircuitBreaker(failure_threshold, reset_timeout) for h in self.hosts}
+        self.errors = {h: 0 for h in self.hosts}
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="http-transport")
+
+    def _hedge_delay(self, host):
+        p = self.histograms[host].percentile(self.hedge_percentile)
+        if p is None:
+            return self.max_hedge_delay
+        return max(self.min_hedge_delay, min(self.max_hedge_delay, p))
+
+    def _available_hosts(self):
+        hosts = [h for h in self.hosts if self.breakers[h].available()]
+        # 所有主机都被熔断时，仍然尝试主主机，避免完全不可用
+        return hosts or self.hosts[:1]
+
+    def _next_host(self, queue):
+        """从候选队列取出下一个真正要请求的主机 (此时才占用熔断器的试探名额)，没有可用主机时返回 None"""
+        while queue:
+            host = queue.pop(0)
+            if self.breakers[host].try_acquire_probe():
+                return host
+        return None
+
+    def _request(self, host, path, params, headers, timeout):
+        """在线程池中执行单次请求，并记录延迟与熔断状态"""
+        start = time.monotonic()
+        try:
+            response = requests.get(f"{host}{path}", params=params, headers=headers, timeout=timeout)
+        except Exception:
+            self.histograms[host].observe(time.monotonic() - start)
+            self.errors[host] += 1
+            self.breakers[host].record_failure()
+            raise
+
+        self.histograms[host].observe(time.monotonic() - start)
+        if response.status_code >= 500:
+            self.errors[host] += 1
+            self.breakers[host].record_failure()
+            raise requests.HTTPError(f"{response.status_code} Server Error from {host}", response=response)
+
+        self.breakers[host].record_success()
+        return response
+
+    def get(self, path, params=None, headers=None, timeout=15):
+        """
+        发送 GET 请求，必要时对冲或切换主机
+        :param path: 接口路径，如 /api/v5/market/tickers
+        :return: requests.Response (非 5xx)
+        """
+        deadline = time.monotonic() + timeout
+        queue = list(self._available_hosts())
+        # 候选主机的试探名额被其他请求占用时，退回第一个候选
+        host = self._next_host(queue) or self._available_hosts()[0]
+        pending = {self._executor.submit(self._request, host, path, params, headers, timeout): host}
+        first_host = host
+        hedge_at = time.monotonic() + self._hedge_delay(host)
+        last_error = None
+
+        while pending:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            # 还有备用主机时，最多等到对冲时间点；否则等到总截止时间
+            wait_until = min(hedge_at, deadline) if queue else deadline
+            done, _ = wait(list(pending), timeout=max(0.0, wait_until - now), return_when=FIRST_COMPLETED)
+
+            for future in done:
+                done_host = pending.pop(future)
+                try:
+                    response = future.result()
+                except Exception as e:
+                    last_error = e
+                    logger.warning(f"Request to {done_host}{path} failed: {e}")
+                    continue
+                if done_host != first_host:
+                    self.hedge_wins += 1
+                return response
+
+            if not queue:
+                continue
+
+            # 当前请求失败时立即切换到下一个主机；超过延迟分位数仍未返回时发出对冲请求
+            if done and pending:
+                continue
+            failover = bool(done)
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                # 已到总截止时间，不再发出新的请求
+                break
+            host = self._next_host(queue)
+            if host is None:
+                continue
+            if failover:
+                self.failovers += 1
+            else:
+                self.hedges += 1
+            pending[self._executor.submit(self._request, host, path, params, headers, remaining)] = host
+            hedge_at = time.monotonic() + self._hedge_delay(host)
+
+        if last_error is not None:
+            raise last_error
+        raise requests.Timeout(f"No host answered {path} within {timeout}s")
+
+    def stats(self):
+        """返回每个主机的延迟直方图、熔断状态与对冲统计"""
+        return {
+            "hosts": {
+                h: {
+                    "latency": self.histograms[h].snapshot(),
+                    "breaker": self.breakers[h].state,
+                    "breaker_trips": self.breakers[h].trips,
+                    "errors": self.errors[h],
+                }
+                for h in self.hosts
+            },
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "failovers": self.failovers,
+        }
@@ -1,49 +1,106 @@
+import atexit
+import datetime
+import json
 import logging
+import queue
 import sys
 from pathlib import Path
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 
-def setup_logger(name="OKXResearch", log_file=None, level=logging.INFO):
+# 队列模式下启动的后台监听线程，退出时统一 flush
+_listeners = []
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """
+    JSON Lines 结构化日志格式：每条日志一行 JSON，便于日志采集与检索
+    """
+
+    def format(self, record):
+        payload = {
+            "time": datetime.datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "logger": record.name,
+            "level": record.levelname,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False)
+
+
+def shutdown_logging():
+    """停止所有队列监听线程，确保队列中剩余的日志全部写出"""
+    while _listeners:
+        listener = _listeners.pop()
+        listener.stop()
+        for handler in listener.handlers:
+            handler.flush()
+            handler.close()
+
+
+def setup_logger(name="OKXResearch", log_file=None, level=logging.INFO, queued=False, json_format=False):
     """
     配置并返回一个 logger 实例
+    :param queued: 是否启用队列模式。启用后调用方只把日志放入内存队列，
+                   文件与控制台写入由后台监听线程完成，不阻塞业务线程
+    :param json_format: 文件日志是否使用 JSON Lines 结构化格式
     """
     logger = logging.getLogger(name)
     logger.setLevel(level)
-    
+
     # 避免重复添加 handler
     if logger.handlers:
         return logger
 
     # 文件日志格式：包含时间、模块名、级别，详细记录
-    file_formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
-    
+    if json_format:
+        file_formatter = JsonLinesFormatter()
+    else:
+        file_formatter = logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+        )
+
     # 控制台日志格式：只显示消息，保持界面清爽
     # 因为我们使用了 Rich UI，不需要在控制台重复显示时间戳等元数据
     console_formatter = logging.Formatter(
         '%(message)s'
     )
 
+    handlers = []
+
     # 控制台 Handler
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setFormatter(console_formatter)
-    logger.addHandler(console_handler)
+    handlers.append(console_handler)
 
     # 文件 Handler (如果指定)
     if log_file:
         log_path = Path(log_file)
         log_path.parent.mkdir(parents=True, exist_ok=True)
-        
+
         # 使用 RotatingFileHandler 限制日志大小
         # maxBytes=10MB, backupCount=5 (保留5个备份文件)
         file_handler = RotatingFileHandler(
-            log_file, 
-            maxBytes=10*1024*1024, 
-            backupCount=5, 
+            log_file,
+            maxBytes=10*1024*1024,
+            backupCount=5,
             encoding='utf-8'
         )
         file_handler.setFormatter(file_formatter)
-        logger.addHandler(file_handler)
+        handlers.append(file_handler)
+
+    if queued:
+        # 队列模式：业务线程只做入队，真正的 I/O 与日志轮转检查在后台线程完成
+        log_queue = queue.Queue(-1)
+        logger.addHandler(QueueHandler(log_queue))
+        listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        listener.start()
+        if not _listeners:
+            atexit.register(shutdown_logging)
+        _listeners.append(listener)
+    else:
+        for handler in handlers:
+            logger.addHandler(handler)
 
     return logger
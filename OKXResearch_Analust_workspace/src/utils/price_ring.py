@@ -0,0 +1,264 @@
+import json
+import logging
+import os
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger("price_ring")
+
+# 环形缓冲区中每个快照保存的 ticker 字段
+RING_FIELDS = ('last', 'open24h', 'high24h', 'low24h', 'volCcy24h', 'bidPx', 'askPx')
+
+_MAGIC = 0x4F4B5852494E4701  # "OKXRING" + 版本号
+# 文件头 (int64): magic, slots, n_fields, max_instruments, seq, n_instruments, index_version, reserved
+_HEADER_LEN = 8
+_H_MAGIC, _H_SLOTS, _H_FIELDS, _H_MAX_INST, _H_SEQ, _H_N_INST, _H_INDEX_VER = range(7)
+
+
+def _index_path(path):
+    return Path(str(path) + ".index.json")
+
+
+def snapshot_frame(snapshot, instruments):
+    """
+    把一个快照还原为与 get_tickers 相同列名的 DataFrame
+    :param snapshot: [len(RING_FIELDS), len(instruments)] 数组
+    :param instruments: 与快照列对应的交易对索引
+    """
+    frame = pd.DataFrame(np.asarray(snapshot).T, columns=list(RING_FIELDS))
+    frame.insert(0, 'instId', pd.Categorical(instruments))
+    # 本轮未出现的交易对 (如已下架) 不返回
+    return frame[frame['last'].notna()].reset_index(drop=True)
+
+
+class _RingLayout:
+    """
+    文件布局: [header][timestamps: 2*slots float64][data: 2*slots x n_fields x max_instruments float64]
+    每个快照同时写入 i 与 i+slots 两个位置 (镜像环)，使最近 n 个快照始终是一段连续内存，
+    读取方可以直接拿到零拷贝的切片视图
+    """
+
+    def __init__(self, path, slots, max_instruments, mode):
+        self.path = Path(path)
+        self.slots = slots
+        self.n_fields = len(RING_FIELDS)
+        self.max_instruments = max_instruments
+        size = _HEADER_LEN * 8 + 2 * slots * 8 + 2 * slots * self.n_fields * max_instruments * 8
+        self.buffer = np.memmap(self.path, dtype='uint8', mode=mode, shape=(size,))
+        offset = 0
+        self.header = np.ndarray((_HEADER_LEN,), dtype='int64', buffer=self.buffer, offset=offset)
+        offset += _HEADER_LEN * 8
+        self.timestamps = np.ndarray((2 * slots,), dtype='float64', buffer=self.buffer, offset=offset)
+        offset += 2 * slots * 8
+        self.data = np.ndarray((2 * slots, self.n_fields, max_instruments), dtype='float64',
+                               buffer=self.buffer, offset=offset)
+
+    @staticmethod
+    def read_header(path):
+        header = np.fromfile(path, dtype='int64', count=_HEADER_LEN)
+        if len(header) < _HEADER_LEN or header[_H_MAGIC] != _MAGIC:
+            raise ValueError(f"{path} is not a price ring buffer")
+        return header
+
+
+class PriceRingWriter:
+    """
+    采集进程使用：把每一轮的 tickers 写入内存映射的环形缓冲区
+    - 交易对索引固定：首次出现的交易对追加到下一个空位，之后位置不再变化
+    - 每写入一个快照，序号 seq 加 1 (最后写，读取方据此判断是否有新数据)
+    - 采集进程重启时，若已有文件的布局一致则原地续写 (保留 seq 与交易对索引)，
+      正在等待 wait_for_update(seq) 的读取方不会因序号归零而卡住
+    """
+
+    def __init__(self, path, slots=120, max_instruments=1024):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if not self._reopen(slots, max_instruments):
+            self._create(slots, max_instruments)
+
+    def _reopen(self, slots, max_instruments):
+        """以 r+ 打开布局一致的已有文件，成功返回 True"""
+        if not self.path.exists():
+            return False
+        try:
+            header = _RingLayout.read_header(self.path)
+            if (int(header[_H_SLOTS]), int(header[_H_FIELDS]), int(header[_H_MAX_INST])) != \
+                    (slots, len(RING_FIELDS), max_instruments):
+                logger.warning(f"Price ring layout changed, recreating {self.path}.")
+                return False
+            with open(_index_path(self.path), encoding="utf-8") as f:
+                instruments = json.load(f)["instruments"]
+            if len(instruments) != header[_H_N_INST]:
+                raise ValueError("instrument index does not match header")
+            self.layout = _RingLayout(self.path, slots, max_instruments, mode='r+')
+        except Exception as e:
+            logger.warning(f"Failed to reopen price ring {self.path}, recreating: {e}")
+            return False
+        self.instruments = pd.Index(instruments, dtype='object')
+        logger.info(f"Reopened price ring {self.path} at seq {self.seq}.")
+        return True
+
+    def _create(self, slots, max_instruments):
+        self.layout = _RingLayout(self.path, slots, max_instruments, mode='w+')
+        header = self.layout.header
+        header[_H_MAGIC] = _MAGIC
+        header[_H_SLOTS] = slots
+        header[_H_FIELDS] = self.layout.n_fields
+        header[_H_MAX_INST] = max_instruments
+        self.layout.data[:] = np.nan
+        self.layout.timestamps[:] = np.nan
+        self.instruments = pd.Index([], dtype='object')
+        self._write_index()
+
+    @property
+    def seq(self):
+        return int(self.layout.header[_H_SEQ])
+
+    def _write_index(self):
+        # 先写临时文件再替换，读取方不会读到半个文件
+        tmp = _index_path(self.path).with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"fields": list(RING_FIELDS), "instruments": list(self.instruments)}, f)
+        os.replace(tmp, _index_path(self.path))
+        self.layout.header[_H_N_INST] = len(self.instruments)
+        self.layout.header[_H_INDEX_VER] += 1
+
+    def _positions(self, inst_ids):
+        """返回交易对在固定索引中的位置，新交易对追加到索引末尾 (超出容量的忽略，位置为 -1)"""
+        inst_ids = pd.Index(inst_ids.astype(str))
+        new = inst_ids.difference(self.instruments, sort=False)
+        if len(new):
+            room = self.layout.max_instruments - len(self.instruments)
+            if len(new) > room:
+                logger.warning(f"Price ring is full, dropping {len(new) - room} new instruments.")
+                new = new[:room]
+            if len(new):
+                self.instruments = self.instruments.append(new)
+                self._write_index()
+        return self.instruments.get_indexer(inst_ids)
+
+    def write(self, df, ts=None):
+        """
+        写入一个快照
+        :param df: OKXClient.get_tickers 返回的 DataFrame
+        :param ts: 快照时间 (epoch 秒)，默认当前时间
+        :return: 写入后的序号
+        """
+        positions = self._positions(df['instId'])
+        valid = positions >= 0
+        positions = positions[valid]
+
+        snapshot = np.full((self.layout.n_fields, self.layout.max_instruments), np.nan)
+        for i, field in enumerate(RING_FIELDS):
+            if field in df.columns:
+                snapshot[i, positions] = pd.to_numeric(df[field], errors='coerce').to_numpy(dtype='float64')[valid]
+
+        seq = self.seq
+        slot = seq % self.layout.slots
+        for s in (slot, slot + self.layout.slots):
+            self.layout.data[s] = snapshot
+            self.layout.timestamps[s] = ts if ts is not None else time.time()
+        # 数据写完后再推进序号
+        self.layout.header[_H_SEQ] = seq + 1
+        return seq + 1
+
+    def flush(self):
+        self.layout.buffer.flush()
+
+
+class PriceRingReader:
+    """
+    其他进程使用：以只读方式映射同一个文件，无网络 I/O、无序列化
+    latest() / field() 返回的是共享内存上的零拷贝视图，最多 slots - 1 个快照
+    (不含写入方下一个要覆盖的槽位)；视图在写入方再写入 slots - n 个快照之前保持有效，需要长期保存时请 .copy()
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        header = _RingLayout.read_header(self.path)
+        self.layout = _RingLayout(self.path, int(header[_H_SLOTS]), int(header[_H_MAX_INST]), mode='r')
+        self._index_version = None
+        self._instruments = pd.Index([])
+
+    @property
+    def seq(self):
+        """已写入的快照总数"""
+        return int(self.layout.header[_H_SEQ])
+
+    @property
+    def instruments(self):
+        """固定的交易对索引 (写入方追加新交易对时自动重新加载)"""
+        version = int(self.layout.header[_H_INDEX_VER])
+        if version != self._index_version:
+            with open(_index_path(self.path), encoding="utf-8") as f:
+                self._instruments = pd.Index(json.load(f)["instruments"])
+            self._index_version = version
+        return self._instruments
+
+    def latest(self, n=1):
+        """
+        最近 n 个快照 (旧 -> 新)，n 最多为 slots - 1
+        :return: (timestamps 视图 [n], data 视图 [n, len(RING_FIELDS), len(instruments)])
+        """
+        return self._view(self.seq, n, len(self.instruments))
+
+    def _view(self, seq, n, count):
+        # 不返回下一个要被覆盖的槽位，避免视图中混入正在写入的快照
+        n = min(n, seq, self.layout.slots - 1)
+        if n == 0:
+            return self.layout.timestamps[:0], self.layout.data[:0, :, :0]
+        end = (seq - 1) % self.layout.slots + self.layout.slots + 1
+        return self.layout.timestamps[end - n:end], self.layout.data[end - n:end, :, :count]
+
+    def copy_latest(self, n=1, retries=5):
+        """
+        最近 n 个快照的一致拷贝：拷贝前后序号不变才返回 (seqlock)，拷贝期间有新快照写入时重试
+        :return: (timestamps [n], data [n, len(RING_FIELDS), len(instruments)], instruments)
+        """
+        for _ in range(retries):
+            seq = self.seq
+            instruments = self.instruments
+            ts, data = self._view(seq, n, len(instruments))
+            ts, data = ts.copy(), data.copy()
+            if self.seq == seq:
+                break
+        else:
+            logger.warning(f"Price ring kept changing during {retries} copies, snapshot may be inconsistent.")
+        return ts, data, instruments
+
+    def field(self, name, n=1):
+        """某个字段最近 n 个快照的视图 [n, len(instruments)]"""
+        _, data = self.latest(n)
+        return data[:, RING_FIELDS.index(name), :]
+
+    def series(self, inst_id, name, n=1):
+        """单个交易对某字段最近 n 个值"""
+        pos = self.instruments.get_loc(inst_id)
+        return self.field(name, n)[:, pos]
+
+    def age(self):
+        """最新快照距今的秒数，尚无数据时返回 None"""
+        ts, _ = self.latest(1)
+        return time.time() - float(ts[0]) if len(ts) else None
+
+    def to_frame(self):
+        """把最新快照还原为与 get_tickers 相同列名的 DataFrame (会拷贝数据)"""
+        _, data, instruments = self.copy_latest(1)
+        if not len(data):
+            return None
+        return snapshot_frame(data[0], instruments)
+
+    def wait_for_update(self, seq, timeout=10.0, poll=0.05):
+        """
+        阻塞等待序号超过 seq
+        :return: 新序号，超时返回 None
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            current = self.seq
+            if current > seq:
+                return current
+            time.sleep(poll)
+        return None
@@ -0,0 +1,166 @@
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+logger = logging.getLogger("profiler")
+
+# 报告中忽略的分配来源 (tracemalloc、本模块的采样计数与导入机制)
+# 在输出时按文件名过滤，比 Snapshot.filter_traces 逐条匹配快得多
+_IGNORED_FILES = (tracemalloc.__file__, __file__, "<frozen importlib._bootstrap>", "<frozen importlib._bootstrap_external>", "<unknown>")
+
+
+def _reportable(stats, limit):
+    """去掉被忽略来源后的前 limit 条统计"""
+    return [stat for stat in stats if stat.traceback[0].filename not in _IGNORED_FILES][:limit]
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+def fold_stack(frame, limit=64):
+    """把一个栈帧折叠为 flamegraph 格式的 "root;...;leaf" 字符串"""
+    labels = []
+    while frame is not None and len(labels) < limit:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class SamplingProfiler:
+    """
+    采样式 CPU 分析器：后台线程按固定间隔读取各线程当前栈 (sys._current_frames)，
+    开销与被测代码的调用次数无关，适合长期挂在定时任务上
+    结果为折叠栈计数，可直接交给 flamegraph.pl / speedscope / inferno 生成火焰图
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = Counter()
+        self.stage = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.samples.clear()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            # 栈根部按 阶段;线程 分组，火焰图中可直接看出各阶段及线程池的占比
+            prefix = self.stage or "idle"
+            for ident, frame in sys._current_frames().items():
+                if ident == own_id:
+                    continue
+                self.samples[f"{prefix};{names.get(ident, ident)};{fold_stack(frame)}"] += 1
+
+    def write_folded(self, path):
+        """写出折叠栈文件 (每行 "栈 次数")"""
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class RunProfiler:
+    """
+    包裹一次分析任务的性能分析器：
+    - 运行期间进行 CPU 采样，输出 <logs>/profile_<时间>_<轮次>.folded
+    - 作为 StageTimer 的监听器，在每个阶段结束时拍 tracemalloc 快照，
+      记录该阶段新增内存最多的代码行，输出 <logs>/memory_<时间>_<轮次>.txt
+    - 实例在定时任务的多轮之间常驻，报告中附带与上一轮结束时的内存差异，用于发现泄漏
+    用法:
+        profiler = RunProfiler(LOG_DIR)
+        with profiler.profile_run():
+            run_analysis_task(..., stage_listener=profiler)
+    """
+
+    def __init__(self, output_dir, interval=0.005, top_n=15, nframes=1):
+        self.output_dir = Path(output_dir)
+        self.top_n = top_n
+        self.nframes = nframes
+        self.sampler = SamplingProfiler(interval)
+        self.previous_snapshot = None
+        self.cycle = 0
+        self._stage_start = {}
+        self._stage_reports = []
+
+    def stage_started(self, name):
+        self.sampler.stage = name
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+            self._stage_start[name] = tracemalloc.take_snapshot()
+
+    def stage_finished(self, name, seconds):
+        self.sampler.stage = None
+        start = self._stage_start.pop(name, None)
+        if start is None:
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        diff = tracemalloc.take_snapshot().compare_to(start, "lineno")
+        self._stage_reports.append((name, seconds, current, peak, _reportable(diff, self.top_n)))
+
+    @contextmanager
+    def profile_run(self):
+        """
+        对包裹的代码块进行 CPU 采样与内存跟踪，结束后写出报告
+        :return: 上下文变量为 dict，退出后包含 folded / memory 两个报告路径
+        """
+        self.cycle += 1
+        self._stage_reports = []
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.nframes)
+        paths = {}
+        self.sampler.start()
+        try:
+            yield paths
+        finally:
+            self.sampler.stop()
+            end_snapshot = tracemalloc.take_snapshot()
+            paths.update(self._write_reports(end_snapshot))
+            self.previous_snapshot = end_snapshot
+            # 跨轮比较依赖持续跟踪，这里不停止 tracemalloc
+            logger.info(f"Profile reports written: {paths['folded']}, {paths['memory']}")
+
+    def _write_reports(self, end_snapshot):
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        stamp = f"{time.strftime('%Y%m%d_%H%M%S')}_{self.cycle}"
+        folded = self.output_dir / f"profile_{stamp}.folded"
+        memory = self.output_dir / f"memory_{stamp}.txt"
+        self.sampler.write_folded(folded)
+
+        lines = [f"# Memory report, cycle {self.cycle}"]
+        for name, seconds, current, peak, diff in self._stage_reports:
+            lines.append("")
+            lines.append(f"## {name}: {seconds:.3f}s, current {current / 1024:.1f} KiB, peak {peak / 1024:.1f} KiB")
+            lines.extend(f"  {stat}" for stat in diff if stat.size_diff)
+
+        lines.append("")
+        lines.append("## Top allocations at end of cycle")
+        lines.extend(f"  {stat}" for stat in _reportable(end_snapshot.statistics("lineno"), self.top_n))
+
+        if self.previous_snapshot is not None:
+            diff = end_snapshot.compare_to(self.previous_snapshot, "lineno")
+            growth = sum(stat.size_diff for stat in diff)
+            lines.append("")
+            lines.append(f"## Growth since previous cycle: {growth / 1024:+.1f} KiB")
+            lines.extend(f"  {stat}" for stat in _reportable(diff, self.top_n) if stat.size_diff > 0)
+
+        memory.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        return {"folded": folded, "memory": memory}
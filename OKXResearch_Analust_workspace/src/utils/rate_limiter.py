@@ -0,0 +1,190 @@
+import asyncio
+import logging
+import threading
+import time
+from config.settings import OKX_RATE_LIMIT_FACTOR
+
+logger = logging.getLogger("rate_limiter")
+
+# OKX 公共接口限频 (请求数, 时间窗口秒)
+# 参考 OKX V5 文档，各接口按 IP 独立计数
+OKX_RATE_LIMITS = {
+    "/api/v5/market/tickers": (20, 2),
+    "/api/v5/market/ticker": (20, 2),
+    "/api/v5/market/books": (40, 2),
+    "/api/v5/market/candles": (40, 2),
+    "/api/v5/market/history-candles": (20, 2),
+    "/api/v5/public/funding-rate": (20, 2),
+    "/api/v5/public/open-interest": (20, 2),
+}
+
+# 未登记接口的保守默认值
+DEFAULT_RATE_LIMIT = (10, 2)
+
+
+class TokenBucket:
+    """
+    线程安全的令牌桶
+    采用"预约"方式：获取令牌时直接扣减 (可为负)，并计算需要等待的时间，
+    多个并发调用者会被自动错开，整体以允许的最高速率运行。
+
+    收到限频响应时速率减半 (乘性减)，之后每次成功请求逐步恢复 (加性增)。
+    """
+
+    def __init__(self, rate, capacity, min_rate_ratio=0.1, recovery_ratio=0.05):
+        """
+        :param rate: 每秒补充的令牌数
+        :param capacity: 桶容量 (允许的突发请求数)
+        :param min_rate_ratio: 限频降速后速率的下限 (相对初始速率)
+        :param recovery_ratio: 每次成功请求恢复的速率 (相对初始速率)
+        """
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.min_rate = self.max_rate * min_rate_ratio
+        self.recovery = self.max_rate * recovery_ratio
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+        # 指标
+        self.acquired = 0
+        self.waited = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.throttled = 0
+
+    def _refill(self, now):
+        elapsed = now - self.updated_at
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated_at = now
+
+    def reserve(self, tokens=1):
+        """
+        预约令牌，返回需要等待的秒数 (不阻塞)
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens -= tokens
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+            self.acquired += 1
+            if wait > 0:
+                self.waited += 1
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+            return wait
+
+    def acquire(self, tokens=1):
+        """阻塞直到获取令牌，返回实际等待的秒数"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, tokens=1):
+        """协程版本的 acquire，等待期间不阻塞事件循环"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def on_throttled(self, retry_after=None):
+        """
+        收到 429 / 限频错误码时调用：速率减半并清空令牌
+        :param retry_after: 服务端建议的等待秒数 (可选)
+        """
+        with self._lock:
+            self.throttled += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            # 清空令牌，若服务端给出 Retry-After 则额外预留等待时间
+            self.tokens = min(self.tokens, 0.0)
+            if retry_after:
+                self.tokens = min(self.tokens, -retry_after * self.rate)
+
+    def on_success(self):
+        """请求成功后逐步恢复速率"""
+        if self.rate >= self.max_rate:
+            return
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.recovery)
+
+    def metrics(self):
+        return {
+            "rate": round(self.rate, 3),
+            "max_rate": self.max_rate,
+            "acquired": self.acquired,
+            "waited": self.waited,
+            "total_wait": round(self.total_wait, 3),
+            "max_wait": round(self.max_wait, 3),
+            "throttled": self.throttled,
+        }
+
+
+class RateLimitRegistry:
+    """
+    按接口维护令牌桶的注册表，同一进程内的所有调用者共享
+    """
+
+    def __init__(self, limits=None, default_limit=DEFAULT_RATE_LIMIT, safety_factor=1.0):
+        """
+        :param limits: {endpoint: (请求数, 时间窗口秒)}
+        :param default_limit: 未登记接口使用的限频
+        :param safety_factor: 速率安全系数 (如 0.9 表示只用到官方限频的 90%)
+        """
+        self.limits = dict(limits or {})
+        self.default_limit = default_limit
+        self.safety_factor = safety_factor
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def get(self, endpoint):
+        """获取 (必要时创建) 某接口的令牌桶"""
+        bucket = self._buckets.get(endpoint)
+        if bucket is not None:
+            return bucket
+
+        with self._lock:
+            if endpoint not in self._buckets:
+                count, window = self.limits.get(endpoint, self.default_limit)
+                rate = count / window * self.safety_factor
+                self._buckets[endpoint] = TokenBucket(rate=rate, capacity=max(1.0, count * self.safety_factor))
+            return self._buckets[endpoint]
+
+    def acquire(self, endpoint, tokens=1):
+        return self.get(endpoint).acquire(tokens)
+
+    async def acquire_async(self, endpoint, tokens=1):
+        return await self.get(endpoint).acquire_async(tokens)
+
+    def report_throttled(self, endpoint, retry_after=None):
+        bucket = self.get(endpoint)
+        bucket.on_throttled(retry_after)
+        logger.warning(f"Rate limited on {endpoint}, slowing down to {bucket.rate:.2f} req/s.")
+
+    def report_success(self, endpoint):
+        self.get(endpoint).on_success()
+
+    def metrics(self):
+        """返回各接口的等待/限频指标"""
+        return {endpoint: bucket.metrics() for endpoint, bucket in list(self._buckets.items())}
+
+
+# 进程内共享的 OKX 限频注册表
+_okx_registry = None
+_okx_registry_lock = threading.Lock()
+
+
+def get_okx_rate_limiter(safety_factor=None):
+    """
+    获取进程内共享的 OKX 限频注册表 (首次调用时创建)
+    :param safety_factor: 首次创建时使用的速率安全系数，默认读取配置
+    """
+    global _okx_registry
+    if _okx_registry is None:
+        with _okx_registry_lock:
+            if _okx_registry is None:
+                if safety_factor is None:
+                    safety_factor = OKX_RATE_LIMIT_FACTOR
+                _okx_registry = RateLimitRegistry(OKX_RATE_LIMITS, safety_factor=safety_factor)
+    return _okx_registry
@@ -0,0 +1,208 @@
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger("run_archive")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    status TEXT,
+    model TEXT,
+    user_query TEXT,
+    snapshot_ref TEXT,
+    inputs TEXT,
+    prompt TEXT,
+    report TEXT,
+    news_json TEXT,
+    timings_json TEXT,
+    usage_json TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_runs_started_at ON runs(started_at);
+CREATE TABLE IF NOT EXISTS run_symbols (
+    symbol TEXT NOT NULL,
+    run_id INTEGER NOT NULL,
+    PRIMARY KEY (symbol, run_id)
+) WITHOUT ROWID;
+"""
+
+# 全文索引：trigram 分词支持中文子串检索 (SQLite >= 3.34)，不支持时退回 unicode61
+_FTS_SCHEMAS = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS runs_fts USING fts5(report, prompt, user_query, tokenize='trigram')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS runs_fts USING fts5(report, prompt, user_query)",
+)
+
+# 列表查询时返回的轻量字段 (不含大段文本)
+_SUMMARY_COLUMNS = "id, started_at, finished_at, status, model, user_query, snapshot_ref, timings_json, usage_json"
+
+_SYMBOL_PATTERN = re.compile(r"\b([A-Z0-9]{2,12})(?:-USDT)?\b")
+
+
+def extract_symbols(text, universe=None):
+    """
+    从报告文本中提取提及的币种代码
+    :param universe: 已知币种集合 (如本轮 Top30 的 base)，提供时只保留集合内的代码，
+                     否则只识别 XXX-USDT 形式
+    :return: 排序后的币种列表
+    """
+    if not text:
+        return []
+    if universe:
+        universe = {u.split('-')[0] for u in universe}
+        found = {m.group(1) for m in _SYMBOL_PATTERN.finditer(text)}
+        return sorted(found & universe)
+    return sorted(set(re.findall(r"\b([A-Z0-9]{2,12})-USDT\b", text)))
+
+
+class RunArchive:
+    """
+    分析任务存档：每次运行保存为一条结构化记录 (输入快照引用、prompt、模型、报告、新闻结论、耗时、token 用量)
+    使用 SQLite 存储，按时间、币种建索引，报告/prompt 建 FTS5 全文索引
+    """
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(_SCHEMA)
+        self.has_fts = self._init_fts()
+        self.conn.commit()
+
+    def _init_fts(self):
+        for ddl in _FTS_SCHEMAS:
+            try:
+                self.conn.execute(ddl)
+                return True
+            except sqlite3.OperationalError:
+                continue
+        logger.warning("SQLite FTS5 not available, keyword search will fall back to LIKE.")
+        return False
+
+    def close(self):
+        self.conn.close()
+
+    def save(self, record):
+        """
+        保存一次运行记录
+        :param record: 字典，包含 started_at / finished_at / status / model / user_query / inputs /
+                       prompt / report / news / timings / usage / error / universe 等字段
+        :return: 新记录的 id
+        """
+        inputs = record.get("inputs") or ""
+        snapshot_ref = record.get("snapshot_ref")
+        if not snapshot_ref and inputs:
+            snapshot_ref = hashlib.sha1(inputs.encode("utf-8")).hexdigest()[:12]
+
+        report = record.get("report") or ""
+        prompt = record.get("prompt") or ""
+        user_query = record.get("user_query") or ""
+        symbols = record.get("symbols")
+        if symbols is None:
+            symbols = extract_symbols(report, record.get("universe"))
+
+        with self._lock:
+            cur = self.conn.execute(
+                "INSERT INTO runs (started_at, finished_at, status, model, user_query, snapshot_ref, inputs, prompt, "
+                "report, news_json, timings_json, usage_json, error) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    record.get("started_at") or time.time(),
+                    record.get("finished_at"),
+                    record.get("status"),
+                    record.get("model"),
+                    user_query,
+                    snapshot_ref,
+                    inputs,
+                    prompt,
+                    report,
+                    json.dumps(record.get("news"), ensure_ascii=False) if record.get("news") is not None else None,
+                    json.dumps(record.get("timings") or {}),
+                    json.dumps(record.get("usage") or {}),
+                    record.get("error"),
+                )
+            )
+            run_id = cur.lastrowid
+            if symbols:
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO run_symbols (symbol, run_id) VALUES (?, ?)",
+                    [(s, run_id) for s in symbols]
+                )
+            if self.has_fts:
+                self.conn.execute(
+                    "INSERT INTO runs_fts (rowid, report, prompt, user_query) VALUES (?, ?, ?, ?)",
+                    (run_id, report, prompt, user_query)
+                )
+            self.conn.commit()
+        return run_id
+
+    def query(self, since=None, until=None, symbol=None, keyword=None, status=None, limit=20):
+        """
+        按时间范围、提及币种、关键词查询运行记录 (新 -> 旧)
+        :param since / until: epoch 秒
+        :param symbol: 币种代码，如 BTC 或 BTC-USDT
+        :param keyword: 在报告 / prompt / 用户问题中全文检索
+        :return: 字典列表 (不含大段文本，用 get() 取完整记录)
+        """
+        sql = [f"SELECT {', '.join('r.' + c.strip() for c in _SUMMARY_COLUMNS.split(','))} FROM runs r"]
+        where, params = [], []
+
+        if symbol:
+            sql.append("JOIN run_symbols s ON s.run_id = r.id")
+            where.append("s.symbol = ?")
+            params.append(symbol.upper().split('-')[0])
+        if keyword:
+            # trigram 至少需要 3 个字符，过短的关键词退回 LIKE
+            if self.has_fts and len(keyword) >= 3:
+                where.append("r.id IN (SELECT rowid FROM runs_fts WHERE runs_fts MATCH ?)")
+                params.append('"' + keyword.replace('"', '""') + '"')
+            else:
+                where.append("(r.report LIKE ? OR r.prompt LIKE ? OR r.user_query LIKE ?)")
+                params.extend([f"%{keyword}%"] * 3)
+        if since is not None:
+            where.append("r.started_at >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("r.started_at < ?")
+            params.append(until)
+        if status:
+            where.append("r.status = ?")
+            params.append(status)
+
+        if where:
+            sql.append("WHERE " + " AND ".join(where))
+        sql.append("ORDER BY r.started_at DESC LIMIT ?")
+        params.append(limit)
+
+        with self._lock:
+            rows = self.conn.execute(" ".join(sql), params).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+    def get(self, run_id):
+        """获取完整的运行记录"""
+        with self._lock:
+            row = self.conn.execute("SELECT * FROM runs WHERE id = ?", (run_id,)).fetchone()
+            if row is None:
+                return None
+            symbols = [r[0] for r in self.conn.execute(
+                "SELECT symbol FROM run_symbols WHERE run_id = ? ORDER BY symbol", (run_id,))]
+        record = self._row_to_dict(row)
+        record["symbols"] = symbols
+        return record
+
+    @staticmethod
+    def _row_to_dict(row):
+        record = dict(row)
+        for key in ("news_json", "timings_json", "usage_json"):
+            if key in record:
+                value = record.pop(key)
+                record[key[:-5]] = json.loads(value) if value else None
+        return record
@@ -0,0 +1,41 @@
+import time
+from contextlib import contextmanager
+
+
+class StageTimer:
+    """
+    记录一次分析任务中各阶段的耗时 (秒)
+    用法:
+        timer = StageTimer()
+        with timer.stage("fetch_market"):
+            ...
+        timer.durations  # {"fetch_market": 0.52}
+    """
+
+    def __init__(self, listener=None):
+        """
+        :param listener: 可选的阶段监听器 (或监听器列表)，需实现 stage_started(name) 与 stage_finished(name, seconds)，
+                         如 RunProfiler 借此按阶段记录内存快照，RunStatus 借此在运行中刷新心跳
+        """
+        self.durations = {}
+        if listener is None:
+            listener = []
+        self.listeners = list(listener) if isinstance(listener, (list, tuple)) else [listener]
+
+    @contextmanager
+    def stage(self, name):
+        for listener in self.listeners:
+            listener.stage_started(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            # 同名阶段多次进入时累加
+            self.durations[name] = round(self.durations.get(name, 0.0) + elapsed, 4)
+            for listener in self.listeners:
+                listener.stage_finished(name, elapsed)
+
+    @property
+    def total(self):
+        return round(sum(self.durations.values()), 4)
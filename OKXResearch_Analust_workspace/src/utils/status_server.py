@@ -0,0 +1,197 @@
+import datetime
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger("status_server")
+
+
+def _iso(ts):
+    return datetime.datetime.fromtimestamp(ts).isoformat(timespec="seconds") if ts else None
+
+
+class RunStatus:
+    """
+    定时任务进程的运行状态，供状态服务读取
+    分析线程只在每轮开始 / 结束以及各阶段切换时更新少量字段 (持锁时间极短)，HTTP 线程读取时复制一份，互不阻塞
+    作为 StageTimer 的阶段监听器时，运行中的每个阶段都会刷新心跳，耗时较长的一轮分析不会被判定为失活
+    """
+
+    def __init__(self, next_run=None, stale_after=900):
+        """
+        :param next_run: 返回下一次计划运行时间 (datetime) 的函数，如 schedule.next_run
+        :param stale_after: 调度循环超过该秒数没有心跳时，/healthz 返回 503
+        """
+        self.next_run = next_run
+        self.stale_after = stale_after
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._heartbeat = time.time()
+        self._running_since = None
+        self._stage = None
+        self._last = None
+        self._last_report = None
+        self._status_counts = {}
+        self._cache_totals = {}
+
+    def heartbeat(self):
+        """调度循环每次迭代调用，用于存活检测"""
+        self._heartbeat = time.time()
+
+    def run_started(self):
+        with self._lock:
+            self._running_since = time.time()
+            self._heartbeat = self._running_since
+
+    def stage_started(self, name):
+        with self._lock:
+            self._stage = name
+            self._heartbeat = time.time()
+
+    def stage_finished(self, name, seconds):
+        with self._lock:
+            self._stage = None
+            self._heartbeat = time.time()
+
+    def run_finished(self, record):
+        """记录一轮运行的结果 (run_analysis_task 返回的记录)"""
+        last = {
+            "run_id": record.get("run_id"),
+            "status": record.get("status"),
+            "started_at": _iso(record.get("started_at")),
+            "finished_at": _iso(record.get("finished_at")),
+            "duration": round(record["finished_at"] - record["started_at"], 3) if record.get("finished_at") else None,
+            "timings": dict(record.get("timings") or {}),
+            "usage": dict(record.get("usage") or {}),
+            "cache": record.get("cache") or {},
+            "error": record.get("error"),
+        }
+        with self._lock:
+            self._running_since = None
+            self._stage = None
+            self._heartbeat = time.time()
+            self._last = last
+            status = last["status"]
+            self._status_counts[status] = self._status_counts.get(status, 0) + 1
+            for name, stats in last["cache"].items():
+                totals = self._cache_totals.setdefault(name, {"hits": 0, "misses": 0})
+                totals["hits"] += stats.get("hits", 0)
+                totals["misses"] += stats.get("misses", 0)
+            if record.get("report") and status == "ok":
+                self._last_report = (last["finished_at"], record["report"])
+
+    def healthy(self):
+        return time.time() - self._heartbeat <= self.stale_after
+
+    def snapshot(self):
+        """当前状态的 JSON 可序列化副本"""
+        with self._lock:
+            last = dict(self._last) if self._last else None
+            running_since = self._running_since
+            stage = self._stage
+            counts = dict(self._status_counts)
+            cache = {name: dict(v) for name, v in self._cache_totals.items()}
+
+        for stats in cache.values():
+            total = stats["hits"] + stats["misses"]
+            stats["hit_rate"] = round(stats["hits"] / total, 4) if total else None
+
+        next_run = None
+        if self.next_run is not None:
+            try:
+                value = self.next_run()
+                next_run = value.isoformat(timespec="seconds") if value else None
+            except Exception:
+                next_run = None
+
+        return {
+            "healthy": self.healthy(),
+            "uptime": round(time.time() - self.started_at, 1),
+            "heartbeat_age": round(time.time() - self._heartbeat, 1),
+            "running": running_since is not None,
+            "running_since": _iso(running_since),
+            "stage": stage,
+            "runs": counts,
+            "last_run": last,
+            "cache": cache,
+            "next_run": next_run,
+        }
+
+    def latest_report(self):
+        """最近一次成功生成的报告 (finished_at, markdown)，尚无时返回 None"""
+        with self._lock:
+            return self._last_report
+
+
+class _StatusHandler(BaseHTTPRequestHandler):
+    server_version = "OKXResearchStatus/1.0"
+
+    def do_GET(self):
+        status = self.server.run_status
+        path = self.path.split("?", 1)[0].rstrip("/") or "/"
+        if path == "/healthz":
+            healthy = status.healthy()
+            self._send(200 if healthy else 503, {"status": "ok" if healthy else "stale"})
+        elif path in ("/", "/status"):
+            self._send(200, status.snapshot())
+        elif path == "/report":
+            report = status.latest_report()
+            if report is None:
+                self._send(404, {"error": "no report yet"})
+            else:
+                finished_at, text = report
+                self._send(200, text, content_type="text/markdown; charset=utf-8",
+                           headers={"X-Report-Time": finished_at or ""})
+        else:
+            self._send(404, {"error": "not found"})
+
+    def _send(self, code, body, content_type="application/json", headers=None):
+        if not isinstance(body, str):
+            body = json.dumps(body, ensure_ascii=False)
+        data = body.encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # 探针请求频繁，只记 debug 日志
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+class StatusServer:
+    """
+    嵌入式 HTTP 状态服务，在后台守护线程中运行
+    - GET /healthz: 存活检测 (调度循环心跳超时返回 503)
+    - GET /status:  最近一轮的时间、状态、各阶段耗时、缓存命中率与下一次计划运行时间
+    - GET /report:  最近一次生成的报告 (Markdown)
+    """
+
+    def __init__(self, run_status, host="0.0.0.0", port=8080):
+        self.run_status = run_status
+        self.httpd = ThreadingHTTPServer((host, port), _StatusHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.run_status = run_status
+        self._thread = None
+
+    @property
+    def port(self):
+        return self.httpd.server_address[1]
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="status-server", daemon=True)
+        self._thread.start()
+        logger.info(f"Status server listening on port {self.port}")
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
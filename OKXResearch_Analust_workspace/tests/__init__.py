@@ -0,0 +1,12 @@
+import os
+import sys
+
+# 与 src/main.py 保持一致：将 src 目录和项目根目录加入 Python 路径，
+# 使 `from api.xxx import ...` 风格的模块内导入在测试中同样可用
+_tests_dir = os.path.dirname(os.path.abspath(__file__))
+_project_root = os.path.dirname(_tests_dir)
+_src_path = os.path.join(_project_root, "src")
+
+for _path in (_src_path, _project_root):
+    if _path not in sys.path:
+        sys.path.append(_path)
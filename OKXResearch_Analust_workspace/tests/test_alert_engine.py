@@ -0,0 +1,228 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+import numpy as np
+import pandas as pd
+from analysis.alert_engine import AlertRule, AlertEngine, AlertDispatcher, load_rules, ticker_metrics, ring_metrics, format_alerts
+from analysis.alert_engine import ring_coverage, required_ring_slots
+from utils.price_ring import PriceRingWriter, PriceRingReader
+
+
+def make_tickers(prices, volume=1e7):
+    return pd.DataFrame({
+        'instId': pd.Categorical(list(prices)),
+        'last': list(prices.values()),
+        'open24h': [p / 1.1 for p in prices.values()],
+        'volCcy24h': [volume] * len(prices),
+        'bidPx': [p * 0.999 for p in prices.values()],
+        'askPx': [p * 1.001 for p in prices.values()],
+    })
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class RecordingNotifier:
+    def __init__(self):
+        self.messages = []
+        self.sent = threading.Event()
+
+    def send(self, title, content):
+        self.messages.append((title, content))
+        self.sent.set()
+
+
+class TestAlertRules(unittest.TestCase):
+    def test_invalid_rules(self):
+        with self.assertRaises(ValueError):
+            AlertRule("x", "unknown", ">", 1)
+        with self.assertRaises(ValueError):
+            AlertRule("x", "price", "!=", 1)
+        with self.assertRaises(ValueError):
+            AlertRule("x", "change", ">", 1)
+        self.assertEqual(AlertRule("x", "change", ">", 1, window=3600).column, "change_3600s")
+
+    def test_load_rules(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "rules.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump([{"name": "hot", "metric": "funding_rate", "op": ">", "value": 0.05}], f)
+            self.assertEqual(load_rules(path)[0].name, "hot")
+            self.assertEqual(load_rules(os.path.join(tmp, "missing.json")), [])
+
+    def test_shipped_rules_fit_default_ring(self):
+        path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", "alert_rules.json")
+        engine = AlertEngine(load_rules(path))
+        # 默认 PRICE_RING_SLOTS=120、PRICE_RING_INTERVAL=5
+        self.assertLessEqual(max(engine.windows), ring_coverage(120, 5))
+        self.assertEqual(required_ring_slots(3600, 5), 722)
+        self.assertEqual(ring_coverage(722, 5), 3600)
+
+    def test_ticker_metrics(self):
+        metrics = ticker_metrics(make_tickers({"BTC-USDT": 110.0}), {"BTC-USDT": 0.06})
+        self.assertAlmostEqual(metrics.loc["BTC-USDT", "change_24h"], 10.0)
+        self.assertAlmostEqual(metrics.loc["BTC-USDT", "spread_bps"], 20.0)
+        self.assertEqual(metrics.loc["BTC-USDT", "funding_rate"], 0.06)
+        self.assertTrue(np.isnan(ticker_metrics(make_tickers({"BTC-USDT": 1.0}))["funding_rate"].iloc[0]))
+
+
+class TestAlertEngine(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.metrics = pd.DataFrame({
+            'price': [100.0, 10.0, 1.0],
+            'change_24h': [2.0, -12.0, 30.0],
+            'volume_24h': [1e9, 1e8, 1e3],
+            'funding_rate': [0.06, -0.2, np.nan],
+        }, index=pd.Index(['BTC-USDT', 'ETH-USDT', 'TINY-USDT'], name='instId'))
+
+    def test_vectorized_match(self):
+        engine = AlertEngine([
+            {"name": "btc_funding", "metric": "funding_rate", "op": ">", "value": 0.05, "symbols": ["BTC-USDT"]},
+            {"name": "funding_extreme", "metric": "funding_rate", "op": "abs>", "value": 0.1},
+            {"name": "pump", "metric": "change_24h", "op": ">=", "value": 20},
+            {"name": "liquid_pump", "metric": "change_24h", "op": ">=", "value": 20, "min_volume": 1e6},
+            {"name": "dump", "metric": "change_24h", "op": "<=", "value": -10},
+        ], clock=self.clock)
+        hits, known = engine.match(self.metrics)
+        self.assertEqual(hits.shape, (3, 5))
+        fired = {(a['rule'], a['symbol']) for a in engine.evaluate(self.metrics)}
+        self.assertEqual(fired, {("btc_funding", "BTC-USDT"), ("funding_extreme", "ETH-USDT"),
+                                 ("pump", "TINY-USDT"), ("dump", "ETH-USDT")})
+        # 缺失的资金费率视为未知
+        self.assertFalse(known[2, 0])
+
+    def test_dedup_and_cooldown(self):
+        engine = AlertEngine([{"name": "hot", "metric": "funding_rate", "op": ">", "value": 0.05, "cooldown": 60}],
+                             clock=self.clock)
+        self.assertEqual(len(engine.evaluate(self.metrics)), 1)
+        # 条件持续成立：不重复告警，即使冷却已过
+        self.clock.now += 120
+        self.assertEqual(engine.evaluate(self.metrics), [])
+
+        # 条件解除后再次成立，但仍在冷却期内
+        calm = self.metrics.assign(funding_rate=0.01)
+        engine.evaluate(calm)
+        self.clock.now += 10
+        engine.evaluate(calm)
+        self.assertEqual(len(engine.evaluate(self.metrics)), 1)
+        self.clock.now += 10
+        engine.evaluate(calm)
+        self.assertEqual(engine.evaluate(self.metrics), [])
+        # 冷却结束后再次由不成立变为成立
+        self.clock.now += 60
+        engine.evaluate(calm)
+        self.assertEqual(len(engine.evaluate(self.metrics)), 1)
+
+    def test_repeat_rule_reminds_after_cooldown(self):
+        engine = AlertEngine([{"name": "hot", "metric": "funding_rate", "op": ">", "value": 0.05, "repeat": True}],
+                             default_cooldown=60, clock=self.clock)
+        self.assertEqual(len(engine.evaluate(self.metrics)), 1)
+        self.clock.now += 30
+        self.assertEqual(engine.evaluate(self.metrics), [])
+        self.clock.now += 31
+        self.assertEqual(len(engine.evaluate(self.metrics)), 1)
+
+    def test_unknown_value_keeps_state(self):
+        engine = AlertEngine([{"name": "hot", "metric": "funding_rate", "op": ">", "value": 0.05}], clock=self.clock)
+        self.assertEqual(len(engine.evaluate(self.metrics)), 1)
+        # 资金费率暂未刷新 (NaN) 不算条件解除
+        engine.evaluate(self.metrics.assign(funding_rate=np.nan))
+        self.clock.now += 3600
+        self.assertEqual(engine.evaluate(self.metrics), [])
+
+    def test_format_alerts(self):
+        engine = AlertEngine([{"name": "hot", "metric": "funding_rate", "op": ">", "value": 0.05}], clock=self.clock)
+        title, content = format_alerts(engine.evaluate(self.metrics))
+        self.assertEqual(title, "OKX Alert: BTC-USDT funding_rate > 0.05")
+        self.assertIn("`hot`: funding_rate = 0.06", content)
+
+
+class TestRingAlerts(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "ring.bin")
+        self.writer = PriceRingWriter(self.path, slots=16, max_instruments=8)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_window_change_from_ring(self):
+        for i, price in enumerate([100.0, 104.0, 110.0, 118.0]):
+            self.writer.write(make_tickers({"SOL-USDT": price}), ts=1000.0 + 60 * i)
+        reader = PriceRingReader(self.path)
+        metrics, data_ts = ring_metrics(reader, windows=[120, 3600])
+        self.assertEqual(data_ts, 1180.0)
+        # 120 秒前的价格为 104
+        self.assertAlmostEqual(metrics.loc["SOL-USDT", "change_120s"], (118 / 104 - 1) * 100)
+        # 缓冲区覆盖不到一小时
+        self.assertTrue(np.isnan(metrics.loc["SOL-USDT", "change_3600s"]))
+
+    def test_full_ring_coverage(self):
+        # 写满并回绕后，最长可计算 ring_coverage 秒的涨跌幅
+        for i in range(20):
+            self.writer.write(make_tickers({"SOL-USDT": 100.0 + i}), ts=1000.0 + 60 * i)
+        reader = PriceRingReader(self.path)
+        coverage = ring_coverage(16, 60)
+        metrics, _ = ring_metrics(reader, windows=[coverage, coverage + 60])
+        self.assertAlmostEqual(metrics.loc["SOL-USDT", f"change_{coverage}s"], (119 / 105 - 1) * 100)
+        self.assertTrue(np.isnan(metrics.loc["SOL-USDT", f"change_{coverage + 60}s"]))
+
+    def test_alert_within_a_second_of_snapshot(self):
+        self.writer.write(make_tickers({"SOL-USDT": 100.0, "BTC-USDT": 100.0}), ts=time.time() - 300)
+        reader = PriceRingReader(self.path)
+        engine = AlertEngine([{"name": "pump_5m", "metric": "change", "window": 300, "op": ">=", "value": 15,
+                               "report": True}])
+        notifier = RecordingNotifier()
+        queries = []
+        dispatcher = AlertDispatcher(notifier, report_fn=queries.append)
+
+        seq = reader.seq
+        self.writer.write(make_tickers({"SOL-USDT": 120.0, "BTC-USDT": 101.0}))
+        seq = reader.wait_for_update(seq, timeout=1)
+        metrics, data_ts = ring_metrics(reader, engine.windows)
+        dispatcher.dispatch(engine.evaluate(metrics, data_ts=data_ts))
+        self.assertTrue(notifier.sent.wait(1))
+        dispatcher.close()
+
+        self.assertEqual(notifier.messages[0][0], "OKX Alert: SOL-USDT change_300s >= 15")
+        self.assertLess(dispatcher.last_latency, 1.0)
+        self.assertEqual(len(queries), 1)
+        self.assertIn("SOL-USDT", queries[0])
+
+
+class TestAlertDispatcher(unittest.TestCase):
+    def test_report_requests_are_single_flight(self):
+        release = threading.Event()
+        calls = []
+
+        def slow_report(query):
+            calls.append(query)
+            release.wait(2)
+
+        dispatcher = AlertDispatcher(None, report_fn=slow_report)
+        alert = {"rule": "pump", "symbol": "SOL-USDT", "metric": "change_24h", "op": ">", "threshold": 10.0,
+                 "value": 12.0, "ts": time.time(), "data_ts": time.time(), "report": True}
+        dispatcher.dispatch([alert])
+        dispatcher.dispatch([dict(alert, symbol="ETH-USDT")])
+        release.set()
+        dispatcher.close()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(dispatcher.sent, 2)
+        # 没有 report 标记的告警不生成报告
+        dispatcher = AlertDispatcher(None, report_fn=calls.append)
+        dispatcher.dispatch([dict(alert, report=False)])
+        dispatcher.close()
+        self.assertEqual(len(calls), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
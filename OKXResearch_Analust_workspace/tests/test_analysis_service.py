@@ -0,0 +1,156 @@
+import json
+import threading
+import time
+import unittest
+import urllib.error
+import urllib.request
+from utils.analysis_service import AnalysisService, AnalysisServer, normalize_query, _ServiceHandler
+
+
+class FakePipeline:
+    """prepare / analyze 替身：analyze 阻塞到 release 被设置，便于观察排队与合并"""
+
+    def __init__(self):
+        self.prepares = 0
+        self.queries = []
+        self.release = threading.Event()
+        self.lock = threading.Lock()
+
+    def prepare(self):
+        self.prepares += 1
+        return {"snapshot_ref": f"snap{self.prepares}", "created_at": time.time()}
+
+    def analyze(self, query, inputs):
+        with self.lock:
+            self.queries.append((query, inputs["snapshot_ref"]))
+        self.release.wait(5)
+        if query == "boom":
+            raise RuntimeError("LLM down")
+        return {"status": "ok", "report": f"report for {query} @ {inputs['snapshot_ref']}", "run_id": 7}
+
+
+class TestAnalysisService(unittest.TestCase):
+    def setUp(self):
+        self.pipeline = FakePipeline()
+        self.service = AnalysisService(self.pipeline.prepare, self.pipeline.analyze, refresh_interval=3600,
+                                       workers=1, max_queue=2)
+
+    def tearDown(self):
+        self.pipeline.release.set()
+        self.service.stop()
+
+    def test_no_snapshot(self):
+        self.assertEqual(self.service.submit("BTC"), (None, "no_snapshot"))
+
+    def test_identical_requests_coalesce(self):
+        self.service.refresh()
+        jobs = [self.service.submit(q) for q in ["分析 BTC", " 分析  BTC ", "分析 BTC"]]
+        self.assertEqual([outcome for _, outcome in jobs], ["new", "coalesced", "coalesced"])
+        job = jobs[0][0]
+        self.assertTrue(all(j is job for j, _ in jobs))
+        self.assertEqual(job.requests, 3)
+
+        self.pipeline.release.set()
+        self.assertTrue(job.finished.wait(2))
+        self.assertEqual(job.status, "done")
+        self.assertEqual(self.pipeline.queries, [("分析 BTC", "snap1")])
+        # 同一快照下已完成的任务直接复用
+        self.assertIs(self.service.submit("分析 BTC")[0], job)
+
+        # 快照更新后重新分析
+        self.service.refresh()
+        fresh, outcome = self.service.submit("分析 BTC")
+        self.assertEqual(outcome, "new")
+        self.assertTrue(fresh.finished.wait(2))
+        self.assertEqual(fresh.report, "report for 分析 BTC @ snap2")
+
+    def test_bounded_queue(self):
+        self.service.refresh()
+        running, _ = self.service.submit("a")
+        deadline = time.time() + 2
+        while running.status != "running" and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(running.status, "running")
+
+        self.assertEqual(self.service.submit("b")[1], "new")
+        self.assertEqual(self.service.submit("c")[1], "new")
+        self.assertEqual(self.service.submit("d"), (None, "queue_full"))
+        # 合并不占用队列
+        self.assertEqual(self.service.submit("b")[1], "coalesced")
+        self.assertEqual(self.service.status()["jobs"], {"running": 1, "queued": 2})
+
+        self.pipeline.release.set()
+        self.service.stop()
+        self.service._executor.shutdown(wait=True)
+        self.assertEqual(len(self.pipeline.queries), 3)
+        self.assertEqual(self.service.status()["stats"]["rejected"], 1)
+
+    def test_failed_job_is_retried(self):
+        self.service.refresh()
+        self.pipeline.release.set()
+        job, _ = self.service.submit("boom")
+        self.assertTrue(job.finished.wait(2))
+        self.assertEqual((job.status, job.error), ("error", "LLM down"))
+        retry, outcome = self.service.submit("boom")
+        self.assertEqual(outcome, "new")
+        self.assertIsNot(retry, job)
+
+    def test_normalize_query(self):
+        self.assertEqual(normalize_query("  a \n b "), "a b")
+        self.assertEqual(normalize_query(None), "")
+
+
+class TestAnalysisServer(unittest.TestCase):
+    def setUp(self):
+        self.pipeline = FakePipeline()
+        self.service = AnalysisService(self.pipeline.prepare, self.pipeline.analyze, refresh_interval=3600)
+        self.server = AnalysisServer(self.service, host="127.0.0.1", port=0).start()
+        self.base = f"http://127.0.0.1:{self.server.port}"
+
+    def tearDown(self):
+        self.pipeline.release.set()
+        self.server.stop()
+        self.service.stop()
+
+    def request(self, path, body=None):
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        try:
+            with urllib.request.urlopen(urllib.request.Request(self.base + path, data=data), timeout=5) as resp:
+                return resp.status, json.loads(resp.read())
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read())
+
+    def test_endpoints(self):
+        self.assertEqual(self.request("/analyze", {"query": "BTC"})[0], 503)
+        self.assertEqual(self.request("/healthz")[0], 503)
+        self.service.start()
+        self.assertEqual(self.request("/healthz")[0], 200)
+
+        code, job = self.request("/analyze", {"query": "BTC"})
+        self.assertEqual((code, job["coalesced"]), (202, False))
+        self.assertIn(job["status"], ("queued", "running"))
+        code, again = self.request("/analyze", {"query": "BTC"})
+        self.assertEqual((again["job_id"], again["coalesced"]), (job["job_id"], True))
+
+        self.pipeline.release.set()
+        code, done = self.request(f"/jobs/{job['job_id']}?wait=2")
+        self.assertEqual((code, done["status"], done["report"]), (200, "done", "report for BTC @ snap1"))
+        self.assertEqual(done["requests"], 2)
+
+        code, status = self.request("/status")
+        self.assertEqual(status["snapshot_ref"], "snap1")
+        self.assertEqual(status["stats"]["coalesced"], 1)
+        self.assertEqual(self.request("/jobs/999")[0], 404)
+        self.assertEqual(self.request("/analyze", [1])[0], 400)
+
+    def test_rejects_invalid_requests(self):
+        self.service.start()
+        code, error = self.request("/analyze", {"query": 1})
+        self.assertEqual((code, error["error"]), (400, "query must be a string"))
+        self.assertEqual(self.request("/analyze", {"query": ["BTC"]})[0], 400)
+        self.assertEqual(self.request("/analyze", {"query": "x" * (_ServiceHandler.MAX_BODY + 1)})[0], 413)
+        self.assertEqual(self.service.status()["stats"]["submitted"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import time
+import unittest
+from unittest import mock
+import numpy as np
+import pandas as pd
+from analysis.anomaly_screener import AnomalyScreener, robust_zscore, format_anomaly_fields
+from utils.stage_timer import StageTimer
+
+
+def make_universe(n=50):
+    """n 个平稳的交易对，涨跌幅在 ±1% 内均匀分布，没有离群值"""
+    open_price = np.full(n, 10.0)
+    last = open_price * (1 + np.linspace(-0.01, 0.01, n))
+    return pd.DataFrame({
+        'symbol': [f"C{i}-USDT" for i in range(n)],
+        'last': last,
+        'open_24h': open_price,
+        'high_24h': np.maximum(last, open_price) * 1.02,
+        'low_24h': np.minimum(last, open_price) * 0.98,
+        'quote_volume': np.full(n, 1_000_000.0),
+    })
+
+
+class TestAnomalyScreener(unittest.TestCase):
+    def test_flags_big_mover(self):
+        df = make_universe()
+        df.loc[7, ['last', 'high_24h']] = [13.0, 13.5]
+        df.loc[8, ['last', 'low_24h']] = [7.0, 6.8]
+
+        result = AnomalyScreener(top_n=5).screen(df)
+
+        self.assertEqual(set(result['symbol'][:2]), {'C7-USDT', 'C8-USDT'})
+        flags = dict(zip(result['symbol'], result['flags']))
+        self.assertIn("暴涨", flags['C7-USDT'])
+        self.assertIn("暴跌", flags['C8-USDT'])
+
+    def test_volume_spike_against_history(self):
+        screener = AnomalyScreener(top_n=5)
+        df = make_universe()
+        # 首轮没有基线，不会因成交额被标记
+        self.assertTrue(screener.screen(df).empty)
+
+        spiked = df.copy()
+        spiked.loc[3, 'quote_volume'] = 6_000_000.0
+        result = screener.screen(spiked)
+
+        self.assertEqual(result['symbol'].tolist(), ['C3-USDT'])
+        self.assertAlmostEqual(result.loc[0, 'vol_ratio'], 6.0)
+        self.assertIn("放量 6.0x", result.loc[0, 'flags'])
+
+    def test_funding_extreme_and_exclusion(self):
+        df = make_universe()
+        funding = {f"C{i}-USDT": 0.01 + 0.0001 * i for i in range(10)}
+        funding["C2-USDT"] = 0.3
+
+        result = AnomalyScreener().screen(df, funding_rates=funding)
+        self.assertEqual(result['symbol'].tolist(), ['C2-USDT'])
+        self.assertIn("资金费率极端", result.loc[0, 'flags'])
+
+        result = AnomalyScreener().screen(df, funding_rates=funding, exclude={'C2-USDT'})
+        self.assertTrue(result.empty)
+
+    def test_funding_factor_in_analysis_pipeline(self):
+        """按 prepare_analysis_inputs 的调用方式：主流币资金费率之外，还需拉取全市场资金费率"""
+        import main
+
+        majors = pd.DataFrame({'symbol': ["BTC-USDT", "ETH-USDT", "SOL-USDT", "DOGE-USDT"], 'last': 100.0,
+                               'open_24h': 100.0, 'high_24h': 101.0, 'low_24h': 99.0, 'quote_volume': 1e9})
+        # OKXClient 返回 OKX 原始列名，由 OKXAdapter 转换
+        df = pd.concat([majors, make_universe()], ignore_index=True).rename(columns={
+            'symbol': 'instId', 'open_24h': 'open24h', 'high_24h': 'high24h', 'low_24h': 'low24h',
+            'quote_volume': 'volCcy24h'})
+        funding = {f"C{i}-USDT": 0.01 + 0.0001 * i for i in range(50)}
+        funding["C2-USDT"] = 0.3
+
+        okx = mock.MagicMock()
+        okx.get_tickers_multi.return_value = {"SPOT": df, "SWAP": None, "FUTURES": None}
+        # 与真实接口一致：默认只返回几个主流币
+        okx.get_funding_rates.return_value = {s: 0.01 for s in majors['symbol']}
+        okx.get_all_funding_rates.return_value = funding
+        okx.rate_limit_metrics.return_value = {}
+        okx.transport_stats.return_value = {"hedges": 0, "failovers": 0, "hedge_wins": 0}
+        ingestor = mock.MagicMock(store={"posts": {}, "verdicts": {}}, verdict_hits=0, verdict_misses=0)
+        ingestor.fetch.return_value = ([], [])
+        ingestor.recent.return_value = []
+        fundamental = mock.MagicMock(sector_hits=0, sector_misses=0)
+        fundamental.get_coin_sector.return_value = "Unknown"
+        fundamental.llm_client.usage = {}
+
+        patches = dict(OKXClient=mock.MagicMock(return_value=okx), NewsClient=mock.MagicMock(),
+                       NewsIngestor=mock.MagicMock(return_value=ingestor),
+                       FundamentalAnalyzer=mock.MagicMock(return_value=fundamental),
+                       get_venue_aggregator=mock.MagicMock(return_value=None),
+                       anomaly_screener=None, coin_news_index=None, USE_PRICE_RING=False, PROMPT_TOP_N=4,
+                       ENABLE_ANOMALY_SCREENER=True, ENABLE_LIQUIDITY_METRICS=False, ENABLE_CORRELATION=False,
+                       ENABLE_SECTOR_SUMMARY=False)
+        with mock.patch.multiple(main, **patches):
+            inputs = main.prepare_analysis_inputs(mock.MagicMock(api_key=None), StageTimer(), {})
+
+        self.assertIn("C2-USDT", inputs["universe"])
+        anomalies = inputs["summary"].split("全市场异动")[1]
+        self.assertIn("Symbol: C2-USDT", anomalies)
+        self.assertIn("资金费率极端", anomalies)
+
+    def test_illiquid_pairs_are_ignored(self):
+        df = make_universe()
+        df.loc[5, ['last', 'quote_volume']] = [30.0, 5_000.0]
+        result = AnomalyScreener(min_volume=100_000).screen(df)
+        self.assertNotIn('C5-USDT', result['symbol'].tolist())
+
+    def test_full_universe_is_fast(self):
+        df = make_universe(n=700)
+        screener = AnomalyScreener()
+        screener.screen(df)
+
+        start = time.perf_counter()
+        screener.screen(df)
+        self.assertLess(time.perf_counter() - start, 0.5)
+
+    def test_robust_zscore_and_fields(self):
+        z = robust_zscore([1.0, 1.0, 1.0, 1.0])
+        self.assertTrue((z == 0).all())
+        self.assertTrue(np.isnan(robust_zscore([1.0, np.nan, 2.0])[1]))
+
+        df = make_universe()
+        df.loc[7, 'last'] = 13.0
+        fields = format_anomaly_fields(AnomalyScreener().screen(df))
+        self.assertIn("Anomaly: 暴涨", fields['C7-USDT'])
+
+
+if __name__ == '__main__':
+    unittest.main()
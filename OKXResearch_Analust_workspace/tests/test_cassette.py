@@ -0,0 +1,139 @@
+import gzip
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+from utils.cassette import Cassette, request_key
+
+
+class _Handler(BaseHTTPRequestHandler):
+    counter = 0
+
+    def do_GET(self):
+        _Handler.counter += 1
+        self._reply(200, {"path": self.path.split("?")[0], "n": _Handler.counter})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self._reply(200, {"echo": body["prompt"]})
+
+    def _reply(self, code, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestCassette(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "run.json.gz")
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def tearDown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.tmp.cleanup()
+
+    def record(self):
+        with Cassette(self.path, mode="record") as cassette:
+            cassette.attach("news_store", '{"posts": {}}')
+            first = requests.get(f"{self.base}/tickers", params={"instType": "SPOT", "auth_token": "secret"}).json()
+            second = requests.get(f"{self.base}/tickers", params={"auth_token": "secret", "instType": "SPOT"}).json()
+            answers = [requests.post(f"{self.base}/chat", json={"prompt": p}).json() for p in ("a", "b")]
+        return first, second, answers
+
+    def test_replay_returns_recorded_responses_offline(self):
+        first, second, answers = self.record()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+        with Cassette(self.path, mode="replay") as cassette:
+            # 同一请求按录制顺序依次返回，参数顺序与密钥不影响匹配
+            self.assertEqual(requests.get(f"{self.base}/tickers", params={"instType": "SPOT", "auth_token": "x"}).json(), first)
+            self.assertEqual(requests.get(f"{self.base}/tickers?instType=SPOT").json(), second)
+            # 请求体精确匹配，与调用顺序无关
+            self.assertEqual(requests.post(f"{self.base}/chat", json={"prompt": "b"}).json(), answers[1])
+            self.assertEqual(requests.post(f"{self.base}/chat", json={"prompt": "a"}).json(), answers[0])
+            # 请求体变化时退化为按 URL 匹配
+            self.assertIn("echo", requests.post(f"{self.base}/chat", json={"prompt": "changed"}).json())
+            with self.assertRaises(requests.ConnectionError):
+                requests.get(f"{self.base}/unknown")
+            self.assertEqual(cassette.misses, 1)
+            self.assertEqual(cassette.attachment("news_store"), '{"posts": {}}')
+
+        # 退出后恢复真实网络 (服务已关闭)
+        with self.assertRaises(requests.ConnectionError):
+            requests.get(f"{self.base}/tickers", timeout=1)
+
+    def test_cassette_is_compact_and_has_no_secrets(self):
+        self.record()
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            text = f.read()
+        self.assertNotIn("secret", text)
+        data = json.loads(text)
+        self.assertEqual(len(data["interactions"]), 4)
+        self.assertTrue(data["interactions"][0]["request"].endswith("/tickers?instType=SPOT"))
+
+    def test_replay_latency(self):
+        self.record()
+        with Cassette(self.path, mode="replay") as cassette:
+            for entry in cassette.interactions:
+                entry["elapsed"] = 0.05
+            start = time.perf_counter()
+            requests.get(f"{self.base}/tickers?instType=SPOT")
+            self.assertLess(time.perf_counter() - start, 0.04)
+            cassette.latency = 2
+            start = time.perf_counter()
+            requests.get(f"{self.base}/tickers?instType=SPOT")
+            self.assertGreaterEqual(time.perf_counter() - start, 0.1)
+
+    def test_request_key(self):
+        self.assertEqual(request_key("get", "https://h/p?b=2&a=1&sign=x")[0], "GET https://h/p?a=1&b=2")
+        self.assertEqual(request_key("POST", "https://h/p", '{"a": 1}'), request_key("POST", "https://h/p", b'{"a": 1}'))
+
+    def test_webhook_tokens_are_redacted(self):
+        feishu = request_key("POST", "https://open.feishu.cn/open-apis/bot/v2/hook/0f1e2d3c-secret-token")[0]
+        self.assertEqual(feishu, "POST https://open.feishu.cn/open-apis/bot/v2/hook/REDACTED")
+        self.assertEqual(request_key("POST", "https://oapi.dingtalk.com/robot/send?access_token=abc&sign=x")[0],
+                         "POST https://oapi.dingtalk.com/robot/send")
+        # 其他主机的路径不受影响
+        self.assertEqual(request_key("GET", "https://h/open-apis/bot/v2/hook/x")[0],
+                         "GET https://h/open-apis/bot/v2/hook/x")
+
+    def test_failed_webhook_is_recorded_without_token(self):
+        url = "https://open.feishu.cn/open-apis/bot/v2/hook/0f1e2d3c-secret-token"
+
+        def refuse(adapter, request, **kwargs):
+            raise requests.ConnectionError(f"Max retries exceeded with url: {request.path_url}")
+
+        with mock.patch("requests.adapters.HTTPAdapter.send", refuse):
+            with Cassette(self.path, mode="record"):
+                with self.assertRaises(requests.ConnectionError):
+                    requests.post(url, json={"msg_type": "text"}, timeout=1)
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            text = f.read()
+        self.assertNotIn("secret-token", text)
+        self.assertIn("hook/REDACTED", text)
+
+        # 回放时按主机与路径前缀匹配，与具体 token 无关
+        with Cassette(self.path, mode="replay") as cassette:
+            with self.assertRaises(requests.ConnectionError):
+                requests.post(url.replace("0f1e2d3c", "another"), json={"msg_type": "text"}, timeout=1)
+        self.assertEqual(cassette.misses, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+import pandas as pd
+from analysis.change_detector import MaterialityGate
+
+
+def make_tickers(prices, vols=None):
+    ids = list(prices)
+    return pd.DataFrame({
+        'symbol': ids,
+        'last': [prices[i] for i in ids],
+        'quote_volume': vols or list(range(len(ids), 0, -1)),
+    })
+
+
+class TestMaterialityGate(unittest.TestCase):
+    def setUp(self):
+        self.gate = MaterialityGate(price_change_pct=1.0, rank_churn=0.5, funding_delta=0.01,
+                                    min_new_headlines=1, max_skips=2, top_n=3)
+        self.df = make_tickers({'BTC-USDT': 100.0, 'ETH-USDT': 10.0, 'SOL-USDT': 5.0})
+        self.news = [{"id": 1}, {"id": 2}]
+        self.funding = {'BTC-USDT': 0.01}
+
+        first = self.gate.evaluate(self.df, self.funding, self.news)
+        self.assertTrue(first["material"])
+        self.gate.mark_analyzed(first)
+
+    def test_skip_when_unchanged(self):
+        """价格、新闻、费率均无显著变化时跳过"""
+        df = make_tickers({'BTC-USDT': 100.5, 'ETH-USDT': 10.0, 'SOL-USDT': 5.0})
+        decision = self.gate.evaluate(df, {'BTC-USDT': 0.012}, self.news)
+
+        self.assertFalse(decision["material"])
+        self.assertIn("BTC-USDT", decision["summary"])
+        self.assertAlmostEqual(self.gate.skip_rate, 0.5)
+
+    def test_price_move_is_material(self):
+        df = make_tickers({'BTC-USDT': 100.0, 'ETH-USDT': 10.0, 'SOL-USDT': 5.2})
+        decision = self.gate.evaluate(df, self.funding, self.news)
+
+        self.assertTrue(decision["material"])
+        self.assertEqual(decision["metrics"]["max_price_mover"], 'SOL-USDT')
+
+    def test_new_headline_and_funding_are_material(self):
+        self.assertTrue(self.gate.evaluate(self.df, self.funding, self.news + [{"id": 3}])["material"])
+        self.assertTrue(self.gate.evaluate(self.df, {'BTC-USDT': 0.05}, self.news)["material"])
+
+    def test_baseline_only_moves_on_analysis(self):
+        """基线只在实际分析后更新，缓慢漂移最终会累积触发"""
+        for price in (100.4, 100.8):
+            df = make_tickers({'BTC-USDT': price, 'ETH-USDT': 10.0, 'SOL-USDT': 5.0})
+            self.assertFalse(self.gate.evaluate(df, self.funding, self.news)["material"])
+
+        df = make_tickers({'BTC-USDT': 101.2, 'ETH-USDT': 10.0, 'SOL-USDT': 5.0})
+        self.assertTrue(self.gate.evaluate(df, self.funding, self.news)["material"])
+
+    def test_forced_refresh_after_max_skips(self):
+        for _ in range(2):
+            self.assertFalse(self.gate.evaluate(self.df, self.funding, self.news)["material"])
+
+        decision = self.gate.evaluate(self.df, self.funding, self.news)
+        self.assertTrue(decision["material"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import unittest
+import numpy as np
+import pandas as pd
+from analysis.correlation import CorrelationEngine, attach_correlation, candle_closes, format_correlation_fields
+from api.exchange_adapter import OKXAdapter
+
+HOUR = 3_600_000
+
+
+def make_rows(prices, start, stop):
+    """已收盘的 K 线 (经 OKXAdapter 转换的 OKX 格式)，第 i 根的开始时间为 i 小时"""
+    rows = [[str(i * HOUR), "0", "0", "0", str(prices[i]), "0", "0", "0", "1"] for i in range(stop - 1, start - 1, -1)]
+    return OKXAdapter.normalize_candles(rows)
+
+
+class TestCorrelationEngine(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        n = 200
+        btc_ret = rng.normal(0, 0.01, n - 1)
+        self.prices = pd.DataFrame({
+            "BTC-USDT": 100 * np.cumprod(np.r_[1, 1 + btc_ret]),
+            # 1.5 倍 BTC + 少量噪声
+            "ETH-USDT": 10 * np.cumprod(np.r_[1, 1 + 1.5 * btc_ret + rng.normal(0, 0.002, n - 1)]),
+            "SOL-USDT": 5 * np.cumprod(np.r_[1, 1 + 1.2 * btc_ret + rng.normal(0, 0.002, n - 1)]),
+            # 独立行情
+            "XYZ-USDT": np.cumprod(np.r_[1, 1 + rng.normal(0, 0.02, n - 1)]),
+        })
+
+    def feed(self, engine, symbols, start, stop):
+        return engine.ingest({s: make_rows(self.prices[s].to_numpy(), start, stop) for s in symbols})
+
+    def expected(self, window):
+        return self.prices.pct_change().iloc[-window:]
+
+    def test_incremental_matches_full_recompute(self):
+        engine = CorrelationEngine(window=50, min_obs=10)
+        symbols = list(self.prices.columns)
+        self.assertEqual(self.feed(engine, symbols, 0, 120), 51)
+        for t in range(120, 200):
+            self.feed(engine, symbols, t - 1, t + 1)
+        self.assertEqual(engine.bars, 50)
+
+        returns = self.expected(50)
+        cov, corr, n = engine.matrices(symbols)
+        np.testing.assert_allclose(cov.to_numpy(), returns.cov().to_numpy(), atol=1e-12)
+        np.testing.assert_allclose(corr.to_numpy(), returns.corr().to_numpy(), atol=1e-9)
+        self.assertTrue((n.to_numpy() == 50).all())
+
+        stats = engine.stats(["ETH-USDT", "BTC-USDT", "XYZ-USDT", "NEW-USDT"])
+        beta = returns.cov().loc["ETH-USDT", "BTC-USDT"] / returns["BTC-USDT"].var()
+        self.assertAlmostEqual(stats.loc["ETH-USDT", "beta_btc"], beta)
+        self.assertTrue(np.isnan(stats.loc["BTC-USDT", "beta_btc"]))
+        self.assertTrue(np.isnan(stats.loc["NEW-USDT", "beta_btc"]))
+        # ETH / SOL / BTC 高度相关，组名取第一个成员
+        self.assertEqual(stats.loc["ETH-USDT", "cluster"], "ETH")
+        self.assertEqual(stats.loc["BTC-USDT", "cluster"], "ETH")
+        self.assertIsNone(stats.loc["XYZ-USDT", "cluster"])
+
+        # 增量更新与从缓冲区完整重算的结果一致
+        incremental = [engine._n.copy(), engine._sxy.copy()]
+        engine.recompute()
+        np.testing.assert_allclose(incremental[0], engine._n)
+        np.testing.assert_allclose(incremental[1], engine._sxy, atol=1e-15)
+
+    def test_new_symbol_is_backfilled(self):
+        engine = CorrelationEngine(window=50, min_obs=10)
+        self.feed(engine, ["BTC-USDT"], 0, 150)
+        # 新币种带着历史 K 线进入，只回填其所在的行 / 列
+        self.feed(engine, ["ETH-USDT"], 60, 150)
+        for t in range(150, 200):
+            self.feed(engine, ["BTC-USDT", "ETH-USDT"], t, t + 1)
+        returns = self.expected(50)
+        _, corr, _ = engine.matrices(["BTC-USDT", "ETH-USDT"])
+        self.assertAlmostEqual(corr.loc["ETH-USDT", "BTC-USDT"], returns.corr().loc["ETH-USDT", "BTC-USDT"])
+
+    def test_plan_fetches_only_new_bars(self):
+        engine = CorrelationEngine(window=50)
+        self.assertEqual(engine.plan(["ETH-USDT"], 0), {"BTC-USDT": 52, "ETH-USDT": 52})
+        self.feed(engine, ["BTC-USDT", "ETH-USDT"], 0, 100)
+        # 最新已收盘的 K 线为第 99 根，当前处于第 100 根
+        self.assertEqual(engine.plan(["ETH-USDT"], 100 * HOUR + 10), {})
+        # 第 100-102 根已收盘，外加未收盘的第 103 根
+        self.assertEqual(engine.plan(["ETH-USDT", "SOL-USDT"], 103 * HOUR),
+                         {"BTC-USDT": 4, "ETH-USDT": 4, "SOL-USDT": 52})
+
+    def test_eviction_keeps_universe(self):
+        engine = CorrelationEngine(window=20, min_obs=5, max_symbols=3)
+        self.feed(engine, ["BTC-USDT", "ETH-USDT", "XYZ-USDT"], 0, 40)
+        engine.ingest({"SOL-USDT": make_rows(self.prices["SOL-USDT"].to_numpy(), 0, 40)},
+                      universe=["ETH-USDT", "SOL-USDT"])
+        self.assertEqual(engine.symbols, ["BTC-USDT", "ETH-USDT", "SOL-USDT"])
+        self.assertFalse(np.isnan(engine.stats(["SOL-USDT"]).loc["SOL-USDT", "beta_btc"]))
+
+    def test_unconfirmed_and_gapped_bars(self):
+        rows = [["7200000", "0", "0", "0", "3", "0", "0", "0", "0"],
+                ["3600000", "0", "0", "0", "2", "0", "0", "0", "1"],
+                ["0", "0", "0", "0", "1", "0", "0", "0", "1"]]
+        # 最新一根在 3 小时时才收盘
+        self.assertEqual(candle_closes(OKXAdapter.normalize_candles(rows), HOUR, now_ms=3 * HOUR - 1).tolist(), [1.0, 2.0])
+        engine = CorrelationEngine(window=10, min_obs=1)
+        engine.add_bar(0, {})
+        engine._add_columns(["BTC-USDT"])
+        engine.add_bar(HOUR, {"BTC-USDT": 1.0})
+        # 中间缺一根 K 线，不计算跨越缺口的收益率
+        engine.add_bar(3 * HOUR, {"BTC-USDT": 2.0})
+        engine.add_bar(4 * HOUR, {"BTC-USDT": 3.0})
+        self.assertEqual(engine._n[0, 0], 1)
+
+
+class TestCorrelationFields(unittest.TestCase):
+    def test_attach_and_format(self):
+        df = pd.DataFrame({'symbol': ['BTC-USDT', 'ETH-USDT', 'DOGE-USDT'],
+                           'last': [102.0, 10.5, 1.0], 'open_24h': [100.0, 10.0, 1.0]})
+        stats = pd.DataFrame({'beta_btc': [np.nan, 1.5], 'corr_btc': [np.nan, 0.9], 'cluster': ['BTC', 'BTC']},
+                             index=['BTC-USDT', 'ETH-USDT'])
+        out = attach_correlation(df, stats)
+        # ETH 涨 5%，其中 1.5 x 2% 来自 BTC
+        self.assertAlmostEqual(out.loc[1, 'idio_24h'], 2.0)
+        self.assertEqual(format_correlation_fields(out.iloc[1]), "BTC Beta: 1.50 (Corr 0.90), Idio 24h: +2.00%, Cluster: BTC")
+        self.assertEqual(format_correlation_fields(out.iloc[0]), "Cluster: BTC")
+        self.assertEqual(format_correlation_fields(out.iloc[2]), "")
+        self.assertIs(attach_correlation(df, None), df)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import math
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from analysis.paper_trader import PaperTrader
+from utils.equity_series import EquitySeries, performance_stats, MARK_DTYPE
+
+DAY = 86400
+T0 = 1_700_006_400  # 整点 (UTC 00:00)
+
+
+class TestPerformanceStats(unittest.TestCase):
+    def test_matches_pandas(self):
+        equity = pd.Series([100.0, 110.0, 99.0, 105.0, 120.0, 90.0, 95.0])
+        stats = performance_stats(equity, periods_per_year=365)
+        returns = equity.pct_change().dropna()
+        self.assertAlmostEqual(stats["total_return"], -5.0)
+        self.assertAlmostEqual(stats["max_drawdown"], -25.0)
+        self.assertAlmostEqual(stats["current_drawdown"], (95 / 120 - 1) * 100)
+        self.assertAlmostEqual(stats["volatility"], returns.std() * math.sqrt(365) * 100)
+        self.assertAlmostEqual(stats["sharpe"], returns.mean() / returns.std() * math.sqrt(365))
+
+    def test_insufficient_data(self):
+        self.assertTrue(math.isnan(performance_stats([])["max_drawdown"]))
+        stats = performance_stats([100.0, 101.0])
+        self.assertAlmostEqual(stats["total_return"], 1.0)
+        self.assertTrue(math.isnan(stats["volatility"]))
+
+
+class TestEquitySeries(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = f"{self.tmp.name}/equity"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_append_and_reload(self):
+        series = EquitySeries(self.path)
+        series.append(1000.0, 400.0, {"BTC-USDT": 600.0}, ts=T0)
+        series.append(1010.0, 400.0, {"BTC-USDT": 500.0, "ETH-USDT": 110.0}, ts=T0 + 60)
+        series.append(990.0, 990.0, ts=T0 + 3600)
+
+        # 重新打开后继续追加，汇总桶接着更新
+        series = EquitySeries(self.path)
+        series.append(1020.0, 1020.0, ts=T0 + 3660)
+        self.assertEqual(len(series), 4)
+        self.assertEqual(series.marks_path.stat().st_size, 4 * MARK_DTYPE.itemsize)
+        np.testing.assert_allclose(series.marks()['positions'], [600.0, 610.0, 0.0, 0.0])
+
+        hourly = series.rollup("hour")
+        self.assertEqual(hourly['count'].tolist(), [2, 2])
+        self.assertEqual(hourly.iloc[0][['open', 'high', 'low', 'close']].tolist(), [1000.0, 1010.0, 1000.0, 1010.0])
+        self.assertEqual(hourly.iloc[1][['open', 'low', 'close']].tolist(), [990.0, 990.0, 1020.0])
+        daily = series.rollup("day")
+        self.assertEqual((len(daily), daily['count'].iloc[0], daily['close'].iloc[0]), (1, 4, 1020.0))
+
+        positions = series.positions()
+        self.assertEqual(list(positions.columns), ["BTC-USDT", "ETH-USDT"])
+        self.assertEqual(positions["ETH-USDT"].iloc[1], 110.0)
+        self.assertTrue(positions.iloc[2].isna().all())
+
+    def test_stats_use_daily_rollup(self):
+        series = EquitySeries(self.path)
+        self.assertIsNone(series.stats())
+        closes = [100.0, 104.0, 98.0, 103.0, 101.0]
+        for day, close in enumerate(closes):
+            # 日内先冲高再回落，日内回撤只体现在逐次估值的最大回撤中
+            series.append(close * 1.1, close, ts=T0 + day * DAY + 60)
+            series.append(close, close, ts=T0 + day * DAY + 7200)
+        stats = series.stats()
+        self.assertEqual((stats["resolution"], stats["marks"]), ("day", 10))
+        self.assertAlmostEqual(stats["volatility"], performance_stats(closes)["volatility"])
+        self.assertAlmostEqual(stats["max_drawdown"], (98 / 114.4 - 1) * 100)
+        self.assertEqual(stats["exposure"], 0.0)
+
+
+class TestPaperTraderEquity(unittest.TestCase):
+    def test_report_includes_performance(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            trader = PaperTrader(data_dir=tmp, initial_balance=1000.0)
+            self.assertNotIn("最大回撤", trader.get_report())
+            trader.execute_trade("buy", "BTC-USDT", 100.0, 500.0)
+            for i, price in enumerate([100.0, 120.0, 90.0, 110.0]):
+                trader.update_valuations({"BTC-USDT": price}, ts=T0 + i * 3600)
+
+            self.assertEqual(len(trader.equity), 4)
+            self.assertEqual(trader.equity.positions()["BTC-USDT"].tolist(), [500.0, 600.0, 450.0, 550.0])
+            report = trader.get_report()
+            self.assertIn("区间收益: +5.00%", report)
+            # 1100 -> 950
+            self.assertIn(f"最大回撤: {(950 / 1100 - 1) * 100:.2f}%", report)
+            self.assertIn("按小时汇总", report)
+
+
+if __name__ == '__main__':
+    unittest.main()
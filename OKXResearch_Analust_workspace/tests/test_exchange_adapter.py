@@ -0,0 +1,193 @@
+import time
+import unittest
+from unittest.mock import patch, MagicMock
+import numpy as np
+import pandas as pd
+from api.exchange_adapter import (ExchangeAdapter, OKXAdapter, BinanceAdapter, TICKER_COLUMNS, CANDLE_COLUMNS,
+                                  normalize_frame, funding_map)
+from api.multi_venue import MultiVenueAggregator, merge_venues, attach_cross_venue, format_cross_venue_fields
+
+
+def tickers(prices, volumes):
+    symbols = list(prices)
+    return normalize_frame({
+        'symbol': symbols,
+        'base': [s.split('-')[0] for s in symbols],
+        'quote': ['USDT'] * len(symbols),
+        'last': list(prices.values()),
+        'quote_volume': [volumes[s] for s in symbols],
+    }, TICKER_COLUMNS)
+
+
+class StandInAdapter(ExchangeAdapter):
+    """本地替身交易所：返回固定行情，可模拟延迟与故障"""
+
+    def __init__(self, name, frame=None, delay=0.0, error=None):
+        self.name = name
+        self.frame = frame
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    def get_tickers(self, market="spot"):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return self.frame
+
+    def get_funding_rates(self, symbols=None):
+        return None
+
+    def get_candles(self, symbol, bar="1H", limit=100, market="spot"):
+        return None
+
+
+class TestOKXAdapter(unittest.TestCase):
+    def test_normalize_spot_and_swap(self):
+        spot = pd.DataFrame({
+            'instId': pd.Categorical(['BTC-USDT']), 'last': [100.0], 'open24h': [90.0], 'high24h': [101.0],
+            'low24h': [89.0], 'volCcy24h': [5000.0], 'vol24h': [50.0], 'bidPx': [99.9], 'askPx': [100.1],
+            'ts': [1700000000000],
+        })
+        frame = OKXAdapter.normalize_tickers(spot, "spot")
+        self.assertEqual(list(frame.columns), list(TICKER_COLUMNS))
+        self.assertEqual(frame.loc[0, 'symbol'], 'BTC-USDT')
+        self.assertEqual((frame.loc[0, 'base'], frame.loc[0, 'quote']), ('BTC', 'USDT'))
+        self.assertEqual(frame.loc[0, 'quote_volume'], 5000.0)
+        self.assertEqual(frame['ts'].dtype.name, 'int64')
+
+        swap = pd.DataFrame({
+            'instId': pd.Categorical(['ETH-USDT-SWAP', 'ETH-USD-SWAP']), 'last': [10.0, 10.0], 'open24h': [9.0, 9.0],
+            'volCcy24h': [300.0, 1.0],
+        })
+        frame = OKXAdapter.normalize_tickers(swap, "swap")
+        # 合约成交量以币计，折算为 USDT；币本位合约被过滤
+        self.assertEqual(frame['symbol'].tolist(), ['ETH-USDT'])
+        self.assertEqual(frame.loc[0, 'quote_volume'], 3000.0)
+        self.assertTrue(np.isnan(frame.loc[0, 'high_24h']))
+
+    def test_normalize_futures_drops_expiry(self):
+        futures = pd.DataFrame({
+            'instId': ['BTC-USDT-250328', 'BTC-USDT-250627', 'BTC-USD-250328'], 'last': ['102', '104', '103'],
+            'volCcy24h': ['1', '2', '999'],
+        })
+        frame = OKXAdapter.normalize_tickers(futures, "futures")
+        self.assertEqual(frame['symbol'].tolist(), ['BTC-USDT', 'BTC-USDT'])
+        self.assertEqual(frame['quote_volume'].tolist(), [102.0, 208.0])
+
+    def test_multi_market_and_funding(self):
+        client = MagicMock()
+        client.get_tickers_multi.return_value = {
+            "SPOT": pd.DataFrame({'instId': ['BTC-USDT'], 'last': [100.0], 'volCcy24h': [10.0]}), "SWAP": None,
+        }
+        client.get_all_funding_rates.return_value = {'BTC-USDT': 0.01, 'PEPE-USDT': -0.2}
+        adapter = OKXAdapter(client)
+
+        frames = adapter.get_tickers_multi(("spot", "swap"))
+        client.get_tickers_multi.assert_called_once_with(("SPOT", "SWAP"))
+        self.assertEqual(frames['spot']['symbol'].tolist(), ['BTC-USDT'])
+        self.assertIsNone(frames['swap'])
+        self.assertEqual(funding_map(adapter.get_all_funding_rates()), {'BTC-USDT': 0.01, 'PEPE-USDT': -0.2})
+        self.assertEqual(funding_map(None), {})
+
+    def test_adapter_requires_abstract_methods(self):
+        class TickersOnly(ExchangeAdapter):
+            def get_tickers(self, market="spot"):
+                return None
+
+        with self.assertRaises(TypeError):
+            TickersOnly()
+
+    def test_candles_are_ascending(self):
+        client = MagicMock()
+        client.get_candles.return_value = [
+            ["2000", "2", "3", "1", "2.5", "10", "20", "25", "1"],
+            ["1000", "1", "2", "0.5", "2", "5", "10", "12", "1"],
+        ]
+        candles = OKXAdapter(client).get_candles("BTC-USDT", market="swap")
+        client.get_candles.assert_called_with("BTC-USDT-SWAP", bar="1H", limit=100)
+        self.assertEqual(list(candles.columns), list(CANDLE_COLUMNS))
+        self.assertEqual(candles['ts'].tolist(), [1000, 2000])
+        self.assertEqual(candles['quote_volume'].tolist(), [12.0, 25.0])
+
+
+class TestBinanceAdapter(unittest.TestCase):
+    @patch('api.exchange_adapter.requests.get')
+    def test_tickers_keep_usdt_pairs(self, mock_get):
+        mock_get.return_value.json.return_value = [
+            {"symbol": "BTCUSDT", "lastPrice": "100.5", "openPrice": "100", "highPrice": "101", "lowPrice": "99",
+             "bidPrice": "100.4", "askPrice": "100.6", "volume": "10", "quoteVolume": "1005", "closeTime": 1700000000000},
+            {"symbol": "ETHBTC", "lastPrice": "0.05", "openPrice": "0.05", "highPrice": "0.05", "lowPrice": "0.05",
+             "volume": "1", "quoteVolume": "0.05", "closeTime": 1700000000000},
+        ]
+        frame = BinanceAdapter().get_tickers("spot")
+        self.assertEqual(frame['symbol'].tolist(), ['BTC-USDT'])
+        self.assertEqual(frame.loc[0, 'last'], 100.5)
+        self.assertEqual(frame.loc[0, 'quote_volume'], 1005.0)
+
+    @patch('api.exchange_adapter.requests.get')
+    def test_failure_returns_none(self, mock_get):
+        mock_get.side_effect = ConnectionError("down")
+        self.assertIsNone(BinanceAdapter().get_tickers("spot"))
+
+
+class TestMultiVenue(unittest.TestCase):
+    def setUp(self):
+        self.okx = tickers({'BTC-USDT': 100.0, 'ETH-USDT': 10.0}, {'BTC-USDT': 300.0, 'ETH-USDT': 50.0})
+        self.other = tickers({'BTC-USDT': 101.0, 'SOL-USDT': 5.0}, {'BTC-USDT': 100.0, 'SOL-USDT': 20.0})
+
+    def test_merge_venues(self):
+        merged = merge_venues({'okx': self.okx, 'other': self.other, 'empty': None}, primary='okx')
+        btc = merged.loc['BTC-USDT']
+        self.assertEqual(btc['venues'], 2)
+        self.assertEqual(btc['xv_vol_usdt'], 400.0)
+        self.assertAlmostEqual(btc['xv_vwap'], (100 * 300 + 101 * 100) / 400)
+        self.assertAlmostEqual(btc['xv_dispersion_bps'], 1.0 / btc['xv_vwap'] * 1e4)
+        self.assertAlmostEqual(btc['primary_vol_share'], 0.75)
+        self.assertEqual(btc['other_last'], 101.0)
+
+        self.assertEqual(merged.loc['SOL-USDT', 'venues'], 1)
+        self.assertEqual(merged.loc['SOL-USDT', 'xv_dispersion_bps'], 0.0)
+        self.assertEqual(merged.loc['SOL-USDT', 'primary_vol_share'], 0.0)
+        self.assertTrue(merge_venues({}).empty)
+
+    def test_aggregator_fetches_concurrently_and_skips_failures(self):
+        slow_a = StandInAdapter('a', self.okx, delay=0.2)
+        slow_b = StandInAdapter('b', self.other, delay=0.2)
+        broken = StandInAdapter('broken', error=RuntimeError("boom"))
+        aggregator = MultiVenueAggregator([slow_a, slow_b, broken])
+
+        start = time.perf_counter()
+        merged = aggregator.snapshot()
+        self.assertLess(time.perf_counter() - start, 0.35)
+        self.assertEqual(aggregator.primary, 'a')
+        self.assertEqual(merged.loc['BTC-USDT', 'venues'], 2)
+        self.assertIn('broken', aggregator.last_latency)
+
+        # 调用方已拉取的交易所不会重复请求
+        aggregator.snapshot(frames={'a': self.okx})
+        self.assertEqual(slow_a.calls, 1)
+
+    def test_timeout_skips_slow_venue(self):
+        aggregator = MultiVenueAggregator([StandInAdapter('fast', self.okx), StandInAdapter('slow', self.other, delay=1)],
+                                          timeout=0.2)
+        frames = aggregator.fetch()
+        self.assertIsNotNone(frames['fast'])
+        self.assertIsNone(frames['slow'])
+
+    def test_attach_and_format(self):
+        merged = merge_venues({'okx': self.okx, 'other': self.other}, primary='okx')
+        df = pd.DataFrame({'symbol': ['BTC-USDT', 'ETH-USDT', 'XRP-USDT'], 'last': [100.0, 10.0, 1.0]})
+        enriched = attach_cross_venue(df, merged)
+
+        self.assertIn("Venues: 2", format_cross_venue_fields(enriched.iloc[0]))
+        self.assertIn("Primary Vol Share: 75%", format_cross_venue_fields(enriched.iloc[0]))
+        # 单一交易所或无数据时不输出
+        self.assertEqual(format_cross_venue_fields(enriched.iloc[1]), "")
+        self.assertEqual(format_cross_venue_fields(enriched.iloc[2]), "")
+        self.assertIs(attach_cross_venue(df, None), df)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import time
+import unittest
+from unittest import mock
+import requests
+from utils.http_transport import HedgedTransport, CircuitBreaker
+
+
+class FakeResponse:
+    def __init__(self, host, status_code=200):
+        self.host = host
+        self.status_code = status_code
+
+
+def fake_get_factory(behaviour):
+    """behaviour: {host: (delay 秒, 异常或状态码)}"""
+    def fake_get(url, params=None, headers=None, timeout=None):
+        host = next(h for h in behaviour if url.startswith(h))
+        delay, outcome = behaviour[host]
+        time.sleep(delay)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return FakeResponse(host, outcome)
+    return fake_get
+
+
+class TestHedgedTransport(unittest.TestCase):
+    def make_transport(self):
+        return HedgedTransport(["http://primary", "http://backup"], min_hedge_delay=0.05,
+                               max_hedge_delay=0.1, failure_threshold=2, reset_timeout=60)
+
+    def test_hedge_when_primary_slow(self):
+        """主主机超过对冲阈值未返回时，备用主机的结果胜出"""
+        transport = self.make_transport()
+        behaviour = {"http://primary": (1.0, 200), "http://backup": (0.01, 200)}
+        with mock.patch("utils.http_transport.requests.get", side_effect=fake_get_factory(behaviour)):
+            start = time.monotonic()
+            response = transport.get("/api", timeout=5)
+
+        self.assertEqual(response.host, "http://backup")
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual(transport.hedges, 1)
+        self.assertEqual(transport.hedge_wins, 1)
+
+    def test_failover_and_circuit_breaker(self):
+        """主主机失败时立即切换，连续失败后熔断不再请求"""
+        transport = self.make_transport()
+        behaviour = {"http://primary": (0.0, requests.ConnectionError("down")), "http://backup": (0.0, 200)}
+        with mock.patch("utils.http_transport.requests.get", side_effect=fake_get_factory(behaviour)) as get:
+            for _ in range(3):
+                self.assertEqual(transport.get("/api").host, "http://backup")
+
+        self.assertEqual(transport.breakers["http://primary"].state, CircuitBreaker.OPEN)
+        # 熔断后第三次请求直接发往备用主机
+        self.assertEqual(get.call_count, 5)
+        self.assertEqual(transport.stats()["hosts"]["http://primary"]["errors"], 2)
+
+    def test_backup_recovers_while_primary_healthy(self):
+        """主主机一直健康时，熔断的备用主机冷却结束后仍能重新参与对冲"""
+        transport = HedgedTransport(["http://primary", "http://backup"], min_hedge_delay=0.05,
+                                    max_hedge_delay=0.05, failure_threshold=1, reset_timeout=0.05)
+        backup = transport.breakers["http://backup"]
+        backup.record_failure()
+        time.sleep(0.06)
+
+        # 主主机快速返回：备用主机未被请求，熔断器状态不应改变
+        fast = {"http://primary": (0.0, 200), "http://backup": (0.0, 200)}
+        with mock.patch("utils.http_transport.requests.get", side_effect=fake_get_factory(fast)):
+            for _ in range(3):
+                self.assertEqual(transport.get("/api").host, "http://primary")
+        self.assertEqual(backup.state, CircuitBreaker.OPEN)
+        self.assertTrue(backup.available())
+
+        # 主主机变慢时，备用主机获得试探请求并恢复
+        slow = {"http://primary": (0.5, 200), "http://backup": (0.0, 200)}
+        with mock.patch("utils.http_transport.requests.get", side_effect=fake_get_factory(slow)):
+            self.assertEqual(transport.get("/api").host, "http://backup")
+        self.assertEqual(backup.state, CircuitBreaker.CLOSED)
+
+    def test_no_hedge_after_deadline(self):
+        transport = HedgedTransport(["http://primary", "http://backup"], min_hedge_delay=0.2,
+                                    max_hedge_delay=0.2)
+        behaviour = {"http://primary": (0.5, 200), "http://backup": (0.0, 200)}
+        with mock.patch("utils.http_transport.requests.get", side_effect=fake_get_factory(behaviour)) as get:
+            with self.assertRaises(requests.Timeout):
+                transport.get("/api", timeout=0.2)
+        self.assertEqual((get.call_count, transport.hedges), (1, 0))
+
+    def test_server_error_raises_when_all_hosts_fail(self):
+        transport = self.make_transport()
+        behaviour = {"http://primary": (0.0, 502), "http://backup": (0.0, 503)}
+        with mock.patch("utils.http_transport.requests.get", side_effect=fake_get_factory(behaviour)):
+            with self.assertRaises(requests.HTTPError):
+                transport.get("/api")
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_half_open_after_timeout(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+        breaker.record_failure()
+        self.assertFalse(breaker.available())
+        self.assertFalse(breaker.try_acquire_probe())
+
+        time.sleep(0.02)
+        # 只读检查不占用试探名额
+        self.assertTrue(breaker.available())
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertTrue(breaker.try_acquire_probe())
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        # 试探进行中，不再放行其他请求
+        self.assertFalse(breaker.available())
+        self.assertFalse(breaker.try_acquire_probe())
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_stale_probe_is_retried(self):
+        """试探名额被占用但一直没有结果时，冷却时间后允许新的试探"""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+        breaker.record_failure()
+        time.sleep(0.02)
+        self.assertTrue(breaker.try_acquire_probe())
+        time.sleep(0.02)
+        self.assertTrue(breaker.available())
+        self.assertTrue(breaker.try_acquire_probe())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+import numpy as np
+import pandas as pd
+from analysis.liquidity import compute_liquidity_metrics, attach_liquidity, format_liquidity_fields, books_to_arrays
+
+
+def level(px, sz):
+    # OKX 每档格式: [价格, 数量, 已废弃字段, 订单数]
+    return [str(px), str(sz), "0", "1"]
+
+
+BOOKS = {
+    # 中间价 100，价差 2bps 附近
+    "BTC-USDT": {
+        "bids": [level(99.99, 10), level(99.7, 5), level(99.0, 20), level(97.0, 100)],
+        "asks": [level(100.01, 10), level(100.3, 5), level(101.5, 20), level(103.0, 100)],
+    },
+    # 买盘明显更厚
+    "ETH-USDT": {
+        "bids": [level(9.99, 1000), level(9.9, 1000)],
+        "asks": [level(10.01, 100)],
+    },
+    # 单边为空
+    "DEAD-USDT": {"bids": [], "asks": [level(1.0, 1)]},
+}
+
+
+class TestLiquidityMetrics(unittest.TestCase):
+    def test_books_to_arrays_pads_levels(self):
+        inst_ids, bid_px, bid_sz, ask_px, _ = books_to_arrays(BOOKS)
+        self.assertEqual(inst_ids, list(BOOKS))
+        self.assertEqual(bid_px.shape, (3, 4))
+        self.assertTrue(np.isnan(bid_px[1, 2]))
+        self.assertEqual(bid_sz[0, 3], 100.0)
+
+    def test_spread_and_depth_bands(self):
+        m = compute_liquidity_metrics(BOOKS)
+        btc = m.loc["BTC-USDT"]
+
+        self.assertAlmostEqual(btc['spread_bps'], 2.0, places=6)
+        # ±0.5%: 99.99*10 + 99.7*5 / 100.01*10 + 100.3*5
+        self.assertAlmostEqual(btc['bid_depth_05'], 999.9 + 498.5)
+        self.assertAlmostEqual(btc['ask_depth_05'], 1000.1 + 501.5)
+        # ±2% 额外包含 99.0 与 101.5 两档，97 / 103 在范围外
+        self.assertAlmostEqual(btc['bid_depth_2'], 999.9 + 498.5 + 1980)
+        self.assertAlmostEqual(btc['depth_2_usdt'], btc['bid_depth_2'] + btc['ask_depth_2'])
+        self.assertAlmostEqual(btc['imbalance'], (btc['bid_depth_2'] - btc['ask_depth_2']) / btc['depth_2_usdt'])
+
+        self.assertGreater(m.loc["ETH-USDT", 'imbalance'], 0.8)
+        self.assertTrue(m.loc["DEAD-USDT"].isna().all())
+
+    def test_attach_and_format(self):
+        df = pd.DataFrame({'symbol': ["ETH-USDT", "BTC-USDT", "XRP-USDT"], 'last': [10.0, 100.0, 1.0]})
+        enriched = attach_liquidity(df, compute_liquidity_metrics(BOOKS))
+
+        self.assertTrue(np.isnan(enriched.loc[2, 'spread_bps']))
+        self.assertEqual(format_liquidity_fields(enriched.iloc[2]), "")
+        self.assertIn("Spread: 2.0bps", format_liquidity_fields(enriched.iloc[1]))
+        self.assertNotIn('spread_bps', df.columns)
+
+    def test_empty_books(self):
+        self.assertTrue(compute_liquidity_metrics({}).empty)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+import threading
+import time
+import unittest
+from api.llm_ensemble import LLMEnsemble, vote_trade_decisions, symbol_agreement
+
+MARKET = "Symbol: BTC-USDT, Price: 1\nSymbol: ETH-USDT, Price: 2\nSymbol: SOL-USDT, Price: 3"
+
+
+class FakeModel:
+    """返回固定报告/指令的模型替身，可模拟延迟与异常"""
+    api_key = "test"
+
+    def __init__(self, name, report="", decision=None, delay=0.0, error=None, served_by=None):
+        self.name = name
+        # 经路由器调用时实际应答的端点
+        self.endpoint = served_by
+        self.served_by = None
+        self.report = report
+        self.decision = decision
+        self.delay = delay
+        self.error = error
+        self.timeout = 60
+        self.usage = {"calls": 0, "total_tokens": 0}
+        self.last_analysis_prompt = None
+
+    def _run(self, value):
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        self.usage["calls"] += 1
+        self.usage["total_tokens"] += 100
+        return value
+
+    def analyze_market(self, market_data_summary, user_query="", **kwargs):
+        self.last_analysis_prompt = f"prompt for {self.name}: {market_data_summary}"
+        self.served_by = self.endpoint
+        return self._run(self.report)
+
+    def get_trade_decision(self, market_analysis, current_portfolio):
+        return self._run(self.decision)
+
+
+class TestLLMEnsemble(unittest.TestCase):
+    def test_slow_model_is_dropped_at_deadline(self):
+        ensemble = LLMEnsemble([
+            FakeModel("fast", "BTC 与 ETH 走强"),
+            FakeModel("slow", "SOL 走强", delay=1.0),
+        ], deadlines={"slow": 0.1})
+
+        start = time.monotonic()
+        result = ensemble.analyze_market_round(MARKET)
+
+        self.assertLess(time.monotonic() - start, 0.8)
+        self.assertTrue(result["report"].startswith("BTC 与 ETH 走强"))
+        self.assertIn("slow (timeout)", result["report"])
+        self.assertEqual(result["round"]["slow"]["status"], "timeout")
+        self.assertEqual(result["round"]["fast"]["served_by"], "fast")
+        self.assertEqual(ensemble.stats()["models"]["slow"]["timeouts"], 1)
+        self.assertEqual(result["prompt"], f"prompt for fast: {MARKET}")
+
+    def test_reports_are_merged_with_consensus(self):
+        ensemble = LLMEnsemble([
+            FakeModel("a", "看好 BTC 与 ETH", served_by="a-backup"),
+            FakeModel("b", "看好 BTC，回避 SOL"),
+            FakeModel("c", "Error: boom", error=RuntimeError("down")),
+        ])
+
+        result = ensemble.analyze_market_round(MARKET)
+        report = result["report"]
+
+        self.assertIn("共识币种** (过半模型提及): BTC", report)
+        self.assertIn("### 💬 b 的观点", report)
+        self.assertIn("c (error)", report)
+        # 路由切换后的实际应答端点记录在本轮状态中
+        self.assertEqual(result["round"]["a"]["served_by"], "a-backup")
+        self.assertNotIn("served_by", result["round"]["c"])
+        # {BTC, ETH} vs {BTC, SOL}
+        self.assertAlmostEqual(ensemble.stats()["avg_agreement"], 1 / 3, places=3)
+        self.assertEqual(result["usage"]["total_tokens"], 200)
+        self.assertEqual(ensemble.analyze_market(MARKET), report)
+        self.assertEqual(ensemble.usage["total_tokens"], 400)
+
+    def test_concurrent_rounds_do_not_share_state(self):
+        """多个任务共享同一个集成分析器：各自的 prompt / 用量互不覆盖，排队时间不计入模型期限"""
+        ensemble = LLMEnsemble([FakeModel("a", "看好 BTC", delay=0.2), FakeModel("b", "看好 ETH", delay=0.2)],
+                               deadline=0.3, concurrency=1)
+        # 线程池 (4 个线程) 只够 2 个任务同时执行，其余任务需要排队
+        results = {}
+
+        def job(i):
+            results[i] = ensemble.analyze_market_round(f"{MARKET}\nquery {i}")
+
+        threads = [threading.Thread(target=job, args=(i,)) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        for i, result in results.items():
+            self.assertEqual(result["prompt"], f"prompt for a: {MARKET}\nquery {i}")
+            self.assertEqual({s["status"] for s in result["round"].values()}, {"ok"})
+            self.assertEqual(result["usage"], {"calls": 2, "total_tokens": 200})
+        self.assertEqual(len(results), 4)
+        self.assertEqual(ensemble.usage["total_tokens"], 800)
+        self.assertEqual(ensemble.stats()["rounds"], 4)
+
+    def test_all_models_failing_raises(self):
+        ensemble = LLMEnsemble([FakeModel("a", error=RuntimeError("down"))])
+        with self.assertRaises(RuntimeError):
+            ensemble.analyze_market(MARKET)
+
+    def test_trade_decisions_are_voted(self):
+        buy = {"action": "buy", "symbol": "BTC-USDT", "amount_usdt": 1000, "reason": "突破"}
+        ensemble = LLMEnsemble([
+            FakeModel("a", decision=buy),
+            FakeModel("b", decision=dict(buy, amount_usdt=2000)),
+            FakeModel("c", decision={"action": "hold", "symbol": "", "amount_usdt": 0}),
+        ])
+
+        decision = ensemble.get_trade_decision("report", "empty")
+
+        self.assertEqual((decision["action"], decision["symbol"]), ("buy", "BTC-USDT"))
+        self.assertEqual(decision["amount_usdt"], 1500)
+        self.assertAlmostEqual(decision["agreement"], 0.667, places=3)
+
+
+class TestVoting(unittest.TestCase):
+    def test_tie_falls_back_to_hold(self):
+        decision = vote_trade_decisions({
+            "a": {"action": "buy", "symbol": "BTC-USDT", "amount_usdt": 1000},
+            "b": {"action": "buy", "symbol": "ETH-USDT", "amount_usdt": 1000},
+        })
+        self.assertEqual(decision["action"], "hold")
+        self.assertEqual(decision["amount_usdt"], 0)
+        self.assertEqual(decision["agreement"], 0)
+
+    def test_invalid_decisions_are_ignored(self):
+        self.assertIsNone(vote_trade_decisions({"a": None, "b": {"action": "moon"}}))
+
+    def test_symbol_agreement(self):
+        self.assertIsNone(symbol_agreement([{"BTC"}]))
+        self.assertEqual(symbol_agreement([{"BTC"}, {"BTC"}]), 1.0)
+        self.assertEqual(symbol_agreement([{"BTC"}, {"ETH"}]), 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
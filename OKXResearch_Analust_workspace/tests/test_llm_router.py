@@ -0,0 +1,146 @@
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch, MagicMock
+import requests
+from api.llm_client import LLMClient
+from api.llm_router import LLMEndpoint, LLMRouter, normalize_chat_url
+
+PAYLOAD = {"model": "placeholder", "messages": [{"role": "user", "content": "hi"}]}
+
+
+def make_response(content="ok"):
+    response = MagicMock()
+    response.status_code = 200
+    response.json.return_value = {"choices": [{"message": {"content": content}}]}
+    return response
+
+
+def fake_post_factory(behaviours):
+    """behaviours: {url 片段: (延迟秒, 异常或 None)}"""
+    def fake_post(url, headers=None, json=None, timeout=None):
+        for fragment, (delay, error) in behaviours.items():
+            if fragment in url:
+                time.sleep(delay)
+                if error:
+                    raise error
+                return make_response(json["model"])
+        raise AssertionError(f"unexpected url {url}")
+    return fake_post
+
+
+def make_router(**kwargs):
+    endpoints = [
+        LLMEndpoint("primary", "https://primary.example/v1", "model-a", "key"),
+        LLMEndpoint("backup", "https://backup.example", "model-b", "key"),
+    ]
+    return LLMRouter(endpoints, **kwargs)
+
+
+class TestLLMRouter(unittest.TestCase):
+    def test_normalize_chat_url(self):
+        self.assertEqual(normalize_chat_url("https://a/v1"), "https://a/v1/chat/completions")
+        self.assertEqual(normalize_chat_url("https://a/"), "https://a/chat/completions")
+        self.assertEqual(normalize_chat_url("https://a/chat/completions"), "https://a/chat/completions")
+
+    def test_routes_to_primary_and_sets_model(self):
+        router = make_router()
+        with patch("api.llm_router.requests.post",
+                   side_effect=fake_post_factory({"primary": (0, None), "backup": (0, None)})):
+            result, endpoint = router.post(PAYLOAD)
+
+        self.assertEqual(endpoint.name, "primary")
+        self.assertEqual(result["choices"][0]["message"]["content"], "model-a")
+        self.assertEqual(router.stats()["recent_decisions"][-1]["winner"], "primary")
+
+    def test_fails_over_on_error(self):
+        router = make_router()
+        behaviours = {"primary": (0, requests.ConnectionError("down")), "backup": (0, None)}
+        with patch("api.llm_router.requests.post", side_effect=fake_post_factory(behaviours)):
+            result, endpoint = router.post(PAYLOAD)
+
+        self.assertEqual(endpoint.name, "backup")
+        self.assertEqual(router.failovers, 1)
+        self.assertEqual(router.stats()["recent_decisions"][-1]["failed"], ["primary"])
+        self.assertGreater(router.endpoints[0].error_rate, 0)
+
+    def test_client_records_answering_endpoint(self):
+        """故障切换后，LLMClient 记录实际应答的端点而不是默认模型"""
+        client = LLMClient(api_key="key", base_url="https://primary.example/v1", model="model-a")
+        client.router = make_router()
+        behaviours = {"primary": (0, requests.ConnectionError("down")), "backup": (0, None)}
+        with patch("api.llm_router.requests.post", side_effect=fake_post_factory(behaviours)):
+            self.assertEqual(client._call_llm("system", "user"), "model-b")
+        self.assertEqual(client.served_by, "backup")
+
+    def test_counters_are_consistent_under_concurrency(self):
+        # 主端点不熔断，选中主端点的每次调用都经历一次故障切换
+        router = LLMRouter([LLMEndpoint("primary", "https://primary.example/v1", "model-a", "key", failure_threshold=1000),
+                            LLMEndpoint("backup", "https://backup.example", "model-b", "key")], timeout=5)
+        behaviours = {"primary": (0.001, requests.ConnectionError("down")), "backup": (0, None)}
+        with patch("api.llm_router.requests.post", side_effect=fake_post_factory(behaviours)), \
+                ThreadPoolExecutor(max_workers=8) as pool:
+            winners = list(pool.map(lambda _: router.post(PAYLOAD)[1].name, range(40)))
+
+        self.assertEqual(winners, ["backup"] * 40)
+        self.assertEqual(router.stats()["failovers"], sum(len(d["failed"]) for d in router.decisions))
+        self.assertGreater(router.failovers, 0)
+        self.assertEqual(router.endpoints[1].wins, 40)
+
+    def test_hedges_when_primary_passes_deadline(self):
+        router = make_router(deadline=0.05, timeout=5)
+        behaviours = {"primary": (0.5, None), "backup": (0, None)}
+        with patch("api.llm_router.requests.post", side_effect=fake_post_factory(behaviours)):
+            start = time.monotonic()
+            _, endpoint = router.post(PAYLOAD)
+
+        self.assertLess(time.monotonic() - start, 0.4)
+        self.assertEqual(endpoint.name, "backup")
+        self.assertEqual(router.hedges, 1)
+
+    def test_ranking_prefers_faster_healthy_endpoint(self):
+        router = make_router()
+        primary, backup = router.endpoints
+        primary.observe(5.0, ok=True)
+        backup.observe(1.0, ok=True)
+        self.assertEqual(router.rank()[0].name, "backup")
+
+        # 连续失败触发熔断后不再被选中
+        for _ in range(3):
+            backup.observe(1.0, ok=False)
+        self.assertEqual([ep.name for ep in router.rank()], ["primary"])
+        self.assertEqual(router.stats()["endpoints"]["backup"]["breaker"], "open")
+
+    def test_ranking_does_not_consume_probe(self):
+        """排序只做只读检查：主端点健康时，冷却结束的备用端点不会卡在半开状态"""
+        endpoints = [LLMEndpoint("primary", "https://primary.example/v1", "model-a", "key"),
+                     LLMEndpoint("backup", "https://backup.example", "model-b", "key",
+                                 failure_threshold=1, reset_timeout=0.05)]
+        router = LLMRouter(endpoints)
+        primary, backup = router.endpoints
+        backup.observe(1.0, ok=False)
+        time.sleep(0.06)
+
+        with patch("api.llm_router.requests.post",
+                   side_effect=fake_post_factory({"primary": (0, None), "backup": (0, None)})):
+            for _ in range(3):
+                self.assertEqual(router.post(PAYLOAD)[1].name, "primary")
+        self.assertEqual(backup.breaker.state, "open")
+        self.assertIn(backup, router.rank())
+
+        # 主端点出错时切换到备用端点，试探成功后恢复
+        behaviours = {"primary": (0, requests.ConnectionError("down")), "backup": (0, None)}
+        with patch("api.llm_router.requests.post", side_effect=fake_post_factory(behaviours)):
+            self.assertEqual(router.post(PAYLOAD)[1].name, "backup")
+        self.assertEqual(backup.breaker.state, "closed")
+
+    def test_raises_last_error_when_all_fail(self):
+        router = make_router()
+        behaviours = {"primary": (0, requests.ConnectionError("a")), "backup": (0, requests.ConnectionError("b"))}
+        with patch("api.llm_router.requests.post", side_effect=fake_post_factory(behaviours)):
+            with self.assertRaises(requests.ConnectionError):
+                router.post(PAYLOAD)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import json
+import logging
+import os
+import tempfile
+import unittest
+from utils.logger import setup_logger, shutdown_logging
+
+
+class TestQueuedLogger(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.log_file = os.path.join(self.tmp.name, "test.log")
+
+    def tearDown(self):
+        shutdown_logging()
+        for name in ("queued_text", "queued_json"):
+            logger = logging.getLogger(name)
+            for handler in list(logger.handlers):
+                logger.removeHandler(handler)
+        self.tmp.cleanup()
+
+    def test_queued_logs_flushed_on_shutdown(self):
+        """队列模式下的日志在 shutdown 后全部写入文件"""
+        logger = setup_logger("queued_text", log_file=self.log_file, queued=True)
+        logger.propagate = False
+        for i in range(100):
+            logger.info(f"line {i}")
+        shutdown_logging()
+
+        with open(self.log_file, encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        self.assertEqual(len(lines), 100)
+        self.assertTrue(lines[-1].endswith("line 99"))
+
+    def test_json_lines_format(self):
+        logger = setup_logger("queued_json", log_file=self.log_file, queued=True, json_format=True)
+        logger.propagate = False
+        logger.warning("报告已生成")
+        shutdown_logging()
+
+        with open(self.log_file, encoding='utf-8') as f:
+            record = json.loads(f.readline())
+        self.assertEqual(record["level"], "WARNING")
+        self.assertEqual(record["logger"], "queued_json")
+        self.assertEqual(record["message"], "报告已生成")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+import pandas as pd
+from analysis.market_snapshot import build_market_snapshot, format_snapshot_fields
+from api.exchange_adapter import OKXAdapter
+
+
+class TestMarketSnapshot(unittest.TestCase):
+    def setUp(self):
+        # OKX 原始行情经适配器转换为内部 schema
+        self.spot = OKXAdapter.normalize_tickers(pd.DataFrame({
+            'instId': ['BTC-USDT', 'ETH-USDT', 'PEPE-USDT'],
+            'last': ['100', '10', '0.5'],
+            'volCcy24h': ['1000', '500', '50'],
+        }), "spot")
+        self.swap = OKXAdapter.normalize_tickers(pd.DataFrame({
+            'instId': ['BTC-USDT-SWAP', 'ETH-USDT-SWAP', 'BTC-USD-SWAP'],
+            'last': ['101', '9.9', '100'],
+            # 合约的 volCcy24h 以币计
+            'volCcy24h': ['30', '50', '999'],
+        }), "swap")
+        self.futures = OKXAdapter.normalize_tickers(pd.DataFrame({
+            'instId': ['BTC-USDT-250328', 'BTC-USDT-250627', 'BTC-USD-250328'],
+            'last': ['102', '104', '103'],
+            'volCcy24h': ['1', '1', '999'],
+        }), "futures")
+
+    def test_basis_and_volume_share(self):
+        """基差与永续成交占比按 USDT 口径计算"""
+        snap = build_market_snapshot(self.spot, self.swap, self.futures)
+
+        self.assertAlmostEqual(snap.loc['BTC', 'basis_pct'], 1.0)
+        self.assertAlmostEqual(snap.loc['ETH', 'basis_pct'], -1.0)
+        # BTC 永续成交额 = 30 * 101 = 3030 USDT
+        self.assertAlmostEqual(snap.loc['BTC', 'perp_vol_usdt'], 3030)
+        self.assertAlmostEqual(snap.loc['BTC', 'perp_vol_share'], 3030 / 4030)
+        # 币本位合约被忽略
+        self.assertAlmostEqual(snap.loc['BTC', 'futures_vol_usdt'], 102 + 104)
+
+    def test_spot_only_coin_has_no_derivatives(self):
+        """只有现货的币种衍生品字段为空"""
+        snap = build_market_snapshot(self.spot, self.swap, self.futures)
+
+        self.assertTrue(pd.isna(snap.loc['PEPE', 'basis_pct']))
+        self.assertEqual(format_snapshot_fields(snap, 'PEPE-USDT'), "")
+        self.assertIn("Perp Basis", format_snapshot_fields(snap, 'BTC-USDT'))
+
+    def test_missing_markets(self):
+        """衍生品市场拉取失败时仍能返回现货快照"""
+        snap = build_market_snapshot(self.spot, None, None)
+
+        self.assertEqual(len(snap), 3)
+        self.assertTrue(snap['basis_pct'].isna().all())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import datetime
+import unittest
+from analysis.news_index import NewsIndex
+
+
+def iso_hours_ago(hours):
+    dt = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(hours=hours)
+    return dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class TestNewsIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = NewsIndex(half_life_hours=6, max_age_hours=48)
+        self.index.add([
+            {"id": 1, "currencies": ["BTC"], "published_at": iso_hours_ago(1),
+             "votes": {"positive": 3, "negative": 1}},
+            {"id": 2, "currencies": ["BTC", "ETH"], "published_at": iso_hours_ago(2),
+             "votes": {"positive": 0, "negative": 4}},
+            {"id": 3, "currencies": ["SOL"], "published_at": iso_hours_ago(100)},
+        ])
+
+    def test_lookup_by_symbol(self):
+        """按币种或交易对查询新闻聚合"""
+        btc = self.index.get("BTC-USDT")
+        self.assertEqual(btc["count"], 2)
+        self.assertEqual(self.index.get("ETH")["count"], 1)
+        self.assertLess(self.index.get("ETH")["sentiment"], 0)
+        # 超过 max_age 的新闻不进入索引
+        self.assertIsNone(self.index.get("SOL"))
+
+    def test_recency_weighting(self):
+        """较新的新闻权重更高"""
+        self.index.add([
+            {"id": 10, "currencies": ["NEW"], "published_at": iso_hours_ago(0)},
+            {"id": 11, "currencies": ["OLD"], "published_at": iso_hours_ago(12)},
+        ])
+        self.assertAlmostEqual(self.index.get("NEW")["score"] / self.index.get("OLD")["score"], 4, places=2)
+
+    def test_readd_overrides_with_verdict(self):
+        """重复加入同一帖子会替换旧值，AI 情绪分优先"""
+        item = {"id": 2, "currencies": ["BTC", "ETH"], "published_at": iso_hours_ago(2),
+                "votes": {"positive": 0, "negative": 4}}
+        self.index.add([item], verdicts={"2": {"sentiment_score": 0.9}})
+
+        self.assertEqual(self.index.get("ETH")["count"], 1)
+        self.assertAlmostEqual(self.index.get("ETH")["sentiment"], 0.9)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from analysis.news_ingestor import NewsIngestor
+from api.llm_client import LLMClient
+
+
+def make_post(post_id, currencies=("BTC",)):
+    return {"id": post_id, "title": f"News {post_id}", "currencies": list(currencies)}
+
+
+class FakeNewsClient:
+    """按页返回帖子 (新 -> 旧) 的本地替身，翻页规则与 NewsClient.fetch_pages 一致"""
+    api_key = "test"
+
+    def __init__(self, feeds, page_size=10):
+        self.feeds = feeds
+        self.page_size = page_size
+        self.calls = []
+
+    def fetch_pages(self, news_filter, currencies=None, since_id=None, max_pages=1, page=1):
+        self.calls.append((news_filter, since_id))
+        posts = self.feeds.get(news_filter, [])
+        result = []
+        for current in range(page, page + max_pages):
+            chunk = posts[(current - 1) * self.page_size:current * self.page_size]
+            fresh = [p for p in chunk if since_id is None or p["id"] > since_id]
+            result += fresh
+            has_next = current * self.page_size < len(posts)
+            if len(fresh) < len(chunk) or not has_next or since_id is None:
+                return result, None
+        return result, page + max_pages
+
+
+class FakeLLM:
+    api_key = "test"
+
+    def __init__(self):
+        self.batches = []
+
+    def verify_and_analyze_news(self, items):
+        self.batches.append([i["id"] for i in items])
+        return {
+            "market_summary": "summary",
+            "verified_news": [{"id": n + 1, "title": i["title"], "credibility": "High",
+                               "sentiment_score": 0.5} for n, i in enumerate(items)]
+        }
+
+
+class TestNewsIngestor(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store_path = os.path.join(self.tmp.name, "news_store.json")
+        self.client = FakeNewsClient({"important": [make_post(2), make_post(1)], "hot": [make_post(3)]})
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_incremental_fetch_uses_cursor(self):
+        """第二次拉取只返回游标之后的帖子"""
+        ingestor = NewsIngestor(self.client, store_path=self.store_path)
+        recent, new = ingestor.fetch(limit=5)
+        self.assertEqual([p["id"] for p in new], [2, 1, 3])
+        # important 优先
+        self.assertEqual([p["id"] for p in recent], [2, 1])
+
+        self.client.feeds["important"].insert(0, make_post(4))
+        ingestor = NewsIngestor(self.client, store_path=self.store_path)
+        _, new = ingestor.fetch(limit=5)
+        self.assertEqual([p["id"] for p in new], [4])
+        self.assertIn(("important", 2), self.client.calls)
+
+    def test_backlog_longer_than_max_pages_is_resumed(self):
+        """新帖子超过 max_pages 页时游标不前移，下一轮从未拉取的页继续，中间的帖子不会丢失"""
+        self.client = FakeNewsClient({"important": [make_post(1)]}, page_size=2)
+        ingestor = NewsIngestor(self.client, store_path=self.store_path, max_pages=2)
+        ingestor.fetch()
+        key = ingestor._cursor_key("important", None)
+        self.assertEqual(ingestor.store["cursors"][key], 1)
+
+        # 积压 10 条 (5 页)，每轮最多 2 页
+        self.client.feeds["important"] = [make_post(i) for i in range(11, 0, -1)]
+        seen = []
+        for _ in range(3):
+            ingestor = NewsIngestor(self.client, store_path=self.store_path, max_pages=2)
+            _, new = ingestor.fetch()
+            seen += [p["id"] for p in new]
+            if ingestor.store["resume"].get(key):
+                # 未与游标衔接前，游标保持不变
+                self.assertEqual(ingestor.store["cursors"][key], 1)
+        self.assertEqual(sorted(seen), list(range(2, 12)))
+        self.assertEqual(ingestor.store["cursors"][key], 11)
+        self.assertNotIn(key, ingestor.store["resume"])
+
+        # 衔接后回到从第一页增量拉取
+        self.client.feeds["important"].insert(0, make_post(12))
+        _, new = NewsIngestor(self.client, store_path=self.store_path, max_pages=2).fetch()
+        self.assertEqual([p["id"] for p in new], [12])
+
+    def test_cached_verdicts_are_reused(self):
+        """已验证的新闻不会再次发送给 LLM"""
+        llm = FakeLLM()
+        ingestor = NewsIngestor(self.client, store_path=self.store_path)
+        recent, _ = ingestor.fetch(limit=5)
+
+        first = ingestor.verify(llm, recent)
+        self.assertEqual(len(first["verified_news"]), 2)
+        self.assertEqual(llm.batches, [[2, 1]])
+
+        self.client.feeds["important"].insert(0, make_post(5))
+        ingestor = NewsIngestor(self.client, store_path=self.store_path)
+        recent, _ = ingestor.fetch(limit=5)
+        second = ingestor.verify(llm, recent)
+
+        self.assertEqual(llm.batches[-1], [5])
+        self.assertEqual(ingestor.verdict_hits, 2)
+        self.assertEqual(len(second["verified_news"]), 3)
+
+
+    def test_malformed_verdicts_are_not_cached(self):
+        """缺少 credibility / sentiment_score 的结论不写入缓存，下一轮重新验证"""
+        llm = FakeLLM()
+        good = llm.verify_and_analyze_news
+        llm.verify_and_analyze_news = lambda items: {
+            "market_summary": "summary",
+            "verified_news": [{"id": 1, "title": "News 2", "credibility": "High"},
+                              {"id": 2, "title": "News 1", "credibility": "High", "sentiment_score": -0.2}]
+        }
+        ingestor = NewsIngestor(self.client, store_path=self.store_path)
+        recent, _ = ingestor.fetch(limit=5)
+        result = ingestor.verify(llm, recent)
+        self.assertEqual([v["title"] for v in result["verified_news"]], ["News 1"])
+        self.assertNotIn("2", ingestor.store["verdicts"])
+
+        llm.verify_and_analyze_news = good
+        ingestor = NewsIngestor(self.client, store_path=self.store_path)
+        ingestor.verify(llm, recent)
+        self.assertEqual(llm.batches, [[2]])
+
+    def test_analyze_market_tolerates_incomplete_verdicts(self):
+        client = LLMClient(api_key="key", base_url="https://llm.example/v1", model="m")
+        news = {"market_summary": "s", "verified_news": [{"title": "No score", "credibility": "High"},
+                                                         {"title": "Bare"}]}
+        with mock.patch.object(LLMClient, "_call_llm", side_effect=lambda system, user: user):
+            prompt = client.analyze_market("Symbol: BTC-USDT", news_analysis=news)
+        self.assertIn("| 🔴 | No score |", prompt)
+        self.assertNotIn("Bare", prompt)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,5 @@
 import unittest
-from src.api.okx_client import OKXClient
+from src.api.okx_client import OKXClient, parse_tickers
 
 class TestOKXClient(unittest.TestCase):
     def setUp(self):
@@ -23,5 +23,39 @@ class TestOKXClient(unittest.TestCase):
         sample_instId = df.iloc[0]['instId']
         self.assertTrue(sample_instId.endswith('-USDT'))
 
+class TestParseTickers(unittest.TestCase):
+    def setUp(self):
+        self.records = [
+            {'instType': 'SPOT', 'instId': 'BTC-USDT', 'last': '100.5', 'lastSz': '0.1',
+             'askPx': '100.6', 'askSz': '2', 'bidPx': '100.4', 'bidSz': '3',
+             'open24h': '99', 'high24h': '101', 'low24h': '98', 'volCcy24h': '123456.7',
+             'vol24h': '1234', 'ts': '1700000000000', 'sodUtc0': '99.5', 'sodUtc8': '99.1'},
+            {'instType': 'SPOT', 'instId': 'ETH-BTC', 'last': '0.05', 'ts': '1700000000000'},
+            {'instType': 'SPOT', 'instId': 'NEW-USDT', 'last': '', 'askPx': '', 'ts': ''},
+        ]
+
+    def test_schema_types(self):
+        """按 schema 直接解析为类型化列，并丢弃无用列"""
+        df = parse_tickers(self.records, "SPOT")
+
+        self.assertEqual(list(df['instId']), ['BTC-USDT', 'NEW-USDT'])
+        self.assertEqual(df['instId'].dtype.name, 'category')
+        self.assertEqual(df['last'].dtype.name, 'float64')
+        self.assertEqual(df['bidSz'].dtype.name, 'float32')
+        self.assertEqual(df['ts'].dtype.name, 'int64')
+        self.assertNotIn('sodUtc0', df.columns)
+        self.assertNotIn('lastSz', df.columns)
+
+        # 空字符串解析为 NaN / 0
+        self.assertTrue(df['last'].isna().iloc[1])
+        self.assertEqual(df['ts'].iloc[1], 0)
+
+    def test_empty_response(self):
+        """空数据也返回带完整列的 DataFrame"""
+        df = parse_tickers([], "SPOT")
+
+        self.assertTrue(df.empty)
+        self.assertIn('volCcy24h', df.columns)
+
 if __name__ == '__main__':
     unittest.main()
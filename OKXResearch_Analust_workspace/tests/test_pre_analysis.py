@@ -0,0 +1,129 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from analysis.fundamental import FundamentalAnalyzer
+from analysis.news_ingestor import NewsIngestor
+from analysis.pre_analysis import run_pre_analysis
+from api.llm_client import LLMClient
+
+
+def make_post(post_id):
+    return {"id": post_id, "title": f"News {post_id}", "currencies": ["BTC"]}
+
+
+def verdicts(items):
+    return {
+        "market_summary": "summary",
+        "verified_news": [{"id": n + 1, "title": i["title"], "credibility": "High",
+                           "sentiment_score": 0.5} for n, i in enumerate(items)]
+    }
+
+
+class FakeLLM:
+    """记录各类请求的替身；combined_ok=False 时模拟合并响应未通过校验"""
+    api_key = "test"
+
+    def __init__(self, combined_ok=True):
+        self.combined_ok = combined_ok
+        self.calls = []
+
+    def pre_analyze(self, news_items, coin_list):
+        self.calls.append(("pre_analyze", [i["id"] for i in news_items], list(coin_list)))
+        if not self.combined_ok:
+            return None, None
+        return verdicts(news_items), {c: "AI" for c in coin_list}
+
+    def verify_and_analyze_news(self, items):
+        self.calls.append(("verify", [i["id"] for i in items]))
+        return verdicts(items)
+
+    def classify_sectors(self, coin_list):
+        self.calls.append(("classify", list(coin_list)))
+        return {c: "Meme" for c in coin_list}
+
+
+class TestRunPreAnalysis(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.ingestor = NewsIngestor(None, store_path=os.path.join(self.tmp.name, "news_store.json"))
+        self.news = [make_post(2), make_post(1)]
+        self.fundamental = FundamentalAnalyzer(config_path=os.path.join(self.tmp.name, "missing.json"))
+        self.fundamental.local_sector_map = {"BTC": "Layer1"}
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_single_round_trip(self):
+        llm = FakeLLM()
+        self.fundamental.llm_client = llm
+        result = run_pre_analysis(llm, self.ingestor, self.fundamental, self.news, ["BTC-USDT", "NEW-USDT"])
+
+        self.assertEqual(llm.calls, [("pre_analyze", [2, 1], ["NEW"])])
+        self.assertEqual(len(result["verified_news"]), 2)
+        self.assertEqual(self.fundamental.get_coin_sector("NEW-USDT"), "AI")
+        self.assertEqual((self.fundamental.sector_hits, self.fundamental.sector_misses), (1, 1))
+        self.assertEqual(self.ingestor.verdict_misses, 2)
+
+        # 第二轮全部命中缓存，不再请求
+        run_pre_analysis(llm, self.ingestor, self.fundamental, self.news, ["BTC-USDT", "NEW-USDT"])
+        self.assertEqual(len(llm.calls), 1)
+
+    def test_fallback_to_separate_calls(self):
+        llm = FakeLLM(combined_ok=False)
+        self.fundamental.llm_client = llm
+        result = run_pre_analysis(llm, self.ingestor, self.fundamental, self.news, ["NEW-USDT"])
+
+        self.assertEqual([c[0] for c in llm.calls], ["pre_analyze", "verify", "classify"])
+        self.assertEqual(len(result["verified_news"]), 2)
+        self.assertEqual(self.fundamental.get_coin_sector("NEW-USDT"), "Meme")
+
+    def test_only_one_task_skips_combined_request(self):
+        llm = FakeLLM()
+        self.fundamental.llm_client = llm
+        run_pre_analysis(llm, self.ingestor, self.fundamental, [], ["NEW-USDT"])
+        self.assertEqual(llm.calls, [("classify", ["NEW"])])
+
+    def test_sectors_beyond_batch_are_classified_separately(self):
+        llm = FakeLLM()
+        self.fundamental.llm_client = llm
+        coins = [f"C{i}-USDT" for i in range(25)]
+        run_pre_analysis(llm, self.ingestor, self.fundamental, self.news, coins)
+        self.assertEqual(len(llm.calls[0][2]), 20)
+        self.assertEqual(llm.calls[1], ("classify", [f"C{i}" for i in range(20, 25)]))
+
+
+class TestPreAnalyzeValidation(unittest.TestCase):
+    def setUp(self):
+        self.llm = LLMClient(api_key="test", base_url="http://localhost", model="m")
+        self.news = [make_post(1), make_post(2)]
+
+    def ask(self, payload):
+        text = payload if isinstance(payload, str) else json.dumps(payload)
+        with patch.object(LLMClient, "_call_llm", return_value=text):
+            return self.llm.pre_analyze(self.news, ["PEPE", "FET"])
+
+    def test_valid_response(self):
+        news, sectors = self.ask("```json\n" + json.dumps({
+            "news": verdicts(self.news),
+            "sectors": {"PEPE": "Meme", "FET": " AI ", "EXTRA": "DeFi"},
+        }) + "\n```")
+        self.assertEqual(len(news["verified_news"]), 2)
+        self.assertEqual(sectors, {"PEPE": "Meme", "FET": "AI"})
+
+    def test_invalid_responses(self):
+        cases = [
+            "not json",
+            {"sectors": {"PEPE": "Meme", "FET": "AI"}},
+            {"news": verdicts(self.news), "sectors": {"PEPE": "Meme"}},
+            {"news": {"verified_news": [{"id": 7}]}, "sectors": {"PEPE": "Meme", "FET": "AI"}},
+            {"news": verdicts(self.news), "sectors": {"PEPE": "Meme", "FET": ""}},
+            {"news": {"verified_news": [{"id": 1, "credibility": "High"}]}, "sectors": {"PEPE": "Meme", "FET": "AI"}},
+        ]
+        for payload in cases:
+            self.assertEqual(self.ask(payload), (None, None))
+
+
+if __name__ == '__main__':
+    unittest.main()
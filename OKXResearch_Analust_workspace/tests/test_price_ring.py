@@ -0,0 +1,134 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+import pandas as pd
+from utils.price_ring import PriceRingWriter, PriceRingReader, RING_FIELDS
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+
+def make_tickers(prices):
+    return pd.DataFrame({
+        'instId': pd.Categorical(list(prices)),
+        'last': list(prices.values()),
+        'open24h': list(prices.values()),
+        'volCcy24h': [1000.0] * len(prices),
+    })
+
+
+class TestPriceRing(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "ring.bin")
+        self.writer = PriceRingWriter(self.path, slots=4, max_instruments=8)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_latest_snapshots_are_contiguous_views(self):
+        reader = PriceRingReader(self.path)
+        self.assertEqual(reader.seq, 0)
+        self.assertEqual(len(reader.latest(3)[0]), 0)
+
+        # 写入 6 次，超过容量 4，环已回绕
+        for i in range(6):
+            self.writer.write(make_tickers({"BTC-USDT": 100.0 + i, "ETH-USDT": 10.0 + i}), ts=1000.0 + i)
+
+        ts, data = reader.latest(3)
+        self.assertEqual(reader.seq, 6)
+        self.assertEqual(ts.tolist(), [1003.0, 1004.0, 1005.0])
+        self.assertEqual(data.shape, (3, len(RING_FIELDS), 2))
+        self.assertEqual(reader.series("BTC-USDT", "last", 3).tolist(), [103.0, 104.0, 105.0])
+        # 零拷贝：返回的是映射内存上的视图
+        self.assertFalse(data.flags['OWNDATA'])
+        # 请求数超过容量时截断，且不含下一个要被覆盖的槽位
+        ts, _ = reader.latest(10)
+        self.assertEqual(ts.tolist(), [1003.0, 1004.0, 1005.0])
+        self.writer.write(make_tickers({"BTC-USDT": 106.0}), ts=1006.0)
+        self.assertEqual(ts.tolist(), [1003.0, 1004.0, 1005.0])
+
+    def test_copy_latest_retries_when_written_during_copy(self):
+        self.writer.write(make_tickers({"BTC-USDT": 1.0}), ts=1000.0)
+        reader = PriceRingReader(self.path)
+        load = PriceRingReader.instruments.fget
+        calls = []
+
+        def instruments(r):
+            # 第一次拷贝期间写入方追加了新交易对与新快照
+            if not calls:
+                self.writer.write(make_tickers({"BTC-USDT": 2.0, "ETH-USDT": 3.0}), ts=1001.0)
+            calls.append(1)
+            return load(r)
+
+        with mock.patch.object(PriceRingReader, "instruments", property(instruments)):
+            ts, data, index = reader.copy_latest(3)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(ts.tolist(), [1000.0, 1001.0])
+        self.assertEqual(list(index), ["BTC-USDT", "ETH-USDT"])
+        self.assertEqual(data.shape, (2, len(RING_FIELDS), 2))
+        self.assertTrue(data.flags['OWNDATA'])
+        self.assertEqual(reader.to_frame()['last'].tolist(), [2.0, 3.0])
+
+    def test_restart_keeps_seq_and_index(self):
+        for i in range(3):
+            self.writer.write(make_tickers({"BTC-USDT": 100.0 + i, "ETH-USDT": 10.0}), ts=1000.0 + i)
+        reader = PriceRingReader(self.path)
+        self.writer.flush()
+
+        # 采集进程重启：布局一致时原地续写，读取方的序号与映射继续有效
+        writer = PriceRingWriter(self.path, slots=4, max_instruments=8)
+        self.assertEqual(writer.seq, 3)
+        writer.write(make_tickers({"SOL-USDT": 1.0, "BTC-USDT": 103.0}), ts=1003.0)
+        self.assertEqual(reader.wait_for_update(3, timeout=1), 4)
+        self.assertEqual(list(reader.instruments), ["BTC-USDT", "ETH-USDT", "SOL-USDT"])
+        self.assertEqual(reader.series("BTC-USDT", "last", 3).tolist(), [101.0, 102.0, 103.0])
+
+        # 布局变化时重建
+        writer = PriceRingWriter(self.path, slots=8, max_instruments=8)
+        self.assertEqual((writer.seq, len(writer.instruments)), (0, 0))
+
+    def test_fixed_index_appends_new_instruments(self):
+        reader = PriceRingReader(self.path)
+        self.writer.write(make_tickers({"BTC-USDT": 1.0, "ETH-USDT": 2.0}))
+        self.writer.write(make_tickers({"SOL-USDT": 3.0, "BTC-USDT": 1.5}))
+
+        self.assertEqual(list(reader.instruments), ["BTC-USDT", "ETH-USDT", "SOL-USDT"])
+        last = reader.field("last", 2)
+        np.testing.assert_array_equal(last[1], [1.5, np.nan, 3.0])
+        self.assertTrue(np.isnan(last[0, 2]))
+
+        frame = reader.to_frame()
+        self.assertEqual(frame['instId'].tolist(), ["BTC-USDT", "SOL-USDT"])
+        self.assertEqual(frame['last'].tolist(), [1.5, 3.0])
+
+    def test_capacity_overflow_drops_new_instruments(self):
+        prices = {f"C{i}-USDT": float(i) for i in range(10)}
+        self.writer.write(make_tickers(prices))
+        self.assertEqual(len(PriceRingReader(self.path).instruments), 8)
+
+    def test_reader_in_another_process(self):
+        self.writer.write(make_tickers({"BTC-USDT": 42.0}))
+        self.writer.flush()
+        code = (
+            f"import sys; sys.path.insert(0, {SRC_DIR!r})\n"
+            "from utils.price_ring import PriceRingReader\n"
+            f"r = PriceRingReader({self.path!r})\n"
+            "print(r.seq, r.series('BTC-USDT', 'last')[0])\n"
+        )
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, timeout=60)
+        self.assertEqual(out.stdout.split(), ["1", "42.0"], out.stderr)
+
+    def test_rejects_foreign_file(self):
+        other = os.path.join(self.tmp.name, "other.bin")
+        with open(other, "wb") as f:
+            f.write(b"\0" * 128)
+        with self.assertRaises(ValueError):
+            PriceRingReader(other)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import tempfile
+import time
+import tracemalloc
+import unittest
+from pathlib import Path
+from utils.profiler import RunProfiler
+from utils.stage_timer import StageTimer
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < end:
+        total += sum(range(100))
+    return total
+
+
+class TestRunProfiler(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.profiler = RunProfiler(self.tmp.name, interval=0.002)
+        self.leak = []
+
+    def tearDown(self):
+        tracemalloc.stop()
+        self.tmp.cleanup()
+
+    def run_cycle(self):
+        timer = StageTimer(listener=self.profiler)
+        with self.profiler.profile_run() as paths:
+            with timer.stage("compute"):
+                busy(0.1)
+            with timer.stage("allocate"):
+                self.leak.append([str(i) * 10 for i in range(20000)])
+        return timer, paths
+
+    def test_writes_folded_stacks_and_stage_memory(self):
+        timer, paths = self.run_cycle()
+        self.assertIn("compute", timer.durations)
+
+        folded = Path(paths["folded"]).read_text(encoding="utf-8").splitlines()
+        self.assertTrue(folded)
+        # 每行为 "阶段;线程;帧;... 次数"
+        stack, count = folded[0].rsplit(" ", 1)
+        self.assertGreater(int(count), 0)
+        self.assertTrue(any(line.startswith("compute;MainThread;") and "busy (test_profiler.py" in line
+                            for line in folded))
+
+        memory = Path(paths["memory"]).read_text(encoding="utf-8")
+        self.assertIn("## compute:", memory)
+        self.assertIn("## allocate:", memory)
+        self.assertIn("test_profiler.py", memory)
+        self.assertNotIn("Growth since previous cycle", memory)
+
+    def test_second_cycle_reports_growth(self):
+        self.run_cycle()
+        _, paths = self.run_cycle()
+        memory = Path(paths["memory"]).read_text(encoding="utf-8")
+        self.assertIn("cycle 2", memory)
+        growth = memory.split("## Growth since previous cycle:")[1]
+        self.assertTrue(growth.strip().startswith("+"))
+        self.assertIn("test_profiler.py", growth)
+
+    def test_stage_timer_without_listener(self):
+        timer = StageTimer()
+        with timer.stage("a"):
+            pass
+        self.assertIn("a", timer.durations)
+
+
+if __name__ == '__main__':
+    unittest.main()
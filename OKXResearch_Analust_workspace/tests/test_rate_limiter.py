@@ -0,0 +1,61 @@
+import asyncio
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from utils.rate_limiter import TokenBucket, RateLimitRegistry
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_burst_then_paced(self):
+        """容量内的请求立即放行，超出部分按速率错开"""
+        bucket = TokenBucket(rate=10, capacity=2)
+        waits = [bucket.reserve() for _ in range(4)]
+
+        self.assertEqual(waits[:2], [0.0, 0.0])
+        self.assertAlmostEqual(waits[2], 0.1, places=2)
+        self.assertAlmostEqual(waits[3], 0.2, places=2)
+        self.assertEqual(bucket.metrics()["waited"], 2)
+
+    def test_concurrent_acquire_respects_rate(self):
+        """多线程并发获取时总耗时受速率约束"""
+        bucket = TokenBucket(rate=50, capacity=1)
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda _: bucket.acquire(), range(11)))
+        self.assertGreaterEqual(time.monotonic() - start, 0.18)
+
+    def test_throttle_halves_rate_and_recovers(self):
+        bucket = TokenBucket(rate=10, capacity=10, recovery_ratio=0.5)
+        bucket.on_throttled()
+        self.assertEqual(bucket.rate, 5)
+        self.assertLessEqual(bucket.tokens, 0)
+
+        bucket.on_success()
+        bucket.on_success()
+        self.assertEqual(bucket.rate, 10)
+
+    def test_async_acquire(self):
+        bucket = TokenBucket(rate=100, capacity=1)
+
+        async def run():
+            return await asyncio.gather(*(bucket.acquire_async() for _ in range(3)))
+
+        waits = asyncio.run(run())
+        self.assertEqual(sorted(waits)[0], 0.0)
+        self.assertGreater(max(waits), 0)
+
+
+class TestRateLimitRegistry(unittest.TestCase):
+    def test_per_endpoint_buckets(self):
+        registry = RateLimitRegistry({"/a": (20, 2)}, default_limit=(4, 2), safety_factor=0.5)
+
+        self.assertAlmostEqual(registry.get("/a").rate, 5)
+        self.assertAlmostEqual(registry.get("/unknown").rate, 1)
+        self.assertIs(registry.get("/a"), registry.get("/a"))
+
+        registry.report_throttled("/a")
+        self.assertEqual(registry.metrics()["/a"]["throttled"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import os
+import tempfile
+import unittest
+from utils.run_archive import RunArchive, extract_symbols
+from utils.stage_timer import StageTimer
+
+
+def make_record(started_at, report, **kwargs):
+    record = {
+        "started_at": started_at,
+        "finished_at": started_at + 5,
+        "status": "ok",
+        "model": "deepseek-chat",
+        "user_query": "",
+        "inputs": f"Symbol: BTC-USDT, Price: {started_at}",
+        "prompt": "请分析以下行情数据",
+        "report": report,
+        "timings": {"fetch_market": 0.5, "analyze": 3.2},
+        "usage": {"calls": 1, "total_tokens": 1200},
+    }
+    record.update(kwargs)
+    return record
+
+
+class TestRunArchive(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.archive = RunArchive(os.path.join(self.tmp.name, "runs.sqlite3"))
+
+    def tearDown(self):
+        self.archive.close()
+        self.tmp.cleanup()
+
+    def test_save_and_get_roundtrip(self):
+        run_id = self.archive.save(make_record(1000.0, "BTC-USDT 放量突破", universe=["BTC-USDT", "ETH-USDT"]))
+        run = self.archive.get(run_id)
+
+        self.assertEqual(run["report"], "BTC-USDT 放量突破")
+        self.assertEqual(run["symbols"], ["BTC"])
+        self.assertEqual(run["timings"]["analyze"], 3.2)
+        self.assertEqual(run["usage"]["total_tokens"], 1200)
+        # 未显式提供时，快照引用为输入数据的哈希
+        self.assertEqual(len(run["snapshot_ref"]), 12)
+        self.assertIsNone(self.archive.get(run_id + 1))
+
+    def test_query_by_time_range_newest_first(self):
+        for ts in (1000.0, 2000.0, 3000.0):
+            self.archive.save(make_record(ts, "report"))
+
+        runs = self.archive.query(since=1500.0)
+        self.assertEqual([r["started_at"] for r in runs], [3000.0, 2000.0])
+
+        runs = self.archive.query(since=1500.0, until=3000.0)
+        self.assertEqual([r["started_at"] for r in runs], [2000.0])
+        # 列表查询不返回大段文本
+        self.assertNotIn("report", runs[0])
+
+    def test_query_by_symbol(self):
+        universe = ["BTC-USDT", "ETH-USDT", "SOL-USDT"]
+        self.archive.save(make_record(1000.0, "BTC 与 ETH 同步上涨", universe=universe))
+        self.archive.save(make_record(2000.0, "SOL 生态资金流入", universe=universe))
+
+        self.assertEqual(len(self.archive.query(symbol="ETH")), 1)
+        self.assertEqual(self.archive.query(symbol="sol-usdt")[0]["started_at"], 2000.0)
+        self.assertEqual(self.archive.query(symbol="DOGE"), [])
+
+    def test_query_by_keyword_supports_chinese(self):
+        self.archive.save(make_record(1000.0, "资金费率持续为负，空头拥挤"))
+        self.archive.save(make_record(2000.0, "Layer2 板块普涨"))
+
+        runs = self.archive.query(keyword="资金费率")
+        self.assertEqual([r["started_at"] for r in runs], [1000.0])
+        # 短关键词退回 LIKE 检索
+        self.assertEqual(len(self.archive.query(keyword="空头")), 1)
+        self.assertEqual(len(self.archive.query(keyword="Layer2")), 1)
+
+    def test_query_combines_filters(self):
+        self.archive.save(make_record(1000.0, "BTC-USDT 资金费率偏高"))
+        self.archive.save(make_record(2000.0, "BTC-USDT 资金费率回落", status="skipped"))
+
+        runs = self.archive.query(symbol="BTC", keyword="资金费率", status="ok")
+        self.assertEqual([r["started_at"] for r in runs], [1000.0])
+
+
+class TestExtractSymbols(unittest.TestCase):
+    def test_without_universe_only_matches_pairs(self):
+        self.assertEqual(extract_symbols("BTC-USDT 领涨，ETH 跟随，RSI 偏高"), ["BTC"])
+
+    def test_with_universe(self):
+        text = "BTC 与 ETH 同步上涨，RSI 偏高"
+        self.assertEqual(extract_symbols(text, ["BTC-USDT", "ETH-USDT", "SOL-USDT"]), ["BTC", "ETH"])
+
+
+class TestStageTimer(unittest.TestCase):
+    def test_accumulates_repeated_stages(self):
+        timer = StageTimer()
+        with timer.stage("fetch"):
+            pass
+        with timer.stage("fetch"):
+            pass
+        with self.assertRaises(ValueError):
+            with timer.stage("analyze"):
+                raise ValueError("boom")
+
+        self.assertEqual(set(timer.durations), {"fetch", "analyze"})
+        self.assertGreaterEqual(timer.total, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+import pandas as pd
+from analysis.sector_aggregator import aggregate_sectors, format_sector_table
+
+
+class FakeAnalyzer:
+    SECTORS = {"BTC": "Layer1", "ETH": "Layer1", "SOL": "Layer1", "DOGE": "Meme", "PEPE": "Meme"}
+
+    def get_coin_sector(self, inst_id):
+        return self.SECTORS.get(inst_id.split('-')[0], "Unknown")
+
+
+class TestSectorAggregator(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame({
+            'symbol': ['BTC-USDT', 'ETH-USDT', 'SOL-USDT', 'DOGE-USDT', 'PEPE-USDT', 'XYZ-USDT'],
+            'last': [110.0, 9.0, 10.0, 1.2, 0.9, 1.0],
+            'open_24h': [100.0, 10.0, 10.0, 1.0, 1.0, 0.0],
+            'quote_volume': [3000.0, 1000.0, 0.0, 500.0, 500.0, 100.0],
+        })
+
+    def test_volume_weighted_return_and_breadth(self):
+        sectors = aggregate_sectors(self.df, FakeAnalyzer())
+
+        layer1 = sectors.loc['Layer1']
+        self.assertEqual(layer1['coins'], 3)
+        # (10% * 3000 + -10% * 1000 + 0% * 0) / 4000
+        self.assertAlmostEqual(layer1['vw_change_pct'], 5.0)
+        self.assertAlmostEqual(layer1['breadth'], 1 / 3)
+        self.assertEqual(layer1['leader'], 'BTC-USDT')
+
+        meme = sectors.loc['Meme']
+        self.assertAlmostEqual(meme['vw_change_pct'], 5.0)
+        self.assertAlmostEqual(meme['dispersion'], 15.0)
+        self.assertEqual(meme['top_gainer'], 'DOGE-USDT')
+
+    def test_volume_share_and_ordering(self):
+        sectors = aggregate_sectors(self.df, FakeAnalyzer())
+
+        # 开盘价为 0 的交易对无法计算涨跌幅，被排除
+        self.assertNotIn('Unknown', sectors.index)
+        self.assertAlmostEqual(sectors['vol_share'].sum(), 1.0)
+        self.assertAlmostEqual(sectors.loc['Layer1', 'vol_share'], 0.8)
+        self.assertEqual(list(sectors.index), ['Layer1', 'Meme'])
+
+    def test_format_table(self):
+        table = format_sector_table(aggregate_sectors(self.df, FakeAnalyzer()), top_n=1)
+        lines = table.splitlines()
+
+        self.assertEqual(len(lines), 3)
+        self.assertIn("| Layer1 | 3 | 80.0% | +5.00% | 33% |", lines[2])
+        self.assertEqual(format_sector_table(aggregate_sectors(pd.DataFrame(), FakeAnalyzer())), "")
+
+    def test_unknown_sector_is_reported_separately(self):
+        df = self.df.assign(open_24h=[100.0, 10.0, 10.0, 1.0, 1.0, 1.0],
+                            quote_volume=[3000.0, 1000.0, 0.0, 500.0, 500.0, 5000.0])
+        sectors = aggregate_sectors(df, FakeAnalyzer())
+        # 未识别赛道成交额最大，但不占用排名
+        self.assertEqual(sectors.index[0], 'Unknown')
+        lines = format_sector_table(sectors, top_n=1).splitlines()
+
+        self.assertEqual(len(lines), 4)
+        self.assertIn("| Layer1 | 3 |", lines[2])
+        self.assertEqual(lines[3], "未识别赛道: 1 个币种，成交额占比 50.0% (未计入上表)")
+        self.assertFalse(any("| Unknown |" in line for line in lines))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import datetime
+import json
+import time
+import unittest
+import urllib.error
+import urllib.request
+from utils.stage_timer import StageTimer
+from utils.status_server import RunStatus, StatusServer
+
+
+def make_record(status="ok", report="# Report\nBTC looks fine", cache=None):
+    now = time.time()
+    return {
+        "run_id": 7, "status": status, "started_at": now - 2.5, "finished_at": now,
+        "timings": {"fetch_market": 0.5, "analyze": 1.8}, "usage": {"total_tokens": 1200},
+        "report": report, "cache": cache if cache is not None else {"news_verdicts": {"hits": 3, "misses": 1}},
+    }
+
+
+class TestStatusServer(unittest.TestCase):
+    def setUp(self):
+        self.next_run = datetime.datetime(2026, 1, 1, 8, 30)
+        self.status = RunStatus(next_run=lambda: self.next_run, stale_after=60)
+        self.server = StatusServer(self.status, host="127.0.0.1", port=0).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def get(self, path):
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{self.server.port}{path}", timeout=5) as resp:
+                return resp.status, resp.read().decode("utf-8"), resp.headers
+        except urllib.error.HTTPError as e:
+            return e.code, e.read().decode("utf-8"), e.headers
+
+    def test_status_before_first_run(self):
+        code, body, _ = self.get("/status")
+        data = json.loads(body)
+        self.assertEqual(code, 200)
+        self.assertIsNone(data["last_run"])
+        self.assertEqual(data["next_run"], "2026-01-01T08:30:00")
+        self.assertEqual(self.get("/report")[0], 404)
+        self.assertEqual(self.get("/missing")[0], 404)
+
+    def test_last_run_and_cache_hit_rates(self):
+        self.status.run_started()
+        self.assertTrue(json.loads(self.get("/status")[1])["running"])
+
+        self.status.run_finished(make_record())
+        self.status.run_finished(make_record(status="skipped", report="闸门跳过",
+                                             cache={"news_verdicts": {"hits": 4, "misses": 0}}))
+        data = json.loads(self.get("/status")[1])
+
+        self.assertFalse(data["running"])
+        self.assertEqual(data["runs"], {"ok": 1, "skipped": 1})
+        self.assertEqual(data["last_run"]["status"], "skipped")
+        self.assertEqual(data["last_run"]["timings"]["analyze"], 1.8)
+        self.assertAlmostEqual(data["last_run"]["duration"], 2.5, places=2)
+        self.assertEqual(data["cache"]["news_verdicts"], {"hits": 7, "misses": 1, "hit_rate": 0.875})
+
+        # 被跳过的轮次不覆盖最近一次报告
+        code, body, headers = self.get("/report")
+        self.assertEqual(code, 200)
+        self.assertIn("BTC looks fine", body)
+        self.assertTrue(headers["Content-Type"].startswith("text/markdown"))
+
+    def test_healthz_reports_stale_loop(self):
+        code, body, _ = self.get("/healthz")
+        self.assertEqual((code, json.loads(body)["status"]), (200, "ok"))
+
+        self.status._heartbeat -= 120
+        code, body, _ = self.get("/healthz")
+        self.assertEqual((code, json.loads(body)["status"]), (503, "stale"))
+
+        self.status.heartbeat()
+        self.assertEqual(self.get("/healthz")[0], 200)
+
+    def test_stages_refresh_heartbeat_during_long_run(self):
+        """运行中的阶段切换刷新心跳：前几个阶段累计超过 stale_after 时仍然健康"""
+        timer = StageTimer(listener=[self.status])
+        self.status.run_started()
+        self.status._heartbeat -= 120
+        with timer.stage("analyze"):
+            self.assertEqual(self.get("/healthz")[0], 200)
+            data = json.loads(self.get("/status")[1])
+            self.assertEqual((data["running"], data["stage"]), (True, "analyze"))
+        self.assertIsNone(self.status.snapshot()["stage"])
+        self.assertIn("analyze", timer.durations)
+
+
+if __name__ == '__main__':
+    unittest.main()